@@ -34,6 +34,7 @@ class Board:
             return True
         return False
 
+
 class Laser:
   
     def __init__(self, x, y, vx, vy):
@@ -119,6 +120,33 @@ class LazorBoard:
         *filename: str*
             Path to the .bff file.
 
+        *returns: LazorBoard*
+            A LazorBoard instance with parsed data.
+        '''
+        with open(filename, 'r') as file:
+            return cls.from_lines(file)
+
+    @classmethod
+    def from_string(cls, text):
+        '''
+        Parses the content of a .bff file given as a string (e.g. received over the network).
+
+        *text: str*
+            The .bff file content.
+
+        *returns: LazorBoard*
+            A LazorBoard instance with parsed data.
+        '''
+        return cls.from_lines(text.splitlines())
+
+    @classmethod
+    def from_lines(cls, lines):
+        '''
+        Parses an iterable of .bff lines; shared by from_file() and from_string().
+
+        *lines: iterable[str]*
+            The lines of a .bff file.
+
         *returns: LazorBoard*
             A LazorBoard instance with parsed data.
         '''
@@ -128,34 +156,33 @@ class LazorBoard:
         targets = []
         reading_grid = False
 
-        with open(filename, 'r') as file:
-            for line in file:
-                line = line.strip()
-                if not line or line.startswith('#'):
-                    continue
-                if line == 'GRID START':
-                    reading_grid = True
-                    continue
-                elif line == 'GRID STOP':
-                    reading_grid = False
-                    continue
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line == 'GRID START':
+                reading_grid = True
+                continue
+            elif line == 'GRID STOP':
+                reading_grid = False
+                continue
 
-                if reading_grid:
-                    row = line.split()
-                    grid.append(row)
-                elif line[0] in {'A', 'B', 'C'}:
-                    parts = line.split()
-                    block_type = parts[0]
-                    count = int(parts[1])
-                    blocks[block_type] = count
-                elif line.startswith('L'):
-                    parts = line.split()
-                    x, y, vx, vy = map(int, parts[1:])
-                    lasers.append((x, y, vx, vy))
-                elif line.startswith('P'):
-                    parts = line.split()
-                    x, y = map(int, parts[1:])
-                    targets.append((x, y))
+            if reading_grid:
+                row = line.split()
+                grid.append(row)
+            elif line[0] in {'A', 'B', 'C'}:
+                parts = line.split()
+                block_type = parts[0]
+                count = int(parts[1])
+                blocks[block_type] = count
+            elif line.startswith('L'):
+                parts = line.split()
+                x, y, vx, vy = map(int, parts[1:])
+                lasers.append((x, y, vx, vy))
+            elif line.startswith('P'):
+                parts = line.split()
+                x, y = map(int, parts[1:])
+                targets.append((x, y))
 
         return cls(grid, blocks, lasers, targets)
 
@@ -177,13 +204,383 @@ class LazorBoard:
                 f"Lasers:\n{laser_str}\n\n"
                 f"Targets:\n{target_str}\n")
 
+    def to_string(self):
+        '''
+        Returns the board in .bff format; from_string() reads it back.
+        '''
+        lines = ["GRID START"] + [" ".join(row) for row in self.grid] + ["GRID STOP", ""]
+        lines += [f"{t} {self.blocks[t]}" for t in ('A', 'B', 'C') if self.blocks.get(t, 0)] + [""]
+        lines += [f"L {x} {y} {vx} {vy}" for (x, y, vx, vy) in self.lasers] + [""]
+        lines += [f"P {x} {y}" for (x, y) in self.targets]
+        return "\n".join(lines) + "\n"
+
+    def fingerprint(self):
+        '''
+        Returns the puzzle_fingerprint() of this board.
+        '''
+        return puzzle_fingerprint(self.grid, self.lasers, self.targets, self.blocks)
+
+
+def puzzle_fingerprint(grid, lasers, targets, blocks):
+    '''
+    Returns a short hex digest identifying a puzzle: a hash of Checkpoint.board_fingerprint(),
+    so that checkpoints and service or batch records tell puzzles apart the same way. Boards
+    with the same grid, lasers, targets (in the same order) and block counts get the same
+    fingerprint, whatever file they came from.
+
+    *returns: str*
+        16 hex characters.
+    '''
+    import hashlib
+    canonical = board_fingerprint(grid, lasers, targets, blocks)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+# ===== FILE: RenderCache.py =====
+
+# RenderCache.py
+import hashlib
+import json
+import os
+import shutil
+
+RENDER_INDEX = 'index.json'
+RENDER_INDEX_VERSION = 1
+
+
+def render_key(grid, targets, laser_paths, options):
+    """
+    SHA-256 hex digest of everything a rendering depends on: the grid with its blocks, the
+    targets, the laser paths (lists of (x, y)) and the render options (a JSON-serializable dict).
+    """
+    payload = json.dumps({
+        'grid': ["".join(row) for row in grid],
+        'targets': [list(t) for t in targets],
+        'paths': [[list(p) for p in path] for path in laser_paths],
+        'options': options,
+    }, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class RenderCache:
+    '''
+    Content-addressed store of rendered solutions: the image of a rendering is kept in
+    directory as <key><extension>, key being its render_key(). An index maps every output file
+    the cache wrote to the key of its image, so an output that already holds the image of a
+    key is left alone, and an entry no output refers to anymore (its level changed, or was
+    removed) is stale and deleted.
+
+    Outputs are copies of the entries, not links: rendering into an output again without the
+    cache must not change an entry.
+
+    directory: *str*
+        Where the entries and the index are kept.
+    index: *dict[str, str]*
+        Output path (relative to directory) -> key of the image it holds.
+    stats: *dict[str, int]*
+        hits (renderings reused), misses (renderings stored) and removed (stale entries deleted).
+    '''
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.index = self._read_index()
+        self.stats = {'hits': 0, 'misses': 0, 'removed': 0}
+
+    def entry_path(self, key, extension='.png'):
+        """Path of the entry of key."""
+        return os.path.join(self.directory, key + extension)
+
+    def fetch(self, key, output_path):
+        """
+        Put the image of key at output_path, if the cache has it (nothing to do if the output
+        already is that image). Returns False if the image must be rendered.
+        """
+        entry = self.entry_path(key, os.path.splitext(output_path)[1])
+        if not os.path.exists(entry):
+            return False
+        name = self._name(output_path)
+        if self.index.get(name) != key or not os.path.exists(output_path) or \
+                os.path.getsize(output_path) != os.path.getsize(entry):
+            self._copy(entry, output_path)
+            self._assign(name, key)
+        self.stats['hits'] += 1
+        return True
+
+    def store(self, key, output_path):
+        """Keep the image just rendered at output_path as the entry of key."""
+        self._copy(output_path, self.entry_path(key, os.path.splitext(output_path)[1]))
+        self._assign(self._name(output_path), key)
+        self.stats['misses'] += 1
+
+    def prune(self):
+        """
+        Forget the outputs that were deleted and delete every entry no output refers to.
+        Returns the number of entries deleted.
+        """
+        for name in [name for name in self.index if not os.path.exists(os.path.join(self.directory, name))]:
+            del self.index[name]
+        self._write_index()
+        live = set(self.index.values())
+        removed = 0
+        for filename in os.listdir(self.directory):
+            key, extension = os.path.splitext(filename)
+            if filename != RENDER_INDEX and extension != '.tmp' and key not in live:
+                os.remove(os.path.join(self.directory, filename))
+                removed += 1
+        self.stats['removed'] += removed
+        return removed
+
+    def _name(self, output_path):
+        return os.path.relpath(output_path, self.directory)
+
+    def _assign(self, name, key):
+        """Record that output name holds the image of key; the entry it held may now be stale."""
+        old = self.index.get(name)
+        self.index[name] = key
+        self._write_index()
+        if old is not None and old != key and old not in self.index.values():
+            extension = os.path.splitext(name)[1]
+            if os.path.exists(self.entry_path(old, extension)):
+                os.remove(self.entry_path(old, extension))
+                self.stats['removed'] += 1
+
+    def _copy(self, source, destination):
+        # Through a temporary file, so a reader never sees half an image
+        tmp_path = destination + ".tmp"
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, destination)
+
+    def _read_index(self):
+        path = os.path.join(self.directory, RENDER_INDEX)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if state.get('version') != RENDER_INDEX_VERSION:
+            return {}
+        return dict(state['outputs'])
+
+    def _write_index(self):
+        path = os.path.join(self.directory, RENDER_INDEX)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': RENDER_INDEX_VERSION, 'outputs': self.index}, f, sort_keys=True)
+        os.replace(tmp_path, path)
+
+
+# ===== FILE: ResultSink.py =====
+
+# ResultSink.py
+import gzip
+import json
+import os
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zstd sinks are optional: plain and gzip ones need nothing
+    zstandard = None
+
+COMPRESSIONS = {'.gz': 'gzip', '.zst': 'zstd'}
+
+
+def solve_record(name, fingerprint, result, elapsed, **stats):
+    """
+    The record of one solved puzzle: name, fingerprint, status (solved or unsolvable), the
+    placements of the solution as [r, c, block type], elapsed seconds, the time it was written,
+    and any other JSON-serializable stats (e.g. nodes).
+    """
+    record = {'name': name, 'fingerprint': fingerprint,
+              'status': 'solved' if result.solved else 'unsolvable',
+              'placements': [[r, c, t] for (r, c), t in sorted(result.placed_blocks().items())],
+              'elapsed': round(elapsed, 6), 'time': round(time.time(), 3)}
+    record.update(stats)
+    return record
+
+
+def _decompressor(compression):
+    """A new decompressor of one gzip member or zstd frame (None for plain files)."""
+    if compression == 'gzip':
+        return zlib.decompressobj(wbits=31)
+    if compression == 'zstd':
+        return zstandard.ZstdDecompressor().decompressobj()
+    return None
+
+
+def _frames(file, compression, chunk_size=1 << 20):
+    """
+    Yield (end offset, data) of every complete frame (gzip member or zstd frame) of file, in
+    order. A frame cut short, as the last one of a file written by a process that crashed, is
+    not yielded.
+    """
+    decompressor, parts = _decompressor(compression), []
+    offset = 0
+    while True:
+        data = file.read(chunk_size)
+        if not data:
+            return
+        offset += len(data)
+        while data:
+            parts.append(decompressor.decompress(data))
+            if not decompressor.eof:
+                break
+            data = decompressor.unused_data
+            yield offset - len(data), b''.join(parts)
+            decompressor, parts = _decompressor(compression), []
+
+
+class ResultSink:
+    '''
+    Buffered, append-only JSONL file of records, one per line, for a batch of solves. Records
+    are encoded as they are written, and reach the file in one write per flush: every
+    flush_records records, and when flush_interval seconds passed since the last flush.
+
+    Compressed sinks (gzip for .gz, zstd for .zst, the latter needing the zstandard package)
+    write every flush as a frame of its own (a gzip member, a zstd frame), which the
+    decompressors read as one stream. A crash can only leave the last line or frame incomplete:
+    read_records() ignores it, and opening the sink again cuts it off before appending.
+
+    path: *str*
+        The file; it is created if needed, and records are appended to the ones it has.
+    compression: *str or None*
+        'gzip', 'zstd' or None, by default from the extension of path.
+    fsync: *bool*
+        Whether every flush also waits until the data is on disk (surviving power loss,
+        not only a crash of the process).
+    records: *int*
+        Records written through this sink so far.
+    '''
+    def __init__(self, path, compression='auto', flush_records=1000, flush_interval=1.0, fsync=False):
+        if compression == 'auto':
+            compression = COMPRESSIONS.get(os.path.splitext(path)[1])
+        if compression not in (None, 'gzip', 'zstd'):
+            raise ValueError(f"Unknown compression {compression!r}")
+        if compression == 'zstd' and zstandard is None:
+            raise RuntimeError("zstd result files need the zstandard package")
+        self.path = path
+        self.compression = compression
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.records = 0
+        self._lines = []
+        self._last_flush = time.monotonic()
+        self._compressor = zstandard.ZstdCompressor() if compression == 'zstd' else None
+        self._file = open(path, 'ab')
+        self._file.truncate(self._complete_length())
+
+    def _complete_length(self):
+        """Length of the file without a record or frame cut short by a crash."""
+        with open(self.path, 'rb') as file:
+            if self.compression is None:
+                end = file.seek(0, os.SEEK_END)
+                while end > 0:
+                    start = max(0, end - 65536)
+                    file.seek(start)
+                    newline = file.read(end - start).rfind(b'\n')
+                    if newline >= 0:
+                        return start + newline + 1
+                    end = start
+                return 0
+            length = 0
+            for length, _ in _frames(file, self.compression):
+                pass
+            return length
+
+    def write(self, record):
+        """Add one record (a JSON-serializable dict)."""
+        self._lines.append(json.dumps(record, separators=(',', ':')))
+        self.records += 1
+        if len(self._lines) >= self.flush_records or \
+                time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered records to the file."""
+        self._last_flush = time.monotonic()
+        if not self._lines:
+            return
+        data = ('\n'.join(self._lines) + '\n').encode('utf-8')
+        self._lines = []
+        if self.compression == 'gzip':
+            data = gzip.compress(data, compresslevel=6, mtime=0)
+        elif self.compression == 'zstd':
+            data = self._compressor.compress(data)
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        """Flush and close the file."""
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_records(path, compression='auto'):
+    """
+    Yield the records of a file written by ResultSink, in order, without the incomplete last
+    line or frame a crash may have left.
+    """
+    if compression == 'auto':
+        compression = COMPRESSIONS.get(os.path.splitext(path)[1])
+    if compression == 'zstd' and zstandard is None:
+        raise RuntimeError("zstd result files need the zstandard package")
+    with open(path, 'rb') as file:
+        if compression is None:
+            for line in file:
+                if line.endswith(b'\n'):
+                    yield json.loads(line)
+            return
+        for _, data in _frames(file, compression):
+            for line in data.splitlines():
+                yield json.loads(line)
+
 
 # ===== FILE: LazorVisualizer.py =====
 
 # LazorVisualizer.py
 import matplotlib.pyplot as plt
 
-def visualize_lazor_solution(board, laser_paths, output_filename="lazor_solution.png"):
+# Bump when the drawing below changes: it is part of the key of every cached rendering
+RENDER_VERSION = 1
+CELL_COLORS = {
+    'x': 'lightgrey',
+    'o': 'white',
+    'A': 'limegreen',
+    'B': 'tomato',
+    'C': 'royalblue'
+}
+LASER_COLORS = ['red', 'cyan', 'orange', 'magenta', 'blue', 'green']
+
+
+def render_options(dpi=300):
+    """Everything besides the solution that the image depends on, for render_key()."""
+    return {'dpi': dpi, 'cells': CELL_COLORS, 'lasers': LASER_COLORS, 'version': RENDER_VERSION}
+
+
+def visualize_lazor_solution(board, laser_paths, output_filename="lazor_solution.png", dpi=300, cache=None):
+    """
+    Render a solved board and its laser paths into output_filename.
+    :param cache: Optional RenderCache (see RenderCache.py); a rendering of the same board, paths
+                  and options made before is then copied from it instead of being drawn again
+    """
+    if cache is not None:
+        laser_paths = [list(path) for path in laser_paths]
+        key = render_key(board.grid, board.targets, laser_paths, render_options(dpi))
+        if cache.fetch(key, output_filename):
+            print(f"Visualization reused: {output_filename}")
+            return
 
     rows = len(board.grid)
     cols = len(board.grid[0]) if rows > 0 else 0
@@ -200,19 +597,11 @@ def visualize_lazor_solution(board, laser_paths, output_filename="lazor_solution
     for y in range(rows + 1):
         ax.axhline(y, color='black', linewidth=0.5)
 
-    color_map = {
-        'x': 'lightgrey',
-        'o': 'white',
-        'A': 'limegreen',
-        'B': 'tomato',
-        'C': 'royalblue'
-    }
-
     # Draw each cell of the board
     for r in range(rows):
         for c in range(cols):
             cell = board.grid[r][c]
-            facecolor = color_map.get(cell, 'white')
+            facecolor = CELL_COLORS.get(cell, 'white')
             rect = plt.Rectangle((c, r), 1, 1, facecolor=facecolor, edgecolor='none')
             ax.add_patch(rect)
 
@@ -225,23 +614,2170 @@ def visualize_lazor_solution(board, laser_paths, output_filename="lazor_solution
                 color='gold', markeredgecolor='black', markeredgewidth=1)
 
     # Draw laser trajectories
-    laser_colors = ['red', 'cyan', 'orange', 'magenta', 'blue', 'green']
     for i, path in enumerate(laser_paths):
         xs = [p[0] * 0.5 for p in path]
         ys = [p[1] * 0.5 for p in path]
-        color = laser_colors[i % len(laser_colors)]
+        color = LASER_COLORS[i % len(LASER_COLORS)]
         ax.plot(xs, ys, color=color, linewidth=2, marker='o', markersize=3)
 
     ax.set_title("Lazor Puzzle Solution")
     plt.tight_layout()
-    plt.savefig(output_filename, dpi=300)
+    plt.savefig(output_filename, dpi=dpi)
     print(f"Visualization saved to: {output_filename}")
+    if cache is not None:
+        cache.store(key, output_filename)
+
+
+def visualize_solve_result(result, output_filename="lazor_solution.png", cache=None, dpi=300):
+    """
+    Render a SolveResult, e.g. one attached from shared memory by another process.
+    The result provides grid and targets like a Board, and its paths() replace solver.final_paths.
+    """
+    visualize_lazor_solution(result, result.paths(), output_filename, dpi=dpi, cache=cache)
+
+
+# ===== FILE: Checkpoint.py =====
+
+# Checkpoint.py
+import os
+
+BLOCK_TYPES = 'ABC'
+CHECKPOINT_VERSION = 1
+
+
+def board_fingerprint(grid, lasers, targets, blocks):
+    """
+    Return a short string identifying a puzzle (grid, lasers, targets and block counts).
+    Used to refuse resuming a checkpoint against a different board.
+    """
+    import json  # Only solves with checkpoints need it, so it is imported here
+    rows = ["".join(row) for row in grid]
+    lasers = [list(l) for l in lasers]
+    targets = [list(t) for t in targets]
+    counts = [blocks.get(t, 0) for t in BLOCK_TYPES]
+    return json.dumps([rows, lasers, targets, counts], separators=(',', ':'))
+
+
+def encode_placement(r, c, block_type, cols):
+    """Pack one placement (r, c, 'A'/'B'/'C') into a single int."""
+    return (r * cols + c) * 3 + BLOCK_TYPES.index(block_type)
+
+
+def decode_placement(code, cols):
+    """Inverse of encode_placement(): returns (r, c, block_type)."""
+    cell, k = divmod(code, 3)
+    r, c = divmod(cell, cols)
+    return r, c, BLOCK_TYPES[k]
+
+
+def write_checkpoint(path, state):
+    """
+    Atomically write a search state to a gzip-compressed JSON file.
+    The file is first written next to path and then renamed over it, so a process killed
+    mid-write never leaves a truncated checkpoint behind.
+    """
+    import gzip
+    import json
+    tmp_path = path + ".tmp"
+    payload = json.dumps(dict(state, version=CHECKPOINT_VERSION), separators=(',', ':'))
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def read_checkpoint(path):
+    """Read a checkpoint written by write_checkpoint() and return the state dict."""
+    import gzip
+    import json
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        state = json.load(f)
+    if state.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version in {path}: {state.get('version')}")
+    return state
+
+
+# ===== FILE: LaserTrace.py =====
+
+# LaserTrace.py
+from array import array
+
+
+class LaserTrace:
+    """
+    Indexed record of one laser simulation, filled by Solver.simulate_with_blocks(trace=True).
+
+    Beams are numbered in simulation order: the L sources first, then every beam split off
+    by a C block. Cells are indexed as r * cols + c, targets in the order of board.targets.
+
+    beam_parent: *array('i')*
+        Index of the beam a C block split this beam from, -1 for L sources.
+    beam_split_cell: *array('i')*
+        Cell index of the C block that created the beam, -1 for L sources.
+    target_beam: *array('i')*
+        First beam that hit each target, -1 if the target was missed.
+    target_step: *array('i')*
+        Position of that hit in the beam's path.
+    target_feeder: *array('i')*
+        Cell of the last block the beam interacted with before reaching the target,
+        -1 if the light came straight from its L source.
+    cell_crossings: *array('I')*
+        Number of half steps that crossed each cell without a collision.
+    """
+    def __init__(self, targets, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.targets = list(targets)
+        self.target_index = {t: i for i, t in enumerate(self.targets)}
+        self.beam_parent = array('i')
+        self.beam_split_cell = array('i')
+        self.target_beam = array('i', [-1] * len(self.targets))
+        self.target_step = array('i', [-1] * len(self.targets))
+        self.target_feeder = array('i', [-1] * len(self.targets))
+        self.cell_crossings = array('I', [0] * (rows * cols))
+
+    def add_beam(self, parent=-1, split_cell=-1):
+        """Register a new beam and return its index."""
+        self.beam_parent.append(parent)
+        self.beam_split_cell.append(split_cell)
+        return len(self.beam_parent) - 1
+
+    def record_hit(self, target, beam, step, feeder):
+        """Record the first hit of target (x, y) by beam; later hits are ignored."""
+        t = self.target_index.get(target)
+        if t is not None and self.target_beam[t] < 0:
+            self.target_beam[t] = beam
+            self.target_step[t] = step
+            self.target_feeder[t] = feeder
+
+    def cross(self, cell):
+        """Count one half step through cell index cell."""
+        self.cell_crossings[cell] += 1
+
+    @property
+    def solved(self):
+        """True if every target was hit."""
+        return all(b >= 0 for b in self.target_beam)
+
+    def missed_targets(self):
+        """Return the targets no beam reached."""
+        return [t for t, b in zip(self.targets, self.target_beam) if b < 0]
+
+    def beam_for_target(self, target):
+        """Return the index of the beam that hit target (x, y), or None."""
+        beam = self.target_beam[self.target_index[target]]
+        return beam if beam >= 0 else None
+
+    def feeder_of(self, target):
+        """
+        Return the (r, c) cell of the block that feeds target (x, y): the last reflector or
+        splitter on the way from the source. None if the target is hit directly or missed.
+        """
+        cell = self.target_feeder[self.target_index[target]]
+        return divmod(cell, self.cols) if cell >= 0 else None
+
+    def beam_ancestry(self, beam):
+        """Return the chain of beam indexes from the L source down to beam."""
+        chain = [beam]
+        while self.beam_parent[chain[-1]] >= 0:
+            chain.append(self.beam_parent[chain[-1]])
+        return chain[::-1]
+
+    def crossings(self, r, c):
+        """Number of times beams crossed cell (r, c)."""
+        return self.cell_crossings[r * self.cols + c]
+
+
+# ===== FILE: LaserPaths.py =====
+
+# LaserPaths.py
+from array import array
+
+
+class LaserPaths:
+    '''
+    Beam paths of one simulation, stored as straight diagonal segments in flat arrays instead
+    of one (x, y) tuple per half step. Filled by the tracers in Tracer.py; indexing or iterating
+    expands a beam into its list of points, in the format of the old Solver.final_paths.
+
+    Beams are numbered in simulation order, as in LaserTrace. Segment s is the four values
+    x, y, d, n at segments[4 * s]: its n points are (x + j * vx, y + j * vy) for j in range(n),
+    with the direction (vx, vy) encoded in d as in BoardGeometry.index, ((vx > 0) << 1) | (vy > 0).
+
+    segments: *array('h') or list[int]*
+        x, y, d, n of every segment, beam after beam.
+    beam_offsets: *array('i') or list[int]*
+        Beam i owns segments beam_offsets[i] to beam_offsets[i + 1] - 1.
+
+    With compact=False both buffers are plain lists, which are several times faster to append
+    to: for scratch paths that are rewritten on every search node and never kept.
+    '''
+    def __init__(self, compact=True):
+        self.segments = array('h') if compact else []
+        self.beam_offsets = array('i', [0]) if compact else [0]
+
+    def clear(self):
+        """Forget every beam, keeping the buffers."""
+        del self.segments[:], self.beam_offsets[1:]
+
+    def add_segment(self, x, y, vx, vy, length):
+        """Append length points from (x, y) in direction (vx, vy) to the current beam."""
+        if length > 0:
+            self.segments.extend((x, y, ((vx > 0) << 1) | (vy > 0), length))
+
+    def end_beam(self):
+        """Close the current beam; the next segments belong to a new one."""
+        self.beam_offsets.append(len(self.segments) >> 2)
+
+    def __len__(self):
+        return len(self.beam_offsets) - 1
+
+    def __getitem__(self, beam):
+        """Points of a beam as a list of (x, y)."""
+        if beam < 0:
+            beam += len(self)
+        if not 0 <= beam < len(self):
+            raise IndexError("beam index out of range")
+        points = []
+        segments = self.segments
+        for s in range(4 * self.beam_offsets[beam], 4 * self.beam_offsets[beam + 1], 4):
+            x, y, d, n = segments[s:s + 4]
+            vx, vy = (1 if d & 2 else -1), (1 if d & 1 else -1)
+            points.extend((x + j * vx, y + j * vy) for j in range(n))
+        return points
+
+    def __iter__(self):
+        for beam in range(len(self)):
+            yield self[beam]
+
+    def __eq__(self, other):
+        if isinstance(other, LaserPaths):
+            return list(self) == list(other)
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    @property
+    def nbytes(self):
+        """Size of the buffers in bytes (of the values only for list buffers)."""
+        return 2 * len(self.segments) + 4 * len(self.beam_offsets)
+
+    def step_states(self, geometry):
+        """
+        The (point, direction) indexes of BoardGeometry.step_cells of every half step between
+        two consecutive points of a beam, computed from the segments without expanding them.
+        """
+        width = geometry.width
+        segments, offsets = self.segments, self.beam_offsets
+        for beam in range(len(self)):
+            last = 4 * offsets[beam + 1]
+            for s in range(4 * offsets[beam], last, 4):
+                x, y, d, n = segments[s:s + 4]
+                state = (((y + 1) * width + x + 1) << 2) | d
+                # Along the segment the index moves by one point in its direction
+                delta = ((1 if d & 1 else -1) * width + (1 if d & 2 else -1)) << 2
+                end = state + (n - 1) * delta
+                yield from range(state, end, delta)
+                if s + 4 < last:
+                    # The step out of a segment is taken in the direction of the next one
+                    yield (end & ~3) | segments[s + 6]
+
+
+# ===== FILE: Tracer.py =====
+
+# Tracer.py
+from functools import lru_cache
+
+MAX_STEPS = 3000       # Half steps simulated per beam before giving up
+MAX_REPEATS = 3        # Identical collisions allowed per beam before it is force-stopped
+
+
+class BoardGeometry:
+    '''
+    Precomputed half-grid tables for one grid size, shared by every board of that size.
+
+    rows, cols: *int*
+        Size of the block grid; the half-grid spans 0..2*cols by 0..2*rows.
+    step_cells: *list[tuple[int, int] | None]*
+        For every half-grid point (padded by one on each side) and diagonal direction,
+        the (r, c) cell crossed by the next half step, or None.
+    '''
+    def __init__(self, rows, cols, step_cells=None):
+        """
+        :param step_cells: Optional table computed before (e.g. read from a shared SolverContext)
+        """
+        self.rows = rows
+        self.cols = cols
+        self.max_x = 2 * cols
+        self.max_y = 2 * rows
+        # Points are stored with a one point margin, because a beam reflected off a border
+        # block can sit one half step outside the board before leaving it.
+        self.width = self.max_x + 3
+        self.height = self.max_y + 3
+        if step_cells is not None:
+            self.step_cells = step_cells
+            return
+        self.step_cells = [None] * (self.width * self.height * 4)
+        for y in range(-1, self.max_y + 2):
+            for x in range(-1, self.max_x + 2):
+                for vx in (-1, 1):
+                    for vy in (-1, 1):
+                        self.step_cells[self.index(x, y, vx, vy)] = self._step_cell(x, y, x + vx, y + vy)
+
+    def index(self, x, y, vx, vy):
+        """Index of (point, direction) in step_cells."""
+        return (((y + 1) * self.width + x + 1) << 2) | ((vx > 0) << 1) | (vy > 0)
+
+    def _step_cell(self, x1, y1, x2, y2):
+        # A half step between two edge midpoints stays inside one cell: the odd x gives
+        # its column and the odd y gives its row. Corner points never touch a cell.
+        if x1 % 2 == y1 % 2 or x2 % 2 == y2 % 2:
+            return None
+        c = (x1 if x1 % 2 else x2) // 2
+        r = (y1 if y1 % 2 else y2) // 2
+        if 0 <= r < self.rows and 0 <= c < self.cols:
+            return (r, c)
+        return None
+
+    def step_cell(self, p1, p2):
+        """Return the (r, c) cell crossed when moving from p1 to the neighbouring point p2."""
+        (x1, y1), (x2, y2) = p1, p2
+        if not (-1 <= x1 <= self.max_x + 1 and -1 <= y1 <= self.max_y + 1):
+            return None
+        return self.step_cells[self.index(x1, y1, x2 - x1, y2 - y1)]
+
+
+@lru_cache(maxsize=64)
+def get_geometry(rows, cols):
+    """Return the shared BoardGeometry for a rows x cols grid."""
+    return BoardGeometry(rows, cols)
+
+
+def simulate_single_laser(geometry, grid, placed_blocks, lx, ly, vx, vy, remaining_targets,
+                          trace=None, beam=0, log=None, rays=None, touched=None, paths=None):
+    """
+    Simulate one beam over grid with placed_blocks ((r, c) -> 'A'/'B'/'C'):
+      - Move in half steps; the crossed cell is a table lookup instead of a scan of the board
+      - A reflects, B stops the beam, C reflects and spawns a transmitted beam
+      - After a collision the beam moves a half step away from the collision point
+    Targets reached are removed from remaining_targets; crossed 'o' cells become candidates.
+    With a RayTable (kept in sync with placed_blocks) runs of plain half steps are taken at once.
+    Cells of placed blocks the beam collides with are added to the set touched, if given.
+    The path is only recorded if a LaserPaths is given: one segment per straight run, appended
+    when the beam turns or ends, and the beam is closed in paths.
+    Returns: (new_candidates, new_lasers, remaining_targets)
+    """
+    new_candidates = set()
+    generated_lasers = []
+    step_cells = geometry.step_cells
+    width = geometry.width
+    max_x, max_y = geometry.max_x, geometry.max_y
+    cols = geometry.cols
+    segments = paths.segments if paths is not None else None
+
+    x, y = lx, ly
+    # Start of the current segment, and the number of points of the segments before it
+    sx, sy, recorded = x, y, 0
+    # Record the count of repeated collisions for the same collision to avoid infinite loops
+    collision_count = {}
+    # Last block this beam interacted with, as a cell index (for LaserTrace.target_feeder)
+    feeder = trace.beam_split_cell[beam] if trace is not None else -1
+    if rays is not None:
+        line_of, pos_of = rays.lines.line_of, rays.lines.pos_of
+        line_points, line_cells = rays.lines.points, rays.lines.cells
+        jumps, o_count, o_cells = rays.jumps, rays.o_count, rays.o_cells
+
+    steps = 0
+    while steps < MAX_STEPS:
+        if rays is not None:
+            state = (((y + 1) * width + x + 1) << 2) | ((vx > 0) << 1) | (vy > 0)
+            line, pos = line_of[state], pos_of[state]
+            run = jumps[line][pos]
+            if run:
+                # Nothing can happen before the end of the run: take it in one step
+                run = min(run, MAX_STEPS - steps)
+                end = pos + run
+                first, last = o_count[line][pos], o_count[line][end]
+                if first != last:
+                    new_candidates.update(o_cells[line][first:last])
+                if trace is not None:
+                    for cell in line_cells[line][pos:end]:
+                        if cell is not None:
+                            trace.cross(cell[0] * cols + cell[1])
+                x, y = line_points[line][end]
+                steps += run
+                continue
+        steps += 1
+
+        curr_pos = (x, y)
+
+        # If a target point is hit, remove it
+        if curr_pos in remaining_targets:
+            remaining_targets.remove(curr_pos)
+            if trace is not None:
+                trace.record_hit(curr_pos, beam, recorded + abs(x - sx), feeder)
+
+        nx = x + vx
+        ny = y + vy
+        # Check for out-of-bounds
+        if nx < 0 or ny < 0 or nx > max_x or ny > max_y:
+            # The path ends with the first point outside the board
+            x = nx + vx
+            break
+
+        cell = step_cells[(((y + 1) * width + x + 1) << 2) | ((vx > 0) << 1) | (vy > 0)]
+        block_type = placed_blocks.get(cell) if cell is not None else None
+
+        if block_type is None:
+            # No collision => move normally, and check if it passes through an 'o' cell
+            if cell is not None:
+                if grid[cell[0]][cell[1]] == 'o':
+                    new_candidates.add(cell)
+                if trace is not None:
+                    trace.cross(cell[0] * cols + cell[1])
+            x, y = nx, ny
+            continue
+
+        # Collision: the parity of the current point tells which edge was hit
+        if touched is not None:
+            touched.add(cell)
+        edge_type = 'horizontal' if x % 2 == 1 else 'vertical'
+        collision_key = (curr_pos, (vx, vy), block_type, edge_type)
+        collision_count[collision_key] = collision_count.get(collision_key, 0) + 1
+        # If the same collision occurs more than MAX_REPEATS times, force-stop this laser
+        if collision_count[collision_key] > MAX_REPEATS:
+            if log:
+                log(f"[WARN] Repeated collision {collision_key} detected, force-stopping this laser")
+            x += vx
+            break
+        if log:
+            log(f"  - Collision: {curr_pos} -> ({nx},{ny}) at cell {cell}, block type = {block_type}, edge = {edge_type}")
+
+        if block_type == 'B':
+            # Blocking: the beam ends here
+            x += vx
+            break
+
+        feeder = cell[0] * cols + cell[1]
+        if block_type == 'C':
+            # Splitting: the transmitted beam continues in the original direction
+            generated_lasers.append((nx, ny, vx, vy))
+            if trace is not None:
+                trace.add_beam(beam, feeder)
+
+        # Reflection (A, and the reflected half of C), then a half step away from the collision point
+        if segments is not None:
+            segments.extend((sx, sy, ((vx > 0) << 1) | (vy > 0), abs(x - sx) + 1))
+        recorded += abs(x - sx) + 1
+        if edge_type == 'horizontal':
+            vy = -vy
+        else:
+            vx = -vx
+        x += vx
+        y += vy
+        sx, sy = x, y
+
+    if segments is not None:
+        # The last segment holds the points from its start up to, not including, x
+        if x != sx:
+            segments.extend((sx, sy, ((vx > 0) << 1) | (vy > 0), abs(x - sx)))
+        paths.beam_offsets.append(len(segments) >> 2)
+    return new_candidates, generated_lasers, remaining_targets
+
+
+def simulate_lasers(geometry, grid, placed_blocks, lasers, targets, trace=None, log=None, rays=None,
+                    touched=None, paths=None):
+    """
+    Simulate all lasers, including the beams split off by C blocks, breadth first.
+    If a LaserTrace is given it must already contain one beam per entry of lasers.
+    rays is an optional RayTable for placed_blocks, touched an optional set of the cells of
+    the blocks hit and paths an optional LaserPaths that receives every beam (see simulate_single_laser).
+    Returns: (remaining_targets, new_candidates)
+    """
+    remaining_targets = set(targets)
+    new_candidates = set()
+
+    lasers_to_sim = list(lasers)
+    idx = 0
+    while idx < len(lasers_to_sim):
+        (lx, ly, vx, vy) = lasers_to_sim[idx]
+        idx += 1
+        if log:
+            log(f"[simulate_with_blocks] Laser #{idx} starting at ({lx},{ly}), direction=({vx},{vy})")
+
+        new_cand_part, new_lasers, remaining_targets = simulate_single_laser(
+            geometry, grid, placed_blocks, lx, ly, vx, vy, remaining_targets, trace, idx - 1, log, rays,
+            touched, paths)
+
+        new_candidates |= new_cand_part
+        # If a C block produces a new beam, add it to the queue
+        lasers_to_sim.extend(new_lasers)
+
+    return remaining_targets, new_candidates
+
+
+def simulate_single_laser_bits(geometry, bits, placed_blocks, lx, ly, vx, vy, remaining_targets,
+                               rays=None, touched=None, paths=None):
+    """
+    Bitboard variant of simulate_single_laser() for a Bitboard.BoardBits of the board:
+    remaining_targets and the returned candidates are int masks, and a target hit or a crossed
+    'o' cell is a single AND/OR with a precomputed bit. Follows exactly the same beam rules;
+    tracing and debug logging are left to simulate_single_laser().
+    Returns: (candidate_mask, new_lasers, remaining_targets)
+    """
+    new_candidates = 0
+    generated_lasers = []
+    segments = paths.segments if paths is not None else None
+    step_cells = geometry.step_cells
+    step_bits = bits.step_bits
+    target_at = bits.target_at
+    width = geometry.width
+    max_x, max_y = geometry.max_x, geometry.max_y
+    if rays is not None:
+        line_of, pos_of = rays.lines.line_of, rays.lines.pos_of
+        line_points, jumps, o_masks = rays.lines.points, rays.jumps, rays.o_masks
+
+    x, y = lx, ly
+    sx, sy = x, y
+    collision_count = {}
+    steps = 0
+    while steps < MAX_STEPS:
+        state = (((y + 1) * width + x + 1) << 2) | ((vx > 0) << 1) | (vy > 0)
+        if rays is not None:
+            line, pos = line_of[state], pos_of[state]
+            run = jumps[line][pos]
+            if run:
+                run = min(run, MAX_STEPS - steps)
+                end = pos + run
+                new_candidates |= o_masks[line][pos] ^ o_masks[line][end]
+                x, y = line_points[line][end]
+                steps += run
+                continue
+        steps += 1
+
+        curr_pos = (x, y)
+        remaining_targets &= ~target_at[state >> 2]
+
+        nx = x + vx
+        ny = y + vy
+        if nx < 0 or ny < 0 or nx > max_x or ny > max_y:
+            x = nx + vx
+            break
+
+        cell = step_cells[state]
+        block_type = placed_blocks.get(cell) if cell is not None else None
+        if block_type is None:
+            new_candidates |= step_bits[state]
+            x, y = nx, ny
+            continue
+
+        if touched is not None:
+            touched.add(cell)
+        edge_type = 'horizontal' if x % 2 == 1 else 'vertical'
+        collision_key = (curr_pos, (vx, vy), block_type, edge_type)
+        collision_count[collision_key] = collision_count.get(collision_key, 0) + 1
+        if collision_count[collision_key] > MAX_REPEATS or block_type == 'B':
+            x += vx
+            break
+        if block_type == 'C':
+            generated_lasers.append((nx, ny, vx, vy))
+        if segments is not None:
+            segments.extend((sx, sy, ((vx > 0) << 1) | (vy > 0), abs(x - sx) + 1))
+        if edge_type == 'horizontal':
+            vy = -vy
+        else:
+            vx = -vx
+        x += vx
+        y += vy
+        sx, sy = x, y
+
+    if segments is not None:
+        if x != sx:
+            segments.extend((sx, sy, ((vx > 0) << 1) | (vy > 0), abs(x - sx)))
+        paths.beam_offsets.append(len(segments) >> 2)
+    return new_candidates, generated_lasers, remaining_targets
+
+
+def simulate_lasers_bits(geometry, bits, placed_blocks, lasers, rays=None, touched=None, paths=None):
+    """
+    Bitboard variant of simulate_lasers(), see simulate_single_laser_bits().
+    Returns: (remaining target mask, candidate cell mask)
+    """
+    remaining_targets = bits.all_targets
+    new_candidates = 0
+
+    lasers_to_sim = list(lasers)
+    idx = 0
+    while idx < len(lasers_to_sim):
+        (lx, ly, vx, vy) = lasers_to_sim[idx]
+        idx += 1
+        new_cand_part, new_lasers, remaining_targets = simulate_single_laser_bits(
+            geometry, bits, placed_blocks, lx, ly, vx, vy, remaining_targets, rays, touched, paths)
+        new_candidates |= new_cand_part
+        lasers_to_sim.extend(new_lasers)
+
+    return remaining_targets, new_candidates
+
+
+# ===== FILE: RayTable.py =====
+
+# RayTable.py
+from array import array
+from functools import lru_cache
+
+
+class RayLines:
+    '''
+    The diagonal lines of the padded half-grid of one grid size, shared by every board of that size.
+    A beam that does not collide stays on one line, so a run of plain half steps is a slice of it.
+
+    line_of, pos_of: *list[int]*
+        For every (point, direction) index of BoardGeometry.step_cells, its line and position on it.
+    points: *list[list[tuple[int, int]]]*
+        The points of each line, in the direction of travel.
+    cells: *list[list[tuple[int, int] | None]]*
+        For each point of a line, the cell crossed by the half step to the next point, or None.
+    cell_states: *dict[tuple[int, int], list[int]]*
+        The (point, direction) indexes whose next half step crosses each cell.
+    '''
+    def __init__(self, geometry):
+        self.line_of = [-1] * len(geometry.step_cells)
+        self.pos_of = [0] * len(geometry.step_cells)
+        self.points = []
+        self.cells = []
+        self.cell_states = {}
+
+        def inside(x, y):
+            return -1 <= x <= geometry.max_x + 1 and -1 <= y <= geometry.max_y + 1
+
+        for vx in (-1, 1):
+            for vy in (-1, 1):
+                for y in range(-1, geometry.max_y + 2):
+                    for x in range(-1, geometry.max_x + 2):
+                        if self.line_of[geometry.index(x, y, vx, vy)] >= 0:
+                            continue
+                        # Walk back to the first point of the line, then number it forwards
+                        sx, sy = x, y
+                        while inside(sx - vx, sy - vy):
+                            sx, sy = sx - vx, sy - vy
+                        line = len(self.points)
+                        points, cells = [], []
+                        while inside(sx, sy):
+                            state = geometry.index(sx, sy, vx, vy)
+                            cell = geometry.step_cells[state]
+                            self.line_of[state] = line
+                            self.pos_of[state] = len(points)
+                            if cell is not None:
+                                self.cell_states.setdefault(cell, []).append(state)
+                            points.append((sx, sy))
+                            cells.append(cell)
+                            sx, sy = sx + vx, sy + vy
+                        self.points.append(points)
+                        self.cells.append(cells)
+
+    @classmethod
+    def from_states(cls, geometry, line_offsets, line_states):
+        """
+        Rebuild the lines from the output of states(), e.g. read from a shared SolverContext,
+        without walking the half-grid again.
+        """
+        lines = cls.__new__(cls)
+        lines.line_of = [-1] * len(geometry.step_cells)
+        lines.pos_of = [0] * len(geometry.step_cells)
+        lines.points = []
+        lines.cells = []
+        lines.cell_states = {}
+        step_cells, width = geometry.step_cells, geometry.width
+        for line in range(len(line_offsets) - 1):
+            states = line_states[line_offsets[line]:line_offsets[line + 1]]
+            cells = [step_cells[state] for state in states]
+            for pos, state in enumerate(states):
+                lines.line_of[state] = line
+                lines.pos_of[state] = pos
+                if cells[pos] is not None:
+                    lines.cell_states.setdefault(cells[pos], []).append(state)
+            lines.points.append([((state >> 2) % width - 1, (state >> 2) // width - 1) for state in states])
+            lines.cells.append(cells)
+        return lines
+
+    def states(self):
+        """
+        The lines as flat arrays: line i is the (point, direction) indexes
+        line_states[line_offsets[i]:line_offsets[i + 1]]. Returns: (line_offsets, line_states)
+        """
+        line_offsets = array('i', [0])
+        for points in self.points:
+            line_offsets.append(line_offsets[-1] + len(points))
+        line_states = array('i', [0]) * line_offsets[-1]
+        for state, line in enumerate(self.line_of):
+            if line >= 0:
+                line_states[line_offsets[line] + self.pos_of[state]] = state
+        return line_offsets, line_states
+
+
+@lru_cache(maxsize=64)
+def _get_ray_lines(geometry):
+    return RayLines(geometry)
+
+
+class RayTable:
+    '''
+    Jump lengths for Tracer.simulate_single_laser: for every point and diagonal direction, the
+    number of half steps a beam can take before something can happen to it, i.e. before it
+    reaches a target, leaves the board or hits a placed block. The beam covers such a run in
+    one step, so tracing costs scale with the number of interactions instead of the path length.
+
+    The table refers to placed_blocks (not a copy); call update() after every block placed on
+    or removed from a cell.
+
+    lines: *RayLines*
+        The diagonal lines of the board's grid size.
+    jumps: *list[list[int]]*
+        Per line and position, the number of plain half steps from that point.
+    o_count, o_cells: *list[list[int]], list[list[tuple[int, int]]]*
+        Per line, the 'o' cells crossed in order and, per position, how many come before it;
+        the candidates of a run are o_cells[line][o_count[line][start]:o_count[line][end]].
+    o_masks: *list[list[int]]*
+        The same as cell masks for the bitboard tracer (bit r * cols + c): the candidates of
+        a run are o_masks[line][start] ^ o_masks[line][end].
+    '''
+    def __init__(self, geometry, grid, targets, placed_blocks, context=None):
+        """
+        :param context: Optional SolverContext of the grid layout, whose lines and cached
+                        ray_cells() are shared instead of being computed for this board
+        """
+        if context is not None:
+            self.lines = context.ray_lines()
+            self.o_count, self.o_cells, self.o_masks = context.ray_cells()
+        else:
+            self.lines = _get_ray_lines(geometry)
+            self.o_count, self.o_cells, self.o_masks = ray_cells(self.lines, geometry, grid)
+        self.placed_blocks = placed_blocks
+        self.free = []      # Per line and position: no target here and the next point is on the board
+        self.jumps = []
+        targets = set(targets)
+        for points, cells in zip(self.lines.points, self.lines.cells):
+            free = [False] * len(points)
+            for j, (x, y) in enumerate(points[:-1]):
+                nx, ny = points[j + 1]
+                free[j] = (x, y) not in targets and 0 <= nx <= geometry.max_x and 0 <= ny <= geometry.max_y
+            jumps = [0] * (len(points) + 1)
+            for j in range(len(points) - 1, -1, -1):
+                if free[j] and cells[j] not in placed_blocks:
+                    jumps[j] = jumps[j + 1] + 1
+            self.free.append(free)
+            self.jumps.append(jumps)
+
+    def update(self, cell):
+        """Refresh the jump lengths after a block was placed on or removed from cell."""
+        lines = self.lines
+        placed_blocks = self.placed_blocks
+        for state in lines.cell_states.get(cell, ()):
+            line = lines.line_of[state]
+            jumps, free, cells = self.jumps[line], self.free[line], lines.cells[line]
+            # Only the run of points leading up to the cell can change
+            j = lines.pos_of[state]
+            while j >= 0:
+                jump = jumps[j + 1] + 1 if free[j] and cells[j] not in placed_blocks else 0
+                if jump == jumps[j]:
+                    break
+                jumps[j] = jump
+                j -= 1
+
+
+def ray_cells(lines, geometry, grid):
+    """
+    The 'o' cells along every line of a grid layout, the part of a RayTable that does not
+    depend on targets or blocks: per line, the cells crossed in order, the number of them
+    before each position and the same as cell masks (see RayTable).
+    Returns: (o_count, o_cells, o_masks)
+    """
+    o_count, o_cells, o_masks = [], [], []
+    for cells in lines.cells:
+        counts = [0] * (len(cells) + 1)
+        crossed = []
+        masks = [0] * (len(cells) + 1)
+        for j, cell in enumerate(cells):
+            if cell is not None and grid[cell[0]][cell[1]] == 'o':
+                crossed.append(cell)
+                masks[j + 1] = masks[j] | 1 << (cell[0] * geometry.cols + cell[1])
+            else:
+                masks[j + 1] = masks[j]
+            counts[j + 1] = len(crossed)
+        o_count.append(counts)
+        o_cells.append(crossed)
+        o_masks.append(masks)
+    return o_count, o_cells, o_masks
+
+
+# ===== FILE: Bitboard.py =====
+
+# Bitboard.py
+
+class BoardBits:
+    '''
+    Bit indexes of one board, for the bitboard mode of the solver (Solver(board, bitboards=True)).
+    Sets of cells, targets and placements become Python ints, so unions, differences and the
+    "all targets hit" test are single integer operations and a search state is one int.
+
+    cols: *int*
+        Number of columns; cell (r, c) is bit r * cols + c of a cell mask.
+    cell_of: *list[tuple[int, int]]*
+        The cell of every bit of a cell mask.
+    open_cells: *int*
+        Mask of the 'o' cells of the unsolved grid.
+    target_bits: *dict[tuple[int, int], int]*
+        The bit of every target point; all_targets is the mask of all of them.
+    target_at: *list[int]*
+        For every half-grid point (padded like BoardGeometry), its target bit or 0.
+    step_bits: *list[int]*
+        Indexed like BoardGeometry.step_cells: the bit of the cell crossed by the half step
+        if it is an 'o' cell, else 0.
+    '''
+    def __init__(self, geometry, grid, targets, context=None):
+        """
+        :param context: Optional SolverContext of the grid layout, whose cached cell_bits() are used
+        """
+        self.cols = geometry.cols
+        if context is not None:
+            self.cell_of, self.open_cells, self.step_bits = context.cell_bits()
+        else:
+            self.cell_of, self.open_cells, self.step_bits = cell_bits(geometry, grid)
+
+        self.target_bits = {}
+        for point in targets:
+            self.target_bits.setdefault(tuple(point), 1 << len(self.target_bits))
+        self.all_targets = (1 << len(self.target_bits)) - 1
+        self.target_at = [0] * (geometry.width * geometry.height)
+        for (x, y), bit in self.target_bits.items():
+            if -1 <= x <= geometry.max_x + 1 and -1 <= y <= geometry.max_y + 1:
+                self.target_at[(y + 1) * geometry.width + x + 1] = bit
+
+    def cell_bit(self, r, c):
+        """Bit of cell (r, c) in a cell mask."""
+        return 1 << (r * self.cols + c)
+
+    def cells(self, mask):
+        """The cells of a cell mask, in bit order."""
+        cells = []
+        while mask:
+            low = mask & -mask
+            cells.append(self.cell_of[low.bit_length() - 1])
+            mask ^= low
+        return cells
+
+
+def cell_bits(geometry, grid):
+    """
+    The cell indexes of a grid layout, the part of a BoardBits that does not depend on the
+    targets: the cell of every bit, the mask of the 'o' cells and the step_bits table.
+    Returns: (cell_of, open_cells, step_bits)
+    """
+    cols = geometry.cols
+    cell_of = [(r, c) for r in range(geometry.rows) for c in range(cols)]
+    open_cells = 0
+    for bit, (r, c) in enumerate(cell_of):
+        if grid[r][c] == 'o':
+            open_cells |= 1 << bit
+    step_bits = [0 if cell is None else (1 << (cell[0] * cols + cell[1])) & open_cells
+                 for cell in geometry.step_cells]
+    return cell_of, open_cells, step_bits
+
+
+def placement_codes(mask):
+    """Bit numbers of a placement mask, i.e. its placements encoded as in Checkpoint.encode_placement."""
+    codes = []
+    while mask:
+        low = mask & -mask
+        codes.append(low.bit_length() - 1)
+        mask ^= low
+    return codes
+
+
+def placement_mask(codes):
+    """Inverse of placement_codes()."""
+    mask = 0
+    for code in codes:
+        mask |= 1 << code
+    return mask
+
+
+# ===== FILE: StaticAnalysis.py =====
+
+# StaticAnalysis.py
+from array import array
+
+
+class BoardAnalysis:
+    '''
+    What any placement of the available blocks could ever do on a board, computed once before
+    the search (see analyze_board()).
+
+    reachable_states: *set[int]*
+        (point, direction) indexes of BoardGeometry.step_cells some beam could ever be in.
+    reachable_cells: *set[tuple[int, int]]*
+        'o' cells some beam could ever cross.
+    live_cells: *set[tuple[int, int]]*
+        'o' cells where a reflecting block could send a beam on towards a target. A block
+        anywhere else only takes light away, so the search never needs to place one there.
+    unreachable_targets: *list[tuple[int, int]]*
+        Targets no placement can hit; a board with any of them has no solution.
+    target_bits: *dict[tuple[int, int], int]*
+        A bit per target, in the order of the board's targets (the same as Bitboard.BoardBits).
+    reflect_cones: *list[int]*
+        Indexed like BoardGeometry.step_cells: for a half step into an 'o' cell, the mask of the
+        targets whose backward light cone contains the beam reflected there, else 0.
+    '''
+    def __init__(self, reachable_states, reachable_cells, live_cells, unreachable_targets,
+                 target_bits, reflect_cones, geometry):
+        self.reachable_states = reachable_states
+        self.reachable_cells = reachable_cells
+        self.live_cells = live_cells
+        self.unreachable_targets = unreachable_targets
+        self.target_bits = target_bits
+        self.reflect_cones = reflect_cones
+        self.geometry = geometry
+
+    @property
+    def dead_cells(self):
+        """Reachable 'o' cells that are not live."""
+        return self.reachable_cells - self.live_cells
+
+    def target_mask(self, targets):
+        """Mask of target_bits for a collection of target points."""
+        mask = 0
+        for target in targets:
+            mask |= self.target_bits.get(target, 0)
+        return mask
+
+    def connecting_cells(self, paths, unmet):
+        """
+        Cells where a reflecting block would turn one of the given beams (a LaserPaths, as
+        Solver.final_paths) into the backward light cone of a target in the mask unmet.
+        """
+        cones = self.reflect_cones
+        step_cells = self.geometry.step_cells
+        width = self.geometry.width
+        cells = set()
+        # Same walk as LaserPaths.step_states(), inlined: the half steps of a segment are an
+        # arithmetic run of (point, direction) indexes, then one step in the next segment's direction
+        values = iter(paths.segments)
+        segment = 0
+        for last in paths.beam_offsets[1:]:
+            end = None
+            while segment < last:
+                x, y, d, n = next(values), next(values), next(values), next(values)
+                segment += 1
+                if end is not None:
+                    state = (end & ~3) | d
+                    if cones[state] & unmet:
+                        cells.add(step_cells[state])
+                state = (((y + 1) * width + x + 1) << 2) | d
+                delta = ((1 if d & 1 else -1) * width + (1 if d & 2 else -1)) << 2
+                end = state + (n - 1) * delta
+                for state in range(state, end, delta):
+                    if cones[state] & unmet:
+                        cells.add(step_cells[state])
+        return cells
+
+
+def next_states(geometry, grid):
+    """
+    The edges of the beam graph of a grid layout, indexed like BoardGeometry.step_cells: the
+    state after a plain half step (-1 if it leaves the board) and, for a half step into an 'o'
+    cell, the state of the beam a reflecting block there would send back (else -1).
+    Depends only on the grid, so SolverContext.py caches it for every board of a layout.
+    Returns: (straight, reflect), two array('i')
+    """
+    step_cells = geometry.step_cells
+    width, max_x, max_y = geometry.width, geometry.max_x, geometry.max_y
+    straight = array('i', [-1]) * len(step_cells)
+    reflect = array('i', [-1]) * len(step_cells)
+    for state, cell in enumerate(step_cells):
+        point = state >> 2
+        x, y = point % width - 1, point // width - 1
+        vx, vy = (1 if state & 2 else -1), (1 if state & 1 else -1)
+        nx, ny = x + vx, y + vy
+        if nx < 0 or ny < 0 or nx > max_x or ny > max_y:
+            continue
+        straight[state] = geometry.index(nx, ny, vx, vy)
+        if cell is not None and grid[cell[0]][cell[1]] == 'o':
+            if x % 2 == 1:
+                vy = -vy
+            else:
+                vx = -vx
+            reflect[state] = geometry.index(x + vx, y + vy, vx, vy)
+    return straight, reflect
+
+
+def beam_edges(geometry, grid, straight, reflect, can_reflect):
+    """
+    The successors and predecessors of every (x, y, vx, vy) state of the padded half-grid, from
+    the edges of next_states(); reflections are only followed if can_reflect.
+    Returns: (successors, predecessors), dicts of state -> list, where a successor is
+             (next state, crossed 'o' cell or None, whether it is the reflected branch)
+    """
+    step_cells = geometry.step_cells
+    width = geometry.width
+    states = [((point % width) - 1, (point // width) - 1, (1 if d & 2 else -1), (1 if d & 1 else -1))
+              for point in range(width * geometry.height) for d in range(4)]
+    successors = {}
+    predecessors = {}
+    for index, state in enumerate(states):
+        nxt = straight[index]
+        if nxt < 0:
+            successors[state] = []
+            continue
+        cell = step_cells[index]
+        if reflect[index] < 0:
+            moves = [(states[nxt], None, False)]
+        elif can_reflect:
+            moves = [(states[nxt], cell, False), (states[reflect[index]], cell, True)]
+        else:
+            moves = [(states[nxt], cell, False)]
+        successors[state] = moves
+        for move in moves:
+            predecessors.setdefault(move[0], []).append(state)
+    return successors, predecessors
+
+
+def analyze_board(geometry, grid, lasers, targets, blocks, context=None):
+    """
+    Over-approximate every beam of every placement: each 'o' cell a beam crosses may hold no
+    block (or a C, whose transmitted beam goes straight on), a reflector (if an A or C block is
+    available) or a B. Beams are followed forward from the lasers over (point, direction)
+    states, and backward from each target (its light cone), with the same rules as
+    Tracer.simulate_single_laser.
+    :param context: Optional SolverContext of the grid layout, whose cached beam_edges() are used
+    Returns: BoardAnalysis
+    """
+    step_cells = geometry.step_cells
+    max_x, max_y = geometry.max_x, geometry.max_y
+    can_reflect = blocks.get('A', 0) + blocks.get('C', 0) > 0
+
+    def inside(x, y):
+        return -1 <= x <= max_x + 1 and -1 <= y <= max_y + 1
+
+    if context is not None:
+        edges, predecessors = context.beam_edges(can_reflect)
+    else:
+        edges, predecessors = beam_edges(geometry, grid, *next_states(geometry, grid), can_reflect)
+
+    # Forward: every state a beam could be in
+    reached = {laser for laser in (tuple(l) for l in lasers) if inside(laser[0], laser[1])}
+    queue = list(reached)
+    reachable_cells = set()
+    reflections = []  # (cell, reflected state) pairs seen from reachable states
+    while queue:
+        state = queue.pop()
+        for nxt, cell, reflected in edges[state]:
+            if cell is not None:
+                reachable_cells.add(cell)
+                if reflected:
+                    reflections.append((cell, nxt))
+            if nxt not in reached:
+                reached.add(nxt)
+                queue.append(nxt)
+
+    # Backward: the light cone of each target, i.e. the states from which it could be reached
+    target_bits = {}
+    for target in targets:
+        target_bits.setdefault(tuple(target), 1 << len(target_bits))
+    cones = {}  # state -> mask of the targets reachable from it
+    for (x, y), bit in target_bits.items():
+        if not inside(x, y):
+            continue
+        queue = [(x, y, vx, vy) for vx in (-1, 1) for vy in (-1, 1)]
+        for state in queue:
+            cones[state] = cones.get(state, 0) | bit
+        while queue:
+            for prev in predecessors.get(queue.pop(), ()):
+                if not cones.get(prev, 0) & bit:
+                    cones[prev] = cones.get(prev, 0) | bit
+                    queue.append(prev)
+
+    reflect_cones = [0] * len(step_cells)
+    for state, moves in edges.items():
+        for nxt, cell, reflected in moves:
+            if reflected:
+                reflect_cones[geometry.index(*state)] = cones.get(nxt, 0)
+
+    reached_points = {(x, y) for (x, y, _, _) in reached}
+    live_cells = {cell for cell, nxt in reflections if cones.get(nxt, 0)}
+    unreachable_targets = [t for t in targets if tuple(t) not in reached_points]
+    return BoardAnalysis({geometry.index(*state) for state in reached}, reachable_cells,
+                         live_cells, unreachable_targets, target_bits, reflect_cones, geometry)
+
+
+# ===== FILE: Nogood.py =====
+
+# Nogood.py
+
+class NogoodStore:
+    '''
+    Learned nogoods of a search: placement sets (masks of Checkpoint.encode_placement bits, as
+    in Bitboard.placement_mask) that no solution contains. A search node whose placements
+    contain a nogood can be skipped.
+
+    Each nogood is filed under each of its bits. The search checks a node right after placing
+    one block on a node that had no nogood, so only the nogoods with that block's bit can match:
+    either those are scanned, or, when it is cheaper, every subset of the node's placements
+    with that bit is looked up directly. When the store is full the least recently used
+    nogood is evicted.
+
+    max_size: *int*
+        Maximum number of nogoods kept.
+    learned, hits, evicted: *int*
+        Number of nogoods added, lookups that found one, and nogoods dropped to stay under max_size.
+    '''
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self.learned = 0
+        self.hits = 0
+        self.evicted = 0
+        self._nogoods = {}   # mask -> None, in least recently used order
+        self._buckets = {}   # bit -> {mask: None}
+
+    def __len__(self):
+        return len(self._nogoods)
+
+    def masks(self):
+        """All nogoods, least recently used first."""
+        return list(self._nogoods)
+
+    def add(self, mask):
+        """Learn a nogood."""
+        if mask in self._nogoods:
+            return
+        self._nogoods[mask] = None
+        for bit in _bits(mask) or (0,):
+            self._buckets.setdefault(bit, {})[mask] = None
+        self.learned += 1
+        while len(self._nogoods) > self.max_size:
+            old = next(iter(self._nogoods))
+            del self._nogoods[old]
+            for bit in _bits(old) or (0,):
+                del self._buckets[bit][old]
+            self.evicted += 1
+
+    def find(self, placements, last=None):
+        """
+        Return a nogood contained in the placement mask, or None.
+        :param last: Bit of the block placed last, if placements without it are known to hold no nogood
+        """
+        buckets = self._buckets
+        found = 0 if buckets.get(0) else None  # The empty nogood: nothing can be solved
+        for bit in ((last,) if last is not None else _bits(placements)):
+            if found is not None:
+                break
+            bucket = buckets.get(bit)
+            if not bucket:
+                continue
+            others = placements & ~bit
+            if 1 << others.bit_count() < len(bucket):
+                subset = others
+                while True:
+                    if subset | bit in self._nogoods:
+                        found = subset | bit
+                        break
+                    if not subset:
+                        break
+                    subset = (subset - 1) & others
+            else:
+                for mask in bucket:
+                    if not mask & ~placements:
+                        found = mask
+                        break
+        if found is not None:
+            self.hits += 1
+            # Keep nogoods that keep paying off
+            del self._nogoods[found]
+            self._nogoods[found] = None
+        return found
+
+    def stats(self):
+        """Counters as a dict."""
+        return {'nogoods': len(self._nogoods), 'learned': self.learned,
+                'hits': self.hits, 'evicted': self.evicted}
+
+
+def _bits(mask):
+    bits = []
+    while mask:
+        low = mask & -mask
+        bits.append(low)
+        mask ^= low
+    return bits
+
+
+# ===== FILE: SolveResult.py =====
+
+# SolveResult.py
+import struct
+from array import array
+
+BLOCK_TYPES = 'ABC'
+# magic, solved, rows, cols, targets, placements, paths, points (native byte order: results
+# are shared between processes of one machine, not stored)
+HEADER = struct.Struct('=4sB x H H H I I I')
+MAGIC = b'LZR1'
+
+
+class SolveResult:
+    '''
+    Immutable, compact result of one solve that can be shared between processes.
+
+    Everything is stored in flat arrays, so the result can be written into any writable buffer
+    (e.g. a multiprocessing.shared_memory block) and read back as read-only memoryviews
+    without unpickling or copying.
+
+    solved: *bool*
+        Whether the placements hit every target.
+    rows, cols: *int*
+        Size of the grid.
+    cells: *bytes or memoryview*
+        The unsolved grid, one byte per cell, row by row.
+    placements: *array('i') or memoryview*
+        One int per placed block: (r * cols + c) * 3 + index of the type in 'ABC'.
+    target_points: *array('h') or memoryview*
+        Target coordinates as x0, y0, x1, y1, ...
+    path_offsets: *array('i') or memoryview*
+        Beam i owns points path_offsets[i] to path_offsets[i + 1] - 1.
+    points: *array('h') or memoryview*
+        Beam path points as x0, y0, x1, y1, ...
+    '''
+    __slots__ = ('solved', 'rows', 'cols', 'cells', 'placements', 'target_points',
+                 'path_offsets', 'points', '_views', '_shm')
+
+    def __init__(self, solved, rows, cols, cells, placements, target_points, path_offsets, points,
+                 _views=(), _shm=None):
+        for name, value in (('solved', bool(solved)), ('rows', rows), ('cols', cols), ('cells', cells),
+                            ('placements', placements), ('target_points', target_points),
+                            ('path_offsets', path_offsets), ('points', points),
+                            ('_views', list(_views)), ('_shm', _shm)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SolveResult is immutable")
+
+    @classmethod
+    def from_solver(cls, solver, solved=True):
+        """Build a result from a Solver after solve(): its placed blocks and final laser paths."""
+        grid = solver.original_grid
+        rows, cols = len(grid), len(grid[0]) if grid else 0
+        placements = array('i', sorted((r * cols + c) * 3 + BLOCK_TYPES.index(t)
+                                       for (r, c), t in solver.placed_blocks.items()))
+        target_points = array('h', [v for target in solver.original_targets for v in target])
+        path_offsets = array('i', [0])
+        points = array('h')
+        for path in (solver.final_paths if solved else []):
+            for (x, y) in path:
+                points.append(x)
+                points.append(y)
+            path_offsets.append(len(points) // 2)
+        cells = "".join(cell[0] for row in grid for cell in row).encode('ascii')
+        return cls(solved, rows, cols, cells, placements, target_points, path_offsets, points)
+
+    # --- binary form -----------------------------------------------------------------------
+
+    @property
+    def nbytes(self):
+        """Size of the binary form in bytes."""
+        return (HEADER.size + 4 * (len(self.placements) + len(self.path_offsets))
+                + 2 * (len(self.points) + len(self.target_points)) + len(self.cells))
+
+    def write_into(self, buffer, offset=0):
+        """Write the binary form into a writable buffer at offset; returns the number of bytes written."""
+        out = memoryview(buffer).cast('B')
+        HEADER.pack_into(out, offset, MAGIC, self.solved, self.rows, self.cols,
+                         len(self.target_points) // 2, len(self.placements),
+                         len(self.path_offsets) - 1, len(self.points) // 2)
+        pos = offset + HEADER.size
+        for section in (self.placements, self.path_offsets, self.points, self.target_points, self.cells):
+            data = memoryview(section).cast('B')
+            out[pos:pos + len(data)] = data
+            pos += len(data)
+        return pos - offset
+
+    def to_bytes(self):
+        """Return the binary form as bytes."""
+        data = bytearray(self.nbytes)
+        self.write_into(data)
+        return bytes(data)
+
+    @classmethod
+    def from_buffer(cls, buffer, offset=0, _shm=None):
+        """
+        Read a result written by write_into() without copying: the arrays of the returned
+        result are read-only memoryviews into buffer. Call release() before freeing the buffer.
+        """
+        view = memoryview(buffer).cast('B').toreadonly()
+        magic, solved, rows, cols, n_targets, n_placements, n_paths, n_points = HEADER.unpack_from(view, offset)
+        if magic != MAGIC:
+            raise ValueError("buffer does not hold a SolveResult")
+        views = []
+        pos = offset + HEADER.size
+
+        def take(nbytes, fmt):
+            nonlocal pos
+            part = view[pos:pos + nbytes]
+            pos += nbytes
+            views.append(part)
+            if fmt != 'B':
+                part = part.cast(fmt)
+                views.append(part)
+            return part
+
+        placements = take(4 * n_placements, 'i')
+        path_offsets = take(4 * (n_paths + 1), 'i')
+        points = take(4 * n_points, 'h')
+        target_points = take(4 * n_targets, 'h')
+        cells = take(rows * cols, 'B')
+        views.append(view)
+        return cls(solved, rows, cols, cells, placements, target_points, path_offsets, points,
+                   _views=views, _shm=_shm)
+
+    def to_shared_memory(self):
+        """Copy the result once into a new SharedMemory block and return the block."""
+        # Imported on use: multiprocessing costs more to import than the whole solve path
+        from multiprocessing import shared_memory
+        shm = shared_memory.SharedMemory(create=True, size=max(1, self.nbytes))
+        self.write_into(shm.buf)
+        return shm
+
+    @classmethod
+    def from_shared_memory(cls, name):
+        """Attach to a block made by to_shared_memory() in another process (zero-copy)."""
+        from multiprocessing import shared_memory
+        shm = shared_memory.SharedMemory(name=name)
+        return cls.from_buffer(shm.buf, _shm=shm)
+
+    def release(self, unlink=False):
+        """
+        Drop the memoryviews into the underlying buffer; with a shared memory block also close it,
+        and unlink it if this process is the last user.
+        """
+        for view in reversed(self._views):
+            view.release()
+        self._views.clear()
+        if self._shm is not None:
+            self._shm.close()
+            if unlink:
+                self._shm.unlink()
+            object.__setattr__(self, '_shm', None)
+
+    # --- Python views, e.g. for LazorVisualizer -------------------------------------------------
+
+    def placed_blocks(self):
+        """Return the placements as a dict (r, c) -> 'A'/'B'/'C'."""
+        return {divmod(code // 3, self.cols): BLOCK_TYPES[code % 3] for code in self.placements}
+
+    @property
+    def grid(self):
+        """The solved grid as a list of rows, with the placed blocks filled in."""
+        cells = bytes(self.cells).decode('ascii')
+        grid = [list(cells[r * self.cols:(r + 1) * self.cols]) for r in range(self.rows)]
+        for (r, c), block_type in self.placed_blocks().items():
+            grid[r][c] = block_type
+        return grid
+
+    @property
+    def targets(self):
+        """Target points as a list of (x, y)."""
+        return [(self.target_points[i], self.target_points[i + 1]) for i in range(0, len(self.target_points), 2)]
+
+    def paths(self):
+        """Laser paths as lists of (x, y), as Solver.final_paths expands them."""
+        points = self.points
+        return [[(points[2 * i], points[2 * i + 1]) for i in range(self.path_offsets[k], self.path_offsets[k + 1])]
+                for k in range(len(self.path_offsets) - 1)]
+
+
+# ===== FILE: Profiler.py =====
+
+# Profiler.py
+import os
+import sys
+from contextlib import nullcontext
+
+
+# Functions whose frames (and everything they call) belong to the simulation phase
+SIMULATION_FUNCTIONS = {'simulate_with_blocks', 'simulate_lasers', 'simulate_lasers_bits',
+                        'simulate_single_laser', 'simulate_single_laser_bits'}
+
+
+def collision_lines(func):
+    """
+    Source lines of the collision handling of a tracer function: the end of its stepping loop,
+    after the `if block_type is None:` branch that moves a beam which hit no block.
+    Collisions are handled inline for speed, so the sampler tells them apart by line number.
+    """
+    import inspect
+    lines, first = inspect.getsourcelines(func)
+    start = indent = None
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        depth = len(line) - len(line.lstrip())
+        if indent is None:
+            if stripped == 'if block_type is None:':
+                indent = depth
+        elif stripped and depth <= indent:
+            if start is None and depth == indent:
+                start = i
+            elif depth < indent:
+                return range(first + start, first + i)
+    return range(first + start, first + len(lines)) if start is not None else range(0)
+
+
+def profile_phase(profile, name):
+    """profile.phase(name), or a context manager doing nothing if profile is None."""
+    return profile.phase(name) if profile is not None else nullcontext()
+
+
+class SolveProfile:
+    '''
+    Profile of the solve of one puzzle, as collapsed stacks ("frame;frame;... weight" per line,
+    the input format of flamegraph.pl, speedscope and inferno) broken down by phase.
+
+    The driver and Solver(profile=...) open the phases parse, initial candidates, search and
+    render with phase(); the stacks recorded inside one start with its label, e.g. "[search]".
+    The labels "[simulation]" (frames of the tracers) and "[collision]" (their collision
+    handling, which only the sampler can see) are inserted within the stacks.
+
+    mode: *str*
+        'sample': a thread reads the stack of the profiled thread every interval seconds; the
+        weights are sample counts. 'cprofile': cProfile runs during every phase, and the stacks
+        are rebuilt from its caller edges; the weights are microseconds of own time.
+    interval: *float*
+        Sampling period in seconds.
+    stacks: *dict[str, int]*
+        Weight of every collapsed stack.
+    '''
+    def __init__(self, mode='sample', interval=0.001):
+        if mode not in ('sample', 'cprofile'):
+            raise ValueError(f"Unknown profile mode {mode!r}")
+        self.mode = mode
+        self.interval = interval
+        self.stacks = {}
+        self._phases = ()       # (label, frame of the with statement) of the open phases
+        self._sampler = None
+        self._stop = None
+        self._collision = None  # code object -> collision_lines() of the tracers
+
+    def phase(self, name):
+        """Context manager of a phase; phases can nest (e.g. search within a driver phase)."""
+        return _Phase(self, name)
+
+    def _enter(self, name, frame):
+        if not self._phases:
+            self._start()
+        elif self.mode == 'cprofile':
+            self._flush()
+        self._phases = self._phases + ((f"[{name}]", frame),)
+        if self.mode == 'cprofile':
+            self._profiler.enable()
+
+    def _exit(self):
+        if self.mode == 'cprofile':
+            self._flush()
+        self._phases = self._phases[:-1]
+        if not self._phases:
+            self._finish()
+        elif self.mode == 'cprofile':
+            self._profiler.enable()
+
+    def _start(self):
+        # The profilers are imported when a profile starts: solves without one do not pay for them
+        if self.mode == 'cprofile':
+            import cProfile
+            import pstats  # Here rather than in _flush(), where the import would be profiled
+            self._profiler = cProfile.Profile()
+            return
+        import threading
+        if self._collision is None:
+            self._collision = {f.__code__: collision_lines(f)
+                               for f in (simulate_single_laser, simulate_single_laser_bits)}
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, args=(threading.get_ident(),),
+                                         daemon=True)
+        # The sampler only runs when the profiled thread releases the GIL, every switch interval
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.interval))
+        self._sampler.start()
+
+    def _finish(self):
+        if self.mode == 'cprofile':
+            self._profiler = None
+            return
+        self._stop.set()
+        self._sampler.join()
+        sys.setswitchinterval(self._switch_interval)
+        self._sampler = self._stop = None
+
+    def _sample(self, thread_id):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            phases = self._phases
+            if frame is None or not phases:
+                continue
+            outer = phases[0][1]
+            frames = []
+            while frame is not None and frame is not outer:
+                frames.append(frame)
+                frame = frame.f_back
+            if frame is None:
+                continue
+            # The stack starts at the phase label, below the frame that opened the outer phase
+            stack = [label for (label, entry) in phases if entry is outer]
+            for f in reversed(frames):
+                code = f.f_code
+                if code.co_name in SIMULATION_FUNCTIONS and '[simulation]' not in stack:
+                    stack.append('[simulation]')
+                stack.append(_frame_name(code.co_name, code.co_filename, code.co_firstlineno))
+                if f.f_lineno in self._collision.get(code, ()):
+                    stack.append('[collision]')
+                stack.extend(label for (label, entry) in phases if entry is f)
+            key = ';'.join(stack)
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def _flush(self):
+        """Add the cProfile stats of the phase on top to the stacks and restart the profiler."""
+        self._profiler.disable()
+        import cProfile
+        import pstats
+        prefix = [label for (label, _) in self._phases]
+        for stack, seconds in _collapse(pstats.Stats(self._profiler).stats, _OWN_CODE).items():
+            weight = round(seconds * 1e6)
+            if weight:
+                key = ';'.join(prefix + list(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + weight
+        self._profiler = cProfile.Profile()
+
+    def phase_totals(self):
+        """Weight of every phase, each stack counted in the innermost phase it contains."""
+        totals = {}
+        for stack, weight in self.stacks.items():
+            phase = None
+            for frame in stack.split(';'):
+                if frame.startswith('['):
+                    phase = frame[1:-1]
+            totals[phase] = totals.get(phase, 0) + weight
+        return totals
+
+    def summary(self):
+        """One line with the share of every phase."""
+        totals = self.phase_totals()
+        total = sum(totals.values()) or 1
+        unit = 'samples' if self.mode == 'sample' else 'us'
+        parts = [f"{phase} {100 * totals[phase] / total:.1f}%"
+                 for phase in sorted(totals, key=totals.get, reverse=True)]
+        return f"{sum(totals.values())} {unit}" + (": " + ", ".join(parts) if parts else "")
+
+    def write(self, path):
+        """Write the collapsed stacks, heaviest first."""
+        with open(path, 'w') as file:
+            for stack, weight in sorted(self.stacks.items(), key=lambda item: -item[1]):
+                file.write(f"{stack} {weight}\n")
+
+    def __getstate__(self):
+        # Sent back from worker processes once finished: only the results
+        return {'mode': self.mode, 'interval': self.interval, 'stacks': self.stacks}
+
+    def __setstate__(self, state):
+        self.__init__(state['mode'], state['interval'])
+        self.stacks = state['stacks']
+
+
+class _Phase:
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        # The frame of the with statement: the sampler cuts the stacks above it
+        self.profile._enter(self.name, sys._getframe(1))
+        return self
+
+    def __exit__(self, *exc):
+        self.profile._exit()
+        return False
+
+
+def _frame_name(name, filename, line):
+    if filename == '~':
+        return name  # built-in functions in cProfile stats
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def _collapse(stats, skip=(), min_share=1e-7, max_depth=64):
+    """
+    Collapsed stacks from cProfile stats, which only keep caller -> callee edges: the own time
+    of every function is spread over its callers in proportion to the time spent through each
+    edge, recursively. Recursive calls fold into one frame, and shares below min_share seconds
+    stop where they are. Functions whose (filename, first line) is in skip are left out.
+    Returns: {tuple of frame names, root first: seconds}
+    """
+    names = {}
+    for func in stats:
+        filename, line, name = func
+        if '_lsprof' not in name and (filename, line) not in skip:
+            names[func] = _frame_name(name, filename, line)
+
+    stacks = {}
+
+    def emit(chain, seconds):
+        frames = []
+        for func in reversed(chain):
+            if func[2] in SIMULATION_FUNCTIONS and '[simulation]' not in frames:
+                frames.append('[simulation]')
+            frames.append(names[func])
+        key = tuple(frames)
+        stacks[key] = stacks.get(key, 0.0) + seconds
+
+    def spread(chain, seconds):
+        callers = {caller: edge[3] for (caller, edge) in stats[chain[-1]][4].items()
+                   if caller in names and caller not in chain}
+        total = sum(callers.values())
+        if total <= 0 or len(chain) >= max_depth:
+            emit(chain, seconds)
+            return
+        for caller, through in callers.items():
+            share = seconds * through / total
+            if share < min_share:
+                emit(chain, share)
+            else:
+                spread(chain + [caller], share)
+
+    for func in names:
+        own = stats[func][2]
+        if own > 0:
+            spread([func], own)
+    return stacks
+
+
+# The profiler's own calls, left out of the cProfile stacks
+_OWN_CODE = {(f.__code__.co_filename, f.__code__.co_firstlineno)
+             for f in (SolveProfile.phase, SolveProfile._enter, SolveProfile._exit, SolveProfile._flush,
+                       _Phase.__init__, _Phase.__enter__, _Phase.__exit__)}
+
+
+# ===== FILE: SolverContext.py =====
+
+# SolverContext.py
+import struct
+from array import array
+
+
+# magic, rows, cols, lines, line points (native byte order, like SolveResult)
+CONTEXT_HEADER = struct.Struct('=4s H H I I')
+CONTEXT_MAGIC = b'LZC1'
+MAX_CONTEXTS = 64
+
+
+class SolverContext:
+    '''
+    Read-only tables of one grid layout (size and cell types), shared by every board on it,
+    e.g. the variants of a level pack that only differ in lasers, targets or block counts.
+    Solver(board) takes the context of its grid from get_context(), so the tables are built
+    for the first board of a layout and the next ones only pay for their own targets and the
+    search. Each table is built when first asked for.
+
+    A built context can be written into a shared memory block (to_shared_memory()) and attached
+    in other processes (from_shared_memory(), register()): they copy the tables out of the block
+    instead of walking the half-grid again.
+
+    key: *tuple[tuple[str, ...], ...]*
+        The grid layout, row by row.
+    rows, cols: *int*
+        Size of the grid.
+    geometry: *BoardGeometry*
+        The half-grid tables of the grid size.
+    '''
+    def __init__(self, grid, geometry=None):
+        self.key = layout_key(grid)
+        self.rows = len(self.key)
+        self.cols = len(self.key[0]) if self.key else 0
+        self.geometry = geometry or get_geometry(self.rows, self.cols)
+        self._lines = None      # RayLines
+        self._next = None       # next_states(): (straight, reflect)
+        self._edges = {}        # can_reflect -> beam_edges()
+        self._ray_cells = None  # ray_cells(): (o_count, o_cells, o_masks)
+        self._cell_bits = None  # cell_bits(): (cell_of, open_cells, step_bits)
+        self._step_index = None  # step_index()
+
+    def matches(self, grid):
+        """Whether grid has the layout of this context."""
+        return layout_key(grid) == self.key
+
+    def ray_lines(self):
+        """The RayLines of the grid size."""
+        if self._lines is None:
+            self._lines = RayLines(self.geometry)
+        return self._lines
+
+    def next_states(self):
+        """StaticAnalysis.next_states() of the layout: (straight, reflect)."""
+        if self._next is None:
+            self._next = next_states(self.geometry, self.key)
+        return self._next
+
+    def beam_edges(self, can_reflect):
+        """StaticAnalysis.beam_edges() of the layout: (successors, predecessors)."""
+        if can_reflect not in self._edges:
+            self._edges[can_reflect] = beam_edges(self.geometry, self.key, *self.next_states(), can_reflect)
+        return self._edges[can_reflect]
+
+    def ray_cells(self):
+        """RayTable.ray_cells() of the layout: (o_count, o_cells, o_masks)."""
+        if self._ray_cells is None:
+            self._ray_cells = ray_cells(self.ray_lines(), self.geometry, self.key)
+        return self._ray_cells
+
+    def cell_bits(self):
+        """Bitboard.cell_bits() of the layout: (cell_of, open_cells, step_bits)."""
+        if self._cell_bits is None:
+            self._cell_bits = cell_bits(self.geometry, self.key)
+        return self._cell_bits
+
+    def step_index(self):
+        """BoardGeometry.step_cells as cell indexes r * cols + c (-1 for no cell), an array('i')."""
+        if self._step_index is None:
+            cols = self.cols
+            self._step_index = array('i', [-1 if cell is None else cell[0] * cols + cell[1]
+                                           for cell in self.geometry.step_cells])
+        return self._step_index
+
+    def build(self):
+        """Build every table now, e.g. before sharing the context. Returns self."""
+        self.ray_lines()
+        for can_reflect in (False, True):
+            self.beam_edges(can_reflect)
+        self.ray_cells()
+        self.cell_bits()
+        return self
+
+    def _arrays(self):
+        # What is shared: the tables that take walks of the half-grid to compute
+        straight, reflect = self.next_states()
+        line_offsets, line_states = self.ray_lines().states()
+        return self.step_index(), straight, reflect, line_offsets, line_states
+
+    def to_shared_memory(self):
+        """
+        Copy the tables into a new shared memory block, which the caller must close() and
+        eventually unlink(). Returns: the SharedMemory; its name is what other processes attach.
+        """
+        from multiprocessing import shared_memory  # Only processes that share contexts need it
+        cells = ''.join(''.join(row) for row in self.key).encode('ascii')
+        arrays = self._arrays()
+        line_offsets, line_states = arrays[3], arrays[4]
+        header = CONTEXT_HEADER.pack(CONTEXT_MAGIC, self.rows, self.cols,
+                                     len(line_offsets) - 1, len(line_states))
+        padding = -(CONTEXT_HEADER.size + len(cells)) % 4
+        size = CONTEXT_HEADER.size + len(cells) + padding + sum(4 * len(a) for a in arrays)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        buffer = shm.buf
+        offset = 0
+        for chunk in [header, cells, bytes(padding)] + [a.tobytes() for a in arrays]:
+            buffer[offset:offset + len(chunk)] = chunk
+            offset += len(chunk)
+        del buffer
+        return shm
+
+    @classmethod
+    def from_shared_memory(cls, name):
+        """
+        Attach to a block made by to_shared_memory() in another process and rebuild the context
+        from it. The block is closed again; every table, including the derived ones, is ready.
+        """
+        from multiprocessing import shared_memory
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            return cls.from_buffer(shm.buf)
+        finally:
+            shm.close()
+
+    @classmethod
+    def from_buffer(cls, buffer):
+        """Rebuild a context from the bytes written by to_shared_memory()."""
+        view = memoryview(buffer)
+        magic, rows, cols, lines, points = CONTEXT_HEADER.unpack_from(view)
+        if magic != CONTEXT_MAGIC:
+            raise ValueError("Not a SolverContext block")
+        offset = CONTEXT_HEADER.size
+        cells = bytes(view[offset:offset + rows * cols]).decode('ascii')
+        offset += rows * cols
+        offset += -offset % 4
+        width, height = 2 * cols + 3, 2 * rows + 3
+        states = width * height * 4
+
+        def take(count):
+            nonlocal offset
+            values = array('i')
+            values.frombytes(view[offset:offset + 4 * count])
+            offset += 4 * count
+            return values
+
+        step, straight, reflect = take(states), take(states), take(states)
+        line_offsets, line_states = take(lines + 1), take(points)
+        view.release()
+
+        cell_of = [(r, c) for r in range(rows) for c in range(cols)]
+        geometry = BoardGeometry(rows, cols, [None if index < 0 else cell_of[index] for index in step])
+        context = cls([cells[r * cols:(r + 1) * cols] for r in range(rows)], geometry)
+        context._next = (straight, reflect)
+        context._step_index = step
+        context._lines = RayLines.from_states(geometry, line_offsets, line_states)
+        return context.build()
+
+
+def layout_key(grid):
+    """The grid layout as a hashable key: a tuple of row tuples."""
+    return tuple(tuple(row) for row in grid)
+
+
+_contexts = {}
+
+
+def get_context(grid):
+    """
+    The shared SolverContext of a grid layout, made on first use. The MAX_CONTEXTS most
+    recently made or registered contexts are kept.
+    """
+    key = layout_key(grid)
+    context = _contexts.get(key)
+    if context is None:
+        context = register(SolverContext(grid))
+    return context
+
+
+def register(context):
+    """Make get_context() return context for its layout, e.g. one attached from shared memory."""
+    _contexts.pop(context.key, None)
+    _contexts[context.key] = context
+    while len(_contexts) > MAX_CONTEXTS:
+        del _contexts[next(iter(_contexts))]
+    return context
+
+
+# ===== FILE: Kernel.py =====
+
+# Kernel.py
+from array import array
+from importlib.util import find_spec
+
+
+# Numba is optional (the solver then keeps the Python tracer) and slow to import, so it is
+# only imported when the first compiled kernel is made
+JIT_AVAILABLE = find_spec('numba') is not None
+BLOCK_CODES = {'A': 1, 'B': 2, 'C': 3}
+MAX_TARGETS = 63       # Targets are the bits of one int64 mask
+QUEUE_BEAMS = 4096     # Beams a simulation can hold before it is handed back to the Python tracer
+
+
+def trace_beams(queue, n_lasers, step_cell, blocks, open_cell, target_at, all_targets,
+                stamp, counts, beam, seen, candidates, width, max_x, max_y, max_steps, max_repeats):
+    """
+    The whole simulation of Tracer.simulate_lasers() over flat integer buffers, written in the
+    subset of Python Numba compiles (and still valid Python, which is how it is tested without Numba).
+
+    queue holds x, y, vx, vy of the lasers, then of the beams split off by C blocks. Cells are
+    r * cols + c: step_cell gives the cell of a (point, direction) index as in
+    BoardGeometry.step_cells (-1 for none), blocks the placed block code (0, or 1, 2, 3 for A, B, C)
+    and open_cell whether it is an 'o' cell. target_at is the target bit of every padded point.
+    A collision repeated more than max_repeats times ends a beam: the (point, direction) it
+    happens at identifies it within a beam, and stamp holds the beam number that counts belong to.
+    The crossed 'o' cells are appended to candidates once per simulation, tracked in seen with
+    the simulation's first beam number. Beams are numbered on from beam, so stamps are never reset.
+    Returns: (remaining target mask, number of candidates, next beam number), the mask being
+             -1 if queue is full, in which case the simulation must be run again in Python.
+    """
+    remaining = all_targets
+    n_candidates = 0
+    first = beam + 1
+    capacity = len(queue) // 4
+    head = 0
+    tail = n_lasers
+    while head < tail:
+        x = queue[4 * head]
+        y = queue[4 * head + 1]
+        vx = queue[4 * head + 2]
+        vy = queue[4 * head + 3]
+        head += 1
+        beam += 1
+        steps = 0
+        while steps < max_steps:
+            steps += 1
+            if -1 <= x <= max_x + 1 and -1 <= y <= max_y + 1:
+                remaining &= ~target_at[(y + 1) * width + x + 1]
+            nx = x + vx
+            ny = y + vy
+            if nx < 0 or ny < 0 or nx > max_x or ny > max_y:
+                break
+            state = ((y + 1) * width + x + 1) * 4
+            if vx > 0:
+                state += 2
+            if vy > 0:
+                state += 1
+            cell = step_cell[state]
+            block = blocks[cell] if cell >= 0 else 0
+            if block == 0:
+                if cell >= 0 and open_cell[cell] and seen[cell] < first:
+                    seen[cell] = first
+                    candidates[n_candidates] = cell
+                    n_candidates += 1
+                x = nx
+                y = ny
+                continue
+            if stamp[state] != beam:
+                stamp[state] = beam
+                counts[state] = 0
+            counts[state] += 1
+            if counts[state] > max_repeats or block == 2:
+                break
+            if block == 3:
+                if tail == capacity:
+                    return -1, n_candidates, beam
+                queue[4 * tail] = nx
+                queue[4 * tail + 1] = ny
+                queue[4 * tail + 2] = vx
+                queue[4 * tail + 3] = vy
+                tail += 1
+            if x % 2 == 1:
+                vy = -vy
+            else:
+                vx = -vx
+            x += vx
+            y += vy
+    return remaining, n_candidates, beam
+
+
+_compiled = None
+
+
+def compiled_trace_beams():
+    """trace_beams() compiled by Numba (once per process; the machine code is cached on disk)."""
+    global _compiled
+    if _compiled is None:
+        from numba import njit
+        _compiled = njit(cache=True, nogil=True)(trace_beams)
+    return _compiled
+
+
+class TraceKernel:
+    '''
+    The buffers of trace_beams() for one board, for Solver(board, jit=...): the tables of the
+    grid layout, the target bits and the scratch space of the beam queue and collision counts,
+    allocated once and reused by every simulation.
+
+    compiled: *bool*
+        Whether simulate() runs the Numba-compiled kernel (else the same code interpreted).
+    targets: *list[tuple[int, int]]*
+        The target of every bit of a target mask, numbered like Bitboard.BoardBits.target_bits.
+    '''
+    def __init__(self, geometry, grid, targets, context, compiled=JIT_AVAILABLE):
+        if compiled and not JIT_AVAILABLE:
+            raise RuntimeError("Numba is not installed")
+        self.compiled = compiled
+        self._run = compiled_trace_beams() if compiled else trace_beams
+        self.geometry = geometry
+        self.cols = geometry.cols
+        self.step_cell = context.step_index()
+        self.open_cell = bytearray(grid[r][c] == 'o' for r in range(geometry.rows) for c in range(geometry.cols))
+        self.blocks = bytearray(geometry.rows * geometry.cols)
+        self.targets = list(dict.fromkeys(tuple(target) for target in targets))
+        if len(self.targets) > MAX_TARGETS:
+            raise ValueError(f"The kernel handles at most {MAX_TARGETS} targets")
+        self.all_targets = (1 << len(self.targets)) - 1
+        self.target_at = array('q', [0]) * (geometry.width * geometry.height)
+        for bit, (x, y) in enumerate(self.targets):
+            if -1 <= x <= geometry.max_x + 1 and -1 <= y <= geometry.max_y + 1:
+                self.target_at[(y + 1) * geometry.width + x + 1] = 1 << bit
+        self.queue = array('i', [0]) * (4 * QUEUE_BEAMS)
+        self.stamp = array('q', [0]) * len(self.step_cell)
+        self.counts = array('i', [0]) * len(self.step_cell)
+        self.seen = array('q', [0]) * len(self.blocks)
+        self.candidates = array('i', [0]) * len(self.blocks)
+        self.beam = 0
+
+    @classmethod
+    def supports(cls, targets):
+        """Whether a board with these targets fits the kernel."""
+        return len(set(tuple(target) for target in targets)) <= MAX_TARGETS
+
+    def simulate(self, placed_blocks, lasers):
+        """
+        Simulate lasers with placed_blocks ((r, c) -> 'A'/'B'/'C').
+        Returns: (remaining target mask, list of candidate cell indexes r * cols + c), or None if
+                 the beams overflowed the queue; Tracer.simulate_lasers() must then be used.
+        """
+        cols, blocks, queue = self.cols, self.blocks, self.queue
+        for (r, c), block_type in placed_blocks.items():
+            blocks[r * cols + c] = BLOCK_CODES[block_type]
+        for i, laser in enumerate(lasers):
+            queue[4 * i:4 * i + 4] = array('i', laser)
+        geometry = self.geometry
+        remaining, n_candidates, self.beam = self._run(
+            queue, len(lasers), self.step_cell, blocks, self.open_cell, self.target_at, self.all_targets,
+            self.stamp, self.counts, self.beam, self.seen, self.candidates,
+            geometry.width, geometry.max_x, geometry.max_y, MAX_STEPS, MAX_REPEATS)
+        for (r, c) in placed_blocks:
+            blocks[r * cols + c] = 0
+        if remaining < 0:
+            return None
+        return remaining, self.candidates[:n_candidates]
+
+    def target_points(self, mask):
+        """The targets of a target mask, as a set of points."""
+        return {target for bit, target in enumerate(self.targets) if mask >> bit & 1}
+
+
+# ===== FILE: Progress.py =====
+
+# Progress.py
+import time
+
+
+class ProgressReport:
+    '''
+    One report of a running solve (see SolveProgress).
+
+    nodes: *int*
+        Nodes expanded so far.
+    rate: *float*
+        Nodes per second since the previous report (since the start for the first one).
+    depth: *int*
+        Depth of the node being searched, i.e. the number of blocks placed on its path.
+    targets_hit: *int*
+        Most targets any node searched so far hit at once.
+    targets: *int*
+        Number of targets of the board.
+    fraction: *float*
+        Estimated share of the search tree behind the current path (see search_fraction()).
+    elapsed: *float*
+        Seconds since the search started.
+    eta: *float or None*
+        Estimated seconds left to search the whole tree, from elapsed and fraction; None while
+        fraction is still 0. A solution found earlier ends the search before that.
+    '''
+    def __init__(self, nodes, rate, depth, targets_hit, targets, fraction, elapsed, eta):
+        self.nodes = nodes
+        self.rate = rate
+        self.depth = depth
+        self.targets_hit = targets_hit
+        self.targets = targets
+        self.fraction = fraction
+        self.elapsed = elapsed
+        self.eta = eta
+
+    def __str__(self):
+        eta = "?" if self.eta is None else f"{self.eta:.0f} s"
+        return (f"{self.nodes} nodes ({self.rate:.0f} nodes/s), depth {self.depth}, "
+                f"best {self.targets_hit}/{self.targets} targets, {self.fraction:.1%} searched "
+                f"in {self.elapsed:.1f} s, ETA {eta}")
+
+    def __repr__(self):
+        return (f"ProgressReport(nodes={self.nodes}, rate={self.rate:.0f}, depth={self.depth}, "
+                f"targets_hit={self.targets_hit}, targets={self.targets}, fraction={self.fraction:.4f}, "
+                f"elapsed={self.elapsed:.3f}, eta={self.eta})")
+
+
+def search_fraction(frames):
+    """
+    Estimated share of a depth-first search done when it is at the given path (the frames of
+    Solver.path_frames()). The children of a node are taken as equal shares of it: with n_d cells
+    in the order of the frame at depth d, the 3 n_d (cell, block type) children are 1 / (3 n_d)
+    of it each, the ones before the child being searched are done, and so on down the path.
+    """
+    fraction, width = 0.0, 1.0
+    for frame in frames:
+        order, i, k = frame[0], frame[1], frame[2]
+        if not order:
+            break
+        width /= 3 * len(order)
+        fraction += (3 * i + k) * width
+    return fraction
+
+
+def print_report(report):
+    """Default callback of SolveProgress."""
+    print(f"[PROGRESS] {report}")
+
+
+class SolveProgress:
+    '''
+    Throttled progress channel of a solve: Solver(board, progress=SolveProgress(callback))
+    calls callback with a ProgressReport every interval seconds while it searches. A solve
+    shorter than interval reports nothing.
+
+    The solver counts its nodes down to the next sample, every sample_nodes nodes it
+    simulates; a sample only keeps the target coverage of the node and reads the clock. The
+    reports, and the walk along the search path they need, happen once an interval. Costs stay
+    under a percent of a search even in bitboard mode, at the price of the best coverage being
+    the best among the sampled nodes.
+
+    callback: *callable*
+        Called with every ProgressReport; print_report() by default.
+    interval: *float*
+        Seconds between two reports.
+    sample_nodes: *int*
+        Nodes between two samples.
+    reports: *int*
+        Reports made during the current solve.
+    '''
+    def __init__(self, callback=None, interval=1.0, sample_nodes=8):
+        self.callback = callback if callback is not None else print_report
+        self.interval = interval
+        self.sample_nodes = sample_nodes
+        self.reports = 0
+        self._targets = 0
+        self._fewest_missed = 0
+        self._count = len
+        self._start = self._last_time = self._next_report = 0.0
+        self._last_nodes = 0
+
+    def start(self, solver):
+        """Begin a new solve of solver (called by Solver.reset_search())."""
+        self.reports = 0
+        self._targets = len(solver.original_targets)
+        self._fewest_missed = self._targets
+        # Missed targets are a mask in bitboard mode, a collection of points otherwise
+        self._count = int.bit_count if solver.bits is not None else len
+        self._start = self._last_time = time.monotonic()
+        self._next_report = self._start + self.interval
+        self._last_nodes = 0
+
+    def sample(self, solver):
+        """
+        Sample the node solver just simulated, and report if an interval has passed since the
+        last report. Returns the number of nodes until the next sample.
+        """
+        missed = self._count(solver.remaining_targets)
+        if missed < self._fewest_missed:
+            self._fewest_missed = missed
+        now = time.monotonic()
+        if now >= self._next_report:
+            self._report(solver, now)
+        return self.sample_nodes
+
+    def _report(self, solver, now):
+        nodes = solver.nodes_expanded
+        rate = (nodes - self._last_nodes) / (now - self._last_time) if now > self._last_time else 0.0
+        frames = solver.path_frames()
+        fraction = search_fraction(frames)
+        elapsed = now - self._start
+        eta = elapsed * (1 - fraction) / fraction if fraction > 0 else None
+        self._last_time, self._last_nodes = now, nodes
+        self._next_report = now + self.interval
+        self.reports += 1
+        self.callback(ProgressReport(nodes, rate, len(frames), self._targets - self._fewest_missed,
+                                     self._targets, fraction, elapsed, eta))
 
 
 # ===== FILE: Solver.py =====
 
 # Solver.py
-import copy
+import os
+import time
 
 def get_cell_edge_points(r, c):
     """
@@ -255,53 +2791,372 @@ def get_cell_edge_points(r, c):
         (2*c,   2*r+1)    # Left edge midpoint (even, odd)
     }
 
+# Slots of a frame of the explicit stack of Solver.search()
+_ORDER, _I, _K, _BIT, _STATE, _CONFLICT, _EXHAUSTED, _RESUMING, _GAVE = range(9)
+
+class SolveInterrupted(Exception):
+    """Raised by Solver.solve() when its time limit passes or should_stop() returns True."""
+
 class Solver:
-    def __init__(self, board, debug=False):
+    def __init__(self, board, debug=False, checkpoint_path=None, checkpoint_interval=60.0,
+                 record_trace=False, time_limit=None, should_stop=None, ray_jump=False,
+                 bitboards=False, prune_dead_cells=False, bidirectional=False,
+                 learn_nogoods=False, max_nogoods=100000, iterative=False, profile=None, context=None,
+                 jit=False, progress=None):
         """
         :param board: Board object containing grid/blocks/lasers/targets
         :param debug: If True, detailed debug information will be printed to the console
+        :param checkpoint_path: If given, the search state is periodically saved to this file
+        :param checkpoint_interval: Minimum number of seconds between two checkpoints
+        :param record_trace: If True, solve() keeps a LaserTrace of the solution in self.trace
+                             (the solution's paths are always kept in self.final_paths)
+        :param time_limit: Optional number of seconds after which solve() raises SolveInterrupted
+        :param should_stop: Optional callable polled during the search; solve() raises SolveInterrupted once it returns True
+        :param ray_jump: If True, beams skip runs of empty half steps using a RayTable kept up to date by backtrack()
+        :param bitboards: If True, targets, candidate cells and search states are int bitmasks (see Bitboard.py);
+                          candidates are then tried in cell order, so the search may find a different solution
+        :param prune_dead_cells: If True, blocks are only tried on cells where the static analysis says a
+                                 reflection could lead towards a target (see StaticAnalysis.py)
+        :param bidirectional: If True, blocks are only tried on cells where a current beam, reflected,
+                              enters the backward light cone of a target that is not hit yet
+        :param learn_nogoods: If True, every failed subtree is explained by a small subset of its placements
+                              (a nogood, see Nogood.py) and any later node containing it is skipped
+        :param max_nogoods: Maximum number of nogoods kept
+        :param iterative: If True, solve() runs search(), the same search as backtrack() on an explicit stack
+                          instead of recursion, so it is not limited by the Python recursion limit
+        :param profile: Optional SolveProfile (see Profiler.py); solve() records its initial candidates
+                        and search phases in it. Simulations then run in the Python tracer, whose
+                        simulation and collision phases it labels, even with jit
+        :param context: SolverContext of the board's grid layout (see SolverContext.py); by default the
+                        one get_context() shares between all boards with this grid
+        :param jit: If True, simulations run the flat-array kernel of Kernel.py, compiled when Numba is
+                    installed, interpreted otherwise (only useful to test it). It leaves traces, paths,
+                    nogood learning and debug output to the Python tracer; the candidates of a node are
+                    the same, but without bitboards they may be tried in another order, so the search
+                    may find a different solution
+        :param progress: Optional SolveProgress (see Progress.py), which samples the search every few
+                         nodes and reports nodes/s, depth, best coverage and ETA every interval
         """
         # Save initial state
-        self.original_grid = copy.deepcopy(board.grid)
-        self.original_blocks = copy.deepcopy(board.blocks)
-        self.original_targets = copy.deepcopy(board.targets)
+        self.original_grid = [list(row) for row in board.grid]
+        self.original_blocks = dict(board.blocks)
+        self.original_targets = list(board.targets)
 
         self.board = board       # Current board object
+        if context is None:
+            context = get_context(board.grid)
+        elif not context.matches(board.grid):
+            raise ValueError("The context was made for a different grid")
+        self.context = context   # Read-only tables of the grid layout
+        self.geometry = context.geometry
         self.debug = debug       # Debug flag
         self.placed_blocks = {}  # Placed blocks, mapping (r, c) -> 'A','B','C'
-        self.final_paths = []    # Final laser trajectory paths
+        self.final_paths = LaserPaths()  # Laser paths of the solution, as compact segments
+        # Beams of the current node for the bidirectional filter, rewritten at every node
+        self.node_paths = LaserPaths(compact=False) if bidirectional else None
+        self.record_trace = record_trace
+        self.trace = None        # LaserTrace of the last traced simulation
+        self.solved = None       # Outcome of the last solve()
+        self.ray_jump = ray_jump
+        self.rays = None         # RayTable of the running solve when ray_jump is set
+        self.bits = BoardBits(self.geometry, board.grid, board.targets, context) if bitboards else None
+        self.kernel = TraceKernel(self.geometry, board.grid, board.targets, context, JIT_AVAILABLE) \
+            if jit and profile is None and TraceKernel.supports(board.targets) else None
+        self.placement_bits = 0  # The placed blocks as a mask of 1 << encode_placement() bits
+        self.prune_dead_cells = prune_dead_cells
+        self.bidirectional = bidirectional
+        self.analysis = None     # BoardAnalysis of the board, made by solve()
+        self.remaining_targets = None  # Targets missed by the last simulation (a mask in bitboard mode)
+        self.learn_nogoods = learn_nogoods
+        self.max_nogoods = max_nogoods
+        self.nogoods = None      # NogoodStore of the running solve when learn_nogoods is set
+        self._touched = None     # Cells of the blocks hit by the last simulation (nogood learning)
+        self._conflict = 0       # Nogood explaining the last failed backtrack() call
+
+        # Search state, kept explicit so that it can be checkpointed and resumed
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.nodes_expanded = 0     # Number of backtrack() calls so far
+        self.failed_states = set()  # frozensets of placed_blocks whose subtree has no solution
+        self.frames = []            # DFS stack: one [candidate list, cell index, block index] per depth
+        self._resume_frames = None  # Frames loaded from a checkpoint, consumed while re-descending
+        self._last_checkpoint = time.monotonic()
+        self.iterative = iterative
+        self.stack = None           # Preallocated frames of search(), one per depth
+        self.depth = 0              # Number of frames of self.stack in use
+        self._pending = None        # Where search() paused in solve_steps(), or None
+        self._base = []             # Placements solve_subtree() started from, below which split_work() gives
+
+        self.time_limit = time_limit
+        self.should_stop = should_stop
+        self._deadline = None
+        self.profile = profile
+        self.progress = progress
+        self._progress_countdown = 0  # Nodes until the next sample of progress
 
     def debug_print(self, *args):
         """Prints only when debug is True."""
         if self.debug:
             print(*args)
 
-    def solve(self):
+    def solve(self, resume_from=None):
         """
         External entry point: Executes the solving process.
           1. Reset the board to its initial state
           2. Simulate lasers in a block-free state to obtain initial candidate cells
           3. Backtrack to place blocks; return True if all targets are hit, otherwise False
+        :param resume_from: Optional checkpoint file; the search continues exactly where it stopped
+        Raises SolveInterrupted if the time limit passes or should_stop() asks for it; with a
+        checkpoint_path the search state is saved first, so the solve can be resumed later.
         """
-        # Reset
-        self.board.grid = copy.deepcopy(self.original_grid)
-        self.board.blocks = copy.deepcopy(self.original_blocks)
-        self.board.targets = copy.deepcopy(self.original_targets)
-        self.placed_blocks.clear()
-        self.final_paths.clear()
+        self.reset_search()
+
+        # (0) Boards with a target that no placement can reach are rejected without a search
+        if self.analysis.unreachable_targets:
+            self.debug_print("[solve] Unreachable targets:", self.analysis.unreachable_targets)
+            self.solved = False
+            return False
+
+        if resume_from is not None:
+            self.load_checkpoint(resume_from)
+            self.debug_print(f"[solve] Resuming from {resume_from} at depth {len(self._resume_frames)}")
 
         # (1) Collect initial candidate cells in block-free state
-        initial_candidates = self.simulate_no_blocks_initial()
+        with self.phase('initial candidates'):
+            initial_candidates = self.simulate_no_blocks_initial()
         self.debug_print("[solve] Initial candidate cells =", initial_candidates)
 
         # (2) Backtracking
-        success = self.backtrack(initial_candidates)
+        with self.phase('search'):
+            success = self.search() if self.iterative else self.backtrack(initial_candidates)
+            if success:
+                # Paths are only recorded for the accepted solution
+                self.simulate_with_blocks(trace=self.record_trace, record_paths=True)
+        return self._finish(success)
+
+    def _finish(self, success):
+        """End of a search of solve() or solve_steps(): report, drop its checkpoint, keep its outcome."""
         if success:
             self.debug_print("[solve] Solution found!")
         else:
             self.debug_print("[solve] No solution.")
+        if self.nogoods is not None:
+            self.debug_print("[solve] Nogoods:", self.nogoods.stats())
+
+        # The search is over, a checkpoint of it would only resume a finished run
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        self.solved = success
         return success
 
+    def solve_steps(self, max_nodes=None, max_microseconds=None):
+        """
+        Cooperative solve() for hosts that cannot block, e.g. an event loop or a GUI: advance the
+        search by at most max_nodes nodes or about max_microseconds (the node running when time
+        is up is finished first), then return, the search state staying in the solver.
+        Returns None while the search is not over, then its outcome, as solve() would; once over,
+        further calls return that outcome until reset_search() or solve() starts a new search.
+        Interruptions are those of solve(), after which the next call starts a new search. Only
+        valid in iterative mode, whose explicit stack lets the search stop and resume between
+        any two nodes. Scheduler.py interleaves such solves on one thread.
+        """
+        if not self.iterative:
+            raise RuntimeError("solve_steps() needs an iterative solver")
+        if self._pending is None:
+            if self.solved is not None:
+                return self.solved
+            self.reset_search()
+            if self.analysis.unreachable_targets:
+                self.debug_print("[solve] Unreachable targets:", self.analysis.unreachable_targets)
+                self.solved = False
+                return False
+            with self.phase('initial candidates'):
+                self.simulate_no_blocks_initial()
+        stop_nodes = None if max_nodes is None else self.nodes_expanded + max_nodes
+        deadline = None if max_microseconds is None else time.perf_counter() + max_microseconds / 1e6
+        with self.phase('search'):
+            try:
+                outcome = self.search(self._pending, stop_nodes, deadline)
+            except SolveInterrupted:
+                self._pending = None  # The next call starts over; solve(resume_from=...) resumes
+                raise
+            if outcome is None:
+                return None
+            self._pending = None
+            if outcome:
+                self.simulate_with_blocks(trace=self.record_trace, record_paths=True)
+        return self._finish(outcome)
+
+    def solve_subtree(self, placements):
+        """
+        Search only the subtree of one node, e.g. a work unit of Distributed.py: the node reached
+        from the initial board by placing placements ((r, c, block type) triples, in order).
+        Returns True if a solution was found below it (left in self.placed_blocks, with its paths
+        in self.final_paths), otherwise False. Interruptions are those of solve().
+        The failed states (or nogoods) of earlier calls are kept: the subtrees are all parts of
+        the same board's search, so a placement set that failed in one fails in every other.
+        """
+        failed_states, nogoods = self.failed_states, self.nogoods
+        self.reset_search()
+        self.failed_states = failed_states
+        if nogoods is not None:
+            self.nogoods = nogoods
+        if self.analysis.unreachable_targets:
+            self.solved = False
+            return False
+        for r, c, block_type in placements:
+            self.place_block(r, c, block_type)
+        self._base = list(placements)
+
+        with self.phase('search'):
+            success = self.search() if self.iterative else self.backtrack(None)
+            if success:
+                self.simulate_with_blocks(trace=self.record_trace, record_paths=True)
+        self.solved = success
+        return success
+
+    def split_work(self):
+        """
+        Give part of the running search away, for work stealing: the cells of the shallowest node
+        on the current path that still has cells after the one being tried, each with every block
+        type left at that node. This search no longer tries them, so the caller must search them
+        (see solve_subtree()). Only valid in iterative mode, between two nodes, e.g. in should_stop().
+        Returns: the given subtrees, each as its list of placements (empty if there is nothing to give).
+        """
+        if not self.iterative:
+            raise RuntimeError("split_work() needs Solver(iterative=True)")
+        if self._resume_frames is not None:
+            return []
+        # Units are rooted at the node solve_subtree() started from, not at the empty board
+        prefix = list(self._base)
+        blocks = dict(self.original_blocks)
+        for _, _, block_type in prefix:
+            blocks[block_type] -= 1
+        for depth, frame in enumerate(self.stack[:self.depth]):
+            order, i = frame[_ORDER], frame[_I]
+            taken = {(r, c) for (r, c, _) in prefix}
+            units = [prefix + [(r, c, block_type)] for (r, c) in order[i + 1:] if (r, c) not in taken
+                     and self.original_grid[r][c] == 'o'
+                     for block_type in 'ABC' if blocks.get(block_type, 0) >= 1]
+            if units:
+                frame[_ORDER] = order[:i + 1]
+                # This node and its ancestors no longer fail here alone: they must not learn
+                for ancestor in self.stack[:depth + 1]:
+                    ancestor[_GAVE] = True
+                return units
+            if not frame[_BIT]:
+                break
+            (r, c), block_type = order[i], 'ABC'[frame[_K]]
+            prefix.append((r, c, block_type))
+            blocks[block_type] -= 1
+        return []
+
+    def phase(self, name):
+        """Context manager of a phase of self.profile, if any (see Profiler.SolveProfile.phase)."""
+        return profile_phase(self.profile, name)
+
+    def reset_search(self):
+        """Put the board back in its initial state and clear every search structure."""
+        # Rows are the only nested values that change: the rest of the state is flat
+        self.board.grid = [list(row) for row in self.original_grid]
+        self.board.blocks = dict(self.original_blocks)
+        self.board.targets = list(self.original_targets)
+        self.placed_blocks.clear()
+        self.placement_bits = 0
+        self.final_paths.clear()
+        self.trace = None
+        self.solved = None
+        self.nodes_expanded = 0
+        self._pending = None
+        self._base = []
+        self.failed_states = set()
+        self.nogoods = NogoodStore(self.max_nogoods) if self.learn_nogoods else None
+        self.frames = []
+        self._resume_frames = None
+        self._last_checkpoint = time.monotonic()
+        if self.iterative:
+            # A node below the root holds one more block than its parent
+            self.stack = [[None, 0, 0, 0, None, 0, 0, False, False]
+                          for _ in range(sum(self.original_blocks.values()) + 1)]
+            self.depth = 0
+        self._deadline = None if self.time_limit is None else time.monotonic() + self.time_limit
+        self.rays = RayTable(self.geometry, self.board.grid, self.board.targets,
+                             self.placed_blocks, self.context) if self.ray_jump else None
+        if self.progress is not None:
+            self.progress.start(self)
+            self._progress_countdown = self.progress.sample_nodes
+        if self.analysis is None:
+            self.analysis = analyze_board(self.geometry, self.original_grid, self.board.lasers,
+                                          self.original_targets, self.original_blocks, self.context)
+
+    def result(self):
+        """
+        Return the outcome of the last solve() as an immutable SolveResult (placements and
+        beam paths in flat arrays), which can be shared with other processes without pickling.
+        """
+        return SolveResult.from_solver(self, solved=bool(self.solved))
+
+    def save_checkpoint(self, path=None):
+        """
+        Serialize the current search state (DFS stack, placed blocks, remaining block counts
+        and the failed-state cache or the nogoods) to path (defaults to checkpoint_path).
+        Only valid between two nodes, i.e. when called from backtrack().
+        """
+        path = path or self.checkpoint_path
+        cols = len(self.original_grid[0]) if self.original_grid else 0
+        frames = [[[r * cols + c for (r, c) in frame[0]], frame[1], frame[2]] for frame in self.path_frames()]
+        if self.nogoods is not None:
+            # A nogood is a failed placement set as well, only a more general one
+            failed = [placement_codes(nogood) for nogood in self.nogoods.masks()]
+        elif self.bits is not None:
+            failed = [placement_codes(state) for state in self.failed_states]
+        else:
+            failed = [sorted(encode_placement(r, c, t, cols) for ((r, c), t) in state)
+                      for state in self.failed_states]
+        write_checkpoint(path, {
+            'board': board_fingerprint(self.original_grid, self.board.lasers,
+                                       self.original_targets, self.original_blocks),
+            'frames': frames,
+            'placed': [encode_placement(r, c, t, cols) for ((r, c), t) in self.placed_blocks.items()],
+            'blocks': self.board.blocks,
+            'failed': failed,
+            'nodes': self.nodes_expanded,
+        })
+        self._last_checkpoint = time.monotonic()
+        self.debug_print(f"[checkpoint] Saved {path} at depth {len(frames)}, {self.nodes_expanded} nodes")
+
+    def path_frames(self):
+        """
+        The frames of the nodes on the current search path, root first; each starts with the
+        node's cell order and the cell and block indexes of the child being searched.
+        """
+        return self.stack[:self.depth] if self.iterative else self.frames
+
+    def load_checkpoint(self, path):
+        """
+        Load a checkpoint written by save_checkpoint(). The DFS stack is replayed lazily by
+        backtrack() or search(), which re-places the recorded blocks before continuing the search.
+        """
+        state = read_checkpoint(path)
+        fingerprint = board_fingerprint(self.original_grid, self.board.lasers,
+                                        self.original_targets, self.original_blocks)
+        if state['board'] != fingerprint:
+            raise ValueError(f"Checkpoint {path} was written for a different board")
+
+        cols = len(self.original_grid[0]) if self.original_grid else 0
+        self._resume_frames = [([divmod(cell, cols) for cell in cands], i, k)
+                               for (cands, i, k) in state['frames']]
+        if self.nogoods is not None:
+            for codes in state['failed']:
+                self.nogoods.add(placement_mask(codes))
+        elif self.bits is not None:
+            self.failed_states = {placement_mask(codes) for codes in state['failed']}
+        else:
+            self.failed_states = {frozenset(((r, c), t) for (r, c, t) in
+                                            (decode_placement(code, cols) for code in codes))
+                                  for codes in state['failed']}
+        self.nodes_expanded = state['nodes']
+
     def simulate_no_blocks_initial(self):
         """
         In a block-free state, for each laser, move in half steps, record the cells it passes through,
@@ -326,269 +3181,715 @@ class Solver:
                 laser.x, laser.y = nx, ny
                 steps += 1
 
-            # Analyze consecutive points in the path; if (p1, p2) both fall on the midpoints of opposite edges of an 'o' cell, add that cell to candidates
+            # Analyze consecutive points in the path; if (p1, p2) both fall on the edge midpoints of an 'o' cell, add that cell to candidates
             for i in range(len(path)-1):
-                p1, p2 = path[i], path[i+1]
-                for r in range(len(self.board.grid)):
-                    for c in range(len(self.board.grid[0])):
-                        if self.board.grid[r][c] == 'o':
-                            edges = get_cell_edge_points(r, c)
-                            if p1 in edges and p2 in edges:
-                                candidate_cells.add((r,c))
+                cell = self.geometry.step_cell(path[i], path[i+1])
+                if cell is not None and self.board.grid[cell[0]][cell[1]] == 'o':
+                    candidate_cells.add(cell)
 
         return candidate_cells
 
-    def backtrack(self, candidates):
+    def backtrack(self, candidates, last_bit=None):
         """
         Main backtracking function:
           1) First use simulate_with_blocks() to check if all targets are hit
           2) If not all targets are hit, then try placing A/B/C blocks in new_candidates
           3) Return True if successful, otherwise backtrack
+        The current path is kept in self.frames so that it can be checkpointed; a placement set
+        whose subtree failed is remembered in self.failed_states and never explored twice.
+        With nogood learning a failure is explained instead by the blocks the beams hit, the
+        blocks of every type that ran out, and the explanations of the children; no solution
+        contains that subset, so every node that contains it is skipped.
         """
+        self.nodes_expanded += 1
+        depth = len(self.frames)
+        resuming = self._resume_frames is not None and depth < len(self._resume_frames)
+
+        # The subtree only depends on the placed blocks, so a known failing set can be skipped
+        if self.nogoods is not None:
+            nogood = self.nogoods.find(self.placement_bits, last_bit)
+            if nogood is not None:
+                self._conflict = nogood
+                return False
+            state = None
+        elif self.bits is not None:
+            state = self.placement_bits
+        else:
+            state = frozenset(self.placed_blocks.items())
+        if state in self.failed_states:
+            return False
+
         # Simulate lasers with the current placed blocks
         solved, new_candidates = self.simulate_with_blocks()
+        if self.progress is not None:
+            self._progress_countdown -= 1
+            if self._progress_countdown <= 0:
+                self._progress_countdown = self.progress.sample(self)
         if solved:
             self.debug_print("[backtrack] All targets hit, returning success")
             return True
 
+        # Blocks the beams do not hit could be removed without changing this node
+        conflict = self._placement_mask(self._touched) if self.nogoods is not None else 0
         if not new_candidates:
             self.debug_print("[backtrack] No new candidate cells available, cannot place additional blocks, backtracking")
+            if self.nogoods is not None:
+                self._learn(conflict)
             return False
 
+        if resuming:
+            order, start_i, start_k = self._resume_frames[depth]
+            if depth == len(self._resume_frames) - 1:
+                # Deepest recorded frame reached, the replay is complete
+                self._resume_frames = None
+        else:
+            order, start_i, start_k = self.candidate_order(new_candidates), 0, 0
+        frame = [order, start_i, start_k]
+        self.frames.append(frame)
+        if resuming:
+            # The children tried before the checkpoint left no explanation
+            conflict = self.placement_bits
+        exhausted = set()
+
+        if self.checkpoint_path and not resuming and \
+                time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+            self.save_checkpoint()
+
+        if not resuming and ((self._deadline is not None and time.monotonic() > self._deadline) or
+                             (self.should_stop is not None and self.should_stop())):
+            if self.checkpoint_path:
+                self.save_checkpoint()
+            raise SolveInterrupted(f"Search stopped after {self.nodes_expanded} nodes")
+
         # Try placing blocks in new_candidates
-        for (r, c) in new_candidates:
+        for i in range(start_i, len(order)):
+            (r, c) = order[i]
             # If the cell is not 'o', it means a block is already placed
             if self.board.grid[r][c] != 'o':
                 continue
 
-            for block_type in ['A','B','C']:
+            for k in range(start_k if i == start_i else 0, 3):
+                block_type = 'ABC'[k]
                 # If there are no remaining blocks of this type, skip
                 if self.board.blocks.get(block_type, 0) < 1:
+                    exhausted.add(block_type)
                     continue
 
                 self.debug_print(f"[backtrack] Placing {block_type} block at ({r},{c})")
-                self.board.grid[r][c] = block_type
-                self.placed_blocks[(r,c)] = block_type
-                self.board.blocks[block_type] -= 1
+                placement_bit = self.place_block(r, c, block_type)
+                frame[1], frame[2] = i, k
 
-                if self.backtrack(new_candidates):
+                if self.backtrack(new_candidates, placement_bit if not resuming else None):
                     return True
+                if self.nogoods is not None and not self._conflict & placement_bit:
+                    # The child failed without its own block: so does this node (backjump)
+                    self.remove_block(r, c, block_type)
+                    self.frames.pop()
+                    return False
+                conflict |= self._conflict
 
                 # Backtracking: remove the block from (r, c)
                 self.debug_print(f"[backtrack] Backtracking: Removing {block_type} block from ({r},{c})")
-                self.board.grid[r][c] = 'o'
-                del self.placed_blocks[(r,c)]
-                self.board.blocks[block_type] += 1
+                self.remove_block(r, c, block_type)
 
+        self.frames.pop()
+        if self.nogoods is not None:
+            # More blocks of a type that ran out would have opened other children
+            exhausted_cells = {cell for cell, t in self.placed_blocks.items() if t in exhausted}
+            self._learn((conflict | self._placement_mask(exhausted_cells)) & self.placement_bits)
+        else:
+            self.failed_states.add(state)
         return False
 
-    def simulate_with_blocks(self):
+    def search(self, paused=None, stop_nodes=None, deadline=None):
         """
-        Simulate all lasers with the current placed blocks:
-          - For each laser, move in half steps, detect collisions, and if a collision occurs, process it (A reflection / B blocking / C splitting)
-          - After each collision, immediately move the laser a half step away from the collision point to avoid infinite collisions
-          - For C blocks, if splitting occurs, generate new lasers to simulate as well
-        Returns: (whether all targets are hit, new_candidates)
+        Iterative equivalent of backtrack(): the same nodes in the same order, with the same
+        failed-state cache, nogoods, checkpoints and interruptions, but without recursion. The
+        path lives in self.stack, one preallocated frame per depth, reused from node to node:
+        the node's cell order, the cell and block indexes of the child being tried, its
+        placement bit (undo information), and the node's state, conflict and exhausted types.
+        solve_steps() runs it in slices: it resumes from paused, a state kept in self._pending,
+        and, once nodes_expanded reaches stop_nodes or time.perf_counter() deadline, keeps its
+        state there and returns None.
         """
-        remaining_targets = set(self.board.targets)
-        all_paths = []
-        new_candidates = set()
+        stack = self.stack
+        outcome, resumed = paused if paused is not None else (self._enter_node(None), False)
+        while outcome is not True:
+            if resumed:
+                resumed = False
+            elif (stop_nodes is not None and self.nodes_expanded >= stop_nodes) or \
+                    (deadline is not None and time.perf_counter() >= deadline):
+                self._pending = outcome, True
+                return None
+            if outcome is False:
+                if self.depth == 0:
+                    return False
+                # A child failed: take its block back in the parent
+                frame = stack[self.depth - 1]
+                (r, c), block_type = frame[_ORDER][frame[_I]], 'ABC'[frame[_K]]
+                if self.nogoods is not None and not self._conflict & frame[_BIT]:
+                    # The child failed without its own block: so does this node (backjump)
+                    self.remove_block(r, c, block_type)
+                    self.depth -= 1
+                    continue
+                frame[_CONFLICT] |= self._conflict
+                self.debug_print(f"[backtrack] Backtracking: Removing {block_type} block from ({r},{c})")
+                self.remove_block(r, c, block_type)
+            else:
+                frame = stack[self.depth - 1]
+
+            child = self._next_child(frame)
+            if child is None:
+                self.depth -= 1
+                if self.nogoods is not None and frame[_GAVE]:
+                    # A nogood of it would prune the subtrees given away, if they come back here
+                    self._conflict = self.placement_bits
+                elif self.nogoods is not None:
+                    # More blocks of a type that ran out would have opened other children
+                    exhausted_cells = {cell for cell, t in self.placed_blocks.items()
+                                       if frame[_EXHAUSTED] >> 'ABC'.index(t) & 1}
+                    self._learn((frame[_CONFLICT] | self._placement_mask(exhausted_cells))
+                                & self.placement_bits)
+                else:
+                    self.failed_states.add(frame[_STATE])
+                outcome = False
+                continue
 
-        # Collect all lasers to simulate (including any new ones generated by C block splitting)
-        lasers_to_sim = [(lx, ly, vx, vy) for (lx, ly, vx, vy) in self.board.lasers]
-        idx = 0
+            r, c, block_type = child
+            self.debug_print(f"[backtrack] Placing {block_type} block at ({r},{c})")
+            frame[_BIT] = self.place_block(r, c, block_type)
+            outcome = self._enter_node(None if frame[_RESUMING] else frame[_BIT])
+        return True
 
-        while idx < len(lasers_to_sim):
-            (lx, ly, vx, vy) = lasers_to_sim[idx]
-            idx += 1
+    def _enter_node(self, last_bit):
+        """
+        The work backtrack() does at a node before trying its children. Returns True if the node
+        is a solution, False if it fails at once (self._conflict explains it with nogoods), and
+        None once its frame is pushed on self.stack.
+        """
+        self.nodes_expanded += 1
+        depth = self.depth
+        resuming = self._resume_frames is not None and depth < len(self._resume_frames)
+
+        if self.nogoods is not None:
+            nogood = self.nogoods.find(self.placement_bits, last_bit)
+            if nogood is not None:
+                self._conflict = nogood
+                return False
+            state = None
+        elif self.bits is not None:
+            state = self.placement_bits
+        else:
+            state = frozenset(self.placed_blocks.items())
+        if state in self.failed_states:
+            return False
 
-            if self.debug:
-                print(f"[simulate_with_blocks] Laser #{idx} starting at ({lx},{ly}), direction=({vx},{vy})")
+        solved, new_candidates = self.simulate_with_blocks()
+        if self.progress is not None:
+            self._progress_countdown -= 1
+            if self._progress_countdown <= 0:
+                self._progress_countdown = self.progress.sample(self)
+        if solved:
+            self.debug_print("[backtrack] All targets hit, returning success")
+            return True
 
-            laser_path, new_cand_part, new_lasers, remaining_targets = \
-                self.simulate_single_laser(lx, ly, vx, vy, remaining_targets)
+        conflict = self._placement_mask(self._touched) if self.nogoods is not None else 0
+        if not new_candidates:
+            self.debug_print("[backtrack] No new candidate cells available, cannot place additional blocks, backtracking")
+            if self.nogoods is not None:
+                self._learn(conflict)
+            return False
 
-            all_paths.append(laser_path)
-            new_candidates |= new_cand_part
-            # If a C block produces a new beam, add it to the queue
-            for nl in new_lasers:
-                lasers_to_sim.append(nl)
+        if resuming:
+            order, start_i, start_k = self._resume_frames[depth]
+            if depth == len(self._resume_frames) - 1:
+                self._resume_frames = None
+            # The children tried before the checkpoint left no explanation
+            conflict = self.placement_bits
+        else:
+            order, start_i, start_k = self.candidate_order(new_candidates), 0, 0
+        frame = self.stack[depth]
+        frame[_ORDER], frame[_I], frame[_K], frame[_BIT] = order, start_i, start_k, 0
+        frame[_STATE], frame[_CONFLICT], frame[_EXHAUSTED], frame[_RESUMING] = state, conflict, 0, resuming
+        frame[_GAVE] = False
+        self.depth = depth + 1
+
+        if self.checkpoint_path and not resuming and \
+                time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+            self.save_checkpoint()
+
+        if not resuming and ((self._deadline is not None and time.monotonic() > self._deadline) or
+                             (self.should_stop is not None and self.should_stop())):
+            if self.checkpoint_path:
+                self.save_checkpoint()
+            raise SolveInterrupted(f"Search stopped after {self.nodes_expanded} nodes")
+        return None
+
+    def _next_child(self, frame):
+        """
+        Move frame to its next (cell, block type) child, the one after the child just tried
+        (or its starting one, if none was placed yet); returns (r, c, block type) or None.
+        """
+        order, i = frame[_ORDER], frame[_I]
+        k = frame[_K] + 1 if frame[_BIT] else frame[_K]
+        grid, blocks = self.board.grid, self.board.blocks
+        while i < len(order):
+            (r, c) = order[i]
+            if grid[r][c] == 'o':
+                while k < 3:
+                    block_type = 'ABC'[k]
+                    if blocks.get(block_type, 0) >= 1:
+                        frame[_I], frame[_K] = i, k
+                        return r, c, block_type
+                    frame[_EXHAUSTED] |= 1 << k
+                    k += 1
+            i += 1
+            k = 0
+        return None
+
+    def candidate_order(self, new_candidates):
+        """
+        The cells backtrack() tries at a node, in order, from the candidates of its simulation
+        (a set, or a cell mask in bitboard mode), after the dead-cell and bidirectional filters.
+        """
+        order = self.bits.cells(new_candidates) if self.bits is not None else list(new_candidates)
+        if self.prune_dead_cells:
+            live_cells = self.analysis.live_cells
+            order = [cell for cell in order if cell in live_cells]
+        if self.bidirectional:
+            # Meet in the middle: forward beams of this node against the targets' light cones
+            unmet = self.remaining_targets if self.bits is not None else \
+                self.analysis.target_mask(self.remaining_targets)
+            connecting = self.analysis.connecting_cells(self.node_paths, unmet)
+            order = [cell for cell in order if cell in connecting]
+        return order
 
-        self.final_paths = all_paths
+    def place_block(self, r, c, block_type):
+        """Place a block on the board and in every search structure; returns its placement bit."""
+        self.board.grid[r][c] = block_type
+        self.placed_blocks[(r, c)] = block_type
+        self.board.blocks[block_type] -= 1
+        if self.rays is not None:
+            self.rays.update((r, c))
+        placement_bit = 1 << encode_placement(r, c, block_type, self.geometry.cols)
+        self.placement_bits ^= placement_bit
+        return placement_bit
+
+    def remove_block(self, r, c, block_type):
+        """Undo place_block()."""
+        self.board.grid[r][c] = 'o'
+        del self.placed_blocks[(r, c)]
+        self.board.blocks[block_type] += 1
+        if self.rays is not None:
+            self.rays.update((r, c))
+        self.placement_bits ^= 1 << encode_placement(r, c, block_type, self.geometry.cols)
+
+    def _placement_mask(self, cells):
+        """Placement mask of the blocks placed on cells."""
+        mask = 0
+        for (r, c) in cells:
+            mask |= 1 << encode_placement(r, c, self.placed_blocks[(r, c)], self.geometry.cols)
+        return mask
+
+    def _learn(self, nogood):
+        self.nogoods.add(nogood)
+        self._conflict = nogood
+
+    def simulate_with_blocks(self, trace=False, record_paths=False):
+        """
+        Simulate all lasers with the current placed blocks:
+          - For each laser, move in half steps, detect collisions, and if a collision occurs, process it (A reflection / B blocking / C splitting)
+          - After each collision, immediately move the laser a half step away from the collision point to avoid infinite collisions
+          - For C blocks, if splitting occurs, generate new lasers to simulate as well
+        The stepping itself is done by the shared tracer in Tracer.py.
+        If trace is True, an indexed LaserTrace (beam tree, target hits, cell crossings) is stored in self.trace.
+        The beams are recorded in self.final_paths with trace or record_paths, else in
+        self.node_paths in bidirectional mode, whose filter reads them; otherwise no path is built.
+        When no path is built, the simulation runs in self.kernel if there is one (see Kernel.py).
+        In bitboard mode (and without trace) new_candidates is a cell mask of self.bits.
+        Returns: (whether all targets are hit, new_candidates)
+        """
+        self._touched = set() if self.nogoods is not None else None
+        paths = self.final_paths if trace or record_paths else self.node_paths
+        if paths is not None:
+            paths.clear()
+        elif self.kernel is not None and not trace and self._touched is None and not self.debug:
+            outcome = self.kernel.simulate(self.placed_blocks, self.board.lasers)
+            if outcome is not None:
+                remaining, cells = outcome
+                if self.bits is not None:
+                    # The kernel numbers targets and cells like BoardBits
+                    self.remaining_targets = remaining
+                    new_candidates = 0
+                    for cell in cells:
+                        new_candidates |= 1 << cell
+                    return remaining == 0, new_candidates
+                self.remaining_targets = self.kernel.target_points(remaining)
+                cols = self.geometry.cols
+                return remaining == 0, {divmod(cell, cols) for cell in cells}
+        if self.bits is not None and not trace:
+            self.remaining_targets, new_candidates = simulate_lasers_bits(
+                self.geometry, self.bits, self.placed_blocks, self.board.lasers, self.rays, self._touched,
+                paths)
+            return self.remaining_targets == 0, new_candidates
+
+        laser_trace = None
+        if trace:
+            laser_trace = LaserTrace(self.board.targets, len(self.board.grid), len(self.board.grid[0]))
+            for _ in self.board.lasers:
+                laser_trace.add_beam()
+
+        remaining_targets, new_candidates = simulate_lasers(
+            self.geometry, self.board.grid, self.placed_blocks, self.board.lasers,
+            self.board.targets, laser_trace, self.debug_print if self.debug else None, self.rays,
+            self._touched, paths)
+
+        self.remaining_targets = remaining_targets
+        if trace:
+            self.trace = laser_trace
         solved = (len(remaining_targets) == 0)
         return solved, new_candidates
 
-    def simulate_single_laser(self, lx, ly, vx, vy, remaining_targets):
+    def simulate_single_laser(self, lx, ly, vx, vy, remaining_targets, trace=None, beam=0, paths=None):
         """
-        Simulate a single laser with the current placed blocks:
-          - Move in half steps
-          - If it collides with an A/B/C block, perform the appropriate operation; after collision, immediately move the laser a half step away from the collision point to avoid infinite collisions
-          - A C block will generate a new beam, which should be returned as new_lasers
-        Also records the points the laser passes through for visualization; any 'o' cells passed are added to new_candidates.
-        If a target is hit, remove it from remaining_targets.
-        Returns: (laser_path, new_candidates, new_lasers, remaining_targets)
+        Simulate a single laser with the current placed blocks (see Tracer.simulate_single_laser);
+        its path is appended to paths, a LaserPaths, if given.
+        Returns: (new_candidates, new_lasers, remaining_targets)
         """
-        laser_path = []
-        new_candidates = set()
-        generated_lasers = []
+        return simulate_single_laser(self.geometry, self.board.grid, self.placed_blocks,
+                                     lx, ly, vx, vy, remaining_targets, trace, beam,
+                                     self.debug_print if self.debug else None, self.rays, None, paths)
 
-        laser = Laser(lx, ly, vx, vy)
-        steps = 0
-        max_steps = 3000
+    def check_collision(self, p1, p2):
+        """
+        Check if there is a collision with any placed block when moving from (p1) to (p2).
+        If a collision occurs, return (block type, (r,c), edge_type); otherwise, return (None, None, None).
+
+        Use the parity of p1 to determine whether the edge is horizontal or vertical:
+          - (odd, even)  => horizontal => invert vy
+          - (even, odd)  => vertical   => invert vx
+          - (even, even) => Corner (collision point at a corner, which usually does not occur), treat as no collision
+        """
+        cell = self.geometry.step_cell(p1, p2)
+        if cell is None or cell not in self.placed_blocks:
+            return None, None, None
+        edge_type = 'horizontal' if p1[0] % 2 == 1 else 'vertical'
+        return self.placed_blocks[cell], cell, edge_type
 
-        # Record the count of repeated collisions for the same collision to avoid infinite loops
-        collision_count = {}
 
-        while steps < max_steps and not laser.is_block:
-            curr_pos = (laser.x, laser.y)
-            laser_path.append(curr_pos)
+# ===== FILE: Estimator.py =====
 
-            # If a target point is hit, remove it
-            if curr_pos in remaining_targets:
-                remaining_targets.remove(curr_pos)
+# Estimator.py
+import heapq
+import random
+import time
+
+
+class SearchEstimate:
+    '''
+    Estimated size and runtime of the full backtracking search of a board (see estimate_search()).
+
+    nodes: *float*
+        Estimated number of nodes of the backtrack() tree, searched to exhaustion.
+    seconds: *float*
+        Estimated runtime of that search, nodes times the time per node measured by the probes.
+    probes: *int*
+        Number of random probes the estimate averages.
+    probe_nodes: *int*
+        Number of nodes the probes simulated.
+    '''
+    def __init__(self, nodes, seconds, probes, probe_nodes):
+        self.nodes = nodes
+        self.seconds = seconds
+        self.probes = probes
+        self.probe_nodes = probe_nodes
+
+    def __repr__(self):
+        return (f"SearchEstimate(nodes={self.nodes:.0f}, seconds={self.seconds:.3f}, "
+                f"probes={self.probes}, probe_nodes={self.probe_nodes})")
 
-            nx = laser.x + laser.vx
-            ny = laser.y + laser.vy
 
-            # Check for out-of-bounds
-            if nx < 0 or ny < 0 or nx > 2*len(self.board.grid[0]) or ny > 2*len(self.board.grid):
-                laser_path.append((nx, ny))
+def estimate_search(solver, probes=32, seed=None):
+    """
+    Knuth's estimate of the backtrack() tree of a solver. Each probe walks from the root to a
+    leaf through uniformly random children (the (cell, block type) pairs backtrack() would try);
+    with d_i the number of children at depth i, 1 + d_0 + d_0 d_1 + ... is an unbiased estimate
+    of the node count, and the probes are averaged. Each probe costs one simulation per depth.
+
+    The estimate is for a search without the failed-state cache or nogoods that does not stop at
+    its first solution, so it is an upper bound on what solve() expands. The solver's filters
+    (dead cells, bidirectional, bitboards) shape the tree as they do in solve().
+    The board is left in its initial state.
+    :param probes: Number of random walks; the work is bounded by probes times the number of blocks
+    :param seed: Seed of the random walks, for reproducible estimates
+    """
+    rng = random.Random(seed)
+    solver.reset_search()
+    if solver.analysis.unreachable_targets:
+        # solve() rejects the board without a search
+        return SearchEstimate(1.0, 0.0, 0, 0)
+
+    total = 0.0
+    probe_nodes = 0
+    start = time.perf_counter()
+    for _ in range(probes):
+        placed = []
+        weight = 1
+        while True:
+            total += weight
+            probe_nodes += 1
+            solved, new_candidates = solver.simulate_with_blocks()
+            if solved or not new_candidates:
                 break
+            children = [(r, c, block_type) for (r, c) in solver.candidate_order(new_candidates)
+                        if solver.board.grid[r][c] == 'o'
+                        for block_type in 'ABC' if solver.board.blocks.get(block_type, 0) >= 1]
+            if not children:
+                break
+            weight *= len(children)
+            r, c, block_type = rng.choice(children)
+            solver.place_block(r, c, block_type)
+            placed.append((r, c, block_type))
+        for (r, c, block_type) in reversed(placed):
+            solver.remove_block(r, c, block_type)
+    elapsed = time.perf_counter() - start
 
-            block_type, block_cell, edge_type = self.check_collision((laser.x, laser.y), (nx, ny))
-            if block_type is not None:
-                # Collision occurred
-                collision_key = ((laser.x, laser.y), (laser.vx, laser.vy), block_type, edge_type)
-                collision_count[collision_key] = collision_count.get(collision_key, 0) + 1
+    nodes = total / probes if probes else 1.0
+    seconds = nodes * elapsed / probe_nodes if probe_nodes else 0.0
+    return SearchEstimate(nodes, seconds, probes, probe_nodes)
 
-                # If the same collision condition occurs more than 3 times, force-stopping this laser to avoid infinite loop
-                if collision_count[collision_key] > 3:
-                    self.debug_print(f"[WARN] Repeated collision {collision_key} detected, force-stopping this laser")
-                    laser.is_block = True
-                    break
 
-                self.debug_print(f"  - Collision: {curr_pos} -> ({nx},{ny}) at cell {block_cell}, block type = {block_type}, edge = {edge_type}")
+def longest_first(estimates):
+    """
+    Order for a batch: the keys of estimates (a dict key -> SearchEstimate), longest expected
+    runtime first. Handing the jobs in this order to a pool whose idle workers take the next
+    job is the LPT rule, whose makespan is at most 4/3 of the optimal one.
+    """
+    return sorted(estimates, key=lambda key: estimates[key].seconds, reverse=True)
 
-                collision_x, collision_y = laser.x, laser.y
 
-                if block_type == 'B':
-                    # Block type B => Blocking
-                    B_Block(block_cell)(laser)
-                    # After being blocked, exit immediately
-                    break
+def predicted_makespan(seconds, workers):
+    """Wall time of running jobs of the given durations, in that order, on workers workers."""
+    loads = [0.0] * max(1, workers)
+    for duration in seconds:
+        heapq.heapreplace(loads, loads[0] + duration)
+    return max(loads)
 
-                elif block_type == 'A':
-                    # Block type A => Reflection
-                    A_Block(block_cell)(laser, edge_type)
-                    # After collision, move the laser a half step away from the collision point
-                    laser.x += laser.vx
-                    laser.y += laser.vy
-
-                elif block_type == 'C':
-                    # Block type C => Splitting (one beam reflected + one transmitted)
-                    from copy import deepcopy
-                    main_laser = deepcopy(laser)
-                    reflected_laser = A_Block(block_cell)(main_laser, edge_type)
-                    # Reflected beam moves a half step away from the collision point
-                    reflected_laser.x += reflected_laser.vx
-                    reflected_laser.y += reflected_laser.vy
-
-                    # Transmitted beam continues in the original direction, also moves a half step away from the collision point
-                    transmit_laser = deepcopy(laser)
-                    transmit_laser.x = collision_x + transmit_laser.vx
-                    transmit_laser.y = collision_y + transmit_laser.vy
-
-                    # The current laser is replaced by the reflected beam
-                    laser.x, laser.y = reflected_laser.x, reflected_laser.y
-                    laser.vx, laser.vy = reflected_laser.vx, reflected_laser.vy
-
-                    # The transmitted beam is added to generated_lasers
-                    generated_lasers.append((transmit_laser.x, transmit_laser.y, transmit_laser.vx, transmit_laser.vy))
 
-            else:
-                # No collision => move normally, and check if it passes through an 'o' cell
-                for r in range(len(self.board.grid)):
-                    for c in range(len(self.board.grid[0])):
-                        if self.board.grid[r][c] == 'o':
-                            ep = get_cell_edge_points(r, c)
-                            if (laser.x, laser.y) in ep and (nx, ny) in ep:
-                                new_candidates.add((r, c))
+# ===== FILE: Batch.py =====
 
-                laser.x, laser.y = nx, ny
+# Batch.py
+import os
+import time
 
-            steps += 1
 
-        return laser_path, new_candidates, generated_lasers, remaining_targets
+def load_bff_board(path):
+    lazor_data = LazorBoard.from_file(path)
+    return Board(
+        grid=lazor_data.grid,
+        lasers=lazor_data.lasers,
+        targets=lazor_data.targets,
+        blocks=lazor_data.blocks
+    )
 
-    def check_collision(self, p1, p2):
-        """
-        Check if there is a collision with any placed block when moving from (p1) to (p2).
-        If a collision occurs, return (block type, (r,c), edge_type); otherwise, return (None, None, None).
 
-        Key change: Use the parity of p1 (or p2) to determine whether the edge is horizontal or vertical:
-          - (odd, even)  => horizontal => invert vy
-          - (even, odd)  => vertical   => invert vx
-          - (even, even) => Corner (collision point at a corner, which usually does not occur), treat as no collision
-        """
-        for (r,c), btype in self.placed_blocks.items():
-            edges = get_cell_edge_points(r,c)
-            if p1 in edges and p2 in edges:
-                # Indicates the laser has passed through the same edge of the block
-                x, y = p1
-                # Determine the collision edge based on the parity of (x, y)
-                if (x % 2 == 1) and (y % 2 == 0):
-                    edge_type = 'horizontal'  # invert vy
-                elif (x % 2 == 0) and (y % 2 == 1):
-                    edge_type = 'vertical'    # invert vx
-                else:
-                    # Other cases (e.g., (even, even) corner), do not process or treat as no collision
-                    return None, None, None
+def console_progress(bff_file, interval):
+    """
+    SolveProgress printing a [PROGRESS] line about bff_file every interval seconds of its
+    search, or None if interval is None or 0.
+    """
+    if not interval:
+        return None
+    return SolveProgress(lambda report: print(f"[PROGRESS] {bff_file}: {report}", flush=True), interval)
+
+
+def solve_bff_file(path, debug=False, profile=None, progress=None, **solver_options):
+    """
+    Solve one .bff file and return (elapsed seconds, SolveResult, stats), stats being the
+    fingerprint of the puzzle and the nodes of the search.
+    :param profile: Optional SolveProfile, which records the parse phase and the phases of solve()
+    :param progress: Optional SolveProgress, which reports on the search while it runs
+    :param solver_options: Other Solver flags, e.g. bitboards=True
+    """
+    with profile_phase(profile, 'parse'):
+        board = load_bff_board(path)
+    fingerprint = puzzle_fingerprint(board.grid, board.lasers, board.targets, board.blocks)
+    solver = Solver(board, debug=debug, profile=profile, progress=progress, **solver_options)
 
-                return btype, (r,c), edge_type
+    start_time = time.time()
+    solver.solve()
+    elapsed_time = time.time() - start_time
+    return elapsed_time, solver.result(), {'fingerprint': fingerprint, 'nodes': solver.nodes_expanded}
 
-        return None, None, None
+
+def solve_bff_file_shared(path, debug=False, profile=None, progress=None):
+    """
+    Worker side of the parallel batch: solve one .bff file and hand the result back in a
+    shared memory block instead of pickling it. Returns (elapsed seconds, block name, SolveProfile,
+    stats), the profile being None unless a profile mode ('sample' or 'cprofile') is given.
+    With a progress interval in seconds, the worker prints the progress of long searches itself.
+    """
+    profile = SolveProfile(profile) if profile else None
+    progress = console_progress(os.path.basename(path), progress)
+    elapsed_time, result, stats = solve_bff_file(path, debug, profile, progress)
+    shm = result.to_shared_memory()
+    shm.close()
+    return elapsed_time, shm.name, profile, stats
 
 
-# ===== FILE: test_solver.py =====
-import os
-import time
+def report_solution(bff_file, result, elapsed_time, output_folder, profile=None, cache=None,
+                    sink=None, stats=None):
+    """
+    Print the outcome of a solve and render its solution. With a SolveProfile the rendering is
+    its render phase, and the collapsed stacks are written next to the solution. With a
+    RenderCache a solution rendered before is reused instead of being drawn again. With a
+    ResultSink the record of the solve (see ResultSink.solve_record) is written to it.
+    """
+    bff_name = os.path.splitext(bff_file)[0]
+    if sink is not None:
+        stats = dict(stats or {})
+        sink.write(solve_record(bff_file, stats.pop('fingerprint', None), result, elapsed_time, **stats))
+    if result.solved:
+        print(f"[RESULT] Solution found for {bff_file} in {elapsed_time:.3f} seconds.")
+        output_path = os.path.join(output_folder, f"{bff_name}_Lazors_Solution.png")
+        with profile_phase(profile, 'render'):
+            # matplotlib is only imported once there is something to draw
+            visualize_solve_result(result, output_path, cache)
+    else:
+        print(f"[RESULT] No solution found for {bff_file}. (Took {elapsed_time:.3f} seconds)")
+    if profile is not None:
+        profile_path = os.path.join(output_folder, f"{bff_name}_profile.folded")
+        profile.write(profile_path)
+        print(f"[PROFILE] {profile.summary()}, written to {profile_path}")
+
+
+def attach_contexts(names):
+    """
+    Worker initializer of the parallel batch: the SolverContext blocks written by the parent
+    become the contexts get_context() returns, so the workers do not build the grid tables again.
+    """
+    for name in names:
+        register(SolverContext.from_shared_memory(name))
+
+
+def estimate_bff_file(path, probes=32):
+    """
+    Estimate the search of one .bff file with a fixed number of random probes (see Estimator.py).
+    """
+    return estimate_search(Solver(load_bff_board(path)), probes=probes, seed=0)
 
-def solve_all_bff_files(debug=False):
-    bff_folder = os.path.join(os.path.dirname(__file__), "bff_files")
-    output_folder = os.path.join(os.path.dirname(__file__), "Solution Output")
+
+def solve_all_bff_files(debug=False, workers=1, probes=32, profile=None, results="results.jsonl",
+                        bff_folder="bff_files", output_folder="Solution Output", progress=5.0):
+    """
+    Solve every .bff file in bff_folder and render the solutions into output_folder.
+    :param workers: Number of worker processes; with more than one, solutions come back
+                    through shared memory and are rendered here as they are read.
+    :param probes: With several workers, the search of every file is first estimated with this
+                   many random probes, and the files are handed out longest first.
+                   The SolverContext of every grid layout is built here and shared with the workers.
+    :param profile: 'sample' or 'cprofile' to profile every puzzle (see Profiler.py); the collapsed
+                    stacks of <name>.bff are written to <output_folder>/<name>_profile.folded
+    :param results: File the record of every solve is appended to (see ResultSink.py), relative to
+                    output_folder; .gz or .zst files are compressed. None writes no records.
+    :param progress: Seconds between two [PROGRESS] lines (nodes/s, depth, best coverage, ETA, see
+                     Progress.py) about a search still running; None or 0 for none.
+    Renderings are kept in <output_folder>/.render_cache (see RenderCache.py): the image of a
+    solution identical to one of an earlier run is copied from there rather than drawn again.
+    """
     os.makedirs(output_folder, exist_ok=True)
+    cache = RenderCache(os.path.join(output_folder, ".render_cache"))
+    sink = ResultSink(os.path.join(output_folder, results)) if results else None
+    try:
+        solve_bff_files(bff_folder, output_folder, debug, workers, probes, profile, cache, sink, progress)
+    finally:
+        if sink is not None:
+            sink.close()
+            print(f"[INFO] {sink.records} result records appended to {sink.path}")
+    report_render_cache(cache)
+
+
+def solve_bff_files(bff_folder, output_folder, debug, workers, probes, profile, cache, sink, progress=None):
+    """The batch of solve_all_bff_files(), reporting to cache and sink."""
 
     bff_files = [f for f in os.listdir(bff_folder) if f.endswith(".bff")]
-    
+
     print(f"[INFO] Found {len(bff_files)} .bff files in '{bff_folder}'")
 
+    if workers <= 1:
+        for bff_file in bff_files:
+            print(f"\n=== Solving: {bff_file} ===")
+            solve_profile = SolveProfile(profile) if profile else None
+            elapsed_time, result, stats = solve_bff_file(os.path.join(bff_folder, bff_file), debug, solve_profile,
+                                                         console_progress(bff_file, progress))
+            report_solution(bff_file, result, elapsed_time, output_folder, solve_profile, cache, sink, stats)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from multiprocessing import resource_tracker
+
+    # Longest first: the long solves start at once instead of being left for the end of the batch
+    estimates = {bff_file: estimate_bff_file(os.path.join(bff_folder, bff_file), probes)
+                 for bff_file in bff_files}
+    bff_files = longest_first(estimates)
     for bff_file in bff_files:
-        bff_name = os.path.splitext(bff_file)[0]
-        print(f"\n=== Solving: {bff_file} ===")
-        
-        path = os.path.join(bff_folder, bff_file)
-        lazor_data = LazorBoard.from_file(path)
-        
-        board = Board(
-            grid=lazor_data.grid,
-            lasers=lazor_data.lasers,
-            targets=lazor_data.targets,
-            blocks=lazor_data.blocks
-        )
-
-        solver = Solver(board, debug=debug)
-        
-        start_time = time.time()
-        success = solver.solve()
-        elapsed_time = time.time() - start_time
+        print(f"[INFO] {bff_file}: ~{estimates[bff_file].nodes:.0f} nodes, ~{estimates[bff_file].seconds:.3f} s")
+    print(f"[INFO] Predicted makespan on {workers} workers: "
+          f"{predicted_makespan([estimates[f].seconds for f in bff_files], workers):.3f} s")
+
+    # Start the resource tracker before the workers fork, so that they share it with this
+    # process and the blocks unlinked here are not reported as leaked by a tracker per worker
+    resource_tracker.ensure_running()
+    # The grid tables of every layout are built once, here, and attached by the workers
+    contexts = {}
+    for bff_file in bff_files:
+        context = get_context(load_bff_board(os.path.join(bff_folder, bff_file)).grid)
+        contexts[context.key] = context
+    blocks = [context.build().to_shared_memory() for context in contexts.values()]
+    try:
+        with ProcessPoolExecutor(workers, initializer=attach_contexts,
+                                 initargs=([block.name for block in blocks],)) as pool:
+            futures = {pool.submit(solve_bff_file_shared, os.path.join(bff_folder, bff_file), debug, profile,
+                                   progress): bff_file
+                       for bff_file in bff_files}
+            for future in as_completed(futures):
+                bff_file = futures[future]
+                elapsed_time, shm_name, solve_profile, stats = future.result()
+                print(f"\n=== Solved: {bff_file} ===")
+                result = SolveResult.from_shared_memory(shm_name)
+                try:
+                    report_solution(bff_file, result, elapsed_time, output_folder, solve_profile, cache, sink, stats)
+                finally:
+                    result.release(unlink=True)
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def report_render_cache(cache):
+    """Delete the stale renderings of a batch's RenderCache and print what it saved."""
+    cache.prune()
+    print(f"\n[INFO] Render cache: {cache.stats['hits']} reused, {cache.stats['misses']} rendered, "
+          f"{cache.stats['removed']} stale entries removed")
 
-        if success:
-            print(f"[RESULT] Solution found for {bff_file} in {elapsed_time:.3f} seconds.")
-            output_path = os.path.join(output_folder, f"{bff_name}_Lazors_Solution.png")
-            visualize_lazor_solution(board, solver.final_paths, output_path)
-        else:
-            print(f"[RESULT] No solution found for {bff_file}. (Took {elapsed_time:.3f} seconds)")
 
-if __name__ == "__main__":
-    solve_all_bff_files(debug=False)
+# ===== FILE: test_solver.py =====
+import argparse
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve every .bff file in bff_files.")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--profile", choices=("sample", "cprofile"),
+                        help="profile every puzzle and write its collapsed stacks next to the solution")
+    parser.add_argument("--results", default="results.jsonl",
+                        help="JSONL file in Solution Output the record of every solve is appended to "
+                             "(.gz or .zst to compress it, '' for none)")
+    parser.add_argument("--progress", type=float, default=5.0, metavar="SECONDS",
+                        help="report nodes/s, depth, best coverage and ETA every SECONDS while a search "
+                             "runs (0 for never)")
+    args = parser.parse_args()
+    solve_all_bff_files(debug=False, workers=args.workers, profile=args.profile, results=args.results,
+                        bff_folder=os.path.join(os.path.dirname(__file__), "bff_files"),
+                        output_folder=os.path.join(os.path.dirname(__file__), "Solution Output"),
+                        progress=args.progress)
@@ -0,0 +1,204 @@
+import os
+import time
+from LazorBoard import LazorBoard, puzzle_fingerprint
+from Classes import Board
+from Solver import Solver
+from SolveResult import SolveResult
+from Profiler import SolveProfile, profile_phase
+from Progress import SolveProgress
+from SolverContext import SolverContext, get_context, register
+from Estimator import estimate_search, longest_first, predicted_makespan
+from RenderCache import RenderCache
+from ResultSink import ResultSink, solve_record
+
+
+def load_bff_board(path):
+    lazor_data = LazorBoard.from_file(path)
+    return Board(
+        grid=lazor_data.grid,
+        lasers=lazor_data.lasers,
+        targets=lazor_data.targets,
+        blocks=lazor_data.blocks
+    )
+
+
+def console_progress(bff_file, interval):
+    """
+    SolveProgress printing a [PROGRESS] line about bff_file every interval seconds of its
+    search, or None if interval is None or 0.
+    """
+    if not interval:
+        return None
+    return SolveProgress(lambda report: print(f"[PROGRESS] {bff_file}: {report}", flush=True), interval)
+
+
+def solve_bff_file(path, debug=False, profile=None, progress=None, **solver_options):
+    """
+    Solve one .bff file and return (elapsed seconds, SolveResult, stats), stats being the
+    fingerprint of the puzzle and the nodes of the search.
+    :param profile: Optional SolveProfile, which records the parse phase and the phases of solve()
+    :param progress: Optional SolveProgress, which reports on the search while it runs
+    :param solver_options: Other Solver flags, e.g. bitboards=True
+    """
+    with profile_phase(profile, 'parse'):
+        board = load_bff_board(path)
+    fingerprint = puzzle_fingerprint(board.grid, board.lasers, board.targets, board.blocks)
+    solver = Solver(board, debug=debug, profile=profile, progress=progress, **solver_options)
+
+    start_time = time.time()
+    solver.solve()
+    elapsed_time = time.time() - start_time
+    return elapsed_time, solver.result(), {'fingerprint': fingerprint, 'nodes': solver.nodes_expanded}
+
+
+def solve_bff_file_shared(path, debug=False, profile=None, progress=None):
+    """
+    Worker side of the parallel batch: solve one .bff file and hand the result back in a
+    shared memory block instead of pickling it. Returns (elapsed seconds, block name, SolveProfile,
+    stats), the profile being None unless a profile mode ('sample' or 'cprofile') is given.
+    With a progress interval in seconds, the worker prints the progress of long searches itself.
+    """
+    profile = SolveProfile(profile) if profile else None
+    progress = console_progress(os.path.basename(path), progress)
+    elapsed_time, result, stats = solve_bff_file(path, debug, profile, progress)
+    shm = result.to_shared_memory()
+    shm.close()
+    return elapsed_time, shm.name, profile, stats
+
+
+def report_solution(bff_file, result, elapsed_time, output_folder, profile=None, cache=None,
+                    sink=None, stats=None):
+    """
+    Print the outcome of a solve and render its solution. With a SolveProfile the rendering is
+    its render phase, and the collapsed stacks are written next to the solution. With a
+    RenderCache a solution rendered before is reused instead of being drawn again. With a
+    ResultSink the record of the solve (see ResultSink.solve_record) is written to it.
+    """
+    bff_name = os.path.splitext(bff_file)[0]
+    if sink is not None:
+        stats = dict(stats or {})
+        sink.write(solve_record(bff_file, stats.pop('fingerprint', None), result, elapsed_time, **stats))
+    if result.solved:
+        print(f"[RESULT] Solution found for {bff_file} in {elapsed_time:.3f} seconds.")
+        output_path = os.path.join(output_folder, f"{bff_name}_Lazors_Solution.png")
+        with profile_phase(profile, 'render'):
+            # matplotlib is only imported once there is something to draw
+            from LazorVisualizer import visualize_solve_result
+            visualize_solve_result(result, output_path, cache)
+    else:
+        print(f"[RESULT] No solution found for {bff_file}. (Took {elapsed_time:.3f} seconds)")
+    if profile is not None:
+        profile_path = os.path.join(output_folder, f"{bff_name}_profile.folded")
+        profile.write(profile_path)
+        print(f"[PROFILE] {profile.summary()}, written to {profile_path}")
+
+
+def attach_contexts(names):
+    """
+    Worker initializer of the parallel batch: the SolverContext blocks written by the parent
+    become the contexts get_context() returns, so the workers do not build the grid tables again.
+    """
+    for name in names:
+        register(SolverContext.from_shared_memory(name))
+
+
+def estimate_bff_file(path, probes=32):
+    """
+    Estimate the search of one .bff file with a fixed number of random probes (see Estimator.py).
+    """
+    return estimate_search(Solver(load_bff_board(path)), probes=probes, seed=0)
+
+
+def solve_all_bff_files(debug=False, workers=1, probes=32, profile=None, results="results.jsonl",
+                        bff_folder="bff_files", output_folder="Solution Output", progress=5.0):
+    """
+    Solve every .bff file in bff_folder and render the solutions into output_folder.
+    :param workers: Number of worker processes; with more than one, solutions come back
+                    through shared memory and are rendered here as they are read.
+    :param probes: With several workers, the search of every file is first estimated with this
+                   many random probes, and the files are handed out longest first.
+                   The SolverContext of every grid layout is built here and shared with the workers.
+    :param profile: 'sample' or 'cprofile' to profile every puzzle (see Profiler.py); the collapsed
+                    stacks of <name>.bff are written to <output_folder>/<name>_profile.folded
+    :param results: File the record of every solve is appended to (see ResultSink.py), relative to
+                    output_folder; .gz or .zst files are compressed. None writes no records.
+    :param progress: Seconds between two [PROGRESS] lines (nodes/s, depth, best coverage, ETA, see
+                     Progress.py) about a search still running; None or 0 for none.
+    Renderings are kept in <output_folder>/.render_cache (see RenderCache.py): the image of a
+    solution identical to one of an earlier run is copied from there rather than drawn again.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    cache = RenderCache(os.path.join(output_folder, ".render_cache"))
+    sink = ResultSink(os.path.join(output_folder, results)) if results else None
+    try:
+        solve_bff_files(bff_folder, output_folder, debug, workers, probes, profile, cache, sink, progress)
+    finally:
+        if sink is not None:
+            sink.close()
+            print(f"[INFO] {sink.records} result records appended to {sink.path}")
+    report_render_cache(cache)
+
+
+def solve_bff_files(bff_folder, output_folder, debug, workers, probes, profile, cache, sink, progress=None):
+    """The batch of solve_all_bff_files(), reporting to cache and sink."""
+
+    bff_files = [f for f in os.listdir(bff_folder) if f.endswith(".bff")]
+
+    print(f"[INFO] Found {len(bff_files)} .bff files in '{bff_folder}'")
+
+    if workers <= 1:
+        for bff_file in bff_files:
+            print(f"\n=== Solving: {bff_file} ===")
+            solve_profile = SolveProfile(profile) if profile else None
+            elapsed_time, result, stats = solve_bff_file(os.path.join(bff_folder, bff_file), debug, solve_profile,
+                                                         console_progress(bff_file, progress))
+            report_solution(bff_file, result, elapsed_time, output_folder, solve_profile, cache, sink, stats)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from multiprocessing import resource_tracker
+
+    # Longest first: the long solves start at once instead of being left for the end of the batch
+    estimates = {bff_file: estimate_bff_file(os.path.join(bff_folder, bff_file), probes)
+                 for bff_file in bff_files}
+    bff_files = longest_first(estimates)
+    for bff_file in bff_files:
+        print(f"[INFO] {bff_file}: ~{estimates[bff_file].nodes:.0f} nodes, ~{estimates[bff_file].seconds:.3f} s")
+    print(f"[INFO] Predicted makespan on {workers} workers: "
+          f"{predicted_makespan([estimates[f].seconds for f in bff_files], workers):.3f} s")
+
+    # Start the resource tracker before the workers fork, so that they share it with this
+    # process and the blocks unlinked here are not reported as leaked by a tracker per worker
+    resource_tracker.ensure_running()
+    # The grid tables of every layout are built once, here, and attached by the workers
+    contexts = {}
+    for bff_file in bff_files:
+        context = get_context(load_bff_board(os.path.join(bff_folder, bff_file)).grid)
+        contexts[context.key] = context
+    blocks = [context.build().to_shared_memory() for context in contexts.values()]
+    try:
+        with ProcessPoolExecutor(workers, initializer=attach_contexts,
+                                 initargs=([block.name for block in blocks],)) as pool:
+            futures = {pool.submit(solve_bff_file_shared, os.path.join(bff_folder, bff_file), debug, profile,
+                                   progress): bff_file
+                       for bff_file in bff_files}
+            for future in as_completed(futures):
+                bff_file = futures[future]
+                elapsed_time, shm_name, solve_profile, stats = future.result()
+                print(f"\n=== Solved: {bff_file} ===")
+                result = SolveResult.from_shared_memory(shm_name)
+                try:
+                    report_solution(bff_file, result, elapsed_time, output_folder, solve_profile, cache, sink, stats)
+                finally:
+                    result.release(unlink=True)
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def report_render_cache(cache):
+    """Delete the stale renderings of a batch's RenderCache and print what it saved."""
+    cache.prune()
+    print(f"\n[INFO] Render cache: {cache.stats['hits']} reused, {cache.stats['misses']} rendered, "
+          f"{cache.stats['removed']} stale entries removed")
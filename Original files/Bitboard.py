@@ -0,0 +1,86 @@
+class BoardBits:
+    '''
+    Bit indexes of one board, for the bitboard mode of the solver (Solver(board, bitboards=True)).
+    Sets of cells, targets and placements become Python ints, so unions, differences and the
+    "all targets hit" test are single integer operations and a search state is one int.
+
+    cols: *int*
+        Number of columns; cell (r, c) is bit r * cols + c of a cell mask.
+    cell_of: *list[tuple[int, int]]*
+        The cell of every bit of a cell mask.
+    open_cells: *int*
+        Mask of the 'o' cells of the unsolved grid.
+    target_bits: *dict[tuple[int, int], int]*
+        The bit of every target point; all_targets is the mask of all of them.
+    target_at: *list[int]*
+        For every half-grid point (padded like BoardGeometry), its target bit or 0.
+    step_bits: *list[int]*
+        Indexed like BoardGeometry.step_cells: the bit of the cell crossed by the half step
+        if it is an 'o' cell, else 0.
+    '''
+    def __init__(self, geometry, grid, targets, context=None):
+        """
+        :param context: Optional SolverContext of the grid layout, whose cached cell_bits() are used
+        """
+        self.cols = geometry.cols
+        if context is not None:
+            self.cell_of, self.open_cells, self.step_bits = context.cell_bits()
+        else:
+            self.cell_of, self.open_cells, self.step_bits = cell_bits(geometry, grid)
+
+        self.target_bits = {}
+        for point in targets:
+            self.target_bits.setdefault(tuple(point), 1 << len(self.target_bits))
+        self.all_targets = (1 << len(self.target_bits)) - 1
+        self.target_at = [0] * (geometry.width * geometry.height)
+        for (x, y), bit in self.target_bits.items():
+            if -1 <= x <= geometry.max_x + 1 and -1 <= y <= geometry.max_y + 1:
+                self.target_at[(y + 1) * geometry.width + x + 1] = bit
+
+    def cell_bit(self, r, c):
+        """Bit of cell (r, c) in a cell mask."""
+        return 1 << (r * self.cols + c)
+
+    def cells(self, mask):
+        """The cells of a cell mask, in bit order."""
+        cells = []
+        while mask:
+            low = mask & -mask
+            cells.append(self.cell_of[low.bit_length() - 1])
+            mask ^= low
+        return cells
+
+
+def cell_bits(geometry, grid):
+    """
+    The cell indexes of a grid layout, the part of a BoardBits that does not depend on the
+    targets: the cell of every bit, the mask of the 'o' cells and the step_bits table.
+    Returns: (cell_of, open_cells, step_bits)
+    """
+    cols = geometry.cols
+    cell_of = [(r, c) for r in range(geometry.rows) for c in range(cols)]
+    open_cells = 0
+    for bit, (r, c) in enumerate(cell_of):
+        if grid[r][c] == 'o':
+            open_cells |= 1 << bit
+    step_bits = [0 if cell is None else (1 << (cell[0] * cols + cell[1])) & open_cells
+                 for cell in geometry.step_cells]
+    return cell_of, open_cells, step_bits
+
+
+def placement_codes(mask):
+    """Bit numbers of a placement mask, i.e. its placements encoded as in Checkpoint.encode_placement."""
+    codes = []
+    while mask:
+        low = mask & -mask
+        codes.append(low.bit_length() - 1)
+        mask ^= low
+    return codes
+
+
+def placement_mask(codes):
+    """Inverse of placement_codes()."""
+    mask = 0
+    for code in codes:
+        mask |= 1 << code
+    return mask
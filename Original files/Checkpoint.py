@@ -0,0 +1,55 @@
+import os
+
+BLOCK_TYPES = 'ABC'
+CHECKPOINT_VERSION = 1
+
+
+def board_fingerprint(grid, lasers, targets, blocks):
+    """
+    Return a short string identifying a puzzle (grid, lasers, targets and block counts).
+    Used to refuse resuming a checkpoint against a different board.
+    """
+    import json  # Only solves with checkpoints need it, so it is imported here
+    rows = ["".join(row) for row in grid]
+    lasers = [list(l) for l in lasers]
+    targets = [list(t) for t in targets]
+    counts = [blocks.get(t, 0) for t in BLOCK_TYPES]
+    return json.dumps([rows, lasers, targets, counts], separators=(',', ':'))
+
+
+def encode_placement(r, c, block_type, cols):
+    """Pack one placement (r, c, 'A'/'B'/'C') into a single int."""
+    return (r * cols + c) * 3 + BLOCK_TYPES.index(block_type)
+
+
+def decode_placement(code, cols):
+    """Inverse of encode_placement(): returns (r, c, block_type)."""
+    cell, k = divmod(code, 3)
+    r, c = divmod(cell, cols)
+    return r, c, BLOCK_TYPES[k]
+
+
+def write_checkpoint(path, state):
+    """
+    Atomically write a search state to a gzip-compressed JSON file.
+    The file is first written next to path and then renamed over it, so a process killed
+    mid-write never leaves a truncated checkpoint behind.
+    """
+    import gzip
+    import json
+    tmp_path = path + ".tmp"
+    payload = json.dumps(dict(state, version=CHECKPOINT_VERSION), separators=(',', ':'))
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def read_checkpoint(path):
+    """Read a checkpoint written by write_checkpoint() and return the state dict."""
+    import gzip
+    import json
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        state = json.load(f)
+    if state.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version in {path}: {state.get('version')}")
+    return state
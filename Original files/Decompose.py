@@ -0,0 +1,228 @@
+from Classes import Board
+from Solver import Solver
+from SolverContext import get_context
+from StaticAnalysis import analyze_board
+
+BLOCK_TYPES = ('A', 'B', 'C')
+
+
+class Component:
+    '''
+    An independent part of a board (see find_components()): lasers whose beams, under any
+    placement, cross none of the 'o' cells and reach none of the targets of the other parts.
+
+    lasers: *list[tuple[int, int, int, int]]*
+        Lasers of the component, in board order.
+    targets: *list[tuple[int, int]]*
+        Targets only these lasers can reach, in board order.
+    cells: *frozenset[tuple[int, int]]*
+        'o' cells these lasers' beams could cross: the only cells where a block matters to them.
+    '''
+    def __init__(self, lasers, targets, cells):
+        self.lasers = lasers
+        self.targets = targets
+        self.cells = cells
+
+    def __repr__(self):
+        return f"Component(lasers={self.lasers}, targets={self.targets}, cells={len(self.cells)})"
+
+    def sub_board(self, grid, blocks):
+        """A Board of the component alone: the full grid, its lasers and targets, and blocks."""
+        return Board([list(row) for row in grid], list(self.lasers), list(self.targets), dict(blocks))
+
+
+def find_components(board, context=None):
+    """
+    Split a board into independent components. The static analysis of every laser alone
+    (StaticAnalysis.analyze_board(), an over-approximation of all placements) gives the 'o' cells
+    and the points its beams could reach; lasers sharing a reachable 'o' cell or a reachable
+    target are joined, since only blocks and targets couple beams. A block on a component's
+    cells then never changes another component's beams, so the components can be solved apart.
+    Targets no laser can reach form a last component without lasers (which has no solution).
+    :param context: Optional SolverContext of the grid layout (by default get_context()'s)
+    Returns: list[Component], in the order of their first laser
+    """
+    if context is None:
+        context = get_context(board.grid)
+    geometry = context.geometry
+    max_x, max_y = geometry.max_x, geometry.max_y
+    lasers = [tuple(laser) for laser in board.lasers]
+    targets = list(dict.fromkeys(tuple(target) for target in board.targets))
+    target_points = {target: geometry.index(target[0], target[1], 1, 1) >> 2 for target in targets
+                     if -1 <= target[0] <= max_x + 1 and -1 <= target[1] <= max_y + 1}
+
+    # Union-find over the lasers, keyed by the first laser that reached a cell or a target
+    parent = list(range(len(lasers)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    cells_of = []
+    owner = {}  # 'o' cell or target -> a laser reaching it
+    reached_targets = []
+    for i, laser in enumerate(lasers):
+        analysis = analyze_board(geometry, board.grid, [laser], (), board.blocks, context)
+        points = {state >> 2 for state in analysis.reachable_states}
+        hits = [target for target, point in target_points.items() if point in points]
+        cells_of.append(analysis.reachable_cells)
+        reached_targets.append(hits)
+        for key in list(analysis.reachable_cells) + hits:
+            j = owner.setdefault(key, i)
+            if find(j) != find(i):
+                parent[find(j)] = find(i)
+
+    groups = {}
+    for i in range(len(lasers)):
+        groups.setdefault(find(i), []).append(i)
+    components = []
+    claimed = set()
+    for members in sorted(groups.values()):
+        reachable = set().union(*(reached_targets[i] for i in members))
+        claimed |= reachable
+        components.append(Component([lasers[i] for i in members],
+                                    [target for target in targets if target in reachable],
+                                    frozenset().union(*(cells_of[i] for i in members))))
+    unreachable = [target for target in targets if target not in claimed]
+    if unreachable:
+        components.append(Component([], unreachable, frozenset()))
+    return components
+
+
+class DecomposedSolver:
+    '''
+    Solves a board one independent component at a time (see find_components()), so that the
+    search costs the sum of the components' searches instead of their product. Each component
+    is solved by its own Solver, on a board with only its lasers and targets, and the
+    placements are combined; unused blocks are allowed, so the components only compete for the
+    block budget.
+
+    Every component is first solved with the whole budget left. When the blocks its solution
+    uses leave too few for the components after it, the other budget shares are tried, fewest
+    blocks first: a share is skipped if it holds a share already solved (its usage leaves no
+    more blocks) or is held by one with no solution (solvability only grows with the budget).
+    The search of the shares is complete, so a board has a solution exactly when solve() finds one.
+
+    board: *Board*
+        The board; solve() leaves the combined solution on it, as Solver.solve() does.
+    options: *dict*
+        Solver options of every component's Solver (bitboards, iterative, ...).
+    components: *list[Component] or None*
+        The components of the board, made by solve().
+    placed_blocks: *dict*
+        (r, c) -> block type of the solution.
+    solved: *bool or None*
+        Outcome of the last solve().
+    nodes_expanded: *int*
+        Nodes expanded by all the component solves.
+    solves: *int*
+        Component solves run (each (component, share) is solved once).
+    '''
+    def __init__(self, board, context=None, **options):
+        self.board = board
+        self.original_grid = [list(row) for row in board.grid]
+        self.original_blocks = dict(board.blocks)
+        self.context = context if context is not None else get_context(board.grid)
+        self.options = options
+        self.components = None
+        self.placed_blocks = {}
+        self.solved = None
+        self.nodes_expanded = 0
+        self.solves = 0
+        self._shares = {}    # (component index, share) -> placements, or None if it has no solution
+        self._failed = {}    # component index -> budgets the components from it cannot be solved in
+
+    def solve(self):
+        """Solve the board; returns True with the solution placed on the board, else False."""
+        self.board.grid = [list(row) for row in self.original_grid]
+        self.board.blocks = dict(self.original_blocks)
+        self.placed_blocks = {}
+        self.nodes_expanded = self.solves = 0
+        self._shares, self._failed = {}, {}
+        self.components = find_components(self.board, self.context)
+        # A component without targets needs no block: any placement will do
+        active = [index for index, component in enumerate(self.components) if component.targets]
+        budget = tuple(self.original_blocks.get(t, 0) for t in BLOCK_TYPES)
+        # Unreachable targets are found before any search, as Solver.solve() does
+        reachable = all(self.components[index].lasers for index in active)
+        placements = self._assign(active, 0, budget) if reachable else None
+        self.solved = placements is not None
+        if self.solved:
+            for (r, c), block_type in placements.items():
+                self.board.place_block(r, c, block_type)
+            self.placed_blocks = placements
+        return self.solved
+
+    def _solve_share(self, index, share):
+        """Placements solving component index with the blocks of share, or None; cached."""
+        key = (index, share)
+        if key not in self._shares:
+            blocks = dict(zip(BLOCK_TYPES, share))
+            solver = Solver(self.components[index].sub_board(self.original_grid, blocks),
+                            context=self.context, **self.options)
+            self._shares[key] = dict(solver.placed_blocks) if solver.solve() else None
+            self.nodes_expanded += solver.nodes_expanded
+            self.solves += 1
+        return self._shares[key]
+
+    def _assign(self, active, position, budget):
+        """Combined placements solving the components active[position:] within budget, or None."""
+        if position == len(active):
+            return {}
+        index = active[position]
+        if any(_within(budget, failed) for failed in self._failed.get(position, ())):
+            return None
+        placements = self._solve_share(index, budget)
+        if placements is None:
+            self._failed.setdefault(position, []).append(budget)
+            return None
+        used = [_usage(placements)]
+        rest = self._assign(active, position + 1, _minus(budget, used[0]))
+        if rest is None:
+            unsolvable = []
+            for share in _shares_within(budget):
+                if any(_within(u, share) for u in used) or any(_within(share, u) for u in unsolvable):
+                    continue
+                placements = self._solve_share(index, share)
+                if placements is None:
+                    unsolvable.append(share)
+                    continue
+                # Shares come fewest blocks first, so this solution uses the whole share
+                used.append(share)
+                rest = self._assign(active, position + 1, _minus(budget, share))
+                if rest is not None:
+                    break
+            else:
+                self._failed.setdefault(position, []).append(budget)
+                return None
+        return {**placements, **rest}
+
+
+def _usage(placements):
+    """Blocks of each type placements use, as a share."""
+    types = list(placements.values())
+    return tuple(types.count(t) for t in BLOCK_TYPES)
+
+
+def _within(share, budget):
+    return all(s <= b for s, b in zip(share, budget))
+
+
+def _minus(budget, share):
+    return tuple(b - s for b, s in zip(budget, share))
+
+
+def _shares_within(budget):
+    """Every share of budget, fewest blocks first."""
+    shares = [(a, b, c) for a in range(budget[0] + 1) for b in range(budget[1] + 1) for c in range(budget[2] + 1)]
+    shares.sort(key=sum)
+    return shares
+
+
+def solve_decomposed(board, **options):
+    """DecomposedSolver(board, **options).solve(); returns (solved, placements)."""
+    solver = DecomposedSolver(board, **options)
+    solved = solver.solve()
+    return solved, solver.placed_blocks
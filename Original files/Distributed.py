@@ -0,0 +1,446 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import select
+import socket
+import time
+from collections import deque
+from Classes import Board
+from Kernel import JIT_AVAILABLE
+from Solver import Solver, SolveInterrupted
+from SolverService import parse_puzzle
+
+# Solver flags a coordinator may pass on to its workers (they must be JSON values)
+SOLVER_OPTIONS = ('ray_jump', 'bitboards', 'prune_dead_cells', 'bidirectional', 'learn_nogoods', 'jit')
+
+
+def puzzle_board(puzzle):
+    """The Board of a puzzle dict (grid, lasers, targets, blocks), as made by parse_puzzle()."""
+    return Board(grid=[list(row) for row in puzzle['grid']],
+                 lasers=[tuple(l) for l in puzzle['lasers']],
+                 targets=[tuple(t) for t in puzzle['targets']],
+                 blocks=dict(puzzle['blocks']))
+
+
+def solver_options(options):
+    """
+    Solver flags as this process runs them: jit is turned off where Numba is not installed, since
+    the kernel would then run interpreted (it gives the same search, only slower).
+    """
+    return dict(options, jit=bool(options.get('jit')) and JIT_AVAILABLE)
+
+
+def encode_message(message):
+    """One protocol message: a JSON object on a line of its own."""
+    return json.dumps(message, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def split_root(solver, count):
+    """
+    Cut the search tree of solver's board into at least count subtrees (fewer if the tree is
+    smaller), expanding nodes breadth first. A subtree is the list of placements leading to it;
+    nodes with the same placements in another order are kept once.
+    Returns: (units, solution, nodes expanded), solution being the placements of a solved node
+             met on the way (units is then empty). Both are empty if the board has no solution.
+    """
+    solver.reset_search()
+    if solver.analysis.unreachable_targets:
+        return [], None, 0
+    units, seen, nodes = deque([[]]), set(), 0
+    while units and len(units) < count:
+        unit = units.popleft()
+        nodes += 1
+        solver.reset_search()
+        for r, c, block_type in unit:
+            solver.place_block(r, c, block_type)
+        solved, candidates = solver.simulate_with_blocks()
+        if solved:
+            return [], unit, nodes
+        if not candidates:
+            continue
+        grid, blocks = solver.board.grid, solver.board.blocks
+        for (r, c) in solver.candidate_order(candidates):
+            if grid[r][c] != 'o':
+                continue
+            for block_type in 'ABC':
+                child = unit + [(r, c, block_type)]
+                key = frozenset(child)
+                if blocks.get(block_type, 0) >= 1 and key not in seen:
+                    seen.add(key)
+                    units.append(child)
+    return list(units), None, nodes
+
+
+class _Worker:
+    """The coordinator's view of one connected worker."""
+    def __init__(self, writer, address):
+        self.writer = writer
+        self.address = address
+        self.unit = None          # (unit id, placements) being searched, or None if idle
+        self.stealing = False     # A steal request is waiting for its answer
+        self.refused_at = 0.0     # When the worker last had nothing to give
+        self.nodes = 0
+        self.units = 0
+
+    def send(self, message):
+        self.writer.write(encode_message(message))
+
+
+class Coordinator:
+    '''
+    Hands the search of one puzzle out to workers over TCP, as work units: subtrees of the
+    Solver's search, each given by the placements leading to it (see Solver.solve_subtree()).
+
+    The tree is first cut into about units_per_worker * expected_workers units. A worker asks
+    for one when it connects and after each one it finishes; when no unit is left for an idle
+    worker, the coordinator asks the busy worker with the shallowest unit to give part of its
+    search away (Solver.split_work()), which becomes new units. The first solution found stops
+    every worker; so does the end of the search, when every unit has failed. A worker that
+    disconnects has its unit searched again by another one.
+
+    Messages are JSON objects, one per line. Worker to coordinator: hello, done (unit id,
+    solved, placements, nodes) and units (the answer to a steal). Coordinator to worker:
+    puzzle (puzzle dict and Solver options, the answer to hello), unit, steal and stop.
+
+    puzzle: *dict*
+        The puzzle (grid, lasers, targets, blocks), as made by SolverService.parse_puzzle().
+    options: *dict*
+        Solver flags of the workers (a subset of SOLVER_OPTIONS, jit always set, to False unless
+        given); the coordinator cuts the tree with the same ones, so its units are nodes of the
+        workers' searches.
+    result: *dict or None*
+        Outcome once the search is over: status solved/unsolvable, the placements of a solution,
+        and counters (nodes, units, steals, stolen units, workers seen, elapsed seconds).
+    '''
+    def __init__(self, puzzle, options=None, expected_workers=4, units_per_worker=4, steal_backoff=0.01):
+        self.puzzle = puzzle
+        self.options = {name: value for name, value in (options or {}).items() if name in SOLVER_OPTIONS}
+        # Sent explicitly, so that no worker falls back on a default of its own
+        self.options['jit'] = bool(self.options.get('jit'))
+        self.steal_backoff = steal_backoff
+        self.workers = set()
+        self.pool = deque()       # Units no worker has yet: lists of placements
+        self.next_id = 0
+        self.result = None
+        self.stats = {'nodes': 0, 'units': 0, 'steals': 0, 'stolen': 0, 'workers': 0}
+        self.start_time = time.perf_counter()
+        self.finished = None
+        self.server = None
+        self._retry = None        # Pending dispatch() after a steal backoff
+
+        solver = Solver(puzzle_board(puzzle), **solver_options(self.options))
+        units, solution, self.stats['nodes'] = split_root(solver, expected_workers * units_per_worker)
+        self.pool.extend(units)
+        self.stats['units'] = len(units)
+        if solution is not None or not units:
+            self._finish(solution)
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Start listening; returns the port (an ephemeral one for port 0)."""
+        self.finished = asyncio.get_running_loop().create_future()
+        if self.result is not None:
+            self.finished.set_result(self.result)
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def wait(self):
+        """Wait until the search is over and every worker was told to stop; returns the result."""
+        result = await self.finished
+        await self.close()
+        return result
+
+    async def close(self):
+        """Drop the worker connections and stop listening."""
+        if self._retry is not None:
+            self._retry.cancel()
+            self._retry = None
+        for worker in list(self.workers):
+            worker.writer.close()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def handle(self, reader, writer):
+        """Serve one worker connection until it closes."""
+        worker = _Worker(writer, writer.get_extra_info('peername'))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.receive(worker, json.loads(line))
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            self.disconnect(worker)
+            writer.close()
+
+    def receive(self, worker, message):
+        """Act on one message of worker; ValueError if it breaks the protocol."""
+        if not isinstance(message, dict) or 'type' not in message:
+            raise ValueError("message without a type")
+        kind = message['type']
+        if kind == 'hello':
+            self.workers.add(worker)
+            self.stats['workers'] += 1
+            worker.send({'type': 'puzzle', 'puzzle': self.puzzle, 'options': self.options})
+            if self.result is not None:
+                worker.send({'type': 'stop'})
+        elif kind == 'units':
+            worker.stealing = False
+            units = [[tuple(p) for p in unit] for unit in message['units']]
+            if units:
+                self.stats['stolen'] += len(units)
+                self.stats['units'] += len(units)
+                self.pool.extend(units)
+            else:
+                worker.refused_at = time.monotonic()
+        elif kind == 'done':
+            if worker.unit is None or message.get('id') != worker.unit[0]:
+                raise ValueError(f"unit {message.get('id')} was not given to this worker")
+            worker.unit = None
+            worker.nodes += message['nodes']
+            self.stats['nodes'] += message['nodes']
+            if message['solved']:
+                self._finish([tuple(p) for p in message['placements']])
+        else:
+            raise ValueError(f"unknown message type {kind!r}")
+        self.dispatch()
+
+    def disconnect(self, worker):
+        """Forget worker; its unit goes back to the pool."""
+        if worker not in self.workers:
+            return
+        self.workers.discard(worker)
+        if worker.unit is not None and self.result is None:
+            self.pool.appendleft(worker.unit[1])
+        worker.unit = None
+        self.dispatch()
+
+    def dispatch(self):
+        """Give units to idle workers, ask busy ones for work if there are none, detect the end."""
+        if self.result is not None:
+            return
+        busy = [worker for worker in self.workers if worker.unit is not None]
+        if not self.pool and not busy:
+            self._finish(None)
+            return
+        idle = [worker for worker in self.workers if worker.unit is None]
+        for worker in idle:
+            if not self.pool:
+                break
+            placements = self.pool.popleft()
+            worker.unit = (self.next_id, placements)
+            worker.units += 1
+            worker.send({'type': 'unit', 'id': self.next_id, 'placements': placements})
+            self.next_id += 1
+        hungry = sum(worker.unit is None for worker in self.workers) - \
+            sum(worker.stealing for worker in self.workers)
+        if hungry <= 0:
+            return
+        now = time.monotonic()
+        victims = sorted((worker for worker in self.workers if worker.unit is not None
+                          and not worker.stealing and now - worker.refused_at >= self.steal_backoff),
+                         key=lambda worker: len(worker.unit[1]))
+        for victim in victims[:hungry]:
+            victim.stealing = True
+            self.stats['steals'] += 1
+            victim.send({'type': 'steal'})
+        if len(victims) < hungry and self._retry is None and \
+                any(worker.unit is not None and not worker.stealing for worker in self.workers):
+            # Workers that just had nothing to give are asked again after the backoff
+            self._retry = asyncio.get_running_loop().call_later(self.steal_backoff, self._dispatch_again)
+
+    def _dispatch_again(self):
+        self._retry = None
+        self.dispatch()
+
+    def _finish(self, placements):
+        """End the search, with placements of a solution or None; every worker is told to stop."""
+        if self.result is not None:
+            return
+        result = {'status': 'solved' if placements is not None else 'unsolvable'}
+        if placements is not None:
+            result['placements'] = [list(p) for p in placements]
+        result.update(self.stats, elapsed=time.perf_counter() - self.start_time)
+        self.result = result
+        for worker in self.workers:
+            worker.send({'type': 'stop'})
+        if self.finished is not None and not self.finished.done():
+            self.finished.set_result(result)
+
+
+class Worker:
+    '''
+    Searches the units of a Coordinator. It runs the Solver in its own thread of control and
+    reads the coordinator's messages between two nodes (every poll_interval seconds at most,
+    through should_stop): a steal is answered with part of the running search, a stop ends it.
+
+    nodes: *int*
+        Nodes expanded over every unit so far.
+    units: *int*
+        Units searched (to the end or until stopped).
+    '''
+    def __init__(self, host='127.0.0.1', port=8766, poll_interval=0.002):
+        self.host = host
+        self.port = port
+        self.poll_interval = poll_interval
+        self.sock = None
+        self.buffer = bytearray()
+        self.solver = None
+        self.stopped = False
+        self.nodes = 0
+        self.units = 0
+        self._last_poll = 0.0
+
+    def send(self, message):
+        self.sock.sendall(encode_message(message))
+
+    def receive(self, block=True):
+        """The next message of the coordinator; None if block is False and none has arrived."""
+        while b'\n' not in self.buffer:
+            if not block and not select.select([self.sock], [], [], 0)[0]:
+                return None
+            data = self.sock.recv(65536)
+            if not data:
+                raise ConnectionError("the coordinator closed the connection")
+            self.buffer += data
+        line, _, rest = bytes(self.buffer).partition(b'\n')
+        self.buffer = bytearray(rest)
+        return json.loads(line)
+
+    def poll(self):
+        """should_stop of the solver: handles the messages that arrived; True once told to stop."""
+        now = time.monotonic()
+        if now - self._last_poll < self.poll_interval:
+            return self.stopped
+        self._last_poll = now
+        while not self.stopped:
+            message = self.receive(block=False)
+            if message is None:
+                break
+            if message['type'] == 'steal':
+                self.send({'type': 'units', 'units': self.solver.split_work()})
+            elif message['type'] == 'stop':
+                self.stopped = True
+        return self.stopped
+
+    def run(self):
+        """Connect, search units until the coordinator says stop, then disconnect."""
+        self.sock = socket.create_connection((self.host, self.port))
+        try:
+            self.send({'type': 'hello'})
+            message = self.receive()
+            self.solver = Solver(puzzle_board(message['puzzle']), iterative=True,
+                                 should_stop=self.poll, **solver_options(message['options']))
+            while not self.stopped:
+                message = self.receive()
+                if message['type'] == 'stop':
+                    break
+                if message['type'] == 'steal':
+                    # The unit it was meant for is over: nothing to give
+                    self.send({'type': 'units', 'units': []})
+                    continue
+                self.search(message['id'], [tuple(p) for p in message['placements']])
+        except ConnectionError:
+            pass
+        finally:
+            self.sock.close()
+
+    def search(self, unit_id, placements):
+        """Search one unit and report it, unless a stop came in meanwhile."""
+        try:
+            solved = self.solver.solve_subtree(placements)
+        except SolveInterrupted:
+            return
+        finally:
+            self.nodes += self.solver.nodes_expanded
+            self.units += 1
+        done = {'type': 'done', 'id': unit_id, 'solved': solved, 'nodes': self.solver.nodes_expanded}
+        if solved:
+            done['placements'] = [[r, c, t] for (r, c), t in self.solver.placed_blocks.items()]
+        self.send(done)
+
+
+def run_worker(host, port, poll_interval=0.002):
+    """Process entry point of a local worker."""
+    Worker(host, port, poll_interval).run()
+
+
+def solve_distributed(puzzle, workers=3, options=None, host='127.0.0.1', port=0, **coordinator_options):
+    """
+    Solve a puzzle dict with a coordinator in this process and workers in local processes
+    (spawned, as in SolverService), over TCP on host. Returns the coordinator's result dict.
+    """
+    async def run():
+        coordinator = Coordinator(puzzle, options, expected_workers=workers, **coordinator_options)
+        bound_port = await coordinator.start(host, port)
+        context = multiprocessing.get_context('spawn')
+        # Nothing is left to hand out if cutting the tree already settled the puzzle
+        processes = [] if coordinator.result is not None else \
+            [context.Process(target=run_worker, args=(host, bound_port)) for _ in range(workers)]
+        for process in processes:
+            process.start()
+        try:
+            return await coordinator.wait()
+        finally:
+            loop = asyncio.get_running_loop()
+            for process in processes:
+                await loop.run_in_executor(None, process.join)
+
+    return asyncio.run(run())
+
+
+def add_solver_flags(parser):
+    for flag in SOLVER_OPTIONS:
+        if flag == 'jit':
+            parser.add_argument("--jit", action=argparse.BooleanOptionalAction, default=False,
+                                help="Simulate in the kernel of Kernel.py on every worker (default: off)")
+        else:
+            parser.add_argument("--" + flag.replace('_', '-'), action="store_true")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distributed Lazor search: one coordinator, workers over TCP.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    coordinate = commands.add_parser("coordinator", help="Serve the search of one puzzle to workers")
+    coordinate.add_argument("bff_file")
+    coordinate.add_argument("--host", default="127.0.0.1")
+    coordinate.add_argument("--port", type=int, default=8766)
+    coordinate.add_argument("--expected-workers", type=int, default=4, help="Workers the tree is first cut for")
+    add_solver_flags(coordinate)
+    work = commands.add_parser("worker", help="Search units of a coordinator")
+    work.add_argument("--host", default="127.0.0.1")
+    work.add_argument("--port", type=int, default=8766)
+    local = commands.add_parser("local", help="Coordinator and worker processes on localhost")
+    local.add_argument("bff_file")
+    local.add_argument("--workers", type=int, default=3)
+    add_solver_flags(local)
+    args = parser.parse_args(argv)
+
+    if args.command == "worker":
+        worker = Worker(args.host, args.port)
+        worker.run()
+        print(f"[INFO] Worker done: {worker.units} units, {worker.nodes} nodes")
+        return
+    with open(args.bff_file, 'rb') as file:
+        puzzle, _ = parse_puzzle(file.read())
+    options = {flag: True for flag in SOLVER_OPTIONS if getattr(args, flag)}
+    options['jit'] = args.jit
+    if args.command == "local":
+        result = solve_distributed(puzzle, args.workers, options)
+    else:
+        async def serve():
+            coordinator = Coordinator(puzzle, options, expected_workers=args.expected_workers)
+            await coordinator.start(args.host, args.port)
+            print(f"[INFO] Coordinator listening on {args.host}:{args.port}")
+            return await coordinator.wait()
+        result = asyncio.run(serve())
+    print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+import heapq
+import random
+import time
+
+
+class SearchEstimate:
+    '''
+    Estimated size and runtime of the full backtracking search of a board (see estimate_search()).
+
+    nodes: *float*
+        Estimated number of nodes of the backtrack() tree, searched to exhaustion.
+    seconds: *float*
+        Estimated runtime of that search, nodes times the time per node measured by the probes.
+    probes: *int*
+        Number of random probes the estimate averages.
+    probe_nodes: *int*
+        Number of nodes the probes simulated.
+    '''
+    def __init__(self, nodes, seconds, probes, probe_nodes):
+        self.nodes = nodes
+        self.seconds = seconds
+        self.probes = probes
+        self.probe_nodes = probe_nodes
+
+    def __repr__(self):
+        return (f"SearchEstimate(nodes={self.nodes:.0f}, seconds={self.seconds:.3f}, "
+                f"probes={self.probes}, probe_nodes={self.probe_nodes})")
+
+
+def estimate_search(solver, probes=32, seed=None):
+    """
+    Knuth's estimate of the backtrack() tree of a solver. Each probe walks from the root to a
+    leaf through uniformly random children (the (cell, block type) pairs backtrack() would try);
+    with d_i the number of children at depth i, 1 + d_0 + d_0 d_1 + ... is an unbiased estimate
+    of the node count, and the probes are averaged. Each probe costs one simulation per depth.
+
+    The estimate is for a search without the failed-state cache or nogoods that does not stop at
+    its first solution, so it is an upper bound on what solve() expands. The solver's filters
+    (dead cells, bidirectional, bitboards) shape the tree as they do in solve().
+    The board is left in its initial state.
+    :param probes: Number of random walks; the work is bounded by probes times the number of blocks
+    :param seed: Seed of the random walks, for reproducible estimates
+    """
+    rng = random.Random(seed)
+    solver.reset_search()
+    if solver.analysis.unreachable_targets:
+        # solve() rejects the board without a search
+        return SearchEstimate(1.0, 0.0, 0, 0)
+
+    total = 0.0
+    probe_nodes = 0
+    start = time.perf_counter()
+    for _ in range(probes):
+        placed = []
+        weight = 1
+        while True:
+            total += weight
+            probe_nodes += 1
+            solved, new_candidates = solver.simulate_with_blocks()
+            if solved or not new_candidates:
+                break
+            children = [(r, c, block_type) for (r, c) in solver.candidate_order(new_candidates)
+                        if solver.board.grid[r][c] == 'o'
+                        for block_type in 'ABC' if solver.board.blocks.get(block_type, 0) >= 1]
+            if not children:
+                break
+            weight *= len(children)
+            r, c, block_type = rng.choice(children)
+            solver.place_block(r, c, block_type)
+            placed.append((r, c, block_type))
+        for (r, c, block_type) in reversed(placed):
+            solver.remove_block(r, c, block_type)
+    elapsed = time.perf_counter() - start
+
+    nodes = total / probes if probes else 1.0
+    seconds = nodes * elapsed / probe_nodes if probe_nodes else 0.0
+    return SearchEstimate(nodes, seconds, probes, probe_nodes)
+
+
+def longest_first(estimates):
+    """
+    Order for a batch: the keys of estimates (a dict key -> SearchEstimate), longest expected
+    runtime first. Handing the jobs in this order to a pool whose idle workers take the next
+    job is the LPT rule, whose makespan is at most 4/3 of the optimal one.
+    """
+    return sorted(estimates, key=lambda key: estimates[key].seconds, reverse=True)
+
+
+def predicted_makespan(seconds, workers):
+    """Wall time of running jobs of the given durations, in that order, on workers workers."""
+    loads = [0.0] * max(1, workers)
+    for duration in seconds:
+        heapq.heapreplace(loads, loads[0] + duration)
+    return max(loads)
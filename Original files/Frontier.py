@@ -0,0 +1,261 @@
+import heapq
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from Checkpoint import encode_placement, decode_placement
+
+
+class SpillFrontier:
+    '''
+    Priority queue of search states for breadth-first or best-first searches, within a RAM
+    ceiling. A state is a list of placement codes (see Checkpoint.encode_placement) with an int
+    priority; pop() returns the state of lowest priority, in push order among equal priorities.
+
+    States are kept as fixed-size binary records: priority, push number, code count and the
+    codes, padded to max_codes. Once the states in memory would take more than ram_limit bytes,
+    the worse half of them is sorted and appended to the spill file as a run, and the file is
+    memory-mapped again; the best states, those pop() returns next, stay in memory. pop() merges
+    the memory heap with the heads of the runs, reading records straight from the map, so the
+    order is exactly that of an unbounded heap. The file is emptied whenever every run has been
+    read, and deleted by close().
+
+    max_codes: *int*
+        Most placements a state can have (the board's block count).
+    ram_limit: *int*
+        Bytes the states in memory may take, Python objects included.
+    capacity: *int*
+        States kept in memory before a spill, from ram_limit less the bytes given to reserve().
+    path: *str*
+        The spill file; a temporary file unless given.
+    spilled: *int*
+        States written to the spill file so far.
+    peak_disk_bytes: *int*
+        Largest size the spill file reached.
+    '''
+    def __init__(self, max_codes, ram_limit=64 << 20, path=None, max_code=65535):
+        code_format = 'H' if max_code < 1 << 16 else 'I'
+        self._record = struct.Struct(f"<iQH{max_codes}{code_format}")
+        self._head = struct.Struct("<iQ")
+        self.max_codes = max_codes
+        self.max_code = max_code
+        self.ram_limit = ram_limit
+        record = self._record.pack(0, 0, 0, *[0] * max_codes)
+        # A heap slot, its (priority, number, record) tuple, a large push number and the record
+        self._entry_bytes = 8 + sys.getsizeof((0, 0, record)) + sys.getsizeof(1 << 40) + sys.getsizeof(record)
+        self._reserved = 0
+        self.capacity = max(2, ram_limit // self._entry_bytes)
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix="frontier_", suffix=".bin")
+            self._file = os.fdopen(fd, 'w+b')
+        else:
+            self._file = open(path, 'w+b')
+        self.path = path
+        self.spilled = 0
+        self.peak_disk_bytes = 0
+        self._heap = []         # (priority, number, record) of the states in memory
+        self._runs = []         # Heap of (priority, number, run) of the next record of every run
+        self._cursors = []      # Offset of the next record and end offset of every run
+        self._map = None
+        self._pushed = 0
+        self._on_disk = 0
+
+    def __len__(self):
+        return len(self._heap) + self._on_disk
+
+    @property
+    def in_memory(self):
+        """States held in memory."""
+        return len(self._heap)
+
+    @property
+    def on_disk(self):
+        """States in the spill file not popped yet."""
+        return self._on_disk
+
+    def reserve(self, size):
+        """
+        Take size bytes of ram_limit for other memory of the search (e.g. a SeenStates); fewer
+        states then stay in memory. Call it before the first push(). Returns size.
+        """
+        self._reserved += size
+        self.capacity = max(2, (self.ram_limit - self._reserved) // self._entry_bytes)
+        return size
+
+    def push(self, priority, codes):
+        """Queue a state: its priority and its placement codes (at most max_codes of them)."""
+        record = self._record.pack(priority, self._pushed, len(codes),
+                                   *codes, *[0] * (self.max_codes - len(codes)))
+        heapq.heappush(self._heap, (priority, self._pushed, record))
+        self._pushed += 1
+        if len(self._heap) > self.capacity:
+            self._spill()
+
+    def pop(self):
+        """Remove the state of lowest priority; returns (priority, codes). IndexError if empty."""
+        if self._runs and (not self._heap or self._runs[0] < self._heap[0][:2]):
+            priority, _, run = self._runs[0]
+            offset, end = self._cursors[run]
+            record = self._map[offset:offset + self._record.size]
+            offset += self._record.size
+            self._cursors[run][0] = offset
+            if offset < end:
+                heapq.heapreplace(self._runs, self._head.unpack_from(self._map, offset) + (run,))
+            else:
+                heapq.heappop(self._runs)
+            self._on_disk -= 1
+            if not self._runs:
+                self._reset_file()
+        else:
+            priority, _, record = heapq.heappop(self._heap)
+        fields = self._record.unpack(record)
+        return priority, list(fields[3:3 + fields[2]])
+
+    def _spill(self):
+        """Write the worse half of the states in memory to the spill file as one sorted run."""
+        self._heap.sort()
+        keep = len(self._heap) // 2
+        spilled = self._heap[keep:]
+        del self._heap[keep:]   # A sorted list is a heap
+        self._file.seek(0, os.SEEK_END)
+        start = self._file.tell()
+        self._file.write(b''.join(record for (_, _, record) in spilled))
+        self._file.flush()
+        end = self._file.tell()
+        if self._map is not None:
+            self._map.close()
+        self._map = mmap.mmap(self._file.fileno(), end, access=mmap.ACCESS_READ)
+        self._cursors.append([start, end])
+        heapq.heappush(self._runs, spilled[0][:2] + (len(self._cursors) - 1,))
+        self._on_disk += len(spilled)
+        self.spilled += len(spilled)
+        self.peak_disk_bytes = max(self.peak_disk_bytes, end)
+
+    def _reset_file(self):
+        """Every run was read: empty the spill file."""
+        self._map.close()
+        self._map = None
+        self._cursors = []
+        self._file.truncate(0)
+
+    def close(self):
+        """Delete the spill file."""
+        if self._file is not None:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._file.close()
+            self._file = None
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SeenStates:
+    '''
+    Fixed-size table of the placement sets a search queued, so that each is queued once: a
+    bytearray of slots, each holding the sorted codes of one set as a packed record, at an index
+    hashed from the set. A set hashed to a taken slot replaces the one there, which may then be
+    queued again: the table forgets sets but never reports one it was not given, and takes
+    ram_limit bytes however many sets it sees.
+
+    slots: *int*
+        Sets the table can hold, from ram_limit.
+    forgotten: *int*
+        Sets replaced by another one so far.
+    '''
+    def __init__(self, max_codes, ram_limit, max_code=65535):
+        code_format = 'H' if max_code < 1 << 16 else 'I'
+        self._record = struct.Struct(f"<H{max_codes}{code_format}")
+        self.max_codes = max_codes
+        self.slots = max(1, ram_limit // self._record.size)
+        self.forgotten = 0
+        self._table = bytearray(self.slots * self._record.size)
+
+    def add(self, codes):
+        """Record the set of codes; returns False if it is in the table already, else True."""
+        codes = sorted(codes)
+        # The count is stored plus one, so that an empty slot matches no set
+        record = self._record.pack(len(codes) + 1, *codes, *[0] * (self.max_codes - len(codes)))
+        offset = zlib.crc32(record) % self.slots * self._record.size
+        slot = self._table[offset:offset + self._record.size]
+        if slot == record:
+            return False
+        if any(slot):
+            self.forgotten += 1
+        self._table[offset:offset + self._record.size] = record
+        return True
+
+
+def solver_frontier(solver, ram_limit=64 << 20, path=None):
+    """A SpillFrontier sized for the states of solver's board."""
+    cols = solver.geometry.cols
+    return SpillFrontier(sum(solver.original_blocks.values()), ram_limit, path,
+                         encode_placement(len(solver.original_grid) - 1, cols - 1, 'C', cols))
+
+
+def best_first_search(solver, frontier=None, max_nodes=None):
+    """
+    Search solver's board best first instead of depth first: the next node expanded is the
+    queued one whose parent missed the fewest targets, the deepest one among those. Queued nodes
+    live in frontier, by default a solver_frontier() of 64 MiB, which is closed on return. A
+    quarter of its ram_limit is reserved for a SeenStates of the queued placement sets, so that
+    nodes with the same placements in another order are queued once, unless the table forgot them.
+    Returns True with the solution left on the board (and its paths in solver.final_paths), as
+    after solve(); False if the board has no solution or max_nodes nodes were expanded first.
+    solver.nodes_expanded counts the nodes expanded.
+    """
+    if frontier is None:
+        frontier = solver_frontier(solver)
+    solver.reset_search()
+    cols = solver.geometry.cols
+    max_blocks = sum(solver.original_blocks.values())
+    # Missed targets are a mask in bitboard mode, a collection of points otherwise
+    count = int.bit_count if solver.bits is not None else len
+    solved = False
+    seen = SeenStates(frontier.max_codes, frontier.reserve(frontier.ram_limit // 4), frontier.max_code)
+    with frontier:
+        if not solver.analysis.unreachable_targets:
+            frontier.push(0, [])
+        seen.add([])
+        while frontier and not solved:
+            if max_nodes is not None and solver.nodes_expanded >= max_nodes:
+                break
+            _, codes = frontier.pop()
+            _move_to(solver, codes, cols)
+            solver.nodes_expanded += 1
+            solved, candidates = solver.simulate_with_blocks()
+            if solved or not candidates:
+                continue
+            missed = count(solver.remaining_targets)
+            grid, blocks = solver.board.grid, solver.board.blocks
+            for (r, c) in solver.candidate_order(candidates):
+                if grid[r][c] != 'o':
+                    continue
+                for block_type in 'ABC':
+                    if blocks.get(block_type, 0) < 1:
+                        continue
+                    code = encode_placement(r, c, block_type, cols)
+                    if seen.add(codes + [code]):
+                        frontier.push(missed * (max_blocks + 1) + max_blocks - len(codes) - 1, codes + [code])
+    if solved:
+        solver.simulate_with_blocks(trace=solver.record_trace, record_paths=True)
+    solver.solved = solved
+    return solved
+
+
+def _move_to(solver, codes, cols):
+    """Change the blocks placed on solver's board to those of codes, placing and removing the difference."""
+    target = {decode_placement(code, cols) for code in codes}
+    for (r, c), block_type in list(solver.placed_blocks.items()):
+        if (r, c, block_type) not in target:
+            solver.remove_block(r, c, block_type)
+    for r, c, block_type in target:
+        if (r, c) not in solver.placed_blocks:
+            solver.place_block(r, c, block_type)
@@ -0,0 +1,168 @@
+from array import array
+from importlib.util import find_spec
+
+from Tracer import MAX_STEPS, MAX_REPEATS
+
+# Numba is optional (the solver then keeps the Python tracer) and slow to import, so it is
+# only imported when the first compiled kernel is made
+JIT_AVAILABLE = find_spec('numba') is not None
+BLOCK_CODES = {'A': 1, 'B': 2, 'C': 3}
+MAX_TARGETS = 63       # Targets are the bits of one int64 mask
+QUEUE_BEAMS = 4096     # Beams a simulation can hold before it is handed back to the Python tracer
+
+
+def trace_beams(queue, n_lasers, step_cell, blocks, open_cell, target_at, all_targets,
+                stamp, counts, beam, seen, candidates, width, max_x, max_y, max_steps, max_repeats):
+    """
+    The whole simulation of Tracer.simulate_lasers() over flat integer buffers, written in the
+    subset of Python Numba compiles (and still valid Python, which is how it is tested without Numba).
+
+    queue holds x, y, vx, vy of the lasers, then of the beams split off by C blocks. Cells are
+    r * cols + c: step_cell gives the cell of a (point, direction) index as in
+    BoardGeometry.step_cells (-1 for none), blocks the placed block code (0, or 1, 2, 3 for A, B, C)
+    and open_cell whether it is an 'o' cell. target_at is the target bit of every padded point.
+    A collision repeated more than max_repeats times ends a beam: the (point, direction) it
+    happens at identifies it within a beam, and stamp holds the beam number that counts belong to.
+    The crossed 'o' cells are appended to candidates once per simulation, tracked in seen with
+    the simulation's first beam number. Beams are numbered on from beam, so stamps are never reset.
+    Returns: (remaining target mask, number of candidates, next beam number), the mask being
+             -1 if queue is full, in which case the simulation must be run again in Python.
+    """
+    remaining = all_targets
+    n_candidates = 0
+    first = beam + 1
+    capacity = len(queue) // 4
+    head = 0
+    tail = n_lasers
+    while head < tail:
+        x = queue[4 * head]
+        y = queue[4 * head + 1]
+        vx = queue[4 * head + 2]
+        vy = queue[4 * head + 3]
+        head += 1
+        beam += 1
+        steps = 0
+        while steps < max_steps:
+            steps += 1
+            if -1 <= x <= max_x + 1 and -1 <= y <= max_y + 1:
+                remaining &= ~target_at[(y + 1) * width + x + 1]
+            nx = x + vx
+            ny = y + vy
+            if nx < 0 or ny < 0 or nx > max_x or ny > max_y:
+                break
+            state = ((y + 1) * width + x + 1) * 4
+            if vx > 0:
+                state += 2
+            if vy > 0:
+                state += 1
+            cell = step_cell[state]
+            block = blocks[cell] if cell >= 0 else 0
+            if block == 0:
+                if cell >= 0 and open_cell[cell] and seen[cell] < first:
+                    seen[cell] = first
+                    candidates[n_candidates] = cell
+                    n_candidates += 1
+                x = nx
+                y = ny
+                continue
+            if stamp[state] != beam:
+                stamp[state] = beam
+                counts[state] = 0
+            counts[state] += 1
+            if counts[state] > max_repeats or block == 2:
+                break
+            if block == 3:
+                if tail == capacity:
+                    return -1, n_candidates, beam
+                queue[4 * tail] = nx
+                queue[4 * tail + 1] = ny
+                queue[4 * tail + 2] = vx
+                queue[4 * tail + 3] = vy
+                tail += 1
+            if x % 2 == 1:
+                vy = -vy
+            else:
+                vx = -vx
+            x += vx
+            y += vy
+    return remaining, n_candidates, beam
+
+
+_compiled = None
+
+
+def compiled_trace_beams():
+    """trace_beams() compiled by Numba (once per process; the machine code is cached on disk)."""
+    global _compiled
+    if _compiled is None:
+        from numba import njit
+        _compiled = njit(cache=True, nogil=True)(trace_beams)
+    return _compiled
+
+
+class TraceKernel:
+    '''
+    The buffers of trace_beams() for one board, for Solver(board, jit=...): the tables of the
+    grid layout, the target bits and the scratch space of the beam queue and collision counts,
+    allocated once and reused by every simulation.
+
+    compiled: *bool*
+        Whether simulate() runs the Numba-compiled kernel (else the same code interpreted).
+    targets: *list[tuple[int, int]]*
+        The target of every bit of a target mask, numbered like Bitboard.BoardBits.target_bits.
+    '''
+    def __init__(self, geometry, grid, targets, context, compiled=JIT_AVAILABLE):
+        if compiled and not JIT_AVAILABLE:
+            raise RuntimeError("Numba is not installed")
+        self.compiled = compiled
+        self._run = compiled_trace_beams() if compiled else trace_beams
+        self.geometry = geometry
+        self.cols = geometry.cols
+        self.step_cell = context.step_index()
+        self.open_cell = bytearray(grid[r][c] == 'o' for r in range(geometry.rows) for c in range(geometry.cols))
+        self.blocks = bytearray(geometry.rows * geometry.cols)
+        self.targets = list(dict.fromkeys(tuple(target) for target in targets))
+        if len(self.targets) > MAX_TARGETS:
+            raise ValueError(f"The kernel handles at most {MAX_TARGETS} targets")
+        self.all_targets = (1 << len(self.targets)) - 1
+        self.target_at = array('q', [0]) * (geometry.width * geometry.height)
+        for bit, (x, y) in enumerate(self.targets):
+            if -1 <= x <= geometry.max_x + 1 and -1 <= y <= geometry.max_y + 1:
+                self.target_at[(y + 1) * geometry.width + x + 1] = 1 << bit
+        self.queue = array('i', [0]) * (4 * QUEUE_BEAMS)
+        self.stamp = array('q', [0]) * len(self.step_cell)
+        self.counts = array('i', [0]) * len(self.step_cell)
+        self.seen = array('q', [0]) * len(self.blocks)
+        self.candidates = array('i', [0]) * len(self.blocks)
+        self.beam = 0
+
+    @classmethod
+    def supports(cls, targets):
+        """Whether a board with these targets fits the kernel."""
+        return len(set(tuple(target) for target in targets)) <= MAX_TARGETS
+
+    def simulate(self, placed_blocks, lasers):
+        """
+        Simulate lasers with placed_blocks ((r, c) -> 'A'/'B'/'C').
+        Returns: (remaining target mask, list of candidate cell indexes r * cols + c), or None if
+                 the beams overflowed the queue; Tracer.simulate_lasers() must then be used.
+        """
+        cols, blocks, queue = self.cols, self.blocks, self.queue
+        for (r, c), block_type in placed_blocks.items():
+            blocks[r * cols + c] = BLOCK_CODES[block_type]
+        for i, laser in enumerate(lasers):
+            queue[4 * i:4 * i + 4] = array('i', laser)
+        geometry = self.geometry
+        remaining, n_candidates, self.beam = self._run(
+            queue, len(lasers), self.step_cell, blocks, self.open_cell, self.target_at, self.all_targets,
+            self.stamp, self.counts, self.beam, self.seen, self.candidates,
+            geometry.width, geometry.max_x, geometry.max_y, MAX_STEPS, MAX_REPEATS)
+        for (r, c) in placed_blocks:
+            blocks[r * cols + c] = 0
+        if remaining < 0:
+            return None
+        return remaining, self.candidates[:n_candidates]
+
+    def target_points(self, mask):
+        """The targets of a target mask, as a set of points."""
+        return {target for bit, target in enumerate(self.targets) if mask >> bit & 1}
@@ -0,0 +1,90 @@
+from array import array
+
+
+class LaserPaths:
+    '''
+    Beam paths of one simulation, stored as straight diagonal segments in flat arrays instead
+    of one (x, y) tuple per half step. Filled by the tracers in Tracer.py; indexing or iterating
+    expands a beam into its list of points, in the format of the old Solver.final_paths.
+
+    Beams are numbered in simulation order, as in LaserTrace. Segment s is the four values
+    x, y, d, n at segments[4 * s]: its n points are (x + j * vx, y + j * vy) for j in range(n),
+    with the direction (vx, vy) encoded in d as in BoardGeometry.index, ((vx > 0) << 1) | (vy > 0).
+
+    segments: *array('h') or list[int]*
+        x, y, d, n of every segment, beam after beam.
+    beam_offsets: *array('i') or list[int]*
+        Beam i owns segments beam_offsets[i] to beam_offsets[i + 1] - 1.
+
+    With compact=False both buffers are plain lists, which are several times faster to append
+    to: for scratch paths that are rewritten on every search node and never kept.
+    '''
+    def __init__(self, compact=True):
+        self.segments = array('h') if compact else []
+        self.beam_offsets = array('i', [0]) if compact else [0]
+
+    def clear(self):
+        """Forget every beam, keeping the buffers."""
+        del self.segments[:], self.beam_offsets[1:]
+
+    def add_segment(self, x, y, vx, vy, length):
+        """Append length points from (x, y) in direction (vx, vy) to the current beam."""
+        if length > 0:
+            self.segments.extend((x, y, ((vx > 0) << 1) | (vy > 0), length))
+
+    def end_beam(self):
+        """Close the current beam; the next segments belong to a new one."""
+        self.beam_offsets.append(len(self.segments) >> 2)
+
+    def __len__(self):
+        return len(self.beam_offsets) - 1
+
+    def __getitem__(self, beam):
+        """Points of a beam as a list of (x, y)."""
+        if beam < 0:
+            beam += len(self)
+        if not 0 <= beam < len(self):
+            raise IndexError("beam index out of range")
+        points = []
+        segments = self.segments
+        for s in range(4 * self.beam_offsets[beam], 4 * self.beam_offsets[beam + 1], 4):
+            x, y, d, n = segments[s:s + 4]
+            vx, vy = (1 if d & 2 else -1), (1 if d & 1 else -1)
+            points.extend((x + j * vx, y + j * vy) for j in range(n))
+        return points
+
+    def __iter__(self):
+        for beam in range(len(self)):
+            yield self[beam]
+
+    def __eq__(self, other):
+        if isinstance(other, LaserPaths):
+            return list(self) == list(other)
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    @property
+    def nbytes(self):
+        """Size of the buffers in bytes (of the values only for list buffers)."""
+        return 2 * len(self.segments) + 4 * len(self.beam_offsets)
+
+    def step_states(self, geometry):
+        """
+        The (point, direction) indexes of BoardGeometry.step_cells of every half step between
+        two consecutive points of a beam, computed from the segments without expanding them.
+        """
+        width = geometry.width
+        segments, offsets = self.segments, self.beam_offsets
+        for beam in range(len(self)):
+            last = 4 * offsets[beam + 1]
+            for s in range(4 * offsets[beam], last, 4):
+                x, y, d, n = segments[s:s + 4]
+                state = (((y + 1) * width + x + 1) << 2) | d
+                # Along the segment the index moves by one point in its direction
+                delta = ((1 if d & 1 else -1) * width + (1 if d & 2 else -1)) << 2
+                end = state + (n - 1) * delta
+                yield from range(state, end, delta)
+                if s + 4 < last:
+                    # The step out of a segment is taken in the direction of the next one
+                    yield (end & ~3) | segments[s + 6]
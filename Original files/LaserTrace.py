@@ -0,0 +1,86 @@
+from array import array
+
+
+class LaserTrace:
+    """
+    Indexed record of one laser simulation, filled by Solver.simulate_with_blocks(trace=True).
+
+    Beams are numbered in simulation order: the L sources first, then every beam split off
+    by a C block. Cells are indexed as r * cols + c, targets in the order of board.targets.
+
+    beam_parent: *array('i')*
+        Index of the beam a C block split this beam from, -1 for L sources.
+    beam_split_cell: *array('i')*
+        Cell index of the C block that created the beam, -1 for L sources.
+    target_beam: *array('i')*
+        First beam that hit each target, -1 if the target was missed.
+    target_step: *array('i')*
+        Position of that hit in the beam's path.
+    target_feeder: *array('i')*
+        Cell of the last block the beam interacted with before reaching the target,
+        -1 if the light came straight from its L source.
+    cell_crossings: *array('I')*
+        Number of half steps that crossed each cell without a collision.
+    """
+    def __init__(self, targets, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.targets = list(targets)
+        self.target_index = {t: i for i, t in enumerate(self.targets)}
+        self.beam_parent = array('i')
+        self.beam_split_cell = array('i')
+        self.target_beam = array('i', [-1] * len(self.targets))
+        self.target_step = array('i', [-1] * len(self.targets))
+        self.target_feeder = array('i', [-1] * len(self.targets))
+        self.cell_crossings = array('I', [0] * (rows * cols))
+
+    def add_beam(self, parent=-1, split_cell=-1):
+        """Register a new beam and return its index."""
+        self.beam_parent.append(parent)
+        self.beam_split_cell.append(split_cell)
+        return len(self.beam_parent) - 1
+
+    def record_hit(self, target, beam, step, feeder):
+        """Record the first hit of target (x, y) by beam; later hits are ignored."""
+        t = self.target_index.get(target)
+        if t is not None and self.target_beam[t] < 0:
+            self.target_beam[t] = beam
+            self.target_step[t] = step
+            self.target_feeder[t] = feeder
+
+    def cross(self, cell):
+        """Count one half step through cell index cell."""
+        self.cell_crossings[cell] += 1
+
+    @property
+    def solved(self):
+        """True if every target was hit."""
+        return all(b >= 0 for b in self.target_beam)
+
+    def missed_targets(self):
+        """Return the targets no beam reached."""
+        return [t for t, b in zip(self.targets, self.target_beam) if b < 0]
+
+    def beam_for_target(self, target):
+        """Return the index of the beam that hit target (x, y), or None."""
+        beam = self.target_beam[self.target_index[target]]
+        return beam if beam >= 0 else None
+
+    def feeder_of(self, target):
+        """
+        Return the (r, c) cell of the block that feeds target (x, y): the last reflector or
+        splitter on the way from the source. None if the target is hit directly or missed.
+        """
+        cell = self.target_feeder[self.target_index[target]]
+        return divmod(cell, self.cols) if cell >= 0 else None
+
+    def beam_ancestry(self, beam):
+        """Return the chain of beam indexes from the L source down to beam."""
+        chain = [beam]
+        while self.beam_parent[chain[-1]] >= 0:
+            chain.append(self.beam_parent[chain[-1]])
+        return chain[::-1]
+
+    def crossings(self, r, c):
+        """Number of times beams crossed cell (r, c)."""
+        return self.cell_crossings[r * self.cols + c]
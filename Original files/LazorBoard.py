@@ -1,4 +1,3 @@
-
 class LazorBoard:
     '''
     Parses a .bff file to initialize the Lazor board setup.
@@ -28,6 +27,33 @@ class LazorBoard:
         *filename: str*
             Path to the .bff file.
 
+        *returns: LazorBoard*
+            A LazorBoard instance with parsed data.
+        '''
+        with open(filename, 'r') as file:
+            return cls.from_lines(file)
+
+    @classmethod
+    def from_string(cls, text):
+        '''
+        Parses the content of a .bff file given as a string (e.g. received over the network).
+
+        *text: str*
+            The .bff file content.
+
+        *returns: LazorBoard*
+            A LazorBoard instance with parsed data.
+        '''
+        return cls.from_lines(text.splitlines())
+
+    @classmethod
+    def from_lines(cls, lines):
+        '''
+        Parses an iterable of .bff lines; shared by from_file() and from_string().
+
+        *lines: iterable[str]*
+            The lines of a .bff file.
+
         *returns: LazorBoard*
             A LazorBoard instance with parsed data.
         '''
@@ -37,34 +63,33 @@ class LazorBoard:
         targets = []
         reading_grid = False
 
-        with open(filename, 'r') as file:
-            for line in file:
-                line = line.strip()
-                if not line or line.startswith('#'):
-                    continue
-                if line == 'GRID START':
-                    reading_grid = True
-                    continue
-                elif line == 'GRID STOP':
-                    reading_grid = False
-                    continue
-
-                if reading_grid:
-                    row = line.split()
-                    grid.append(row)
-                elif line[0] in {'A', 'B', 'C'}:
-                    parts = line.split()
-                    block_type = parts[0]
-                    count = int(parts[1])
-                    blocks[block_type] = count
-                elif line.startswith('L'):
-                    parts = line.split()
-                    x, y, vx, vy = map(int, parts[1:])
-                    lasers.append((x, y, vx, vy))
-                elif line.startswith('P'):
-                    parts = line.split()
-                    x, y = map(int, parts[1:])
-                    targets.append((x, y))
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line == 'GRID START':
+                reading_grid = True
+                continue
+            elif line == 'GRID STOP':
+                reading_grid = False
+                continue
+
+            if reading_grid:
+                row = line.split()
+                grid.append(row)
+            elif line[0] in {'A', 'B', 'C'}:
+                parts = line.split()
+                block_type = parts[0]
+                count = int(parts[1])
+                blocks[block_type] = count
+            elif line.startswith('L'):
+                parts = line.split()
+                x, y, vx, vy = map(int, parts[1:])
+                lasers.append((x, y, vx, vy))
+            elif line.startswith('P'):
+                parts = line.split()
+                x, y = map(int, parts[1:])
+                targets.append((x, y))
 
         return cls(grid, blocks, lasers, targets)
 
@@ -85,3 +110,35 @@ class LazorBoard:
                 f"Blocks: {block_str}\n\n"
                 f"Lasers:\n{laser_str}\n\n"
                 f"Targets:\n{target_str}\n")
+
+    def to_string(self):
+        '''
+        Returns the board in .bff format; from_string() reads it back.
+        '''
+        lines = ["GRID START"] + [" ".join(row) for row in self.grid] + ["GRID STOP", ""]
+        lines += [f"{t} {self.blocks[t]}" for t in ('A', 'B', 'C') if self.blocks.get(t, 0)] + [""]
+        lines += [f"L {x} {y} {vx} {vy}" for (x, y, vx, vy) in self.lasers] + [""]
+        lines += [f"P {x} {y}" for (x, y) in self.targets]
+        return "\n".join(lines) + "\n"
+
+    def fingerprint(self):
+        '''
+        Returns the puzzle_fingerprint() of this board.
+        '''
+        return puzzle_fingerprint(self.grid, self.lasers, self.targets, self.blocks)
+
+
+def puzzle_fingerprint(grid, lasers, targets, blocks):
+    '''
+    Returns a short hex digest identifying a puzzle: a hash of Checkpoint.board_fingerprint(),
+    so that checkpoints and service or batch records tell puzzles apart the same way. Boards
+    with the same grid, lasers, targets (in the same order) and block counts get the same
+    fingerprint, whatever file they came from.
+
+    *returns: str*
+        16 hex characters.
+    '''
+    import hashlib
+    from Checkpoint import board_fingerprint
+    canonical = board_fingerprint(grid, lasers, targets, blocks)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:16]
@@ -1,6 +1,35 @@
 import matplotlib.pyplot as plt
+from RenderCache import render_key
 
-def visualize_lazor_solution(board, laser_paths, output_filename="lazor_solution.png"):
+# Bump when the drawing below changes: it is part of the key of every cached rendering
+RENDER_VERSION = 1
+CELL_COLORS = {
+    'x': 'lightgrey',
+    'o': 'white',
+    'A': 'limegreen',
+    'B': 'tomato',
+    'C': 'royalblue'
+}
+LASER_COLORS = ['red', 'cyan', 'orange', 'magenta', 'blue', 'green']
+
+
+def render_options(dpi=300):
+    """Everything besides the solution that the image depends on, for render_key()."""
+    return {'dpi': dpi, 'cells': CELL_COLORS, 'lasers': LASER_COLORS, 'version': RENDER_VERSION}
+
+
+def visualize_lazor_solution(board, laser_paths, output_filename="lazor_solution.png", dpi=300, cache=None):
+    """
+    Render a solved board and its laser paths into output_filename.
+    :param cache: Optional RenderCache (see RenderCache.py); a rendering of the same board, paths
+                  and options made before is then copied from it instead of being drawn again
+    """
+    if cache is not None:
+        laser_paths = [list(path) for path in laser_paths]
+        key = render_key(board.grid, board.targets, laser_paths, render_options(dpi))
+        if cache.fetch(key, output_filename):
+            print(f"Visualization reused: {output_filename}")
+            return
 
     rows = len(board.grid)
     cols = len(board.grid[0]) if rows > 0 else 0
@@ -17,19 +46,11 @@ def visualize_lazor_solution(board, laser_paths, output_filename="lazor_solution
     for y in range(rows + 1):
         ax.axhline(y, color='black', linewidth=0.5)
 
-    color_map = {
-        'x': 'lightgrey',
-        'o': 'white',
-        'A': 'limegreen',
-        'B': 'tomato',
-        'C': 'royalblue'
-    }
-
     # Draw each cell of the board
     for r in range(rows):
         for c in range(cols):
             cell = board.grid[r][c]
-            facecolor = color_map.get(cell, 'white')
+            facecolor = CELL_COLORS.get(cell, 'white')
             rect = plt.Rectangle((c, r), 1, 1, facecolor=facecolor, edgecolor='none')
             ax.add_patch(rect)
 
@@ -42,14 +63,23 @@ def visualize_lazor_solution(board, laser_paths, output_filename="lazor_solution
                 color='gold', markeredgecolor='black', markeredgewidth=1)
 
     # Draw laser trajectories
-    laser_colors = ['red', 'cyan', 'orange', 'magenta', 'blue', 'green']
     for i, path in enumerate(laser_paths):
         xs = [p[0] * 0.5 for p in path]
         ys = [p[1] * 0.5 for p in path]
-        color = laser_colors[i % len(laser_colors)]
+        color = LASER_COLORS[i % len(LASER_COLORS)]
         ax.plot(xs, ys, color=color, linewidth=2, marker='o', markersize=3)
 
     ax.set_title("Lazor Puzzle Solution")
     plt.tight_layout()
-    plt.savefig(output_filename, dpi=300)
+    plt.savefig(output_filename, dpi=dpi)
     print(f"Visualization saved to: {output_filename}")
+    if cache is not None:
+        cache.store(key, output_filename)
+
+
+def visualize_solve_result(result, output_filename="lazor_solution.png", cache=None, dpi=300):
+    """
+    Render a SolveResult, e.g. one attached from shared memory by another process.
+    The result provides grid and targets like a Board, and its paths() replace solver.final_paths.
+    """
+    visualize_lazor_solution(result, result.paths(), output_filename, dpi=dpi, cache=cache)
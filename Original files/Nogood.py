@@ -0,0 +1,95 @@
+class NogoodStore:
+    '''
+    Learned nogoods of a search: placement sets (masks of Checkpoint.encode_placement bits, as
+    in Bitboard.placement_mask) that no solution contains. A search node whose placements
+    contain a nogood can be skipped.
+
+    Each nogood is filed under each of its bits. The search checks a node right after placing
+    one block on a node that had no nogood, so only the nogoods with that block's bit can match:
+    either those are scanned, or, when it is cheaper, every subset of the node's placements
+    with that bit is looked up directly. When the store is full the least recently used
+    nogood is evicted.
+
+    max_size: *int*
+        Maximum number of nogoods kept.
+    learned, hits, evicted: *int*
+        Number of nogoods added, lookups that found one, and nogoods dropped to stay under max_size.
+    '''
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self.learned = 0
+        self.hits = 0
+        self.evicted = 0
+        self._nogoods = {}   # mask -> None, in least recently used order
+        self._buckets = {}   # bit -> {mask: None}
+
+    def __len__(self):
+        return len(self._nogoods)
+
+    def masks(self):
+        """All nogoods, least recently used first."""
+        return list(self._nogoods)
+
+    def add(self, mask):
+        """Learn a nogood."""
+        if mask in self._nogoods:
+            return
+        self._nogoods[mask] = None
+        for bit in _bits(mask) or (0,):
+            self._buckets.setdefault(bit, {})[mask] = None
+        self.learned += 1
+        while len(self._nogoods) > self.max_size:
+            old = next(iter(self._nogoods))
+            del self._nogoods[old]
+            for bit in _bits(old) or (0,):
+                del self._buckets[bit][old]
+            self.evicted += 1
+
+    def find(self, placements, last=None):
+        """
+        Return a nogood contained in the placement mask, or None.
+        :param last: Bit of the block placed last, if placements without it are known to hold no nogood
+        """
+        buckets = self._buckets
+        found = 0 if buckets.get(0) else None  # The empty nogood: nothing can be solved
+        for bit in ((last,) if last is not None else _bits(placements)):
+            if found is not None:
+                break
+            bucket = buckets.get(bit)
+            if not bucket:
+                continue
+            others = placements & ~bit
+            if 1 << others.bit_count() < len(bucket):
+                subset = others
+                while True:
+                    if subset | bit in self._nogoods:
+                        found = subset | bit
+                        break
+                    if not subset:
+                        break
+                    subset = (subset - 1) & others
+            else:
+                for mask in bucket:
+                    if not mask & ~placements:
+                        found = mask
+                        break
+        if found is not None:
+            self.hits += 1
+            # Keep nogoods that keep paying off
+            del self._nogoods[found]
+            self._nogoods[found] = None
+        return found
+
+    def stats(self):
+        """Counters as a dict."""
+        return {'nogoods': len(self._nogoods), 'learned': self.learned,
+                'hits': self.hits, 'evicted': self.evicted}
+
+
+def _bits(mask):
+    bits = []
+    while mask:
+        low = mask & -mask
+        bits.append(low)
+        mask ^= low
+    return bits
@@ -0,0 +1,428 @@
+import argparse
+import os
+import random
+import sys
+import time
+from Classes import Board
+from LazorBoard import LazorBoard
+from Solver import Solver
+from Verifier import verify
+
+BLOCK_TYPES = ('A', 'B', 'C')
+
+
+class Outcome:
+    '''
+    What one simulation of a board with placed blocks produced, in a form every simulator
+    can be compared in. A field a simulator does not report is None and is not compared.
+
+    remaining: *frozenset[tuple[int, int]] or None*
+        Targets no beam hit.
+    candidates: *frozenset[tuple[int, int]] or None*
+        'o' cells the beams crossed.
+    paths: *list[list[tuple[int, int]]] or None*
+        Points of every beam, in simulation order.
+    '''
+    def __init__(self, remaining=None, candidates=None, paths=None):
+        self.remaining = remaining
+        self.candidates = candidates
+        self.paths = paths
+
+    def mismatch(self, other):
+        """Name of the first field both outcomes report and disagree on, or None."""
+        for name in ('remaining', 'candidates', 'paths'):
+            mine, theirs = getattr(self, name), getattr(other, name)
+            if mine is not None and theirs is not None and mine != theirs:
+                return name
+        return None
+
+
+class CaseResult:
+    '''
+    One differential case: a board (and placements for a simulator), the time the reference
+    and the candidate took, and the reason they disagreed (None if they agreed).
+    '''
+    def __init__(self, board, placements, reference_seconds, candidate_seconds, failure=None):
+        self.board = board
+        self.placements = placements
+        self.reference_seconds = reference_seconds
+        self.candidate_seconds = candidate_seconds
+        self.failure = failure
+
+    @property
+    def speedup(self):
+        """Reference time over candidate time."""
+        return self.reference_seconds / self.candidate_seconds if self.candidate_seconds > 0 else float('inf')
+
+
+class DifferentialReport:
+    '''
+    Outcome of run_simulator_cases() or run_engine_cases() for one candidate.
+
+    name: *str*
+        Name of the candidate.
+    cases: *list[CaseResult]*
+        Every case, in generation order.
+    failures: *list[CaseResult]*
+        The failing cases, shrunk to minimal boards.
+    '''
+    def __init__(self, name):
+        self.name = name
+        self.cases = []
+        self.failures = []
+
+    def __bool__(self):
+        return not self.failures
+
+    def speedups(self):
+        return sorted(case.speedup for case in self.cases)
+
+    def summary(self):
+        speedups = self.speedups()
+        if not speedups:
+            return f"[ORACLE] {self.name}: no cases"
+        median = speedups[len(speedups) // 2]
+        return (f"[ORACLE] {self.name}: {len(self.cases) - len(self.failures)}/{len(self.cases)} cases agree, "
+                f"speedup median {median:.2f}x (min {speedups[0]:.2f}x, max {speedups[-1]:.2f}x)")
+
+
+# --- random cases --------------------------------------------------------------------------
+
+def random_board(rng, max_rows=5, max_cols=5, max_lasers=2, max_targets=3, max_blocks=4):
+    """
+    A random board: mostly 'o' cells with some 'x' and fixed blocks, lasers and targets on
+    edge midpoints (x + y odd) anywhere on the half grid, and a few blocks of each type.
+    """
+    rows, cols = rng.randint(1, max_rows), rng.randint(1, max_cols)
+    grid = [[rng.choices('oxABC', weights=(14, 4, 1, 1, 1))[0] for _ in range(cols)] for _ in range(rows)]
+
+    def edge_point():
+        while True:
+            x, y = rng.randint(0, 2 * cols), rng.randint(0, 2 * rows)
+            if (x + y) % 2:
+                return x, y
+
+    lasers = [edge_point() + (rng.choice((-1, 1)), rng.choice((-1, 1)))
+              for _ in range(rng.randint(1, max_lasers))]
+    targets = list({edge_point() for _ in range(rng.randint(1, max_targets))})
+    open_cells = sum(row.count('o') for row in grid)
+    blocks = {t: 0 for t in BLOCK_TYPES}
+    for _ in range(min(open_cells, rng.randint(0, max_blocks))):
+        blocks[rng.choice(BLOCK_TYPES)] += 1
+    return Board(grid, lasers, targets, blocks)
+
+
+def random_placements(rng, board):
+    """A random legal placement of some of the board's blocks on its 'o' cells."""
+    cells = [(r, c) for r, row in enumerate(board.grid) for c, cell in enumerate(row) if cell == 'o']
+    pool = [t for t in BLOCK_TYPES for _ in range(board.blocks.get(t, 0))]
+    rng.shuffle(pool)
+    count = rng.randint(0, min(len(cells), len(pool)))
+    return dict(zip(rng.sample(cells, count), pool[:count]))
+
+
+def copy_board(board):
+    return Board([list(row) for row in board.grid], list(board.lasers), list(board.targets), dict(board.blocks))
+
+
+# --- simulators and engines ----------------------------------------------------------------
+#
+# A simulator is prepare(board, placements) -> run, where run() simulates once and returns an
+# Outcome; only run() is timed. An engine is prepare(board) -> run, where run() solves the
+# board and returns (solved, placements).
+
+def solver_simulator(record_paths=True, **options):
+    """
+    Simulator: Solver(board, **options).simulate_with_blocks() with the blocks placed. Without
+    record_paths no path is built, which the kernel of Solver(jit=True) needs to run, and only
+    the remaining targets and candidates are reported.
+    """
+    def prepare(board, placements):
+        solver = Solver(copy_board(board), **options)
+        solver.reset_search()
+        for (r, c), block_type in placements.items():
+            solver.place_block(r, c, block_type)
+
+        def run():
+            solved, candidates = solver.simulate_with_blocks(record_paths=record_paths)
+            remaining = solver.remaining_targets
+            if solver.bits is not None:
+                candidates = solver.bits.cells(candidates)
+                remaining = [t for t, bit in solver.bits.target_bits.items() if remaining & bit]
+            paths = list(solver.final_paths) if record_paths else None
+            return Outcome(frozenset(remaining), frozenset(candidates), paths)
+        return run
+    return prepare
+
+
+def verifier_simulator(board, placements):
+    """Simulator: Verifier.verify(), which only reports the targets it missed."""
+    board = copy_board(board)
+    return lambda: Outcome(remaining=frozenset(verify(board, placements).missed_targets))
+
+
+def solver_engine(**options):
+    """Engine: Solver(board, **options).solve()."""
+    def prepare(board):
+        solver = Solver(copy_board(board), **options)
+
+        def run():
+            solved = solver.solve()
+            return solved, dict(solver.placed_blocks)
+        return run
+    return prepare
+
+
+reference_simulator = solver_simulator()
+reference_engine = solver_engine()
+
+SIMULATORS = {
+    'ray_jump': solver_simulator(ray_jump=True),
+    'bitboards': solver_simulator(bitboards=True),
+    'bitboards+ray_jump': solver_simulator(bitboards=True, ray_jump=True),
+    'jit': solver_simulator(record_paths=False, jit=True),
+    'jit+bitboards': solver_simulator(record_paths=False, jit=True, bitboards=True),
+    'verifier': verifier_simulator,
+}
+
+ENGINES = {
+    'iterative': solver_engine(iterative=True),
+    'bitboards': solver_engine(bitboards=True),
+    'prune_dead_cells': solver_engine(prune_dead_cells=True),
+    'bidirectional': solver_engine(bidirectional=True),
+    'learn_nogoods': solver_engine(learn_nogoods=True),
+    'jit': solver_engine(jit=True),
+    'all': solver_engine(iterative=True, ray_jump=True, bitboards=True, prune_dead_cells=True,
+                         bidirectional=True, learn_nogoods=True),
+}
+
+
+def _timed(run, repeat):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def simulation_failure(candidate, board, placements):
+    """Why candidate disagrees with the reference on board and placements, or None."""
+    try:
+        expected = reference_simulator(board, placements)()
+        field = candidate(board, placements)().mismatch(expected)
+    except Exception as error:
+        return f"{type(error).__name__}: {error}"
+    return f"{field} differ" if field else None
+
+
+def engine_failure(candidate, board):
+    """
+    Why candidate disagrees with the reference engine on board, or None. Engines may find
+    different solutions, so they must agree on solvability and any solution must verify.
+    """
+    try:
+        expected, _ = reference_engine(board)()
+        solved, placements = candidate(board)()
+    except Exception as error:
+        return f"{type(error).__name__}: {error}"
+    if solved != expected:
+        return f"solved {solved}, reference {expected}"
+    if solved and not verify(board, placements):
+        return "solution does not verify"
+    return None
+
+
+# --- shrinking -----------------------------------------------------------------------------
+
+def _crops(board, placements):
+    """The board without its first or last row or column, where nothing needs it."""
+    rows, cols = len(board.grid), len(board.grid[0])
+    points = list(board.targets) + [(x, y) for (x, y, _, _) in board.lasers]
+    if rows > 1:
+        if all(y >= 2 for _, y in points) and all(r > 0 for r, _ in placements):
+            yield (Board(board.grid[1:], [(x, y - 2, vx, vy) for (x, y, vx, vy) in board.lasers],
+                         [(x, y - 2) for (x, y) in board.targets], board.blocks),
+                   {(r - 1, c): t for (r, c), t in placements.items()})
+        if all(y <= 2 * rows - 2 for _, y in points) and all(r < rows - 1 for r, _ in placements):
+            yield Board(board.grid[:-1], board.lasers, board.targets, board.blocks), placements
+    if cols > 1:
+        if all(x >= 2 for x, _ in points) and all(c > 0 for _, c in placements):
+            yield (Board([row[1:] for row in board.grid],
+                         [(x - 2, y, vx, vy) for (x, y, vx, vy) in board.lasers],
+                         [(x - 2, y) for (x, y) in board.targets], board.blocks),
+                   {(r, c - 1): t for (r, c), t in placements.items()})
+        if all(x <= 2 * cols - 2 for x, _ in points) and all(c < cols - 1 for _, c in placements):
+            yield Board([row[:-1] for row in board.grid], board.lasers, board.targets, board.blocks), placements
+
+
+def _reductions(board, placements):
+    """Boards (and placements) one step smaller than board, most promising first."""
+    yield from _crops(board, placements)
+    for cell in placements:
+        yield board, {k: t for k, t in placements.items() if k != cell}
+    if len(board.lasers) > 1:
+        for i in range(len(board.lasers)):
+            yield Board(board.grid, board.lasers[:i] + board.lasers[i + 1:], board.targets, board.blocks), placements
+    for i in range(len(board.targets)):
+        yield Board(board.grid, board.lasers, board.targets[:i] + board.targets[i + 1:], board.blocks), placements
+    for block_type in BLOCK_TYPES:
+        if board.blocks.get(block_type, 0) > list(placements.values()).count(block_type):
+            yield Board(board.grid, board.lasers, board.targets,
+                        dict(board.blocks, **{block_type: board.blocks[block_type] - 1})), placements
+    for r, row in enumerate(board.grid):
+        for c, cell in enumerate(row):
+            if cell != 'x' and (r, c) not in placements:
+                grid = [list(line) for line in board.grid]
+                grid[r][c] = 'x'
+                yield Board(grid, board.lasers, board.targets, board.blocks), placements
+
+
+def shrink(board, placements, fails, max_tries=2000):
+    """
+    Greedily make a failing case smaller (crop the grid, drop placements, lasers, targets and
+    blocks, turn cells into 'x') as long as fails(board, placements) still returns a reason.
+    Returns (board, placements, reason) of the smallest failing case found.
+    """
+    reason = fails(board, placements)
+    tries = 0
+    progress = True
+    while progress and tries < max_tries:
+        progress = False
+        for smaller, smaller_placements in _reductions(board, placements):
+            tries += 1
+            smaller_reason = fails(smaller, smaller_placements)
+            if smaller_reason:
+                board, placements, reason = smaller, smaller_placements, smaller_reason
+                progress = True
+                break
+            if tries >= max_tries:
+                break
+    return copy_board(board), dict(placements), reason
+
+
+# --- runs ----------------------------------------------------------------------------------
+
+def run_simulator_cases(candidate, name="candidate", cases=200, seed=0, repeat=3, out_dir=None, **board_options):
+    """
+    Compare a simulator with the reference (Solver.simulate_with_blocks) on random boards and
+    placements. Failing cases are shrunk and, with out_dir, written there as .bff reproducers.
+    Returns a DifferentialReport.
+    """
+    rng = random.Random(seed)
+    report = DifferentialReport(name)
+    fails = lambda board, placements: simulation_failure(candidate, board, placements)
+    for _ in range(cases):
+        board = random_board(rng, **board_options)
+        placements = random_placements(rng, board)
+        expected, reference_seconds = _timed(reference_simulator(board, placements), repeat)
+        try:
+            outcome, candidate_seconds = _timed(candidate(board, placements), repeat)
+            failure = outcome.mismatch(expected)
+            failure = f"{failure} differ" if failure else None
+        except Exception as error:
+            candidate_seconds, failure = float('inf'), f"{type(error).__name__}: {error}"
+        case = CaseResult(board, placements, reference_seconds, candidate_seconds, failure)
+        report.cases.append(case)
+        if failure:
+            report.failures.append(CaseResult(*shrink(board, placements, fails)[:2], reference_seconds,
+                                              candidate_seconds, failure))
+    if out_dir:
+        write_reproducers(report, out_dir)
+    return report
+
+
+def run_engine_cases(candidate, name="candidate", cases=50, seed=0, repeat=3, out_dir=None, **board_options):
+    """
+    Compare a search engine with the reference (Solver.solve) on random boards, see
+    engine_failure(). Failing boards are shrunk and optionally written to out_dir.
+    Each engine is timed as its best of repeat solves, each by a freshly prepared engine: the
+    first one on a new grid layout also builds its SolverContext, which the following ones share.
+    Returns a DifferentialReport.
+    """
+    # Unsolvable boards are searched to exhaustion, so engine boards are kept smaller
+    board_options = dict(dict(max_rows=4, max_cols=4, max_blocks=3), **board_options)
+    rng = random.Random(seed)
+    report = DifferentialReport(name)
+    fails = lambda board, placements: engine_failure(candidate, board)
+    for _ in range(cases):
+        board = random_board(rng, **board_options)
+        (expected, _), reference_seconds = _timed(lambda: reference_engine(board)(), repeat)
+        try:
+            (solved, placements), candidate_seconds = _timed(lambda: candidate(board)(), repeat)
+            failure = None
+            if solved != expected:
+                failure = f"solved {solved}, reference {expected}"
+            elif solved and not verify(board, placements):
+                failure = "solution does not verify"
+        except Exception as error:
+            candidate_seconds, failure = float('inf'), f"{type(error).__name__}: {error}"
+        report.cases.append(CaseResult(board, {}, reference_seconds, candidate_seconds, failure))
+        if failure:
+            smallest, _, reason = shrink(board, {}, fails)
+            report.failures.append(CaseResult(smallest, {}, reference_seconds, candidate_seconds, reason))
+    if out_dir:
+        write_reproducers(report, out_dir)
+    return report
+
+
+def case_to_bff(board, placements=None, comment=None):
+    """A case as .bff text; the placements are '# place <type> <r> <c>' comment lines."""
+    lines = [f"# {comment}"] if comment else []
+    lines += [f"# place {t} {r} {c}" for (r, c), t in sorted((placements or {}).items())]
+    text = LazorBoard(board.grid, board.blocks, board.lasers, board.targets).to_string()
+    return "\n".join(lines + [text])
+
+
+def load_case(filename):
+    """Read a reproducer written by write_reproducers(): returns (Board, placements)."""
+    with open(filename, 'r') as file:
+        text = file.read()
+    lazor_data = LazorBoard.from_string(text)
+    placements = {}
+    for line in text.splitlines():
+        parts = line.split()
+        if parts[:2] == ['#', 'place']:
+            placements[(int(parts[3]), int(parts[4]))] = parts[2]
+    board = Board(lazor_data.grid, lazor_data.lasers, lazor_data.targets, lazor_data.blocks)
+    return board, placements
+
+
+def write_reproducers(report, out_dir):
+    """Write every failure of a report to out_dir/<name>_<i>.bff; returns the paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for i, case in enumerate(report.failures):
+        path = os.path.join(out_dir, f"{report.name}_{i}.bff")
+        with open(path, 'w') as file:
+            file.write(case_to_bff(case.board, case.placements, f"{report.name}: {case.failure}"))
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    """Command line entry point: check the built-in alternative simulators and engines."""
+    parser = argparse.ArgumentParser(description="Differential tests of the optimized Lazor simulators and engines.")
+    parser.add_argument("--cases", type=int, default=200, help="Random simulation cases per simulator")
+    parser.add_argument("--engine-cases", type=int, default=50, help="Random boards per engine")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="Folder for .bff reproducers of failing cases")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print the speedup of every case")
+    args = parser.parse_args(argv)
+
+    reports = [run_simulator_cases(prepare, name, args.cases, args.seed, out_dir=args.out)
+               for name, prepare in SIMULATORS.items()]
+    reports += [run_engine_cases(prepare, name, args.engine_cases, args.seed, out_dir=args.out)
+                for name, prepare in ENGINES.items()]
+    for report in reports:
+        if args.verbose:
+            for i, case in enumerate(report.cases):
+                print(f"[ORACLE] {report.name} #{i}: {case.speedup:.2f}x" + (f" FAIL {case.failure}" if case.failure else ""))
+        print(report.summary())
+        for case in report.failures:
+            print(f"[ORACLE]   {case.failure}:\n" + case_to_bff(case.board, case.placements))
+    return 0 if all(reports) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
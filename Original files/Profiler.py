@@ -0,0 +1,264 @@
+import os
+import sys
+from contextlib import nullcontext
+
+from Tracer import simulate_single_laser, simulate_single_laser_bits
+
+# Functions whose frames (and everything they call) belong to the simulation phase
+SIMULATION_FUNCTIONS = {'simulate_with_blocks', 'simulate_lasers', 'simulate_lasers_bits',
+                        'simulate_single_laser', 'simulate_single_laser_bits'}
+
+
+def collision_lines(func):
+    """
+    Source lines of the collision handling of a tracer function: the end of its stepping loop,
+    after the `if block_type is None:` branch that moves a beam which hit no block.
+    Collisions are handled inline for speed, so the sampler tells them apart by line number.
+    """
+    import inspect
+    lines, first = inspect.getsourcelines(func)
+    start = indent = None
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        depth = len(line) - len(line.lstrip())
+        if indent is None:
+            if stripped == 'if block_type is None:':
+                indent = depth
+        elif stripped and depth <= indent:
+            if start is None and depth == indent:
+                start = i
+            elif depth < indent:
+                return range(first + start, first + i)
+    return range(first + start, first + len(lines)) if start is not None else range(0)
+
+
+def profile_phase(profile, name):
+    """profile.phase(name), or a context manager doing nothing if profile is None."""
+    return profile.phase(name) if profile is not None else nullcontext()
+
+
+class SolveProfile:
+    '''
+    Profile of the solve of one puzzle, as collapsed stacks ("frame;frame;... weight" per line,
+    the input format of flamegraph.pl, speedscope and inferno) broken down by phase.
+
+    The driver and Solver(profile=...) open the phases parse, initial candidates, search and
+    render with phase(); the stacks recorded inside one start with its label, e.g. "[search]".
+    The labels "[simulation]" (frames of the tracers) and "[collision]" (their collision
+    handling, which only the sampler can see) are inserted within the stacks.
+
+    mode: *str*
+        'sample': a thread reads the stack of the profiled thread every interval seconds; the
+        weights are sample counts. 'cprofile': cProfile runs during every phase, and the stacks
+        are rebuilt from its caller edges; the weights are microseconds of own time.
+    interval: *float*
+        Sampling period in seconds.
+    stacks: *dict[str, int]*
+        Weight of every collapsed stack.
+    '''
+    def __init__(self, mode='sample', interval=0.001):
+        if mode not in ('sample', 'cprofile'):
+            raise ValueError(f"Unknown profile mode {mode!r}")
+        self.mode = mode
+        self.interval = interval
+        self.stacks = {}
+        self._phases = ()       # (label, frame of the with statement) of the open phases
+        self._sampler = None
+        self._stop = None
+        self._collision = None  # code object -> collision_lines() of the tracers
+
+    def phase(self, name):
+        """Context manager of a phase; phases can nest (e.g. search within a driver phase)."""
+        return _Phase(self, name)
+
+    def _enter(self, name, frame):
+        if not self._phases:
+            self._start()
+        elif self.mode == 'cprofile':
+            self._flush()
+        self._phases = self._phases + ((f"[{name}]", frame),)
+        if self.mode == 'cprofile':
+            self._profiler.enable()
+
+    def _exit(self):
+        if self.mode == 'cprofile':
+            self._flush()
+        self._phases = self._phases[:-1]
+        if not self._phases:
+            self._finish()
+        elif self.mode == 'cprofile':
+            self._profiler.enable()
+
+    def _start(self):
+        # The profilers are imported when a profile starts: solves without one do not pay for them
+        if self.mode == 'cprofile':
+            import cProfile
+            import pstats  # Here rather than in _flush(), where the import would be profiled
+            self._profiler = cProfile.Profile()
+            return
+        import threading
+        if self._collision is None:
+            self._collision = {f.__code__: collision_lines(f)
+                               for f in (simulate_single_laser, simulate_single_laser_bits)}
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, args=(threading.get_ident(),),
+                                         daemon=True)
+        # The sampler only runs when the profiled thread releases the GIL, every switch interval
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.interval))
+        self._sampler.start()
+
+    def _finish(self):
+        if self.mode == 'cprofile':
+            self._profiler = None
+            return
+        self._stop.set()
+        self._sampler.join()
+        sys.setswitchinterval(self._switch_interval)
+        self._sampler = self._stop = None
+
+    def _sample(self, thread_id):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            phases = self._phases
+            if frame is None or not phases:
+                continue
+            outer = phases[0][1]
+            frames = []
+            while frame is not None and frame is not outer:
+                frames.append(frame)
+                frame = frame.f_back
+            if frame is None:
+                continue
+            # The stack starts at the phase label, below the frame that opened the outer phase
+            stack = [label for (label, entry) in phases if entry is outer]
+            for f in reversed(frames):
+                code = f.f_code
+                if code.co_name in SIMULATION_FUNCTIONS and '[simulation]' not in stack:
+                    stack.append('[simulation]')
+                stack.append(_frame_name(code.co_name, code.co_filename, code.co_firstlineno))
+                if f.f_lineno in self._collision.get(code, ()):
+                    stack.append('[collision]')
+                stack.extend(label for (label, entry) in phases if entry is f)
+            key = ';'.join(stack)
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def _flush(self):
+        """Add the cProfile stats of the phase on top to the stacks and restart the profiler."""
+        self._profiler.disable()
+        import cProfile
+        import pstats
+        prefix = [label for (label, _) in self._phases]
+        for stack, seconds in _collapse(pstats.Stats(self._profiler).stats, _OWN_CODE).items():
+            weight = round(seconds * 1e6)
+            if weight:
+                key = ';'.join(prefix + list(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + weight
+        self._profiler = cProfile.Profile()
+
+    def phase_totals(self):
+        """Weight of every phase, each stack counted in the innermost phase it contains."""
+        totals = {}
+        for stack, weight in self.stacks.items():
+            phase = None
+            for frame in stack.split(';'):
+                if frame.startswith('['):
+                    phase = frame[1:-1]
+            totals[phase] = totals.get(phase, 0) + weight
+        return totals
+
+    def summary(self):
+        """One line with the share of every phase."""
+        totals = self.phase_totals()
+        total = sum(totals.values()) or 1
+        unit = 'samples' if self.mode == 'sample' else 'us'
+        parts = [f"{phase} {100 * totals[phase] / total:.1f}%"
+                 for phase in sorted(totals, key=totals.get, reverse=True)]
+        return f"{sum(totals.values())} {unit}" + (": " + ", ".join(parts) if parts else "")
+
+    def write(self, path):
+        """Write the collapsed stacks, heaviest first."""
+        with open(path, 'w') as file:
+            for stack, weight in sorted(self.stacks.items(), key=lambda item: -item[1]):
+                file.write(f"{stack} {weight}\n")
+
+    def __getstate__(self):
+        # Sent back from worker processes once finished: only the results
+        return {'mode': self.mode, 'interval': self.interval, 'stacks': self.stacks}
+
+    def __setstate__(self, state):
+        self.__init__(state['mode'], state['interval'])
+        self.stacks = state['stacks']
+
+
+class _Phase:
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        # The frame of the with statement: the sampler cuts the stacks above it
+        self.profile._enter(self.name, sys._getframe(1))
+        return self
+
+    def __exit__(self, *exc):
+        self.profile._exit()
+        return False
+
+
+def _frame_name(name, filename, line):
+    if filename == '~':
+        return name  # built-in functions in cProfile stats
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def _collapse(stats, skip=(), min_share=1e-7, max_depth=64):
+    """
+    Collapsed stacks from cProfile stats, which only keep caller -> callee edges: the own time
+    of every function is spread over its callers in proportion to the time spent through each
+    edge, recursively. Recursive calls fold into one frame, and shares below min_share seconds
+    stop where they are. Functions whose (filename, first line) is in skip are left out.
+    Returns: {tuple of frame names, root first: seconds}
+    """
+    names = {}
+    for func in stats:
+        filename, line, name = func
+        if '_lsprof' not in name and (filename, line) not in skip:
+            names[func] = _frame_name(name, filename, line)
+
+    stacks = {}
+
+    def emit(chain, seconds):
+        frames = []
+        for func in reversed(chain):
+            if func[2] in SIMULATION_FUNCTIONS and '[simulation]' not in frames:
+                frames.append('[simulation]')
+            frames.append(names[func])
+        key = tuple(frames)
+        stacks[key] = stacks.get(key, 0.0) + seconds
+
+    def spread(chain, seconds):
+        callers = {caller: edge[3] for (caller, edge) in stats[chain[-1]][4].items()
+                   if caller in names and caller not in chain}
+        total = sum(callers.values())
+        if total <= 0 or len(chain) >= max_depth:
+            emit(chain, seconds)
+            return
+        for caller, through in callers.items():
+            share = seconds * through / total
+            if share < min_share:
+                emit(chain, share)
+            else:
+                spread(chain + [caller], share)
+
+    for func in names:
+        own = stats[func][2]
+        if own > 0:
+            spread([func], own)
+    return stacks
+
+
+# The profiler's own calls, left out of the cProfile stacks
+_OWN_CODE = {(f.__code__.co_filename, f.__code__.co_firstlineno)
+             for f in (SolveProfile.phase, SolveProfile._enter, SolveProfile._exit, SolveProfile._flush,
+                       _Phase.__init__, _Phase.__enter__, _Phase.__exit__)}
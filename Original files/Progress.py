@@ -0,0 +1,137 @@
+import time
+
+
+class ProgressReport:
+    '''
+    One report of a running solve (see SolveProgress).
+
+    nodes: *int*
+        Nodes expanded so far.
+    rate: *float*
+        Nodes per second since the previous report (since the start for the first one).
+    depth: *int*
+        Depth of the node being searched, i.e. the number of blocks placed on its path.
+    targets_hit: *int*
+        Most targets any node searched so far hit at once.
+    targets: *int*
+        Number of targets of the board.
+    fraction: *float*
+        Estimated share of the search tree behind the current path (see search_fraction()).
+    elapsed: *float*
+        Seconds since the search started.
+    eta: *float or None*
+        Estimated seconds left to search the whole tree, from elapsed and fraction; None while
+        fraction is still 0. A solution found earlier ends the search before that.
+    '''
+    def __init__(self, nodes, rate, depth, targets_hit, targets, fraction, elapsed, eta):
+        self.nodes = nodes
+        self.rate = rate
+        self.depth = depth
+        self.targets_hit = targets_hit
+        self.targets = targets
+        self.fraction = fraction
+        self.elapsed = elapsed
+        self.eta = eta
+
+    def __str__(self):
+        eta = "?" if self.eta is None else f"{self.eta:.0f} s"
+        return (f"{self.nodes} nodes ({self.rate:.0f} nodes/s), depth {self.depth}, "
+                f"best {self.targets_hit}/{self.targets} targets, {self.fraction:.1%} searched "
+                f"in {self.elapsed:.1f} s, ETA {eta}")
+
+    def __repr__(self):
+        return (f"ProgressReport(nodes={self.nodes}, rate={self.rate:.0f}, depth={self.depth}, "
+                f"targets_hit={self.targets_hit}, targets={self.targets}, fraction={self.fraction:.4f}, "
+                f"elapsed={self.elapsed:.3f}, eta={self.eta})")
+
+
+def search_fraction(frames):
+    """
+    Estimated share of a depth-first search done when it is at the given path (the frames of
+    Solver.path_frames()). The children of a node are taken as equal shares of it: with n_d cells
+    in the order of the frame at depth d, the 3 n_d (cell, block type) children are 1 / (3 n_d)
+    of it each, the ones before the child being searched are done, and so on down the path.
+    """
+    fraction, width = 0.0, 1.0
+    for frame in frames:
+        order, i, k = frame[0], frame[1], frame[2]
+        if not order:
+            break
+        width /= 3 * len(order)
+        fraction += (3 * i + k) * width
+    return fraction
+
+
+def print_report(report):
+    """Default callback of SolveProgress."""
+    print(f"[PROGRESS] {report}")
+
+
+class SolveProgress:
+    '''
+    Throttled progress channel of a solve: Solver(board, progress=SolveProgress(callback))
+    calls callback with a ProgressReport every interval seconds while it searches. A solve
+    shorter than interval reports nothing.
+
+    The solver counts its nodes down to the next sample, every sample_nodes nodes it
+    simulates; a sample only keeps the target coverage of the node and reads the clock. The
+    reports, and the walk along the search path they need, happen once an interval. Costs stay
+    under a percent of a search even in bitboard mode, at the price of the best coverage being
+    the best among the sampled nodes.
+
+    callback: *callable*
+        Called with every ProgressReport; print_report() by default.
+    interval: *float*
+        Seconds between two reports.
+    sample_nodes: *int*
+        Nodes between two samples.
+    reports: *int*
+        Reports made during the current solve.
+    '''
+    def __init__(self, callback=None, interval=1.0, sample_nodes=8):
+        self.callback = callback if callback is not None else print_report
+        self.interval = interval
+        self.sample_nodes = sample_nodes
+        self.reports = 0
+        self._targets = 0
+        self._fewest_missed = 0
+        self._count = len
+        self._start = self._last_time = self._next_report = 0.0
+        self._last_nodes = 0
+
+    def start(self, solver):
+        """Begin a new solve of solver (called by Solver.reset_search())."""
+        self.reports = 0
+        self._targets = len(solver.original_targets)
+        self._fewest_missed = self._targets
+        # Missed targets are a mask in bitboard mode, a collection of points otherwise
+        self._count = int.bit_count if solver.bits is not None else len
+        self._start = self._last_time = time.monotonic()
+        self._next_report = self._start + self.interval
+        self._last_nodes = 0
+
+    def sample(self, solver):
+        """
+        Sample the node solver just simulated, and report if an interval has passed since the
+        last report. Returns the number of nodes until the next sample.
+        """
+        missed = self._count(solver.remaining_targets)
+        if missed < self._fewest_missed:
+            self._fewest_missed = missed
+        now = time.monotonic()
+        if now >= self._next_report:
+            self._report(solver, now)
+        return self.sample_nodes
+
+    def _report(self, solver, now):
+        nodes = solver.nodes_expanded
+        rate = (nodes - self._last_nodes) / (now - self._last_time) if now > self._last_time else 0.0
+        frames = solver.path_frames()
+        fraction = search_fraction(frames)
+        elapsed = now - self._start
+        eta = elapsed * (1 - fraction) / fraction if fraction > 0 else None
+        self._last_time, self._last_nodes = now, nodes
+        self._next_report = now + self.interval
+        self.reports += 1
+        self.callback(ProgressReport(nodes, rate, len(frames), self._targets - self._fewest_missed,
+                                     self._targets, fraction, elapsed, eta))
@@ -0,0 +1,186 @@
+from array import array
+from functools import lru_cache
+
+
+class RayLines:
+    '''
+    The diagonal lines of the padded half-grid of one grid size, shared by every board of that size.
+    A beam that does not collide stays on one line, so a run of plain half steps is a slice of it.
+
+    line_of, pos_of: *list[int]*
+        For every (point, direction) index of BoardGeometry.step_cells, its line and position on it.
+    points: *list[list[tuple[int, int]]]*
+        The points of each line, in the direction of travel.
+    cells: *list[list[tuple[int, int] | None]]*
+        For each point of a line, the cell crossed by the half step to the next point, or None.
+    cell_states: *dict[tuple[int, int], list[int]]*
+        The (point, direction) indexes whose next half step crosses each cell.
+    '''
+    def __init__(self, geometry):
+        self.line_of = [-1] * len(geometry.step_cells)
+        self.pos_of = [0] * len(geometry.step_cells)
+        self.points = []
+        self.cells = []
+        self.cell_states = {}
+
+        def inside(x, y):
+            return -1 <= x <= geometry.max_x + 1 and -1 <= y <= geometry.max_y + 1
+
+        for vx in (-1, 1):
+            for vy in (-1, 1):
+                for y in range(-1, geometry.max_y + 2):
+                    for x in range(-1, geometry.max_x + 2):
+                        if self.line_of[geometry.index(x, y, vx, vy)] >= 0:
+                            continue
+                        # Walk back to the first point of the line, then number it forwards
+                        sx, sy = x, y
+                        while inside(sx - vx, sy - vy):
+                            sx, sy = sx - vx, sy - vy
+                        line = len(self.points)
+                        points, cells = [], []
+                        while inside(sx, sy):
+                            state = geometry.index(sx, sy, vx, vy)
+                            cell = geometry.step_cells[state]
+                            self.line_of[state] = line
+                            self.pos_of[state] = len(points)
+                            if cell is not None:
+                                self.cell_states.setdefault(cell, []).append(state)
+                            points.append((sx, sy))
+                            cells.append(cell)
+                            sx, sy = sx + vx, sy + vy
+                        self.points.append(points)
+                        self.cells.append(cells)
+
+    @classmethod
+    def from_states(cls, geometry, line_offsets, line_states):
+        """
+        Rebuild the lines from the output of states(), e.g. read from a shared SolverContext,
+        without walking the half-grid again.
+        """
+        lines = cls.__new__(cls)
+        lines.line_of = [-1] * len(geometry.step_cells)
+        lines.pos_of = [0] * len(geometry.step_cells)
+        lines.points = []
+        lines.cells = []
+        lines.cell_states = {}
+        step_cells, width = geometry.step_cells, geometry.width
+        for line in range(len(line_offsets) - 1):
+            states = line_states[line_offsets[line]:line_offsets[line + 1]]
+            cells = [step_cells[state] for state in states]
+            for pos, state in enumerate(states):
+                lines.line_of[state] = line
+                lines.pos_of[state] = pos
+                if cells[pos] is not None:
+                    lines.cell_states.setdefault(cells[pos], []).append(state)
+            lines.points.append([((state >> 2) % width - 1, (state >> 2) // width - 1) for state in states])
+            lines.cells.append(cells)
+        return lines
+
+    def states(self):
+        """
+        The lines as flat arrays: line i is the (point, direction) indexes
+        line_states[line_offsets[i]:line_offsets[i + 1]]. Returns: (line_offsets, line_states)
+        """
+        line_offsets = array('i', [0])
+        for points in self.points:
+            line_offsets.append(line_offsets[-1] + len(points))
+        line_states = array('i', [0]) * line_offsets[-1]
+        for state, line in enumerate(self.line_of):
+            if line >= 0:
+                line_states[line_offsets[line] + self.pos_of[state]] = state
+        return line_offsets, line_states
+
+
+@lru_cache(maxsize=64)
+def _get_ray_lines(geometry):
+    return RayLines(geometry)
+
+
+class RayTable:
+    '''
+    Jump lengths for Tracer.simulate_single_laser: for every point and diagonal direction, the
+    number of half steps a beam can take before something can happen to it, i.e. before it
+    reaches a target, leaves the board or hits a placed block. The beam covers such a run in
+    one step, so tracing costs scale with the number of interactions instead of the path length.
+
+    The table refers to placed_blocks (not a copy); call update() after every block placed on
+    or removed from a cell.
+
+    lines: *RayLines*
+        The diagonal lines of the board's grid size.
+    jumps: *list[list[int]]*
+        Per line and position, the number of plain half steps from that point.
+    o_count, o_cells: *list[list[int]], list[list[tuple[int, int]]]*
+        Per line, the 'o' cells crossed in order and, per position, how many come before it;
+        the candidates of a run are o_cells[line][o_count[line][start]:o_count[line][end]].
+    o_masks: *list[list[int]]*
+        The same as cell masks for the bitboard tracer (bit r * cols + c): the candidates of
+        a run are o_masks[line][start] ^ o_masks[line][end].
+    '''
+    def __init__(self, geometry, grid, targets, placed_blocks, context=None):
+        """
+        :param context: Optional SolverContext of the grid layout, whose lines and cached
+                        ray_cells() are shared instead of being computed for this board
+        """
+        if context is not None:
+            self.lines = context.ray_lines()
+            self.o_count, self.o_cells, self.o_masks = context.ray_cells()
+        else:
+            self.lines = _get_ray_lines(geometry)
+            self.o_count, self.o_cells, self.o_masks = ray_cells(self.lines, geometry, grid)
+        self.placed_blocks = placed_blocks
+        self.free = []      # Per line and position: no target here and the next point is on the board
+        self.jumps = []
+        targets = set(targets)
+        for points, cells in zip(self.lines.points, self.lines.cells):
+            free = [False] * len(points)
+            for j, (x, y) in enumerate(points[:-1]):
+                nx, ny = points[j + 1]
+                free[j] = (x, y) not in targets and 0 <= nx <= geometry.max_x and 0 <= ny <= geometry.max_y
+            jumps = [0] * (len(points) + 1)
+            for j in range(len(points) - 1, -1, -1):
+                if free[j] and cells[j] not in placed_blocks:
+                    jumps[j] = jumps[j + 1] + 1
+            self.free.append(free)
+            self.jumps.append(jumps)
+
+    def update(self, cell):
+        """Refresh the jump lengths after a block was placed on or removed from cell."""
+        lines = self.lines
+        placed_blocks = self.placed_blocks
+        for state in lines.cell_states.get(cell, ()):
+            line = lines.line_of[state]
+            jumps, free, cells = self.jumps[line], self.free[line], lines.cells[line]
+            # Only the run of points leading up to the cell can change
+            j = lines.pos_of[state]
+            while j >= 0:
+                jump = jumps[j + 1] + 1 if free[j] and cells[j] not in placed_blocks else 0
+                if jump == jumps[j]:
+                    break
+                jumps[j] = jump
+                j -= 1
+
+
+def ray_cells(lines, geometry, grid):
+    """
+    The 'o' cells along every line of a grid layout, the part of a RayTable that does not
+    depend on targets or blocks: per line, the cells crossed in order, the number of them
+    before each position and the same as cell masks (see RayTable).
+    Returns: (o_count, o_cells, o_masks)
+    """
+    o_count, o_cells, o_masks = [], [], []
+    for cells in lines.cells:
+        counts = [0] * (len(cells) + 1)
+        crossed = []
+        masks = [0] * (len(cells) + 1)
+        for j, cell in enumerate(cells):
+            if cell is not None and grid[cell[0]][cell[1]] == 'o':
+                crossed.append(cell)
+                masks[j + 1] = masks[j] | 1 << (cell[0] * geometry.cols + cell[1])
+            else:
+                masks[j + 1] = masks[j]
+            counts[j + 1] = len(crossed)
+        o_count.append(counts)
+        o_cells.append(crossed)
+        o_masks.append(masks)
+    return o_count, o_cells, o_masks
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import shutil
+
+RENDER_INDEX = 'index.json'
+RENDER_INDEX_VERSION = 1
+
+
+def render_key(grid, targets, laser_paths, options):
+    """
+    SHA-256 hex digest of everything a rendering depends on: the grid with its blocks, the
+    targets, the laser paths (lists of (x, y)) and the render options (a JSON-serializable dict).
+    """
+    payload = json.dumps({
+        'grid': ["".join(row) for row in grid],
+        'targets': [list(t) for t in targets],
+        'paths': [[list(p) for p in path] for path in laser_paths],
+        'options': options,
+    }, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class RenderCache:
+    '''
+    Content-addressed store of rendered solutions: the image of a rendering is kept in
+    directory as <key><extension>, key being its render_key(). An index maps every output file
+    the cache wrote to the key of its image, so an output that already holds the image of a
+    key is left alone, and an entry no output refers to anymore (its level changed, or was
+    removed) is stale and deleted.
+
+    Outputs are copies of the entries, not links: rendering into an output again without the
+    cache must not change an entry.
+
+    directory: *str*
+        Where the entries and the index are kept.
+    index: *dict[str, str]*
+        Output path (relative to directory) -> key of the image it holds.
+    stats: *dict[str, int]*
+        hits (renderings reused), misses (renderings stored) and removed (stale entries deleted).
+    '''
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.index = self._read_index()
+        self.stats = {'hits': 0, 'misses': 0, 'removed': 0}
+
+    def entry_path(self, key, extension='.png'):
+        """Path of the entry of key."""
+        return os.path.join(self.directory, key + extension)
+
+    def fetch(self, key, output_path):
+        """
+        Put the image of key at output_path, if the cache has it (nothing to do if the output
+        already is that image). Returns False if the image must be rendered.
+        """
+        entry = self.entry_path(key, os.path.splitext(output_path)[1])
+        if not os.path.exists(entry):
+            return False
+        name = self._name(output_path)
+        if self.index.get(name) != key or not os.path.exists(output_path) or \
+                os.path.getsize(output_path) != os.path.getsize(entry):
+            self._copy(entry, output_path)
+            self._assign(name, key)
+        self.stats['hits'] += 1
+        return True
+
+    def store(self, key, output_path):
+        """Keep the image just rendered at output_path as the entry of key."""
+        self._copy(output_path, self.entry_path(key, os.path.splitext(output_path)[1]))
+        self._assign(self._name(output_path), key)
+        self.stats['misses'] += 1
+
+    def prune(self):
+        """
+        Forget the outputs that were deleted and delete every entry no output refers to.
+        Returns the number of entries deleted.
+        """
+        for name in [name for name in self.index if not os.path.exists(os.path.join(self.directory, name))]:
+            del self.index[name]
+        self._write_index()
+        live = set(self.index.values())
+        removed = 0
+        for filename in os.listdir(self.directory):
+            key, extension = os.path.splitext(filename)
+            if filename != RENDER_INDEX and extension != '.tmp' and key not in live:
+                os.remove(os.path.join(self.directory, filename))
+                removed += 1
+        self.stats['removed'] += removed
+        return removed
+
+    def _name(self, output_path):
+        return os.path.relpath(output_path, self.directory)
+
+    def _assign(self, name, key):
+        """Record that output name holds the image of key; the entry it held may now be stale."""
+        old = self.index.get(name)
+        self.index[name] = key
+        self._write_index()
+        if old is not None and old != key and old not in self.index.values():
+            extension = os.path.splitext(name)[1]
+            if os.path.exists(self.entry_path(old, extension)):
+                os.remove(self.entry_path(old, extension))
+                self.stats['removed'] += 1
+
+    def _copy(self, source, destination):
+        # Through a temporary file, so a reader never sees half an image
+        tmp_path = destination + ".tmp"
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, destination)
+
+    def _read_index(self):
+        path = os.path.join(self.directory, RENDER_INDEX)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if state.get('version') != RENDER_INDEX_VERSION:
+            return {}
+        return dict(state['outputs'])
+
+    def _write_index(self):
+        path = os.path.join(self.directory, RENDER_INDEX)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': RENDER_INDEX_VERSION, 'outputs': self.index}, f, sort_keys=True)
+        os.replace(tmp_path, path)
@@ -0,0 +1,173 @@
+import gzip
+import json
+import os
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zstd sinks are optional: plain and gzip ones need nothing
+    zstandard = None
+
+COMPRESSIONS = {'.gz': 'gzip', '.zst': 'zstd'}
+
+
+def solve_record(name, fingerprint, result, elapsed, **stats):
+    """
+    The record of one solved puzzle: name, fingerprint, status (solved or unsolvable), the
+    placements of the solution as [r, c, block type], elapsed seconds, the time it was written,
+    and any other JSON-serializable stats (e.g. nodes).
+    """
+    record = {'name': name, 'fingerprint': fingerprint,
+              'status': 'solved' if result.solved else 'unsolvable',
+              'placements': [[r, c, t] for (r, c), t in sorted(result.placed_blocks().items())],
+              'elapsed': round(elapsed, 6), 'time': round(time.time(), 3)}
+    record.update(stats)
+    return record
+
+
+def _decompressor(compression):
+    """A new decompressor of one gzip member or zstd frame (None for plain files)."""
+    if compression == 'gzip':
+        return zlib.decompressobj(wbits=31)
+    if compression == 'zstd':
+        return zstandard.ZstdDecompressor().decompressobj()
+    return None
+
+
+def _frames(file, compression, chunk_size=1 << 20):
+    """
+    Yield (end offset, data) of every complete frame (gzip member or zstd frame) of file, in
+    order. A frame cut short, as the last one of a file written by a process that crashed, is
+    not yielded.
+    """
+    decompressor, parts = _decompressor(compression), []
+    offset = 0
+    while True:
+        data = file.read(chunk_size)
+        if not data:
+            return
+        offset += len(data)
+        while data:
+            parts.append(decompressor.decompress(data))
+            if not decompressor.eof:
+                break
+            data = decompressor.unused_data
+            yield offset - len(data), b''.join(parts)
+            decompressor, parts = _decompressor(compression), []
+
+
+class ResultSink:
+    '''
+    Buffered, append-only JSONL file of records, one per line, for a batch of solves. Records
+    are encoded as they are written, and reach the file in one write per flush: every
+    flush_records records, and when flush_interval seconds passed since the last flush.
+
+    Compressed sinks (gzip for .gz, zstd for .zst, the latter needing the zstandard package)
+    write every flush as a frame of its own (a gzip member, a zstd frame), which the
+    decompressors read as one stream. A crash can only leave the last line or frame incomplete:
+    read_records() ignores it, and opening the sink again cuts it off before appending.
+
+    path: *str*
+        The file; it is created if needed, and records are appended to the ones it has.
+    compression: *str or None*
+        'gzip', 'zstd' or None, by default from the extension of path.
+    fsync: *bool*
+        Whether every flush also waits until the data is on disk (surviving power loss,
+        not only a crash of the process).
+    records: *int*
+        Records written through this sink so far.
+    '''
+    def __init__(self, path, compression='auto', flush_records=1000, flush_interval=1.0, fsync=False):
+        if compression == 'auto':
+            compression = COMPRESSIONS.get(os.path.splitext(path)[1])
+        if compression not in (None, 'gzip', 'zstd'):
+            raise ValueError(f"Unknown compression {compression!r}")
+        if compression == 'zstd' and zstandard is None:
+            raise RuntimeError("zstd result files need the zstandard package")
+        self.path = path
+        self.compression = compression
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.records = 0
+        self._lines = []
+        self._last_flush = time.monotonic()
+        self._compressor = zstandard.ZstdCompressor() if compression == 'zstd' else None
+        self._file = open(path, 'ab')
+        self._file.truncate(self._complete_length())
+
+    def _complete_length(self):
+        """Length of the file without a record or frame cut short by a crash."""
+        with open(self.path, 'rb') as file:
+            if self.compression is None:
+                end = file.seek(0, os.SEEK_END)
+                while end > 0:
+                    start = max(0, end - 65536)
+                    file.seek(start)
+                    newline = file.read(end - start).rfind(b'\n')
+                    if newline >= 0:
+                        return start + newline + 1
+                    end = start
+                return 0
+            length = 0
+            for length, _ in _frames(file, self.compression):
+                pass
+            return length
+
+    def write(self, record):
+        """Add one record (a JSON-serializable dict)."""
+        self._lines.append(json.dumps(record, separators=(',', ':')))
+        self.records += 1
+        if len(self._lines) >= self.flush_records or \
+                time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered records to the file."""
+        self._last_flush = time.monotonic()
+        if not self._lines:
+            return
+        data = ('\n'.join(self._lines) + '\n').encode('utf-8')
+        self._lines = []
+        if self.compression == 'gzip':
+            data = gzip.compress(data, compresslevel=6, mtime=0)
+        elif self.compression == 'zstd':
+            data = self._compressor.compress(data)
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        """Flush and close the file."""
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_records(path, compression='auto'):
+    """
+    Yield the records of a file written by ResultSink, in order, without the incomplete last
+    line or frame a crash may have left.
+    """
+    if compression == 'auto':
+        compression = COMPRESSIONS.get(os.path.splitext(path)[1])
+    if compression == 'zstd' and zstandard is None:
+        raise RuntimeError("zstd result files need the zstandard package")
+    with open(path, 'rb') as file:
+        if compression is None:
+            for line in file:
+                if line.endswith(b'\n'):
+                    yield json.loads(line)
+            return
+        for _, data in _frames(file, compression):
+            for line in data.splitlines():
+                yield json.loads(line)
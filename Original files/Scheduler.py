@@ -0,0 +1,80 @@
+import asyncio
+from collections import deque
+
+
+class RoundRobin:
+    '''
+    Interleaves the solves of several iterative Solvers on one thread, in slices of
+    Solver.solve_steps(): step() gives the next unfinished solve one slice, in turn, so that
+    every solve gets the same share of the thread, and the host gets control back after every
+    slice, i.e. after slice_microseconds at most plus the node running when time was up.
+
+    slice_microseconds: *float or None*
+        Time budget of a slice.
+    slice_nodes: *int or None*
+        Node budget of a slice (both budgets may be given; the first one spent ends the slice).
+    outcomes: *dict*
+        Name -> outcome (True or False) of every finished solve.
+    slices: *dict*
+        Name -> number of slices every solve was given.
+    '''
+    def __init__(self, slice_microseconds=2000, slice_nodes=None):
+        self.slice_microseconds = slice_microseconds
+        self.slice_nodes = slice_nodes
+        self.outcomes = {}
+        self.slices = {}
+        self._queue = deque()  # Names of the unfinished solves, the next one to run first
+        self._solvers = {}
+
+    def add(self, name, solver):
+        """Queue the solve of solver (made with iterative=True) under name."""
+        if name in self._solvers:
+            raise ValueError(f"A solve named {name!r} was already added")
+        self._solvers[name] = solver
+        self.slices[name] = 0
+        self._queue.append(name)
+
+    @property
+    def pending(self):
+        """Names of the unfinished solves."""
+        return list(self._queue)
+
+    def step(self):
+        """
+        Give the next unfinished solve one slice; returns its name, or None if all are over.
+        A solve interrupted by its time limit or should_stop() is dropped, its SolveInterrupted
+        propagating.
+        """
+        if not self._queue:
+            return None
+        name = self._queue.popleft()
+        self.slices[name] += 1
+        outcome = self._solvers[name].solve_steps(self.slice_nodes, self.slice_microseconds)
+        if outcome is None:
+            self._queue.append(name)
+        else:
+            self.outcomes[name] = outcome
+        return name
+
+    def run(self, callback=None):
+        """
+        Step until every solve is over, calling callback() between two slices (where a host would
+        handle its events); returns outcomes.
+        """
+        while self.step() is not None:
+            if callback is not None:
+                callback()
+        return self.outcomes
+
+
+async def solve_async(solver, slice_microseconds=2000):
+    """
+    Solve an iterative solver in the running asyncio loop, yielding to the other tasks after
+    every slice of about slice_microseconds; returns the outcome of the solve. Several such
+    tasks share the loop's thread the way RoundRobin shares it.
+    """
+    while True:
+        outcome = solver.solve_steps(max_microseconds=slice_microseconds)
+        if outcome is not None:
+            return outcome
+        await asyncio.sleep(0)
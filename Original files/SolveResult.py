@@ -0,0 +1,178 @@
+import struct
+from array import array
+
+BLOCK_TYPES = 'ABC'
+# magic, solved, rows, cols, targets, placements, paths, points (native byte order: results
+# are shared between processes of one machine, not stored)
+HEADER = struct.Struct('=4sB x H H H I I I')
+MAGIC = b'LZR1'
+
+
+class SolveResult:
+    '''
+    Immutable, compact result of one solve that can be shared between processes.
+
+    Everything is stored in flat arrays, so the result can be written into any writable buffer
+    (e.g. a multiprocessing.shared_memory block) and read back as read-only memoryviews
+    without unpickling or copying.
+
+    solved: *bool*
+        Whether the placements hit every target.
+    rows, cols: *int*
+        Size of the grid.
+    cells: *bytes or memoryview*
+        The unsolved grid, one byte per cell, row by row.
+    placements: *array('i') or memoryview*
+        One int per placed block: (r * cols + c) * 3 + index of the type in 'ABC'.
+    target_points: *array('h') or memoryview*
+        Target coordinates as x0, y0, x1, y1, ...
+    path_offsets: *array('i') or memoryview*
+        Beam i owns points path_offsets[i] to path_offsets[i + 1] - 1.
+    points: *array('h') or memoryview*
+        Beam path points as x0, y0, x1, y1, ...
+    '''
+    __slots__ = ('solved', 'rows', 'cols', 'cells', 'placements', 'target_points',
+                 'path_offsets', 'points', '_views', '_shm')
+
+    def __init__(self, solved, rows, cols, cells, placements, target_points, path_offsets, points,
+                 _views=(), _shm=None):
+        for name, value in (('solved', bool(solved)), ('rows', rows), ('cols', cols), ('cells', cells),
+                            ('placements', placements), ('target_points', target_points),
+                            ('path_offsets', path_offsets), ('points', points),
+                            ('_views', list(_views)), ('_shm', _shm)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SolveResult is immutable")
+
+    @classmethod
+    def from_solver(cls, solver, solved=True):
+        """Build a result from a Solver after solve(): its placed blocks and final laser paths."""
+        grid = solver.original_grid
+        rows, cols = len(grid), len(grid[0]) if grid else 0
+        placements = array('i', sorted((r * cols + c) * 3 + BLOCK_TYPES.index(t)
+                                       for (r, c), t in solver.placed_blocks.items()))
+        target_points = array('h', [v for target in solver.original_targets for v in target])
+        path_offsets = array('i', [0])
+        points = array('h')
+        for path in (solver.final_paths if solved else []):
+            for (x, y) in path:
+                points.append(x)
+                points.append(y)
+            path_offsets.append(len(points) // 2)
+        cells = "".join(cell[0] for row in grid for cell in row).encode('ascii')
+        return cls(solved, rows, cols, cells, placements, target_points, path_offsets, points)
+
+    # --- binary form -----------------------------------------------------------------------
+
+    @property
+    def nbytes(self):
+        """Size of the binary form in bytes."""
+        return (HEADER.size + 4 * (len(self.placements) + len(self.path_offsets))
+                + 2 * (len(self.points) + len(self.target_points)) + len(self.cells))
+
+    def write_into(self, buffer, offset=0):
+        """Write the binary form into a writable buffer at offset; returns the number of bytes written."""
+        out = memoryview(buffer).cast('B')
+        HEADER.pack_into(out, offset, MAGIC, self.solved, self.rows, self.cols,
+                         len(self.target_points) // 2, len(self.placements),
+                         len(self.path_offsets) - 1, len(self.points) // 2)
+        pos = offset + HEADER.size
+        for section in (self.placements, self.path_offsets, self.points, self.target_points, self.cells):
+            data = memoryview(section).cast('B')
+            out[pos:pos + len(data)] = data
+            pos += len(data)
+        return pos - offset
+
+    def to_bytes(self):
+        """Return the binary form as bytes."""
+        data = bytearray(self.nbytes)
+        self.write_into(data)
+        return bytes(data)
+
+    @classmethod
+    def from_buffer(cls, buffer, offset=0, _shm=None):
+        """
+        Read a result written by write_into() without copying: the arrays of the returned
+        result are read-only memoryviews into buffer. Call release() before freeing the buffer.
+        """
+        view = memoryview(buffer).cast('B').toreadonly()
+        magic, solved, rows, cols, n_targets, n_placements, n_paths, n_points = HEADER.unpack_from(view, offset)
+        if magic != MAGIC:
+            raise ValueError("buffer does not hold a SolveResult")
+        views = []
+        pos = offset + HEADER.size
+
+        def take(nbytes, fmt):
+            nonlocal pos
+            part = view[pos:pos + nbytes]
+            pos += nbytes
+            views.append(part)
+            if fmt != 'B':
+                part = part.cast(fmt)
+                views.append(part)
+            return part
+
+        placements = take(4 * n_placements, 'i')
+        path_offsets = take(4 * (n_paths + 1), 'i')
+        points = take(4 * n_points, 'h')
+        target_points = take(4 * n_targets, 'h')
+        cells = take(rows * cols, 'B')
+        views.append(view)
+        return cls(solved, rows, cols, cells, placements, target_points, path_offsets, points,
+                   _views=views, _shm=_shm)
+
+    def to_shared_memory(self):
+        """Copy the result once into a new SharedMemory block and return the block."""
+        # Imported on use: multiprocessing costs more to import than the whole solve path
+        from multiprocessing import shared_memory
+        shm = shared_memory.SharedMemory(create=True, size=max(1, self.nbytes))
+        self.write_into(shm.buf)
+        return shm
+
+    @classmethod
+    def from_shared_memory(cls, name):
+        """Attach to a block made by to_shared_memory() in another process (zero-copy)."""
+        from multiprocessing import shared_memory
+        shm = shared_memory.SharedMemory(name=name)
+        return cls.from_buffer(shm.buf, _shm=shm)
+
+    def release(self, unlink=False):
+        """
+        Drop the memoryviews into the underlying buffer; with a shared memory block also close it,
+        and unlink it if this process is the last user.
+        """
+        for view in reversed(self._views):
+            view.release()
+        self._views.clear()
+        if self._shm is not None:
+            self._shm.close()
+            if unlink:
+                self._shm.unlink()
+            object.__setattr__(self, '_shm', None)
+
+    # --- Python views, e.g. for LazorVisualizer -------------------------------------------------
+
+    def placed_blocks(self):
+        """Return the placements as a dict (r, c) -> 'A'/'B'/'C'."""
+        return {divmod(code // 3, self.cols): BLOCK_TYPES[code % 3] for code in self.placements}
+
+    @property
+    def grid(self):
+        """The solved grid as a list of rows, with the placed blocks filled in."""
+        cells = bytes(self.cells).decode('ascii')
+        grid = [list(cells[r * self.cols:(r + 1) * self.cols]) for r in range(self.rows)]
+        for (r, c), block_type in self.placed_blocks().items():
+            grid[r][c] = block_type
+        return grid
+
+    @property
+    def targets(self):
+        """Target points as a list of (x, y)."""
+        return [(self.target_points[i], self.target_points[i + 1]) for i in range(0, len(self.target_points), 2)]
+
+    def paths(self):
+        """Laser paths as lists of (x, y), as Solver.final_paths expands them."""
+        points = self.points
+        return [[(points[2 * i], points[2 * i + 1]) for i in range(self.path_offsets[k], self.path_offsets[k + 1])]
+                for k in range(len(self.path_offsets) - 1)]
@@ -1,5 +1,19 @@
-import copy
+import os
+import time
 from Classes import Board, Laser, A_Block, B_Block, C_Block
+from LaserTrace import LaserTrace
+from LaserPaths import LaserPaths
+from Tracer import simulate_lasers, simulate_lasers_bits, simulate_single_laser
+from RayTable import RayTable
+from Bitboard import BoardBits, placement_codes, placement_mask
+from StaticAnalysis import analyze_board
+from Nogood import NogoodStore
+from SolveResult import SolveResult
+from Profiler import profile_phase
+from SolverContext import get_context
+from Kernel import JIT_AVAILABLE, TraceKernel
+from Checkpoint import (board_fingerprint, encode_placement, decode_placement,
+                        write_checkpoint, read_checkpoint)
 
 def get_cell_edge_points(r, c):
     """
@@ -13,53 +27,372 @@ def get_cell_edge_points(r, c):
         (2*c,   2*r+1)    # Left edge midpoint (even, odd)
     }
 
+# Slots of a frame of the explicit stack of Solver.search()
+_ORDER, _I, _K, _BIT, _STATE, _CONFLICT, _EXHAUSTED, _RESUMING, _GAVE = range(9)
+
+class SolveInterrupted(Exception):
+    """Raised by Solver.solve() when its time limit passes or should_stop() returns True."""
+
 class Solver:
-    def __init__(self, board, debug=False):
+    def __init__(self, board, debug=False, checkpoint_path=None, checkpoint_interval=60.0,
+                 record_trace=False, time_limit=None, should_stop=None, ray_jump=False,
+                 bitboards=False, prune_dead_cells=False, bidirectional=False,
+                 learn_nogoods=False, max_nogoods=100000, iterative=False, profile=None, context=None,
+                 jit=False, progress=None):
         """
         :param board: Board object containing grid/blocks/lasers/targets
         :param debug: If True, detailed debug information will be printed to the console
+        :param checkpoint_path: If given, the search state is periodically saved to this file
+        :param checkpoint_interval: Minimum number of seconds between two checkpoints
+        :param record_trace: If True, solve() keeps a LaserTrace of the solution in self.trace
+                             (the solution's paths are always kept in self.final_paths)
+        :param time_limit: Optional number of seconds after which solve() raises SolveInterrupted
+        :param should_stop: Optional callable polled during the search; solve() raises SolveInterrupted once it returns True
+        :param ray_jump: If True, beams skip runs of empty half steps using a RayTable kept up to date by backtrack()
+        :param bitboards: If True, targets, candidate cells and search states are int bitmasks (see Bitboard.py);
+                          candidates are then tried in cell order, so the search may find a different solution
+        :param prune_dead_cells: If True, blocks are only tried on cells where the static analysis says a
+                                 reflection could lead towards a target (see StaticAnalysis.py)
+        :param bidirectional: If True, blocks are only tried on cells where a current beam, reflected,
+                              enters the backward light cone of a target that is not hit yet
+        :param learn_nogoods: If True, every failed subtree is explained by a small subset of its placements
+                              (a nogood, see Nogood.py) and any later node containing it is skipped
+        :param max_nogoods: Maximum number of nogoods kept
+        :param iterative: If True, solve() runs search(), the same search as backtrack() on an explicit stack
+                          instead of recursion, so it is not limited by the Python recursion limit
+        :param profile: Optional SolveProfile (see Profiler.py); solve() records its initial candidates
+                        and search phases in it. Simulations then run in the Python tracer, whose
+                        simulation and collision phases it labels, even with jit
+        :param context: SolverContext of the board's grid layout (see SolverContext.py); by default the
+                        one get_context() shares between all boards with this grid
+        :param jit: If True, simulations run the flat-array kernel of Kernel.py, compiled when Numba is
+                    installed, interpreted otherwise (only useful to test it). It leaves traces, paths,
+                    nogood learning and debug output to the Python tracer; the candidates of a node are
+                    the same, but without bitboards they may be tried in another order, so the search
+                    may find a different solution
+        :param progress: Optional SolveProgress (see Progress.py), which samples the search every few
+                         nodes and reports nodes/s, depth, best coverage and ETA every interval
         """
         # Save initial state
-        self.original_grid = copy.deepcopy(board.grid)
-        self.original_blocks = copy.deepcopy(board.blocks)
-        self.original_targets = copy.deepcopy(board.targets)
+        self.original_grid = [list(row) for row in board.grid]
+        self.original_blocks = dict(board.blocks)
+        self.original_targets = list(board.targets)
 
         self.board = board       # Current board object
+        if context is None:
+            context = get_context(board.grid)
+        elif not context.matches(board.grid):
+            raise ValueError("The context was made for a different grid")
+        self.context = context   # Read-only tables of the grid layout
+        self.geometry = context.geometry
         self.debug = debug       # Debug flag
         self.placed_blocks = {}  # Placed blocks, mapping (r, c) -> 'A','B','C'
-        self.final_paths = []    # Final laser trajectory paths
+        self.final_paths = LaserPaths()  # Laser paths of the solution, as compact segments
+        # Beams of the current node for the bidirectional filter, rewritten at every node
+        self.node_paths = LaserPaths(compact=False) if bidirectional else None
+        self.record_trace = record_trace
+        self.trace = None        # LaserTrace of the last traced simulation
+        self.solved = None       # Outcome of the last solve()
+        self.ray_jump = ray_jump
+        self.rays = None         # RayTable of the running solve when ray_jump is set
+        self.bits = BoardBits(self.geometry, board.grid, board.targets, context) if bitboards else None
+        self.kernel = TraceKernel(self.geometry, board.grid, board.targets, context, JIT_AVAILABLE) \
+            if jit and profile is None and TraceKernel.supports(board.targets) else None
+        self.placement_bits = 0  # The placed blocks as a mask of 1 << encode_placement() bits
+        self.prune_dead_cells = prune_dead_cells
+        self.bidirectional = bidirectional
+        self.analysis = None     # BoardAnalysis of the board, made by solve()
+        self.remaining_targets = None  # Targets missed by the last simulation (a mask in bitboard mode)
+        self.learn_nogoods = learn_nogoods
+        self.max_nogoods = max_nogoods
+        self.nogoods = None      # NogoodStore of the running solve when learn_nogoods is set
+        self._touched = None     # Cells of the blocks hit by the last simulation (nogood learning)
+        self._conflict = 0       # Nogood explaining the last failed backtrack() call
+
+        # Search state, kept explicit so that it can be checkpointed and resumed
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.nodes_expanded = 0     # Number of backtrack() calls so far
+        self.failed_states = set()  # frozensets of placed_blocks whose subtree has no solution
+        self.frames = []            # DFS stack: one [candidate list, cell index, block index] per depth
+        self._resume_frames = None  # Frames loaded from a checkpoint, consumed while re-descending
+        self._last_checkpoint = time.monotonic()
+        self.iterative = iterative
+        self.stack = None           # Preallocated frames of search(), one per depth
+        self.depth = 0              # Number of frames of self.stack in use
+        self._pending = None        # Where search() paused in solve_steps(), or None
+        self._base = []             # Placements solve_subtree() started from, below which split_work() gives
+
+        self.time_limit = time_limit
+        self.should_stop = should_stop
+        self._deadline = None
+        self.profile = profile
+        self.progress = progress
+        self._progress_countdown = 0  # Nodes until the next sample of progress
 
     def debug_print(self, *args):
         """Prints only when debug is True."""
         if self.debug:
             print(*args)
 
-    def solve(self):
+    def solve(self, resume_from=None):
         """
         External entry point: Executes the solving process.
           1. Reset the board to its initial state
           2. Simulate lasers in a block-free state to obtain initial candidate cells
           3. Backtrack to place blocks; return True if all targets are hit, otherwise False
+        :param resume_from: Optional checkpoint file; the search continues exactly where it stopped
+        Raises SolveInterrupted if the time limit passes or should_stop() asks for it; with a
+        checkpoint_path the search state is saved first, so the solve can be resumed later.
         """
-        # Reset
-        self.board.grid = copy.deepcopy(self.original_grid)
-        self.board.blocks = copy.deepcopy(self.original_blocks)
-        self.board.targets = copy.deepcopy(self.original_targets)
-        self.placed_blocks.clear()
-        self.final_paths.clear()
+        self.reset_search()
+
+        # (0) Boards with a target that no placement can reach are rejected without a search
+        if self.analysis.unreachable_targets:
+            self.debug_print("[solve] Unreachable targets:", self.analysis.unreachable_targets)
+            self.solved = False
+            return False
+
+        if resume_from is not None:
+            self.load_checkpoint(resume_from)
+            self.debug_print(f"[solve] Resuming from {resume_from} at depth {len(self._resume_frames)}")
 
         # (1) Collect initial candidate cells in block-free state
-        initial_candidates = self.simulate_no_blocks_initial()
+        with self.phase('initial candidates'):
+            initial_candidates = self.simulate_no_blocks_initial()
         self.debug_print("[solve] Initial candidate cells =", initial_candidates)
 
         # (2) Backtracking
-        success = self.backtrack(initial_candidates)
+        with self.phase('search'):
+            success = self.search() if self.iterative else self.backtrack(initial_candidates)
+            if success:
+                # Paths are only recorded for the accepted solution
+                self.simulate_with_blocks(trace=self.record_trace, record_paths=True)
+        return self._finish(success)
+
+    def _finish(self, success):
+        """End of a search of solve() or solve_steps(): report, drop its checkpoint, keep its outcome."""
         if success:
             self.debug_print("[solve] Solution found!")
         else:
             self.debug_print("[solve] No solution.")
+        if self.nogoods is not None:
+            self.debug_print("[solve] Nogoods:", self.nogoods.stats())
+
+        # The search is over, a checkpoint of it would only resume a finished run
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        self.solved = success
         return success
 
+    def solve_steps(self, max_nodes=None, max_microseconds=None):
+        """
+        Cooperative solve() for hosts that cannot block, e.g. an event loop or a GUI: advance the
+        search by at most max_nodes nodes or about max_microseconds (the node running when time
+        is up is finished first), then return, the search state staying in the solver.
+        Returns None while the search is not over, then its outcome, as solve() would; once over,
+        further calls return that outcome until reset_search() or solve() starts a new search.
+        Interruptions are those of solve(), after which the next call starts a new search. Only
+        valid in iterative mode, whose explicit stack lets the search stop and resume between
+        any two nodes. Scheduler.py interleaves such solves on one thread.
+        """
+        if not self.iterative:
+            raise RuntimeError("solve_steps() needs an iterative solver")
+        if self._pending is None:
+            if self.solved is not None:
+                return self.solved
+            self.reset_search()
+            if self.analysis.unreachable_targets:
+                self.debug_print("[solve] Unreachable targets:", self.analysis.unreachable_targets)
+                self.solved = False
+                return False
+            with self.phase('initial candidates'):
+                self.simulate_no_blocks_initial()
+        stop_nodes = None if max_nodes is None else self.nodes_expanded + max_nodes
+        deadline = None if max_microseconds is None else time.perf_counter() + max_microseconds / 1e6
+        with self.phase('search'):
+            try:
+                outcome = self.search(self._pending, stop_nodes, deadline)
+            except SolveInterrupted:
+                self._pending = None  # The next call starts over; solve(resume_from=...) resumes
+                raise
+            if outcome is None:
+                return None
+            self._pending = None
+            if outcome:
+                self.simulate_with_blocks(trace=self.record_trace, record_paths=True)
+        return self._finish(outcome)
+
+    def solve_subtree(self, placements):
+        """
+        Search only the subtree of one node, e.g. a work unit of Distributed.py: the node reached
+        from the initial board by placing placements ((r, c, block type) triples, in order).
+        Returns True if a solution was found below it (left in self.placed_blocks, with its paths
+        in self.final_paths), otherwise False. Interruptions are those of solve().
+        The failed states (or nogoods) of earlier calls are kept: the subtrees are all parts of
+        the same board's search, so a placement set that failed in one fails in every other.
+        """
+        failed_states, nogoods = self.failed_states, self.nogoods
+        self.reset_search()
+        self.failed_states = failed_states
+        if nogoods is not None:
+            self.nogoods = nogoods
+        if self.analysis.unreachable_targets:
+            self.solved = False
+            return False
+        for r, c, block_type in placements:
+            self.place_block(r, c, block_type)
+        self._base = list(placements)
+
+        with self.phase('search'):
+            success = self.search() if self.iterative else self.backtrack(None)
+            if success:
+                self.simulate_with_blocks(trace=self.record_trace, record_paths=True)
+        self.solved = success
+        return success
+
+    def split_work(self):
+        """
+        Give part of the running search away, for work stealing: the cells of the shallowest node
+        on the current path that still has cells after the one being tried, each with every block
+        type left at that node. This search no longer tries them, so the caller must search them
+        (see solve_subtree()). Only valid in iterative mode, between two nodes, e.g. in should_stop().
+        Returns: the given subtrees, each as its list of placements (empty if there is nothing to give).
+        """
+        if not self.iterative:
+            raise RuntimeError("split_work() needs Solver(iterative=True)")
+        if self._resume_frames is not None:
+            return []
+        # Units are rooted at the node solve_subtree() started from, not at the empty board
+        prefix = list(self._base)
+        blocks = dict(self.original_blocks)
+        for _, _, block_type in prefix:
+            blocks[block_type] -= 1
+        for depth, frame in enumerate(self.stack[:self.depth]):
+            order, i = frame[_ORDER], frame[_I]
+            taken = {(r, c) for (r, c, _) in prefix}
+            units = [prefix + [(r, c, block_type)] for (r, c) in order[i + 1:] if (r, c) not in taken
+                     and self.original_grid[r][c] == 'o'
+                     for block_type in 'ABC' if blocks.get(block_type, 0) >= 1]
+            if units:
+                frame[_ORDER] = order[:i + 1]
+                # This node and its ancestors no longer fail here alone: they must not learn
+                for ancestor in self.stack[:depth + 1]:
+                    ancestor[_GAVE] = True
+                return units
+            if not frame[_BIT]:
+                break
+            (r, c), block_type = order[i], 'ABC'[frame[_K]]
+            prefix.append((r, c, block_type))
+            blocks[block_type] -= 1
+        return []
+
+    def phase(self, name):
+        """Context manager of a phase of self.profile, if any (see Profiler.SolveProfile.phase)."""
+        return profile_phase(self.profile, name)
+
+    def reset_search(self):
+        """Put the board back in its initial state and clear every search structure."""
+        # Rows are the only nested values that change: the rest of the state is flat
+        self.board.grid = [list(row) for row in self.original_grid]
+        self.board.blocks = dict(self.original_blocks)
+        self.board.targets = list(self.original_targets)
+        self.placed_blocks.clear()
+        self.placement_bits = 0
+        self.final_paths.clear()
+        self.trace = None
+        self.solved = None
+        self.nodes_expanded = 0
+        self._pending = None
+        self._base = []
+        self.failed_states = set()
+        self.nogoods = NogoodStore(self.max_nogoods) if self.learn_nogoods else None
+        self.frames = []
+        self._resume_frames = None
+        self._last_checkpoint = time.monotonic()
+        if self.iterative:
+            # A node below the root holds one more block than its parent
+            self.stack = [[None, 0, 0, 0, None, 0, 0, False, False]
+                          for _ in range(sum(self.original_blocks.values()) + 1)]
+            self.depth = 0
+        self._deadline = None if self.time_limit is None else time.monotonic() + self.time_limit
+        self.rays = RayTable(self.geometry, self.board.grid, self.board.targets,
+                             self.placed_blocks, self.context) if self.ray_jump else None
+        if self.progress is not None:
+            self.progress.start(self)
+            self._progress_countdown = self.progress.sample_nodes
+        if self.analysis is None:
+            self.analysis = analyze_board(self.geometry, self.original_grid, self.board.lasers,
+                                          self.original_targets, self.original_blocks, self.context)
+
+    def result(self):
+        """
+        Return the outcome of the last solve() as an immutable SolveResult (placements and
+        beam paths in flat arrays), which can be shared with other processes without pickling.
+        """
+        return SolveResult.from_solver(self, solved=bool(self.solved))
+
+    def save_checkpoint(self, path=None):
+        """
+        Serialize the current search state (DFS stack, placed blocks, remaining block counts
+        and the failed-state cache or the nogoods) to path (defaults to checkpoint_path).
+        Only valid between two nodes, i.e. when called from backtrack().
+        """
+        path = path or self.checkpoint_path
+        cols = len(self.original_grid[0]) if self.original_grid else 0
+        frames = [[[r * cols + c for (r, c) in frame[0]], frame[1], frame[2]] for frame in self.path_frames()]
+        if self.nogoods is not None:
+            # A nogood is a failed placement set as well, only a more general one
+            failed = [placement_codes(nogood) for nogood in self.nogoods.masks()]
+        elif self.bits is not None:
+            failed = [placement_codes(state) for state in self.failed_states]
+        else:
+            failed = [sorted(encode_placement(r, c, t, cols) for ((r, c), t) in state)
+                      for state in self.failed_states]
+        write_checkpoint(path, {
+            'board': board_fingerprint(self.original_grid, self.board.lasers,
+                                       self.original_targets, self.original_blocks),
+            'frames': frames,
+            'placed': [encode_placement(r, c, t, cols) for ((r, c), t) in self.placed_blocks.items()],
+            'blocks': self.board.blocks,
+            'failed': failed,
+            'nodes': self.nodes_expanded,
+        })
+        self._last_checkpoint = time.monotonic()
+        self.debug_print(f"[checkpoint] Saved {path} at depth {len(frames)}, {self.nodes_expanded} nodes")
+
+    def path_frames(self):
+        """
+        The frames of the nodes on the current search path, root first; each starts with the
+        node's cell order and the cell and block indexes of the child being searched.
+        """
+        return self.stack[:self.depth] if self.iterative else self.frames
+
+    def load_checkpoint(self, path):
+        """
+        Load a checkpoint written by save_checkpoint(). The DFS stack is replayed lazily by
+        backtrack() or search(), which re-places the recorded blocks before continuing the search.
+        """
+        state = read_checkpoint(path)
+        fingerprint = board_fingerprint(self.original_grid, self.board.lasers,
+                                        self.original_targets, self.original_blocks)
+        if state['board'] != fingerprint:
+            raise ValueError(f"Checkpoint {path} was written for a different board")
+
+        cols = len(self.original_grid[0]) if self.original_grid else 0
+        self._resume_frames = [([divmod(cell, cols) for cell in cands], i, k)
+                               for (cands, i, k) in state['frames']]
+        if self.nogoods is not None:
+            for codes in state['failed']:
+                self.nogoods.add(placement_mask(codes))
+        elif self.bits is not None:
+            self.failed_states = {placement_mask(codes) for codes in state['failed']}
+        else:
+            self.failed_states = {frozenset(((r, c), t) for (r, c, t) in
+                                            (decode_placement(code, cols) for code in codes))
+                                  for codes in state['failed']}
+        self.nodes_expanded = state['nodes']
+
     def simulate_no_blocks_initial(self):
         """
         In a block-free state, for each laser, move in half steps, record the cells it passes through,
@@ -84,224 +417,397 @@ class Solver:
                 laser.x, laser.y = nx, ny
                 steps += 1
 
-            # Analyze consecutive points in the path; if (p1, p2) both fall on the midpoints of opposite edges of an 'o' cell, add that cell to candidates
+            # Analyze consecutive points in the path; if (p1, p2) both fall on the edge midpoints of an 'o' cell, add that cell to candidates
             for i in range(len(path)-1):
-                p1, p2 = path[i], path[i+1]
-                for r in range(len(self.board.grid)):
-                    for c in range(len(self.board.grid[0])):
-                        if self.board.grid[r][c] == 'o':
-                            edges = get_cell_edge_points(r, c)
-                            if p1 in edges and p2 in edges:
-                                candidate_cells.add((r,c))
+                cell = self.geometry.step_cell(path[i], path[i+1])
+                if cell is not None and self.board.grid[cell[0]][cell[1]] == 'o':
+                    candidate_cells.add(cell)
 
         return candidate_cells
 
-    def backtrack(self, candidates):
+    def backtrack(self, candidates, last_bit=None):
         """
         Main backtracking function:
           1) First use simulate_with_blocks() to check if all targets are hit
           2) If not all targets are hit, then try placing A/B/C blocks in new_candidates
           3) Return True if successful, otherwise backtrack
+        The current path is kept in self.frames so that it can be checkpointed; a placement set
+        whose subtree failed is remembered in self.failed_states and never explored twice.
+        With nogood learning a failure is explained instead by the blocks the beams hit, the
+        blocks of every type that ran out, and the explanations of the children; no solution
+        contains that subset, so every node that contains it is skipped.
         """
+        self.nodes_expanded += 1
+        depth = len(self.frames)
+        resuming = self._resume_frames is not None and depth < len(self._resume_frames)
+
+        # The subtree only depends on the placed blocks, so a known failing set can be skipped
+        if self.nogoods is not None:
+            nogood = self.nogoods.find(self.placement_bits, last_bit)
+            if nogood is not None:
+                self._conflict = nogood
+                return False
+            state = None
+        elif self.bits is not None:
+            state = self.placement_bits
+        else:
+            state = frozenset(self.placed_blocks.items())
+        if state in self.failed_states:
+            return False
+
         # Simulate lasers with the current placed blocks
         solved, new_candidates = self.simulate_with_blocks()
+        if self.progress is not None:
+            self._progress_countdown -= 1
+            if self._progress_countdown <= 0:
+                self._progress_countdown = self.progress.sample(self)
         if solved:
             self.debug_print("[backtrack] All targets hit, returning success")
             return True
 
+        # Blocks the beams do not hit could be removed without changing this node
+        conflict = self._placement_mask(self._touched) if self.nogoods is not None else 0
         if not new_candidates:
             self.debug_print("[backtrack] No new candidate cells available, cannot place additional blocks, backtracking")
+            if self.nogoods is not None:
+                self._learn(conflict)
             return False
 
+        if resuming:
+            order, start_i, start_k = self._resume_frames[depth]
+            if depth == len(self._resume_frames) - 1:
+                # Deepest recorded frame reached, the replay is complete
+                self._resume_frames = None
+        else:
+            order, start_i, start_k = self.candidate_order(new_candidates), 0, 0
+        frame = [order, start_i, start_k]
+        self.frames.append(frame)
+        if resuming:
+            # The children tried before the checkpoint left no explanation
+            conflict = self.placement_bits
+        exhausted = set()
+
+        if self.checkpoint_path and not resuming and \
+                time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+            self.save_checkpoint()
+
+        if not resuming and ((self._deadline is not None and time.monotonic() > self._deadline) or
+                             (self.should_stop is not None and self.should_stop())):
+            if self.checkpoint_path:
+                self.save_checkpoint()
+            raise SolveInterrupted(f"Search stopped after {self.nodes_expanded} nodes")
+
         # Try placing blocks in new_candidates
-        for (r, c) in new_candidates:
+        for i in range(start_i, len(order)):
+            (r, c) = order[i]
             # If the cell is not 'o', it means a block is already placed
             if self.board.grid[r][c] != 'o':
                 continue
 
-            for block_type in ['A','B','C']:
+            for k in range(start_k if i == start_i else 0, 3):
+                block_type = 'ABC'[k]
                 # If there are no remaining blocks of this type, skip
                 if self.board.blocks.get(block_type, 0) < 1:
+                    exhausted.add(block_type)
                     continue
 
                 self.debug_print(f"[backtrack] Placing {block_type} block at ({r},{c})")
-                self.board.grid[r][c] = block_type
-                self.placed_blocks[(r,c)] = block_type
-                self.board.blocks[block_type] -= 1
+                placement_bit = self.place_block(r, c, block_type)
+                frame[1], frame[2] = i, k
 
-                if self.backtrack(new_candidates):
+                if self.backtrack(new_candidates, placement_bit if not resuming else None):
                     return True
+                if self.nogoods is not None and not self._conflict & placement_bit:
+                    # The child failed without its own block: so does this node (backjump)
+                    self.remove_block(r, c, block_type)
+                    self.frames.pop()
+                    return False
+                conflict |= self._conflict
 
                 # Backtracking: remove the block from (r, c)
                 self.debug_print(f"[backtrack] Backtracking: Removing {block_type} block from ({r},{c})")
-                self.board.grid[r][c] = 'o'
-                del self.placed_blocks[(r,c)]
-                self.board.blocks[block_type] += 1
+                self.remove_block(r, c, block_type)
 
+        self.frames.pop()
+        if self.nogoods is not None:
+            # More blocks of a type that ran out would have opened other children
+            exhausted_cells = {cell for cell, t in self.placed_blocks.items() if t in exhausted}
+            self._learn((conflict | self._placement_mask(exhausted_cells)) & self.placement_bits)
+        else:
+            self.failed_states.add(state)
         return False
 
-    def simulate_with_blocks(self):
+    def search(self, paused=None, stop_nodes=None, deadline=None):
         """
-        Simulate all lasers with the current placed blocks:
-          - For each laser, move in half steps, detect collisions, and if a collision occurs, process it (A reflection / B blocking / C splitting)
-          - After each collision, immediately move the laser a half step away from the collision point to avoid infinite collisions
-          - For C blocks, if splitting occurs, generate new lasers to simulate as well
-        Returns: (whether all targets are hit, new_candidates)
+        Iterative equivalent of backtrack(): the same nodes in the same order, with the same
+        failed-state cache, nogoods, checkpoints and interruptions, but without recursion. The
+        path lives in self.stack, one preallocated frame per depth, reused from node to node:
+        the node's cell order, the cell and block indexes of the child being tried, its
+        placement bit (undo information), and the node's state, conflict and exhausted types.
+        solve_steps() runs it in slices: it resumes from paused, a state kept in self._pending,
+        and, once nodes_expanded reaches stop_nodes or time.perf_counter() deadline, keeps its
+        state there and returns None.
         """
-        remaining_targets = set(self.board.targets)
-        all_paths = []
-        new_candidates = set()
-
-        # Collect all lasers to simulate (including any new ones generated by C block splitting)
-        lasers_to_sim = [(lx, ly, vx, vy) for (lx, ly, vx, vy) in self.board.lasers]
-        idx = 0
+        stack = self.stack
+        outcome, resumed = paused if paused is not None else (self._enter_node(None), False)
+        while outcome is not True:
+            if resumed:
+                resumed = False
+            elif (stop_nodes is not None and self.nodes_expanded >= stop_nodes) or \
+                    (deadline is not None and time.perf_counter() >= deadline):
+                self._pending = outcome, True
+                return None
+            if outcome is False:
+                if self.depth == 0:
+                    return False
+                # A child failed: take its block back in the parent
+                frame = stack[self.depth - 1]
+                (r, c), block_type = frame[_ORDER][frame[_I]], 'ABC'[frame[_K]]
+                if self.nogoods is not None and not self._conflict & frame[_BIT]:
+                    # The child failed without its own block: so does this node (backjump)
+                    self.remove_block(r, c, block_type)
+                    self.depth -= 1
+                    continue
+                frame[_CONFLICT] |= self._conflict
+                self.debug_print(f"[backtrack] Backtracking: Removing {block_type} block from ({r},{c})")
+                self.remove_block(r, c, block_type)
+            else:
+                frame = stack[self.depth - 1]
+
+            child = self._next_child(frame)
+            if child is None:
+                self.depth -= 1
+                if self.nogoods is not None and frame[_GAVE]:
+                    # A nogood of it would prune the subtrees given away, if they come back here
+                    self._conflict = self.placement_bits
+                elif self.nogoods is not None:
+                    # More blocks of a type that ran out would have opened other children
+                    exhausted_cells = {cell for cell, t in self.placed_blocks.items()
+                                       if frame[_EXHAUSTED] >> 'ABC'.index(t) & 1}
+                    self._learn((frame[_CONFLICT] | self._placement_mask(exhausted_cells))
+                                & self.placement_bits)
+                else:
+                    self.failed_states.add(frame[_STATE])
+                outcome = False
+                continue
 
-        while idx < len(lasers_to_sim):
-            (lx, ly, vx, vy) = lasers_to_sim[idx]
-            idx += 1
+            r, c, block_type = child
+            self.debug_print(f"[backtrack] Placing {block_type} block at ({r},{c})")
+            frame[_BIT] = self.place_block(r, c, block_type)
+            outcome = self._enter_node(None if frame[_RESUMING] else frame[_BIT])
+        return True
 
-            if self.debug:
-                print(f"[simulate_with_blocks] Laser #{idx} starting at ({lx},{ly}), direction=({vx},{vy})")
+    def _enter_node(self, last_bit):
+        """
+        The work backtrack() does at a node before trying its children. Returns True if the node
+        is a solution, False if it fails at once (self._conflict explains it with nogoods), and
+        None once its frame is pushed on self.stack.
+        """
+        self.nodes_expanded += 1
+        depth = self.depth
+        resuming = self._resume_frames is not None and depth < len(self._resume_frames)
+
+        if self.nogoods is not None:
+            nogood = self.nogoods.find(self.placement_bits, last_bit)
+            if nogood is not None:
+                self._conflict = nogood
+                return False
+            state = None
+        elif self.bits is not None:
+            state = self.placement_bits
+        else:
+            state = frozenset(self.placed_blocks.items())
+        if state in self.failed_states:
+            return False
 
-            laser_path, new_cand_part, new_lasers, remaining_targets = \
-                self.simulate_single_laser(lx, ly, vx, vy, remaining_targets)
+        solved, new_candidates = self.simulate_with_blocks()
+        if self.progress is not None:
+            self._progress_countdown -= 1
+            if self._progress_countdown <= 0:
+                self._progress_countdown = self.progress.sample(self)
+        if solved:
+            self.debug_print("[backtrack] All targets hit, returning success")
+            return True
 
-            all_paths.append(laser_path)
-            new_candidates |= new_cand_part
-            # If a C block produces a new beam, add it to the queue
-            for nl in new_lasers:
-                lasers_to_sim.append(nl)
+        conflict = self._placement_mask(self._touched) if self.nogoods is not None else 0
+        if not new_candidates:
+            self.debug_print("[backtrack] No new candidate cells available, cannot place additional blocks, backtracking")
+            if self.nogoods is not None:
+                self._learn(conflict)
+            return False
 
-        self.final_paths = all_paths
+        if resuming:
+            order, start_i, start_k = self._resume_frames[depth]
+            if depth == len(self._resume_frames) - 1:
+                self._resume_frames = None
+            # The children tried before the checkpoint left no explanation
+            conflict = self.placement_bits
+        else:
+            order, start_i, start_k = self.candidate_order(new_candidates), 0, 0
+        frame = self.stack[depth]
+        frame[_ORDER], frame[_I], frame[_K], frame[_BIT] = order, start_i, start_k, 0
+        frame[_STATE], frame[_CONFLICT], frame[_EXHAUSTED], frame[_RESUMING] = state, conflict, 0, resuming
+        frame[_GAVE] = False
+        self.depth = depth + 1
+
+        if self.checkpoint_path and not resuming and \
+                time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+            self.save_checkpoint()
+
+        if not resuming and ((self._deadline is not None and time.monotonic() > self._deadline) or
+                             (self.should_stop is not None and self.should_stop())):
+            if self.checkpoint_path:
+                self.save_checkpoint()
+            raise SolveInterrupted(f"Search stopped after {self.nodes_expanded} nodes")
+        return None
+
+    def _next_child(self, frame):
+        """
+        Move frame to its next (cell, block type) child, the one after the child just tried
+        (or its starting one, if none was placed yet); returns (r, c, block type) or None.
+        """
+        order, i = frame[_ORDER], frame[_I]
+        k = frame[_K] + 1 if frame[_BIT] else frame[_K]
+        grid, blocks = self.board.grid, self.board.blocks
+        while i < len(order):
+            (r, c) = order[i]
+            if grid[r][c] == 'o':
+                while k < 3:
+                    block_type = 'ABC'[k]
+                    if blocks.get(block_type, 0) >= 1:
+                        frame[_I], frame[_K] = i, k
+                        return r, c, block_type
+                    frame[_EXHAUSTED] |= 1 << k
+                    k += 1
+            i += 1
+            k = 0
+        return None
+
+    def candidate_order(self, new_candidates):
+        """
+        The cells backtrack() tries at a node, in order, from the candidates of its simulation
+        (a set, or a cell mask in bitboard mode), after the dead-cell and bidirectional filters.
+        """
+        order = self.bits.cells(new_candidates) if self.bits is not None else list(new_candidates)
+        if self.prune_dead_cells:
+            live_cells = self.analysis.live_cells
+            order = [cell for cell in order if cell in live_cells]
+        if self.bidirectional:
+            # Meet in the middle: forward beams of this node against the targets' light cones
+            unmet = self.remaining_targets if self.bits is not None else \
+                self.analysis.target_mask(self.remaining_targets)
+            connecting = self.analysis.connecting_cells(self.node_paths, unmet)
+            order = [cell for cell in order if cell in connecting]
+        return order
+
+    def place_block(self, r, c, block_type):
+        """Place a block on the board and in every search structure; returns its placement bit."""
+        self.board.grid[r][c] = block_type
+        self.placed_blocks[(r, c)] = block_type
+        self.board.blocks[block_type] -= 1
+        if self.rays is not None:
+            self.rays.update((r, c))
+        placement_bit = 1 << encode_placement(r, c, block_type, self.geometry.cols)
+        self.placement_bits ^= placement_bit
+        return placement_bit
+
+    def remove_block(self, r, c, block_type):
+        """Undo place_block()."""
+        self.board.grid[r][c] = 'o'
+        del self.placed_blocks[(r, c)]
+        self.board.blocks[block_type] += 1
+        if self.rays is not None:
+            self.rays.update((r, c))
+        self.placement_bits ^= 1 << encode_placement(r, c, block_type, self.geometry.cols)
+
+    def _placement_mask(self, cells):
+        """Placement mask of the blocks placed on cells."""
+        mask = 0
+        for (r, c) in cells:
+            mask |= 1 << encode_placement(r, c, self.placed_blocks[(r, c)], self.geometry.cols)
+        return mask
+
+    def _learn(self, nogood):
+        self.nogoods.add(nogood)
+        self._conflict = nogood
+
+    def simulate_with_blocks(self, trace=False, record_paths=False):
+        """
+        Simulate all lasers with the current placed blocks:
+          - For each laser, move in half steps, detect collisions, and if a collision occurs, process it (A reflection / B blocking / C splitting)
+          - After each collision, immediately move the laser a half step away from the collision point to avoid infinite collisions
+          - For C blocks, if splitting occurs, generate new lasers to simulate as well
+        The stepping itself is done by the shared tracer in Tracer.py.
+        If trace is True, an indexed LaserTrace (beam tree, target hits, cell crossings) is stored in self.trace.
+        The beams are recorded in self.final_paths with trace or record_paths, else in
+        self.node_paths in bidirectional mode, whose filter reads them; otherwise no path is built.
+        When no path is built, the simulation runs in self.kernel if there is one (see Kernel.py).
+        In bitboard mode (and without trace) new_candidates is a cell mask of self.bits.
+        Returns: (whether all targets are hit, new_candidates)
+        """
+        self._touched = set() if self.nogoods is not None else None
+        paths = self.final_paths if trace or record_paths else self.node_paths
+        if paths is not None:
+            paths.clear()
+        elif self.kernel is not None and not trace and self._touched is None and not self.debug:
+            outcome = self.kernel.simulate(self.placed_blocks, self.board.lasers)
+            if outcome is not None:
+                remaining, cells = outcome
+                if self.bits is not None:
+                    # The kernel numbers targets and cells like BoardBits
+                    self.remaining_targets = remaining
+                    new_candidates = 0
+                    for cell in cells:
+                        new_candidates |= 1 << cell
+                    return remaining == 0, new_candidates
+                self.remaining_targets = self.kernel.target_points(remaining)
+                cols = self.geometry.cols
+                return remaining == 0, {divmod(cell, cols) for cell in cells}
+        if self.bits is not None and not trace:
+            self.remaining_targets, new_candidates = simulate_lasers_bits(
+                self.geometry, self.bits, self.placed_blocks, self.board.lasers, self.rays, self._touched,
+                paths)
+            return self.remaining_targets == 0, new_candidates
+
+        laser_trace = None
+        if trace:
+            laser_trace = LaserTrace(self.board.targets, len(self.board.grid), len(self.board.grid[0]))
+            for _ in self.board.lasers:
+                laser_trace.add_beam()
+
+        remaining_targets, new_candidates = simulate_lasers(
+            self.geometry, self.board.grid, self.placed_blocks, self.board.lasers,
+            self.board.targets, laser_trace, self.debug_print if self.debug else None, self.rays,
+            self._touched, paths)
+
+        self.remaining_targets = remaining_targets
+        if trace:
+            self.trace = laser_trace
         solved = (len(remaining_targets) == 0)
         return solved, new_candidates
 
-    def simulate_single_laser(self, lx, ly, vx, vy, remaining_targets):
+    def simulate_single_laser(self, lx, ly, vx, vy, remaining_targets, trace=None, beam=0, paths=None):
         """
-        Simulate a single laser with the current placed blocks:
-          - Move in half steps
-          - If it collides with an A/B/C block, perform the appropriate operation; after collision, immediately move the laser a half step away from the collision point to avoid infinite collisions
-          - A C block will generate a new beam, which should be returned as new_lasers
-        Also records the points the laser passes through for visualization; any 'o' cells passed are added to new_candidates.
-        If a target is hit, remove it from remaining_targets.
-        Returns: (laser_path, new_candidates, new_lasers, remaining_targets)
+        Simulate a single laser with the current placed blocks (see Tracer.simulate_single_laser);
+        its path is appended to paths, a LaserPaths, if given.
+        Returns: (new_candidates, new_lasers, remaining_targets)
         """
-        laser_path = []
-        new_candidates = set()
-        generated_lasers = []
-
-        laser = Laser(lx, ly, vx, vy)
-        steps = 0
-        max_steps = 3000
-
-        # Record the count of repeated collisions for the same collision to avoid infinite loops
-        collision_count = {}
-
-        while steps < max_steps and not laser.is_block:
-            curr_pos = (laser.x, laser.y)
-            laser_path.append(curr_pos)
-
-            # If a target point is hit, remove it
-            if curr_pos in remaining_targets:
-                remaining_targets.remove(curr_pos)
-
-            nx = laser.x + laser.vx
-            ny = laser.y + laser.vy
-
-            # Check for out-of-bounds
-            if nx < 0 or ny < 0 or nx > 2*len(self.board.grid[0]) or ny > 2*len(self.board.grid):
-                laser_path.append((nx, ny))
-                break
-
-            block_type, block_cell, edge_type = self.check_collision((laser.x, laser.y), (nx, ny))
-            if block_type is not None:
-                # Collision occurred
-                collision_key = ((laser.x, laser.y), (laser.vx, laser.vy), block_type, edge_type)
-                collision_count[collision_key] = collision_count.get(collision_key, 0) + 1
-
-                # If the same collision condition occurs more than 3 times, force-stopping this laser to avoid infinite loop
-                if collision_count[collision_key] > 3:
-                    self.debug_print(f"[WARN] Repeated collision {collision_key} detected, force-stopping this laser")
-                    laser.is_block = True
-                    break
-
-                self.debug_print(f"  - Collision: {curr_pos} -> ({nx},{ny}) at cell {block_cell}, block type = {block_type}, edge = {edge_type}")
-
-                collision_x, collision_y = laser.x, laser.y
-
-                if block_type == 'B':
-                    # Block type B => Blocking
-                    B_Block(block_cell)(laser)
-                    # After being blocked, exit immediately
-                    break
-
-                elif block_type == 'A':
-                    # Block type A => Reflection
-                    A_Block(block_cell)(laser, edge_type)
-                    # After collision, move the laser a half step away from the collision point
-                    laser.x += laser.vx
-                    laser.y += laser.vy
-
-                elif block_type == 'C':
-                    # Block type C => Splitting (one beam reflected + one transmitted)
-                    from copy import deepcopy
-                    main_laser = deepcopy(laser)
-                    reflected_laser = A_Block(block_cell)(main_laser, edge_type)
-                    # Reflected beam moves a half step away from the collision point
-                    reflected_laser.x += reflected_laser.vx
-                    reflected_laser.y += reflected_laser.vy
-
-                    # Transmitted beam continues in the original direction, also moves a half step away from the collision point
-                    transmit_laser = deepcopy(laser)
-                    transmit_laser.x = collision_x + transmit_laser.vx
-                    transmit_laser.y = collision_y + transmit_laser.vy
-
-                    # The current laser is replaced by the reflected beam
-                    laser.x, laser.y = reflected_laser.x, reflected_laser.y
-                    laser.vx, laser.vy = reflected_laser.vx, reflected_laser.vy
-
-                    # The transmitted beam is added to generated_lasers
-                    generated_lasers.append((transmit_laser.x, transmit_laser.y, transmit_laser.vx, transmit_laser.vy))
-
-            else:
-                # No collision => move normally, and check if it passes through an 'o' cell
-                for r in range(len(self.board.grid)):
-                    for c in range(len(self.board.grid[0])):
-                        if self.board.grid[r][c] == 'o':
-                            ep = get_cell_edge_points(r, c)
-                            if (laser.x, laser.y) in ep and (nx, ny) in ep:
-                                new_candidates.add((r, c))
-
-                laser.x, laser.y = nx, ny
-
-            steps += 1
-
-        return laser_path, new_candidates, generated_lasers, remaining_targets
+        return simulate_single_laser(self.geometry, self.board.grid, self.placed_blocks,
+                                     lx, ly, vx, vy, remaining_targets, trace, beam,
+                                     self.debug_print if self.debug else None, self.rays, None, paths)
 
     def check_collision(self, p1, p2):
         """
         Check if there is a collision with any placed block when moving from (p1) to (p2).
         If a collision occurs, return (block type, (r,c), edge_type); otherwise, return (None, None, None).
 
-        Key change: Use the parity of p1 (or p2) to determine whether the edge is horizontal or vertical:
+        Use the parity of p1 to determine whether the edge is horizontal or vertical:
           - (odd, even)  => horizontal => invert vy
           - (even, odd)  => vertical   => invert vx
           - (even, even) => Corner (collision point at a corner, which usually does not occur), treat as no collision
         """
-        for (r,c), btype in self.placed_blocks.items():
-            edges = get_cell_edge_points(r,c)
-            if p1 in edges and p2 in edges:
-                # Indicates the laser has passed through the same edge of the block
-                x, y = p1
-                # Determine the collision edge based on the parity of (x, y)
-                if (x % 2 == 1) and (y % 2 == 0):
-                    edge_type = 'horizontal'  # invert vy
-                elif (x % 2 == 0) and (y % 2 == 1):
-                    edge_type = 'vertical'    # invert vx
-                else:
-                    # Other cases (e.g., (even, even) corner), do not process or treat as no collision
-                    return None, None, None
-
-                return btype, (r,c), edge_type
-
-        return None, None, None
+        cell = self.geometry.step_cell(p1, p2)
+        if cell is None or cell not in self.placed_blocks:
+            return None, None, None
+        edge_type = 'horizontal' if p1[0] % 2 == 1 else 'vertical'
+        return self.placed_blocks[cell], cell, edge_type
@@ -0,0 +1,198 @@
+import struct
+from array import array
+
+from Tracer import BoardGeometry, get_geometry
+from RayTable import RayLines, ray_cells
+from Bitboard import cell_bits
+from StaticAnalysis import next_states, beam_edges
+
+# magic, rows, cols, lines, line points (native byte order, like SolveResult)
+CONTEXT_HEADER = struct.Struct('=4s H H I I')
+CONTEXT_MAGIC = b'LZC1'
+MAX_CONTEXTS = 64
+
+
+class SolverContext:
+    '''
+    Read-only tables of one grid layout (size and cell types), shared by every board on it,
+    e.g. the variants of a level pack that only differ in lasers, targets or block counts.
+    Solver(board) takes the context of its grid from get_context(), so the tables are built
+    for the first board of a layout and the next ones only pay for their own targets and the
+    search. Each table is built when first asked for.
+
+    A built context can be written into a shared memory block (to_shared_memory()) and attached
+    in other processes (from_shared_memory(), register()): they copy the tables out of the block
+    instead of walking the half-grid again.
+
+    key: *tuple[tuple[str, ...], ...]*
+        The grid layout, row by row.
+    rows, cols: *int*
+        Size of the grid.
+    geometry: *BoardGeometry*
+        The half-grid tables of the grid size.
+    '''
+    def __init__(self, grid, geometry=None):
+        self.key = layout_key(grid)
+        self.rows = len(self.key)
+        self.cols = len(self.key[0]) if self.key else 0
+        self.geometry = geometry or get_geometry(self.rows, self.cols)
+        self._lines = None      # RayLines
+        self._next = None       # next_states(): (straight, reflect)
+        self._edges = {}        # can_reflect -> beam_edges()
+        self._ray_cells = None  # ray_cells(): (o_count, o_cells, o_masks)
+        self._cell_bits = None  # cell_bits(): (cell_of, open_cells, step_bits)
+        self._step_index = None  # step_index()
+
+    def matches(self, grid):
+        """Whether grid has the layout of this context."""
+        return layout_key(grid) == self.key
+
+    def ray_lines(self):
+        """The RayLines of the grid size."""
+        if self._lines is None:
+            self._lines = RayLines(self.geometry)
+        return self._lines
+
+    def next_states(self):
+        """StaticAnalysis.next_states() of the layout: (straight, reflect)."""
+        if self._next is None:
+            self._next = next_states(self.geometry, self.key)
+        return self._next
+
+    def beam_edges(self, can_reflect):
+        """StaticAnalysis.beam_edges() of the layout: (successors, predecessors)."""
+        if can_reflect not in self._edges:
+            self._edges[can_reflect] = beam_edges(self.geometry, self.key, *self.next_states(), can_reflect)
+        return self._edges[can_reflect]
+
+    def ray_cells(self):
+        """RayTable.ray_cells() of the layout: (o_count, o_cells, o_masks)."""
+        if self._ray_cells is None:
+            self._ray_cells = ray_cells(self.ray_lines(), self.geometry, self.key)
+        return self._ray_cells
+
+    def cell_bits(self):
+        """Bitboard.cell_bits() of the layout: (cell_of, open_cells, step_bits)."""
+        if self._cell_bits is None:
+            self._cell_bits = cell_bits(self.geometry, self.key)
+        return self._cell_bits
+
+    def step_index(self):
+        """BoardGeometry.step_cells as cell indexes r * cols + c (-1 for no cell), an array('i')."""
+        if self._step_index is None:
+            cols = self.cols
+            self._step_index = array('i', [-1 if cell is None else cell[0] * cols + cell[1]
+                                           for cell in self.geometry.step_cells])
+        return self._step_index
+
+    def build(self):
+        """Build every table now, e.g. before sharing the context. Returns self."""
+        self.ray_lines()
+        for can_reflect in (False, True):
+            self.beam_edges(can_reflect)
+        self.ray_cells()
+        self.cell_bits()
+        return self
+
+    def _arrays(self):
+        # What is shared: the tables that take walks of the half-grid to compute
+        straight, reflect = self.next_states()
+        line_offsets, line_states = self.ray_lines().states()
+        return self.step_index(), straight, reflect, line_offsets, line_states
+
+    def to_shared_memory(self):
+        """
+        Copy the tables into a new shared memory block, which the caller must close() and
+        eventually unlink(). Returns: the SharedMemory; its name is what other processes attach.
+        """
+        from multiprocessing import shared_memory  # Only processes that share contexts need it
+        cells = ''.join(''.join(row) for row in self.key).encode('ascii')
+        arrays = self._arrays()
+        line_offsets, line_states = arrays[3], arrays[4]
+        header = CONTEXT_HEADER.pack(CONTEXT_MAGIC, self.rows, self.cols,
+                                     len(line_offsets) - 1, len(line_states))
+        padding = -(CONTEXT_HEADER.size + len(cells)) % 4
+        size = CONTEXT_HEADER.size + len(cells) + padding + sum(4 * len(a) for a in arrays)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        buffer = shm.buf
+        offset = 0
+        for chunk in [header, cells, bytes(padding)] + [a.tobytes() for a in arrays]:
+            buffer[offset:offset + len(chunk)] = chunk
+            offset += len(chunk)
+        del buffer
+        return shm
+
+    @classmethod
+    def from_shared_memory(cls, name):
+        """
+        Attach to a block made by to_shared_memory() in another process and rebuild the context
+        from it. The block is closed again; every table, including the derived ones, is ready.
+        """
+        from multiprocessing import shared_memory
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            return cls.from_buffer(shm.buf)
+        finally:
+            shm.close()
+
+    @classmethod
+    def from_buffer(cls, buffer):
+        """Rebuild a context from the bytes written by to_shared_memory()."""
+        view = memoryview(buffer)
+        magic, rows, cols, lines, points = CONTEXT_HEADER.unpack_from(view)
+        if magic != CONTEXT_MAGIC:
+            raise ValueError("Not a SolverContext block")
+        offset = CONTEXT_HEADER.size
+        cells = bytes(view[offset:offset + rows * cols]).decode('ascii')
+        offset += rows * cols
+        offset += -offset % 4
+        width, height = 2 * cols + 3, 2 * rows + 3
+        states = width * height * 4
+
+        def take(count):
+            nonlocal offset
+            values = array('i')
+            values.frombytes(view[offset:offset + 4 * count])
+            offset += 4 * count
+            return values
+
+        step, straight, reflect = take(states), take(states), take(states)
+        line_offsets, line_states = take(lines + 1), take(points)
+        view.release()
+
+        cell_of = [(r, c) for r in range(rows) for c in range(cols)]
+        geometry = BoardGeometry(rows, cols, [None if index < 0 else cell_of[index] for index in step])
+        context = cls([cells[r * cols:(r + 1) * cols] for r in range(rows)], geometry)
+        context._next = (straight, reflect)
+        context._step_index = step
+        context._lines = RayLines.from_states(geometry, line_offsets, line_states)
+        return context.build()
+
+
+def layout_key(grid):
+    """The grid layout as a hashable key: a tuple of row tuples."""
+    return tuple(tuple(row) for row in grid)
+
+
+_contexts = {}
+
+
+def get_context(grid):
+    """
+    The shared SolverContext of a grid layout, made on first use. The MAX_CONTEXTS most
+    recently made or registered contexts are kept.
+    """
+    key = layout_key(grid)
+    context = _contexts.get(key)
+    if context is None:
+        context = register(SolverContext(grid))
+    return context
+
+
+def register(context):
+    """Make get_context() return context for its layout, e.g. one attached from shared memory."""
+    _contexts.pop(context.key, None)
+    _contexts[context.key] = context
+    while len(_contexts) > MAX_CONTEXTS:
+        del _contexts[next(iter(_contexts))]
+    return context
@@ -0,0 +1,293 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+from LazorBoard import LazorBoard, puzzle_fingerprint
+from Classes import Board
+from Solver import Solver, SolveInterrupted
+
+# Shared cancel flags, one per job slot; set in each worker process by _init_worker()
+_cancel_flags = None
+
+
+def _init_worker(cancel_flags):
+    global _cancel_flags
+    _cancel_flags = cancel_flags
+
+
+def solve_puzzle(puzzle, slot=None, time_limit=None):
+    """
+    Solve one puzzle dict (grid, lasers, targets, blocks) in a worker process.
+    The solve stops early when the service sets the cancel flag of slot (status 'cancelled')
+    or when time_limit seconds pass (status 'timeout').
+    Returns a JSON-serializable result dict.
+    """
+    board = Board(grid=[list(row) for row in puzzle['grid']],
+                  lasers=[tuple(l) for l in puzzle['lasers']],
+                  targets=[tuple(t) for t in puzzle['targets']],
+                  blocks=dict(puzzle['blocks']))
+    should_stop = None
+    if slot is not None and _cancel_flags is not None:
+        should_stop = lambda: _cancel_flags[slot] != 0
+    solver = Solver(board, time_limit=time_limit, should_stop=should_stop)
+
+    start_time = time.perf_counter()
+    try:
+        success = solver.solve()
+    except SolveInterrupted:
+        cancelled = should_stop is not None and should_stop()
+        return {'status': 'cancelled' if cancelled else 'timeout',
+                'elapsed': time.perf_counter() - start_time, 'nodes': solver.nodes_expanded}
+    result = {'status': 'solved' if success else 'unsolvable',
+              'elapsed': time.perf_counter() - start_time,
+              'nodes': solver.nodes_expanded}
+    if success:
+        result['placements'] = [[r, c, t] for (r, c), t in sorted(solver.placed_blocks.items())]
+        result['grid'] = [" ".join(row) for row in board.grid]
+    return result
+
+
+def parse_puzzle(body, content_type=""):
+    """
+    Turn a request body into a puzzle dict. Accepted forms:
+      - .bff text
+      - JSON {"bff": "<.bff text>"}
+      - JSON {"grid": [...], "lasers": [...], "targets": [...], "blocks": {...}}
+    JSON bodies may also carry "deadline" (seconds). Returns (puzzle, deadline).
+    """
+    text = body.decode('utf-8')
+    deadline = None
+    if 'json' in content_type or text.lstrip().startswith('{'):
+        data = json.loads(text)
+        deadline = data.get('deadline')
+        if 'bff' in data:
+            text = data['bff']
+        else:
+            grid = [row.split() if isinstance(row, str) else list(row) for row in data['grid']]
+            blocks = {t: int(data.get('blocks', {}).get(t, 0)) for t in ('A', 'B', 'C')}
+            if not grid or not grid[0] or not data['lasers']:
+                raise ValueError("puzzle needs a grid and at least one laser")
+            return {'grid': grid, 'lasers': [list(l) for l in data['lasers']],
+                    'targets': [list(t) for t in data['targets']], 'blocks': blocks}, deadline
+    board = LazorBoard.from_string(text)
+    if not board.grid or not board.grid[0] or not board.lasers:
+        raise ValueError("puzzle needs a grid and at least one laser")
+    return {'grid': board.grid, 'lasers': [list(l) for l in board.lasers],
+            'targets': [list(t) for t in board.targets], 'blocks': board.blocks}, deadline
+
+
+class _Job:
+    """One in-flight solve, shared by every request for the same fingerprint."""
+    def __init__(self, fingerprint, slot, future):
+        self.fingerprint = fingerprint
+        self.slot = slot
+        self.future = future
+        self.waiters = 0
+        self.cancelled = False
+
+
+class SolverService:
+    '''
+    Asyncio front end that runs solves in a process pool.
+
+    Requests for a puzzle that is already being solved (same fingerprint) wait on the
+    running solve instead of starting a new one. Each request may set a deadline; a solve
+    nobody waits for anymore, or one cancelled explicitly, is stopped in its worker.
+
+    workers: *int*
+        Size of the process pool (defaults to the CPU count).
+    max_jobs: *int*
+        Maximum number of distinct puzzles solved at the same time.
+    max_solve_time: *float or None*
+        Hard limit in seconds for a single solve.
+    '''
+    def __init__(self, workers=None, max_jobs=256, max_solve_time=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_jobs = max_jobs
+        self.max_solve_time = max_solve_time
+        # Workers are spawned rather than forked: a forked worker would inherit the open
+        # client sockets and keep connections alive after the service closes them.
+        self.mp_context = multiprocessing.get_context('spawn')
+        self.cancel_flags = self.mp_context.RawArray('b', max_jobs)
+        self.free_slots = list(range(max_jobs))
+        self.jobs = {}
+        self.stats = {'requests': 0, 'solves': 0, 'coalesced': 0, 'cancelled': 0, 'timeouts': 0, 'errors': 0}
+        self.pool = None
+
+    def start(self):
+        """Start the worker processes."""
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(self.workers, mp_context=self.mp_context,
+                                            initializer=_init_worker, initargs=(self.cancel_flags,))
+
+    def close(self):
+        """Stop every running solve and shut the pool down."""
+        for job in list(self.jobs.values()):
+            self.cancel(job.fingerprint)
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+
+    def _start_job(self, fingerprint, puzzle):
+        if not self.free_slots:
+            raise RuntimeError("too many puzzles in flight")
+        slot = self.free_slots.pop()
+        self.cancel_flags[slot] = 0
+        loop = asyncio.get_running_loop()
+        pool_future = self.pool.submit(solve_puzzle, puzzle, slot, self.max_solve_time)
+        job = _Job(fingerprint, slot, asyncio.wrap_future(pool_future, loop=loop))
+        self.jobs[fingerprint] = job
+
+        def release(_):
+            # The worker is done with the slot only once the pool future finishes
+            loop.call_soon_threadsafe(self._release_job, job)
+        pool_future.add_done_callback(release)
+        self.stats['solves'] += 1
+        return job
+
+    def _release_job(self, job):
+        if self.jobs.get(job.fingerprint) is job:
+            del self.jobs[job.fingerprint]
+        self.cancel_flags[job.slot] = 0
+        self.free_slots.append(job.slot)
+
+    def cancel(self, fingerprint):
+        """Cancel the in-flight solve of fingerprint. Returns False if there is none."""
+        job = self.jobs.get(fingerprint)
+        # A finished job stays in self.jobs until _release_job() runs: it is no longer in flight
+        if job is None or job.cancelled or job.future.done():
+            return False
+        job.cancelled = True
+        self.cancel_flags[job.slot] = 1
+        # Later requests for this puzzle start a fresh solve
+        del self.jobs[fingerprint]
+        job.future.cancel()
+        self.stats['cancelled'] += 1
+        return True
+
+    async def solve(self, puzzle, deadline=None):
+        """
+        Solve a puzzle dict, sharing the work with identical requests in flight.
+        :param deadline: Optional number of seconds this caller is willing to wait
+        :return: Result dict with 'status' solved/unsolvable/timeout/cancelled and 'fingerprint'
+        """
+        self.start()
+        self.stats['requests'] += 1
+        fingerprint = puzzle_fingerprint(puzzle['grid'], puzzle['lasers'], puzzle['targets'], puzzle['blocks'])
+        job = self.jobs.get(fingerprint)
+        if job is None:
+            job = self._start_job(fingerprint, puzzle)
+        else:
+            self.stats['coalesced'] += 1
+
+        job.waiters += 1
+        start_time = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(asyncio.shield(job.future), deadline)
+            result = dict(result)
+            if result['status'] == 'timeout':
+                # The solve itself ran out of max_solve_time
+                self.stats['timeouts'] += 1
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            result = {'status': 'timeout'}
+        except asyncio.CancelledError:
+            if not job.cancelled:
+                raise
+            result = {'status': 'cancelled'}
+        finally:
+            job.waiters -= 1
+            if job.waiters == 0 and not job.future.done():
+                # Nobody is interested in this solve anymore
+                self.cancel(fingerprint)
+        result['fingerprint'] = fingerprint
+        result['wait'] = time.perf_counter() - start_time
+        return result
+
+    async def handle(self, reader, writer):
+        """Serve one HTTP/1.1 request (POST /solve, POST /cancel/<fingerprint>, GET /stats)."""
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0) or 0))
+            if len(request_line) < 2:
+                raise ValueError("malformed request line")
+            method, target = request_line[0], urlsplit(request_line[1])
+            status, payload = await self.route(method, target.path, parse_qs(target.query),
+                                               body, headers.get('content-type', ''))
+        except (ValueError, KeyError, TypeError) as exc:
+            self.stats['errors'] += 1
+            status, payload = 400, {'error': str(exc)}
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        except Exception as exc:
+            self.stats['errors'] += 1
+            status, payload = 500, {'error': f"{type(exc).__name__}: {exc}"}
+
+        data = json.dumps(payload).encode('utf-8')
+        reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+                  500: 'Internal Server Error', 503: 'Service Unavailable'}[status]
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode('latin-1') + data)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    async def route(self, method, path, query, body, content_type):
+        """Dispatch a parsed request; returns (HTTP status, JSON payload)."""
+        if method == 'POST' and path == '/solve':
+            puzzle, deadline = parse_puzzle(body, content_type)
+            if 'deadline' in query:
+                deadline = float(query['deadline'][0])
+            try:
+                return 200, await self.solve(puzzle, deadline)
+            except RuntimeError as exc:
+                return 503, {'error': str(exc)}
+        if method == 'POST' and path.startswith('/cancel/'):
+            fingerprint = path[len('/cancel/'):]
+            return (200, {'cancelled': fingerprint}) if self.cancel(fingerprint) else (404, {'error': 'no such solve'})
+        if method == 'GET' and path == '/stats':
+            return 200, dict(self.stats, in_flight=len(self.jobs), workers=self.workers)
+        return 404, {'error': f"unknown endpoint {method} {path}"}
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        """Run the HTTP front end until cancelled."""
+        self.start()
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"[INFO] Solver service listening on http://{host}:{port} with {self.workers} workers")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lazor solving service (HTTP/JSON on localhost).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--max-solve-time", type=float, default=None, help="Hard limit per solve in seconds")
+    args = parser.parse_args(argv)
+    service = SolverService(workers=args.workers, max_solve_time=args.max_solve_time)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+from array import array
+
+
+class BoardAnalysis:
+    '''
+    What any placement of the available blocks could ever do on a board, computed once before
+    the search (see analyze_board()).
+
+    reachable_states: *set[int]*
+        (point, direction) indexes of BoardGeometry.step_cells some beam could ever be in.
+    reachable_cells: *set[tuple[int, int]]*
+        'o' cells some beam could ever cross.
+    live_cells: *set[tuple[int, int]]*
+        'o' cells where a reflecting block could send a beam on towards a target. A block
+        anywhere else only takes light away, so the search never needs to place one there.
+    unreachable_targets: *list[tuple[int, int]]*
+        Targets no placement can hit; a board with any of them has no solution.
+    target_bits: *dict[tuple[int, int], int]*
+        A bit per target, in the order of the board's targets (the same as Bitboard.BoardBits).
+    reflect_cones: *list[int]*
+        Indexed like BoardGeometry.step_cells: for a half step into an 'o' cell, the mask of the
+        targets whose backward light cone contains the beam reflected there, else 0.
+    '''
+    def __init__(self, reachable_states, reachable_cells, live_cells, unreachable_targets,
+                 target_bits, reflect_cones, geometry):
+        self.reachable_states = reachable_states
+        self.reachable_cells = reachable_cells
+        self.live_cells = live_cells
+        self.unreachable_targets = unreachable_targets
+        self.target_bits = target_bits
+        self.reflect_cones = reflect_cones
+        self.geometry = geometry
+
+    @property
+    def dead_cells(self):
+        """Reachable 'o' cells that are not live."""
+        return self.reachable_cells - self.live_cells
+
+    def target_mask(self, targets):
+        """Mask of target_bits for a collection of target points."""
+        mask = 0
+        for target in targets:
+            mask |= self.target_bits.get(target, 0)
+        return mask
+
+    def connecting_cells(self, paths, unmet):
+        """
+        Cells where a reflecting block would turn one of the given beams (a LaserPaths, as
+        Solver.final_paths) into the backward light cone of a target in the mask unmet.
+        """
+        cones = self.reflect_cones
+        step_cells = self.geometry.step_cells
+        width = self.geometry.width
+        cells = set()
+        # Same walk as LaserPaths.step_states(), inlined: the half steps of a segment are an
+        # arithmetic run of (point, direction) indexes, then one step in the next segment's direction
+        values = iter(paths.segments)
+        segment = 0
+        for last in paths.beam_offsets[1:]:
+            end = None
+            while segment < last:
+                x, y, d, n = next(values), next(values), next(values), next(values)
+                segment += 1
+                if end is not None:
+                    state = (end & ~3) | d
+                    if cones[state] & unmet:
+                        cells.add(step_cells[state])
+                state = (((y + 1) * width + x + 1) << 2) | d
+                delta = ((1 if d & 1 else -1) * width + (1 if d & 2 else -1)) << 2
+                end = state + (n - 1) * delta
+                for state in range(state, end, delta):
+                    if cones[state] & unmet:
+                        cells.add(step_cells[state])
+        return cells
+
+
+def next_states(geometry, grid):
+    """
+    The edges of the beam graph of a grid layout, indexed like BoardGeometry.step_cells: the
+    state after a plain half step (-1 if it leaves the board) and, for a half step into an 'o'
+    cell, the state of the beam a reflecting block there would send back (else -1).
+    Depends only on the grid, so SolverContext.py caches it for every board of a layout.
+    Returns: (straight, reflect), two array('i')
+    """
+    step_cells = geometry.step_cells
+    width, max_x, max_y = geometry.width, geometry.max_x, geometry.max_y
+    straight = array('i', [-1]) * len(step_cells)
+    reflect = array('i', [-1]) * len(step_cells)
+    for state, cell in enumerate(step_cells):
+        point = state >> 2
+        x, y = point % width - 1, point // width - 1
+        vx, vy = (1 if state & 2 else -1), (1 if state & 1 else -1)
+        nx, ny = x + vx, y + vy
+        if nx < 0 or ny < 0 or nx > max_x or ny > max_y:
+            continue
+        straight[state] = geometry.index(nx, ny, vx, vy)
+        if cell is not None and grid[cell[0]][cell[1]] == 'o':
+            if x % 2 == 1:
+                vy = -vy
+            else:
+                vx = -vx
+            reflect[state] = geometry.index(x + vx, y + vy, vx, vy)
+    return straight, reflect
+
+
+def beam_edges(geometry, grid, straight, reflect, can_reflect):
+    """
+    The successors and predecessors of every (x, y, vx, vy) state of the padded half-grid, from
+    the edges of next_states(); reflections are only followed if can_reflect.
+    Returns: (successors, predecessors), dicts of state -> list, where a successor is
+             (next state, crossed 'o' cell or None, whether it is the reflected branch)
+    """
+    step_cells = geometry.step_cells
+    width = geometry.width
+    states = [((point % width) - 1, (point // width) - 1, (1 if d & 2 else -1), (1 if d & 1 else -1))
+              for point in range(width * geometry.height) for d in range(4)]
+    successors = {}
+    predecessors = {}
+    for index, state in enumerate(states):
+        nxt = straight[index]
+        if nxt < 0:
+            successors[state] = []
+            continue
+        cell = step_cells[index]
+        if reflect[index] < 0:
+            moves = [(states[nxt], None, False)]
+        elif can_reflect:
+            moves = [(states[nxt], cell, False), (states[reflect[index]], cell, True)]
+        else:
+            moves = [(states[nxt], cell, False)]
+        successors[state] = moves
+        for move in moves:
+            predecessors.setdefault(move[0], []).append(state)
+    return successors, predecessors
+
+
+def analyze_board(geometry, grid, lasers, targets, blocks, context=None):
+    """
+    Over-approximate every beam of every placement: each 'o' cell a beam crosses may hold no
+    block (or a C, whose transmitted beam goes straight on), a reflector (if an A or C block is
+    available) or a B. Beams are followed forward from the lasers over (point, direction)
+    states, and backward from each target (its light cone), with the same rules as
+    Tracer.simulate_single_laser.
+    :param context: Optional SolverContext of the grid layout, whose cached beam_edges() are used
+    Returns: BoardAnalysis
+    """
+    step_cells = geometry.step_cells
+    max_x, max_y = geometry.max_x, geometry.max_y
+    can_reflect = blocks.get('A', 0) + blocks.get('C', 0) > 0
+
+    def inside(x, y):
+        return -1 <= x <= max_x + 1 and -1 <= y <= max_y + 1
+
+    if context is not None:
+        edges, predecessors = context.beam_edges(can_reflect)
+    else:
+        edges, predecessors = beam_edges(geometry, grid, *next_states(geometry, grid), can_reflect)
+
+    # Forward: every state a beam could be in
+    reached = {laser for laser in (tuple(l) for l in lasers) if inside(laser[0], laser[1])}
+    queue = list(reached)
+    reachable_cells = set()
+    reflections = []  # (cell, reflected state) pairs seen from reachable states
+    while queue:
+        state = queue.pop()
+        for nxt, cell, reflected in edges[state]:
+            if cell is not None:
+                reachable_cells.add(cell)
+                if reflected:
+                    reflections.append((cell, nxt))
+            if nxt not in reached:
+                reached.add(nxt)
+                queue.append(nxt)
+
+    # Backward: the light cone of each target, i.e. the states from which it could be reached
+    target_bits = {}
+    for target in targets:
+        target_bits.setdefault(tuple(target), 1 << len(target_bits))
+    cones = {}  # state -> mask of the targets reachable from it
+    for (x, y), bit in target_bits.items():
+        if not inside(x, y):
+            continue
+        queue = [(x, y, vx, vy) for vx in (-1, 1) for vy in (-1, 1)]
+        for state in queue:
+            cones[state] = cones.get(state, 0) | bit
+        while queue:
+            for prev in predecessors.get(queue.pop(), ()):
+                if not cones.get(prev, 0) & bit:
+                    cones[prev] = cones.get(prev, 0) | bit
+                    queue.append(prev)
+
+    reflect_cones = [0] * len(step_cells)
+    for state, moves in edges.items():
+        for nxt, cell, reflected in moves:
+            if reflected:
+                reflect_cones[geometry.index(*state)] = cones.get(nxt, 0)
+
+    reached_points = {(x, y) for (x, y, _, _) in reached}
+    live_cells = {cell for cell, nxt in reflections if cones.get(nxt, 0)}
+    unreachable_targets = [t for t in targets if tuple(t) not in reached_points]
+    return BoardAnalysis({geometry.index(*state) for state in reached}, reachable_cells,
+                         live_cells, unreachable_targets, target_bits, reflect_cones, geometry)
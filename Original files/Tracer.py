@@ -0,0 +1,331 @@
+from functools import lru_cache
+
+MAX_STEPS = 3000       # Half steps simulated per beam before giving up
+MAX_REPEATS = 3        # Identical collisions allowed per beam before it is force-stopped
+
+
+class BoardGeometry:
+    '''
+    Precomputed half-grid tables for one grid size, shared by every board of that size.
+
+    rows, cols: *int*
+        Size of the block grid; the half-grid spans 0..2*cols by 0..2*rows.
+    step_cells: *list[tuple[int, int] | None]*
+        For every half-grid point (padded by one on each side) and diagonal direction,
+        the (r, c) cell crossed by the next half step, or None.
+    '''
+    def __init__(self, rows, cols, step_cells=None):
+        """
+        :param step_cells: Optional table computed before (e.g. read from a shared SolverContext)
+        """
+        self.rows = rows
+        self.cols = cols
+        self.max_x = 2 * cols
+        self.max_y = 2 * rows
+        # Points are stored with a one point margin, because a beam reflected off a border
+        # block can sit one half step outside the board before leaving it.
+        self.width = self.max_x + 3
+        self.height = self.max_y + 3
+        if step_cells is not None:
+            self.step_cells = step_cells
+            return
+        self.step_cells = [None] * (self.width * self.height * 4)
+        for y in range(-1, self.max_y + 2):
+            for x in range(-1, self.max_x + 2):
+                for vx in (-1, 1):
+                    for vy in (-1, 1):
+                        self.step_cells[self.index(x, y, vx, vy)] = self._step_cell(x, y, x + vx, y + vy)
+
+    def index(self, x, y, vx, vy):
+        """Index of (point, direction) in step_cells."""
+        return (((y + 1) * self.width + x + 1) << 2) | ((vx > 0) << 1) | (vy > 0)
+
+    def _step_cell(self, x1, y1, x2, y2):
+        # A half step between two edge midpoints stays inside one cell: the odd x gives
+        # its column and the odd y gives its row. Corner points never touch a cell.
+        if x1 % 2 == y1 % 2 or x2 % 2 == y2 % 2:
+            return None
+        c = (x1 if x1 % 2 else x2) // 2
+        r = (y1 if y1 % 2 else y2) // 2
+        if 0 <= r < self.rows and 0 <= c < self.cols:
+            return (r, c)
+        return None
+
+    def step_cell(self, p1, p2):
+        """Return the (r, c) cell crossed when moving from p1 to the neighbouring point p2."""
+        (x1, y1), (x2, y2) = p1, p2
+        if not (-1 <= x1 <= self.max_x + 1 and -1 <= y1 <= self.max_y + 1):
+            return None
+        return self.step_cells[self.index(x1, y1, x2 - x1, y2 - y1)]
+
+
+@lru_cache(maxsize=64)
+def get_geometry(rows, cols):
+    """Return the shared BoardGeometry for a rows x cols grid."""
+    return BoardGeometry(rows, cols)
+
+
+def simulate_single_laser(geometry, grid, placed_blocks, lx, ly, vx, vy, remaining_targets,
+                          trace=None, beam=0, log=None, rays=None, touched=None, paths=None):
+    """
+    Simulate one beam over grid with placed_blocks ((r, c) -> 'A'/'B'/'C'):
+      - Move in half steps; the crossed cell is a table lookup instead of a scan of the board
+      - A reflects, B stops the beam, C reflects and spawns a transmitted beam
+      - After a collision the beam moves a half step away from the collision point
+    Targets reached are removed from remaining_targets; crossed 'o' cells become candidates.
+    With a RayTable (kept in sync with placed_blocks) runs of plain half steps are taken at once.
+    Cells of placed blocks the beam collides with are added to the set touched, if given.
+    The path is only recorded if a LaserPaths is given: one segment per straight run, appended
+    when the beam turns or ends, and the beam is closed in paths.
+    Returns: (new_candidates, new_lasers, remaining_targets)
+    """
+    new_candidates = set()
+    generated_lasers = []
+    step_cells = geometry.step_cells
+    width = geometry.width
+    max_x, max_y = geometry.max_x, geometry.max_y
+    cols = geometry.cols
+    segments = paths.segments if paths is not None else None
+
+    x, y = lx, ly
+    # Start of the current segment, and the number of points of the segments before it
+    sx, sy, recorded = x, y, 0
+    # Record the count of repeated collisions for the same collision to avoid infinite loops
+    collision_count = {}
+    # Last block this beam interacted with, as a cell index (for LaserTrace.target_feeder)
+    feeder = trace.beam_split_cell[beam] if trace is not None else -1
+    if rays is not None:
+        line_of, pos_of = rays.lines.line_of, rays.lines.pos_of
+        line_points, line_cells = rays.lines.points, rays.lines.cells
+        jumps, o_count, o_cells = rays.jumps, rays.o_count, rays.o_cells
+
+    steps = 0
+    while steps < MAX_STEPS:
+        if rays is not None:
+            state = (((y + 1) * width + x + 1) << 2) | ((vx > 0) << 1) | (vy > 0)
+            line, pos = line_of[state], pos_of[state]
+            run = jumps[line][pos]
+            if run:
+                # Nothing can happen before the end of the run: take it in one step
+                run = min(run, MAX_STEPS - steps)
+                end = pos + run
+                first, last = o_count[line][pos], o_count[line][end]
+                if first != last:
+                    new_candidates.update(o_cells[line][first:last])
+                if trace is not None:
+                    for cell in line_cells[line][pos:end]:
+                        if cell is not None:
+                            trace.cross(cell[0] * cols + cell[1])
+                x, y = line_points[line][end]
+                steps += run
+                continue
+        steps += 1
+
+        curr_pos = (x, y)
+
+        # If a target point is hit, remove it
+        if curr_pos in remaining_targets:
+            remaining_targets.remove(curr_pos)
+            if trace is not None:
+                trace.record_hit(curr_pos, beam, recorded + abs(x - sx), feeder)
+
+        nx = x + vx
+        ny = y + vy
+        # Check for out-of-bounds
+        if nx < 0 or ny < 0 or nx > max_x or ny > max_y:
+            # The path ends with the first point outside the board
+            x = nx + vx
+            break
+
+        cell = step_cells[(((y + 1) * width + x + 1) << 2) | ((vx > 0) << 1) | (vy > 0)]
+        block_type = placed_blocks.get(cell) if cell is not None else None
+
+        if block_type is None:
+            # No collision => move normally, and check if it passes through an 'o' cell
+            if cell is not None:
+                if grid[cell[0]][cell[1]] == 'o':
+                    new_candidates.add(cell)
+                if trace is not None:
+                    trace.cross(cell[0] * cols + cell[1])
+            x, y = nx, ny
+            continue
+
+        # Collision: the parity of the current point tells which edge was hit
+        if touched is not None:
+            touched.add(cell)
+        edge_type = 'horizontal' if x % 2 == 1 else 'vertical'
+        collision_key = (curr_pos, (vx, vy), block_type, edge_type)
+        collision_count[collision_key] = collision_count.get(collision_key, 0) + 1
+        # If the same collision occurs more than MAX_REPEATS times, force-stop this laser
+        if collision_count[collision_key] > MAX_REPEATS:
+            if log:
+                log(f"[WARN] Repeated collision {collision_key} detected, force-stopping this laser")
+            x += vx
+            break
+        if log:
+            log(f"  - Collision: {curr_pos} -> ({nx},{ny}) at cell {cell}, block type = {block_type}, edge = {edge_type}")
+
+        if block_type == 'B':
+            # Blocking: the beam ends here
+            x += vx
+            break
+
+        feeder = cell[0] * cols + cell[1]
+        if block_type == 'C':
+            # Splitting: the transmitted beam continues in the original direction
+            generated_lasers.append((nx, ny, vx, vy))
+            if trace is not None:
+                trace.add_beam(beam, feeder)
+
+        # Reflection (A, and the reflected half of C), then a half step away from the collision point
+        if segments is not None:
+            segments.extend((sx, sy, ((vx > 0) << 1) | (vy > 0), abs(x - sx) + 1))
+        recorded += abs(x - sx) + 1
+        if edge_type == 'horizontal':
+            vy = -vy
+        else:
+            vx = -vx
+        x += vx
+        y += vy
+        sx, sy = x, y
+
+    if segments is not None:
+        # The last segment holds the points from its start up to, not including, x
+        if x != sx:
+            segments.extend((sx, sy, ((vx > 0) << 1) | (vy > 0), abs(x - sx)))
+        paths.beam_offsets.append(len(segments) >> 2)
+    return new_candidates, generated_lasers, remaining_targets
+
+
+def simulate_lasers(geometry, grid, placed_blocks, lasers, targets, trace=None, log=None, rays=None,
+                    touched=None, paths=None):
+    """
+    Simulate all lasers, including the beams split off by C blocks, breadth first.
+    If a LaserTrace is given it must already contain one beam per entry of lasers.
+    rays is an optional RayTable for placed_blocks, touched an optional set of the cells of
+    the blocks hit and paths an optional LaserPaths that receives every beam (see simulate_single_laser).
+    Returns: (remaining_targets, new_candidates)
+    """
+    remaining_targets = set(targets)
+    new_candidates = set()
+
+    lasers_to_sim = list(lasers)
+    idx = 0
+    while idx < len(lasers_to_sim):
+        (lx, ly, vx, vy) = lasers_to_sim[idx]
+        idx += 1
+        if log:
+            log(f"[simulate_with_blocks] Laser #{idx} starting at ({lx},{ly}), direction=({vx},{vy})")
+
+        new_cand_part, new_lasers, remaining_targets = simulate_single_laser(
+            geometry, grid, placed_blocks, lx, ly, vx, vy, remaining_targets, trace, idx - 1, log, rays,
+            touched, paths)
+
+        new_candidates |= new_cand_part
+        # If a C block produces a new beam, add it to the queue
+        lasers_to_sim.extend(new_lasers)
+
+    return remaining_targets, new_candidates
+
+
+def simulate_single_laser_bits(geometry, bits, placed_blocks, lx, ly, vx, vy, remaining_targets,
+                               rays=None, touched=None, paths=None):
+    """
+    Bitboard variant of simulate_single_laser() for a Bitboard.BoardBits of the board:
+    remaining_targets and the returned candidates are int masks, and a target hit or a crossed
+    'o' cell is a single AND/OR with a precomputed bit. Follows exactly the same beam rules;
+    tracing and debug logging are left to simulate_single_laser().
+    Returns: (candidate_mask, new_lasers, remaining_targets)
+    """
+    new_candidates = 0
+    generated_lasers = []
+    segments = paths.segments if paths is not None else None
+    step_cells = geometry.step_cells
+    step_bits = bits.step_bits
+    target_at = bits.target_at
+    width = geometry.width
+    max_x, max_y = geometry.max_x, geometry.max_y
+    if rays is not None:
+        line_of, pos_of = rays.lines.line_of, rays.lines.pos_of
+        line_points, jumps, o_masks = rays.lines.points, rays.jumps, rays.o_masks
+
+    x, y = lx, ly
+    sx, sy = x, y
+    collision_count = {}
+    steps = 0
+    while steps < MAX_STEPS:
+        state = (((y + 1) * width + x + 1) << 2) | ((vx > 0) << 1) | (vy > 0)
+        if rays is not None:
+            line, pos = line_of[state], pos_of[state]
+            run = jumps[line][pos]
+            if run:
+                run = min(run, MAX_STEPS - steps)
+                end = pos + run
+                new_candidates |= o_masks[line][pos] ^ o_masks[line][end]
+                x, y = line_points[line][end]
+                steps += run
+                continue
+        steps += 1
+
+        curr_pos = (x, y)
+        remaining_targets &= ~target_at[state >> 2]
+
+        nx = x + vx
+        ny = y + vy
+        if nx < 0 or ny < 0 or nx > max_x or ny > max_y:
+            x = nx + vx
+            break
+
+        cell = step_cells[state]
+        block_type = placed_blocks.get(cell) if cell is not None else None
+        if block_type is None:
+            new_candidates |= step_bits[state]
+            x, y = nx, ny
+            continue
+
+        if touched is not None:
+            touched.add(cell)
+        edge_type = 'horizontal' if x % 2 == 1 else 'vertical'
+        collision_key = (curr_pos, (vx, vy), block_type, edge_type)
+        collision_count[collision_key] = collision_count.get(collision_key, 0) + 1
+        if collision_count[collision_key] > MAX_REPEATS or block_type == 'B':
+            x += vx
+            break
+        if block_type == 'C':
+            generated_lasers.append((nx, ny, vx, vy))
+        if segments is not None:
+            segments.extend((sx, sy, ((vx > 0) << 1) | (vy > 0), abs(x - sx) + 1))
+        if edge_type == 'horizontal':
+            vy = -vy
+        else:
+            vx = -vx
+        x += vx
+        y += vy
+        sx, sy = x, y
+
+    if segments is not None:
+        if x != sx:
+            segments.extend((sx, sy, ((vx > 0) << 1) | (vy > 0), abs(x - sx)))
+        paths.beam_offsets.append(len(segments) >> 2)
+    return new_candidates, generated_lasers, remaining_targets
+
+
+def simulate_lasers_bits(geometry, bits, placed_blocks, lasers, rays=None, touched=None, paths=None):
+    """
+    Bitboard variant of simulate_lasers(), see simulate_single_laser_bits().
+    Returns: (remaining target mask, candidate cell mask)
+    """
+    remaining_targets = bits.all_targets
+    new_candidates = 0
+
+    lasers_to_sim = list(lasers)
+    idx = 0
+    while idx < len(lasers_to_sim):
+        (lx, ly, vx, vy) = lasers_to_sim[idx]
+        idx += 1
+        new_cand_part, new_lasers, remaining_targets = simulate_single_laser_bits(
+            geometry, bits, placed_blocks, lx, ly, vx, vy, remaining_targets, rays, touched, paths)
+        new_candidates |= new_cand_part
+        lasers_to_sim.extend(new_lasers)
+
+    return remaining_targets, new_candidates
@@ -0,0 +1,160 @@
+import argparse
+import sys
+import time
+from LazorBoard import LazorBoard
+from LaserTrace import LaserTrace
+from Tracer import get_geometry, simulate_lasers
+
+BLOCK_TYPES = ('A', 'B', 'C')
+
+
+class VerifyResult:
+    '''
+    Outcome of verify(). Truthy when the placements are legal and every target is hit.
+
+    ok: *bool*
+        True if the placements are legal and solve the board.
+    missed_targets: *list[tuple[int, int]]*
+        Targets that no beam reached.
+    errors: *list[str]*
+        Illegal placements (wrong cell, unknown block, too many blocks); no simulation is run if any.
+    trace: *LaserTrace or None*
+        Indexed trace of the simulation when verify(..., trace=True) was used.
+    '''
+    def __init__(self, ok, missed_targets=(), errors=(), trace=None):
+        self.ok = ok
+        self.missed_targets = list(missed_targets)
+        self.errors = list(errors)
+        self.trace = trace
+
+    def __bool__(self):
+        return self.ok
+
+    def __repr__(self):
+        return f"VerifyResult(ok={self.ok}, missed_targets={self.missed_targets}, errors={self.errors})"
+
+
+def placements_from_grid(board_grid, solution_grid):
+    """
+    Compare a solved grid with the puzzle grid and return (placements, errors).
+    placements maps (r, c) -> block type for every 'o' cell that holds a block in the solution.
+    """
+    placements = {}
+    errors = []
+    if len(solution_grid) != len(board_grid) or \
+            any(len(row) != len(board_row) for row, board_row in zip(solution_grid, board_grid)):
+        return placements, ["solution grid size does not match the board"]
+    for r, (row, board_row) in enumerate(zip(solution_grid, board_grid)):
+        for c, (cell, board_cell) in enumerate(zip(row, board_row)):
+            if cell == board_cell:
+                continue
+            if board_cell == 'o':
+                placements[(r, c)] = cell
+            else:
+                errors.append(f"cell ({r},{c}) is '{board_cell}' on the board but '{cell}' in the solution")
+    return placements, errors
+
+
+def verify(board, placements, trace=False):
+    """
+    Check candidate placements against a board without building a Solver.
+
+    :param board: Board or LazorBoard (grid, lasers, targets, blocks) of the unsolved puzzle
+    :param placements: dict (r, c) -> 'A'/'B'/'C', or a solved grid (rows of cells) with the blocks placed
+    :param trace: If True, the result carries a LaserTrace of the simulation
+    :return: VerifyResult
+    """
+    grid = board.grid
+    if isinstance(placements, dict):
+        errors = []
+    else:
+        placements, errors = placements_from_grid(grid, [list(row) for row in placements])
+
+    used = {t: 0 for t in BLOCK_TYPES}
+    rows, cols = len(grid), len(grid[0]) if grid else 0
+    for (r, c), block_type in placements.items():
+        if block_type not in used:
+            errors.append(f"unknown block type '{block_type}' at ({r},{c})")
+        elif not (0 <= r < rows and 0 <= c < cols) or grid[r][c] != 'o':
+            errors.append(f"cell ({r},{c}) does not allow a block")
+        else:
+            used[block_type] += 1
+    for block_type, count in used.items():
+        if count > board.blocks.get(block_type, 0):
+            errors.append(f"{count} {block_type} blocks placed, only {board.blocks.get(block_type, 0)} available")
+    if errors:
+        return VerifyResult(False, errors=errors)
+
+    laser_trace = None
+    if trace:
+        laser_trace = LaserTrace(board.targets, rows, cols)
+        for _ in board.lasers:
+            laser_trace.add_beam()
+
+    # The tracer only reads the grid to collect candidate cells, which verify() does not need,
+    # so the puzzle grid is used as is instead of copying it with the blocks placed.
+    remaining, _ = simulate_lasers(get_geometry(rows, cols), grid, placements,
+                               board.lasers, board.targets, laser_trace)
+    missed = [t for t in board.targets if t in remaining]
+    return VerifyResult(not missed, missed_targets=missed, trace=laser_trace)
+
+
+def read_solution_grids(filename):
+    """
+    Read every GRID START ... GRID STOP block of a file; each block is one candidate solution.
+    Everything outside the blocks (comments, block counts, lasers) is ignored.
+    """
+    grids = []
+    grid = None
+    with open(filename, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line == 'GRID START':
+                grid = []
+            elif line == 'GRID STOP':
+                if grid is not None:
+                    grids.append(grid)
+                grid = None
+            elif grid is not None:
+                grid.append(line.split())
+    return grids
+
+
+def main(argv=None):
+    """Command line entry point: verify solved grids against a .bff puzzle."""
+    parser = argparse.ArgumentParser(description="Verify candidate Lazor solutions against a .bff puzzle.")
+    parser.add_argument("bff_file", help="Unsolved puzzle in .bff format")
+    parser.add_argument("solutions", nargs='+',
+                        help="Files with one or more solved grids (GRID START ... GRID STOP blocks)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Only print failures and the summary")
+    args = parser.parse_args(argv)
+
+    board = LazorBoard.from_file(args.bff_file)
+    candidates = []
+    for filename in args.solutions:
+        candidates.extend((filename, i + 1, grid) for i, grid in enumerate(read_solution_grids(filename)))
+
+    valid = 0
+    start_time = time.perf_counter()
+    for filename, number, grid in candidates:
+        result = verify(board, grid)
+        if result:
+            valid += 1
+            if not args.quiet:
+                print(f"[VERIFY] {filename} #{number}: OK")
+        elif result.errors:
+            print(f"[VERIFY] {filename} #{number}: INVALID - " + "; ".join(result.errors))
+        else:
+            missed = ", ".join(f"({x},{y})" for (x, y) in result.missed_targets)
+            print(f"[VERIFY] {filename} #{number}: FAIL - missed targets {missed}")
+    elapsed = time.perf_counter() - start_time
+
+    rate = len(candidates) / elapsed if elapsed > 0 else float('inf')
+    print(f"[VERIFY] {valid}/{len(candidates)} valid ({rate:.0f} placements/s)")
+    return 0 if valid == len(candidates) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,174 @@
+import argparse
+import os
+import sys
+import time
+
+# Solver flags every solving subcommand accepts, as --ray-jump etc.
+SOLVER_FLAGS = ('ray_jump', 'bitboards', 'prune_dead_cells', 'bidirectional', 'learn_nogoods', 'iterative', 'jit')
+
+# Every subcommand imports what it needs itself, when it runs: a solve does not pay for
+# matplotlib (render), multiprocessing (batch) or the profilers. test_cli.py keeps it that way.
+
+
+def add_solver_flags(parser):
+    for flag in SOLVER_FLAGS:
+        parser.add_argument("--" + flag.replace('_', '-'), action="store_true")
+
+
+def solver_options(args):
+    return {flag: True for flag in SOLVER_FLAGS if getattr(args, flag)}
+
+
+def bff_paths(paths):
+    """The .bff files among paths, a directory standing for the .bff files in it."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, f) for f in sorted(os.listdir(path)) if f.endswith(".bff"))
+        else:
+            files.append(path)
+    return files
+
+
+def solve_file(path, options, progress=None):
+    """
+    Parse and solve one .bff file; returns (Solver, solved, elapsed seconds). With progress (seconds),
+    long searches report on stderr every progress seconds.
+    """
+    from LazorBoard import LazorBoard
+    from Classes import Board
+    from Solver import Solver
+    lazor_data = LazorBoard.from_file(path)
+    board = Board(grid=lazor_data.grid, lasers=lazor_data.lasers,
+                  targets=lazor_data.targets, blocks=lazor_data.blocks)
+    if progress:
+        from Progress import SolveProgress
+        name = os.path.basename(path)
+        options = dict(options, progress=SolveProgress(
+            lambda report: print(f"[PROGRESS] {name}: {report}", file=sys.stderr, flush=True), progress))
+    # The kernel, and Numba with it, is only loaded with --jit
+    solver = Solver(board, **dict(options, jit=options.get('jit', False)))
+    start_time = time.perf_counter()
+    solved = solver.solve()
+    return solver, solved, time.perf_counter() - start_time
+
+
+def solve_command(args):
+    """lazor solve: print the solved grid of every file (as GRID START/STOP blocks, which
+    lazor verify reads back), or one JSON record per file with --json."""
+    all_solved = True
+    for path in bff_paths(args.files):
+        solver, solved, elapsed = solve_file(path, solver_options(args), args.progress)
+        all_solved &= solved
+        name = os.path.basename(path)
+        if args.json:
+            import json
+            print(json.dumps({'name': name, 'status': 'solved' if solved else 'unsolvable',
+                              'placements': [[r, c, t] for (r, c), t in sorted(solver.placed_blocks.items())],
+                              'elapsed': round(elapsed, 6), 'nodes': solver.nodes_expanded}))
+        elif solved:
+            print(f"# {name}: solved in {elapsed:.3f} s, {solver.nodes_expanded} nodes")
+            print("GRID START")
+            for row in solver.board.grid:
+                print(" ".join(row))
+            print("GRID STOP")
+        else:
+            print(f"# {name}: no solution ({elapsed:.3f} s, {solver.nodes_expanded} nodes)")
+    return 0 if all_solved else 1
+
+
+def verify_command(args):
+    """lazor verify: Verifier.py's check of solved grids against a puzzle."""
+    from Verifier import main as verify_main
+    return verify_main([args.bff_file] + args.solutions + (["--quiet"] if args.quiet else []))
+
+
+def batch_command(args):
+    """lazor batch: solve_all_bff_files() of Batch.py on any folder."""
+    from Batch import solve_all_bff_files
+    solve_all_bff_files(workers=args.workers, probes=args.probes, profile=args.profile,
+                        results=args.results, bff_folder=args.folder, output_folder=args.output,
+                        progress=args.progress)
+    return 0
+
+
+def render_command(args):
+    """lazor render: solve every file and render its solution next to it (or into --output)."""
+    from LazorVisualizer import visualize_solve_result
+    all_solved = True
+    for path in bff_paths(args.files):
+        solver, solved, _ = solve_file(path, solver_options(args))
+        all_solved &= solved
+        if not solved:
+            print(f"# {os.path.basename(path)}: no solution, nothing to render")
+            continue
+        folder = args.output or os.path.dirname(path)
+        name = os.path.splitext(os.path.basename(path))[0]
+        visualize_solve_result(solver.result(), os.path.join(folder, f"{name}_Lazors_Solution.png"), dpi=args.dpi)
+    return 0 if all_solved else 1
+
+
+def bench_command(args):
+    """lazor bench: time repeated solves of every file, each with a fresh Solver."""
+    print(f"{'file':<24}{'best (s)':>12}{'median (s)':>12}{'nodes':>10}")
+    for path in bff_paths(args.files):
+        timings = []
+        for _ in range(args.repeat):
+            solver, solved, elapsed = solve_file(path, solver_options(args))
+            timings.append(elapsed)
+        timings.sort()
+        median = timings[len(timings) // 2]
+        print(f"{os.path.basename(path):<24}{timings[0]:>12.4f}{median:>12.4f}{solver.nodes_expanded:>10}"
+              + ("" if solved else "  (no solution)"))
+    return 0
+
+
+def main(argv=None):
+    """Entry point of the lazor command."""
+    parser = argparse.ArgumentParser(prog="lazor", description="Lazor puzzle solver.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    solve = commands.add_parser("solve", help="Solve .bff files and print the solved grids")
+    solve.add_argument("files", nargs='+', help=".bff files, or folders of them")
+    solve.add_argument("--json", action="store_true", help="One JSON record per file")
+    solve.add_argument("--progress", type=float, metavar="SECONDS",
+                       help="Report on stderr every SECONDS while a search runs")
+    add_solver_flags(solve)
+    solve.set_defaults(run=solve_command)
+
+    verify = commands.add_parser("verify", help="Check solved grids against a .bff puzzle")
+    verify.add_argument("bff_file")
+    verify.add_argument("solutions", nargs='+', help="Files with GRID START ... GRID STOP blocks")
+    verify.add_argument("-q", "--quiet", action="store_true", help="Only print failures and the summary")
+    verify.set_defaults(run=verify_command)
+
+    batch = commands.add_parser("batch", help="Solve and render every .bff file of a folder")
+    batch.add_argument("folder", nargs='?', default="bff_files")
+    batch.add_argument("--output", default="Solution Output", help="Folder of the images and records")
+    batch.add_argument("--workers", type=int, default=1, help="Number of worker processes")
+    batch.add_argument("--probes", type=int, default=32, help="Estimation probes per file with several workers")
+    batch.add_argument("--profile", choices=("sample", "cprofile"), help="Profile every puzzle")
+    batch.add_argument("--results", default="results.jsonl", help="Records file in --output ('' for none)")
+    batch.add_argument("--progress", type=float, default=5.0, metavar="SECONDS",
+                       help="Report every SECONDS while a search runs (0 for never)")
+    batch.set_defaults(run=batch_command)
+
+    render = commands.add_parser("render", help="Solve .bff files and render their solutions")
+    render.add_argument("files", nargs='+', help=".bff files, or folders of them")
+    render.add_argument("--output", help="Folder of the images (default: next to each file)")
+    render.add_argument("--dpi", type=int, default=300)
+    add_solver_flags(render)
+    render.set_defaults(run=render_command)
+
+    bench = commands.add_parser("bench", help="Time repeated solves of .bff files")
+    bench.add_argument("files", nargs='+', help=".bff files, or folders of them")
+    bench.add_argument("--repeat", type=int, default=5)
+    add_solver_flags(bench)
+    bench.set_defaults(run=bench_command)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+import argparse
+import os
+import random
+import time
+from Kernel import JIT_AVAILABLE
+from Solver import Solver
+from Oracle import random_placements
+from test_checkpoint import load_board
+
+
+def placement_sets(board, count, seed):
+    '''
+    count random placements of the board's blocks, the same for every simulator.
+    '''
+    rng = random.Random(seed)
+    return [random_placements(rng, board) for _ in range(count)]
+
+
+def throughput(solver, placements, seconds):
+    '''
+    Simulates the placements in turn, cycling, for at least the given number of seconds, and
+    returns the number of simulations per second.
+    '''
+    solver.reset_search()
+    done = 0
+    start_time = time.perf_counter()
+    while True:
+        for placed in placements:
+            solver.placed_blocks.clear()
+            solver.placed_blocks.update(placed)
+            solver.simulate_with_blocks()
+        done += len(placements)
+        elapsed = time.perf_counter() - start_time
+        if elapsed >= seconds:
+            return done / elapsed
+
+
+def main(args):
+    levels = args.levels or sorted(f[:-4] for f in os.listdir("bff_files") if f.endswith(".bff"))
+    kernel = "kernel, numba" if JIT_AVAILABLE else "kernel, interpreted"
+    simulators = [("python", dict(jit=False)), (kernel, dict(jit=True))]
+    if not JIT_AVAILABLE:
+        print("[INFO] Numba is not installed: the kernel is measured interpreted")
+
+    print(f"{'level':<15}" + "".join(f"{name:>22}" for name, _ in simulators) + "   (simulations/s)")
+    for level in levels:
+        board = load_board(level)
+        placements = placement_sets(board, args.placements, args.seed)
+        rates = []
+        for name, options in simulators:
+            solver = Solver(load_board(level), bitboards=args.bitboards, **options)
+            if solver.kernel is not None and solver.kernel.compiled:
+                throughput(solver, placements[:1], 0)  # Compile before timing
+            rates.append(throughput(solver, placements, args.seconds))
+        print(f"{level:<15}" + "".join(f"{rate:>22.0f}" for rate in rates)
+              + "".join(f"   x{rate / rates[0]:.2f}" for rate in rates[1:]))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Simulation throughput of the Python tracer and the kernel.")
+    parser.add_argument("--placements", type=int, default=200, help="Random placements per level")
+    parser.add_argument("--seconds", type=float, default=0.5, help="Minimum measuring time per simulator")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bitboards", action="store_true", help="Measure in bitboard mode")
+    parser.add_argument("levels", nargs='*', help="Level names from bff_files (default: all)")
+    main(parser.parse_args())
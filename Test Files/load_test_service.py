@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from SolverService import SolverService
+
+
+async def post(host, port, path, body):
+    '''
+    Sends one HTTP POST and returns the decoded JSON response.
+    '''
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: text/plain\r\n"
+                 f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('latin-1') + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run_load(host, port, puzzles, requests, concurrency, deadline):
+    '''
+    Fires requests solve calls with at most concurrency in flight, cycling through puzzles,
+    and returns (latencies, status counts, wall time).
+    '''
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = {}
+    path = "/solve" + (f"?deadline={deadline}" if deadline else "")
+
+    async def one(i):
+        async with semaphore:
+            start_time = time.perf_counter()
+            result = await post(host, port, path, puzzles[i % len(puzzles)])
+            latencies.append(time.perf_counter() - start_time)
+            statuses[result.get('status', 'error')] = statuses.get(result.get('status', 'error'), 0) + 1
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return latencies, statuses, time.perf_counter() - start_time
+
+
+async def main(args):
+    bff_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bff_files")
+    names = args.levels or sorted(os.path.splitext(f)[0] for f in os.listdir(bff_folder) if f.endswith(".bff"))
+    puzzles = [open(os.path.join(bff_folder, f"{name}.bff"), 'rb').read() for name in names]
+
+    service = None
+    server = None
+    host, port = args.host, args.port
+    if not port:
+        # No server given: run one in this process on a free localhost port
+        service = SolverService(workers=args.workers)
+        service.start()
+        server = await asyncio.start_server(service.handle, '127.0.0.1', 0)
+        host, port = '127.0.0.1', server.sockets[0].getsockname()[1]
+
+    print(f"[INFO] {args.requests} requests, concurrency {args.concurrency}, levels: {', '.join(names)}")
+    latencies, statuses, wall = await run_load(host, port, puzzles, args.requests, args.concurrency, args.deadline)
+    print(f"[RESULT] throughput {len(latencies) / wall:.1f} req/s over {wall:.2f} s")
+    print(f"[RESULT] latency p50 {percentile(latencies, 0.50) * 1000:.1f} ms, "
+          f"p95 {percentile(latencies, 0.95) * 1000:.1f} ms, p99 {percentile(latencies, 0.99) * 1000:.1f} ms, "
+          f"max {max(latencies) * 1000:.1f} ms")
+    print(f"[RESULT] statuses {statuses}")
+    if service is not None:
+        print(f"[RESULT] service stats {service.stats}")
+        server.close()
+        await server.wait_closed()
+        service.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load test for SolverService on localhost.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="Port of a running service (default: start one)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--deadline", type=float, default=None, help="Per-request deadline in seconds")
+    parser.add_argument("levels", nargs='*', help="Level names from bff_files (default: all)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,23 @@
+from Solver import Solver
+from Verifier import verify
+from test_checkpoint import load_board
+
+
+def test_bidirectional(bff_names=("mad_7", "numbered_6", "yarn_5")):
+    '''
+    Solves levels with the bidirectional filter, with sets and with bitboards; the solutions
+    must verify and the searches must expand fewer nodes than the forward-only one.
+    '''
+    for bff_name in bff_names:
+        forward = Solver(load_board(bff_name))
+        assert forward.solve()
+        for options in ({}, {'bitboards': True}):
+            solver = Solver(load_board(bff_name), bidirectional=True, **options)
+            assert solver.solve()
+            assert verify(load_board(bff_name), solver.placed_blocks)
+            assert solver.nodes_expanded < forward.nodes_expanded
+        print(f"[TEST] {bff_name}: {forward.nodes_expanded} -> {solver.nodes_expanded} nodes")
+
+
+if __name__ == '__main__':
+    test_bidirectional()
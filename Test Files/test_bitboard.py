@@ -0,0 +1,45 @@
+import os
+import tempfile
+from Solver import Solver
+from Verifier import verify
+from test_checkpoint import InterruptedSolver, load_board
+
+
+def test_bitboard_solve(bff_names=("mad_1", "mad_4", "numbered_6", "showstopper_4", "tiny_5", "yarn_5")):
+    '''
+    Solves levels in bitboard mode; candidates are tried in another order than with sets,
+    so the placements are checked with the verifier instead of against the default solver.
+    '''
+    for bff_name in bff_names:
+        solver = Solver(load_board(bff_name), bitboards=True)
+        assert solver.solve()
+        assert verify(load_board(bff_name), solver.placed_blocks)
+        assert solver.placement_bits.bit_count() == len(solver.placed_blocks)
+        print(f"[TEST] {bff_name}: bitboard solve in {solver.nodes_expanded} nodes")
+
+
+def test_bitboard_checkpoint_resume(bff_name="numbered_6", stop_after=10):
+    '''
+    Interrupts and resumes a bitboard solve; its failed states are saved as placement masks.
+    '''
+    reference = Solver(load_board(bff_name), bitboards=True)
+    assert reference.solve()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"{bff_name}.ckpt")
+        solver = InterruptedSolver(load_board(bff_name), stop_after, bitboards=True,
+                                   checkpoint_path=path, checkpoint_interval=0)
+        try:
+            solver.solve()
+        except KeyboardInterrupt:
+            pass
+
+        resumed = Solver(load_board(bff_name), bitboards=True, checkpoint_path=path)
+        assert resumed.solve(resume_from=path)
+        assert resumed.placed_blocks == reference.placed_blocks
+    print(f"[TEST] {bff_name}: resumed bitboard solve matches {sorted(reference.placed_blocks.items())}")
+
+
+if __name__ == '__main__':
+    test_bitboard_solve()
+    test_bitboard_checkpoint_resume()
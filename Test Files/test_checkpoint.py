@@ -0,0 +1,74 @@
+import hashlib
+import os
+import tempfile
+from Checkpoint import board_fingerprint
+from LazorBoard import LazorBoard, puzzle_fingerprint
+from Classes import Board
+from Solver import Solver
+
+
+class InterruptedSolver(Solver):
+    """Solver that simulates being killed right after its n-th checkpoint."""
+    def __init__(self, board, stop_after, **kwargs):
+        super().__init__(board, **kwargs)
+        self.stop_after = stop_after
+        self.saved = 0
+
+    def save_checkpoint(self, path=None):
+        super().save_checkpoint(path)
+        self.saved += 1
+        if self.saved >= self.stop_after:
+            raise KeyboardInterrupt
+
+
+def load_board(bff_name):
+    lazor_data = LazorBoard.from_file(f"bff_files/{bff_name}.bff")
+    return Board(grid=lazor_data.grid, lasers=lazor_data.lasers,
+                 targets=lazor_data.targets, blocks=lazor_data.blocks)
+
+
+def test_checkpoint_resume(bff_name="numbered_6", stop_after=25):
+    '''
+    Interrupts a solve after a few checkpoints, resumes it in a fresh Solver and checks
+    that the resumed search ends on the same placements as an uninterrupted one.
+    '''
+    reference = Solver(load_board(bff_name))
+    assert reference.solve()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"{bff_name}.ckpt")
+        solver = InterruptedSolver(load_board(bff_name), stop_after,
+                                   checkpoint_path=path, checkpoint_interval=0)
+        try:
+            solver.solve()
+        except KeyboardInterrupt:
+            pass
+        assert os.path.exists(path)
+
+        resumed = Solver(load_board(bff_name), checkpoint_path=path)
+        assert resumed.solve(resume_from=path)
+        assert resumed.placed_blocks == reference.placed_blocks
+        # A finished search removes its checkpoint
+        assert not os.path.exists(path)
+    print(f"[TEST] {bff_name}: resumed solve matches {sorted(reference.placed_blocks.items())}")
+
+
+def test_fingerprints_agree(bff_names=("mad_1", "mad_7", "dark_1")):
+    '''
+    The puzzle fingerprint of the service and batch records is a hash of the checkpoint's, so
+    both tell the same boards apart: the levels all differ, and reordering a board's lasers
+    changes both.
+    '''
+    boards = [load_board(bff_name) for bff_name in bff_names]
+    boards.append(Board(boards[1].grid, boards[1].lasers[::-1], boards[1].targets, boards[1].blocks))
+    assert len(boards[1].lasers) > 1
+    keys = [board_fingerprint(b.grid, b.lasers, b.targets, b.blocks) for b in boards]
+    fingerprints = [puzzle_fingerprint(b.grid, b.lasers, b.targets, b.blocks) for b in boards]
+    assert fingerprints == [hashlib.sha1(key.encode('utf-8')).hexdigest()[:16] for key in keys]
+    assert len(set(keys)) == len(set(fingerprints)) == len(boards)
+    print(f"[TEST] {len(boards)} boards, fingerprints {fingerprints}")
+
+
+if __name__ == '__main__':
+    test_checkpoint_resume()
+    test_fingerprints_agree()
@@ -0,0 +1,99 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from contextlib import redirect_stdout
+import lazor
+
+# Imports of `lazor solve` on top of the interpreter's own, pyc files being up to date
+IMPORT_BUDGET = 0.05
+# Modules `lazor solve` has no use for, each imported by the subcommands or options that need it
+HEAVY_MODULES = ('matplotlib', 'multiprocessing', 'concurrent', 'asyncio', 'socket', 'numba',
+                 'cProfile', 'pstats', 'inspect', 'gzip', 'json', 'hashlib')
+
+
+def run(*argv):
+    '''Runs lazor with argv in this process; returns (exit status, output).'''
+    output = io.StringIO()
+    with redirect_stdout(output):
+        status = lazor.main(list(argv))
+    return status, output.getvalue()
+
+
+def imports(*argv, pycache_prefix):
+    '''
+    Runs python -X importtime with argv in a new process; returns {module: cumulative seconds}
+    of the modules it imports, None for those imported by other modules.
+    '''
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(lazor.__file__)))
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    process = subprocess.run([sys.executable, "-X", "importtime", "-X", f"pycache_prefix={pycache_prefix}",
+                              *argv], env=env, capture_output=True, text=True, check=True)
+    modules = {}
+    for line in process.stderr.splitlines():
+        if line.startswith("import time:") and not line.endswith("imported package"):
+            _, cumulative, name = line[len("import time:"):].split("|")
+            top_level = not name.startswith("  ")
+            modules[name.strip()] = int(cumulative) / 1e6 if top_level else None
+    return modules
+
+
+def test_solve_and_verify(bff_name="mad_1"):
+    '''lazor verify accepts the grids lazor solve prints, and --json gives the placements.'''
+    path = f"bff_files/{bff_name}.bff"
+    status, output = run("solve", path, "--bitboards")
+    assert status == 0 and "GRID START" in output
+    with tempfile.TemporaryDirectory() as folder:
+        solution = os.path.join(folder, "solution.txt")
+        with open(solution, 'w') as f:
+            f.write(output)
+        status, report = run("verify", path, solution)
+    assert status == 0 and "1/1 valid" in report
+
+    status, output = run("solve", path, "--json")
+    record = json.loads(output)
+    assert status == 0 and record['name'] == f"{bff_name}.bff" and record['status'] == 'solved'
+    assert record['placements'] and record['nodes'] > 0
+    print(f"[TEST] {bff_name}: solved and verified through the CLI, {record['nodes']} nodes")
+
+
+def test_jit_flag(bff_name="mad_1"):
+    '''lazor solve --jit runs the kernel, which in bitboard mode searches the same nodes.'''
+    records = [json.loads(run("solve", f"bff_files/{bff_name}.bff", "--json", "--bitboards", *flags)[1])
+               for flags in ((), ("--jit",))]
+    assert records[0]['status'] == records[1]['status'] == 'solved'
+    assert records[0]['nodes'] == records[1]['nodes'] and records[0]['placements'] == records[1]['placements']
+    print(f"[TEST] {bff_name}: same search with --jit, {records[1]['nodes']} nodes")
+
+
+def test_bench(bff_name="tiny_5"):
+    '''lazor bench prints one row per file.'''
+    status, output = run("bench", f"bff_files/{bff_name}.bff", "--repeat", "2")
+    assert status == 0 and output.splitlines()[1].startswith(f"{bff_name}.bff")
+    print(f"[TEST] {output.splitlines()[1]}")
+
+
+def test_import_budget(bff_name="tiny_5"):
+    '''
+    `lazor solve` imports none of the heavy modules and its imports take less than IMPORT_BUDGET
+    seconds; the best of three runs counts, the first of them writing the pyc files.
+    '''
+    with tempfile.TemporaryDirectory() as pycache_prefix:
+        startup = imports("-c", "pass", pycache_prefix=pycache_prefix)
+        runs = [imports(lazor.__file__, "solve", f"bff_files/{bff_name}.bff", pycache_prefix=pycache_prefix)
+                for _ in range(3)]
+    heavy = [name for name in runs[-1] if name.split('.')[0] in HEAVY_MODULES]
+    assert not heavy, f"lazor solve imports {heavy}"
+    seconds = min(sum(t for name, t in modules.items() if t is not None and name not in startup)
+                  for modules in runs)
+    assert seconds < IMPORT_BUDGET, f"lazor solve spends {seconds * 1000:.1f} ms importing"
+    print(f"[TEST] lazor solve: {seconds * 1000:.1f} ms of imports (budget {IMPORT_BUDGET * 1000:.0f} ms)")
+
+
+if __name__ == '__main__':
+    test_solve_and_verify()
+    test_jit_flag()
+    test_bench()
+    test_import_budget()
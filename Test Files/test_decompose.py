@@ -0,0 +1,73 @@
+import random
+from Classes import Board
+from Decompose import DecomposedSolver, find_components
+from Oracle import random_board, copy_board
+from Solver import Solver
+from Verifier import verify
+from test_checkpoint import load_board
+
+
+def side_by_side(board):
+    '''
+    Two copies of a board next to each other, with a gap of 'x' cells wider than the board is
+    tall: no diagonal through the cells of one copy crosses a cell of the other.
+    '''
+    rows, cols = len(board.grid), len(board.grid[0])
+    gap = rows + 1
+    shift = 2 * (cols + gap)
+    return Board([row + ['x'] * gap + row for row in board.grid],
+                 list(board.lasers) + [(x + shift, y, vx, vy) for x, y, vx, vy in board.lasers],
+                 list(board.targets) + [(x + shift, y) for x, y in board.targets],
+                 {t: 2 * n for t, n in board.blocks.items()})
+
+
+def test_decomposed_levels(bff_names=("dark_1", "mad_1", "mad_4", "showstopper_4", "tiny_5", "yarn_5")):
+    '''
+    The single-laser levels are one component each: the decomposed solve is the plain one.
+    '''
+    for bff_name in bff_names:
+        solver = DecomposedSolver(load_board(bff_name))
+        assert solver.solve() and len(solver.components) == 1
+        assert verify(load_board(bff_name), solver.placed_blocks)
+        print(f"[TEST] {bff_name}: one component, {solver.nodes_expanded} nodes")
+
+
+def test_decomposed_side_by_side(bff_name="tiny_5"):
+    '''
+    Two copies of a level are two components sharing the block budget; solving them apart
+    costs about twice one copy's search where the joint search costs about its square.
+    '''
+    components = find_components(side_by_side(load_board(bff_name)))
+    assert len(components) == 2 and all(len(component.lasers) == 1 for component in components)
+    decomposed = DecomposedSolver(side_by_side(load_board(bff_name)))
+    joint = Solver(side_by_side(load_board(bff_name)))
+    assert decomposed.solve() and joint.solve()
+    assert verify(side_by_side(load_board(bff_name)), decomposed.placed_blocks)
+    assert decomposed.nodes_expanded * 10 < joint.nodes_expanded
+    print(f"[TEST] {bff_name} twice: {joint.nodes_expanded} nodes jointly, "
+          f"{decomposed.nodes_expanded} in {decomposed.solves} component solves")
+
+
+def test_decomposed_random(cases=300, seed=0):
+    '''
+    On random multi-laser boards the decomposed solve finds a solution exactly when Solver
+    does, and its solutions verify.
+    '''
+    rng = random.Random(seed)
+    split = 0
+    for _ in range(cases):
+        board = random_board(rng, max_lasers=3, max_targets=4)
+        decomposed = DecomposedSolver(copy_board(board))
+        solved = decomposed.solve()
+        assert solved == Solver(copy_board(board)).solve()
+        if solved:
+            assert verify(copy_board(board), decomposed.placed_blocks)
+        split += sum(1 for component in decomposed.components if component.lasers) > 1
+    assert split > 0
+    print(f"[TEST] {cases} random boards, {split} split into several components")
+
+
+if __name__ == '__main__':
+    test_decomposed_levels()
+    test_decomposed_side_by_side()
+    test_decomposed_random()
@@ -0,0 +1,210 @@
+import asyncio
+import io
+import random
+import threading
+from contextlib import redirect_stdout
+from Distributed import Coordinator, Worker, main, puzzle_board, solve_distributed, split_root
+from Oracle import random_board, copy_board
+from Solver import Solver
+from SolverService import parse_puzzle
+from Verifier import verify
+
+
+def load_puzzle(bff_name):
+    with open(f"bff_files/{bff_name}.bff", 'rb') as file:
+        return parse_puzzle(file.read())[0]
+
+
+def solve_split(board, every=7, **options):
+    '''
+    Solves board in one search that gives work away every few nodes, then searches what it gave
+    away; returns whether any of them found a solution.
+    '''
+    solver = Solver(copy_board(board), iterative=True, **options)
+    given = []
+    solver.should_stop = lambda: given.extend(solver.split_work() if solver.nodes_expanded % every == 0 else [])
+    solved = solver.solve_subtree([])
+    other = Solver(copy_board(board), iterative=True, **options)
+    while given and not solved:
+        solved = other.solve_subtree(given.pop())
+        if solved:
+            assert verify(board, dict(other.placed_blocks))
+    return solved, len(given)
+
+
+def test_split_work(cases=150, seed=0):
+    '''
+    The search that gave work away and the subtrees it gave cover the whole tree: a solution is
+    found exactly when the plain search finds one, with or without bitboards and nogoods.
+    '''
+    rng = random.Random(seed)
+    for options in ({}, dict(bitboards=True), dict(learn_nogoods=True)):
+        for _ in range(cases):
+            board = random_board(rng, max_rows=5, max_cols=5, max_blocks=5)
+            expected = Solver(copy_board(board), **options).solve()
+            assert solve_split(board, **options)[0] == expected, board.to_string()
+    print(f"[TEST] {cases} random boards: split searches agree, for 3 flag sets")
+
+
+def solve_units(board, count=4, every=5, **options):
+    '''
+    Searches board as the coordinator's units, all on one worker Solver that keeps its failed
+    states and nogoods from unit to unit and gives work away inside every unit; what it gives
+    is queued after the units. Returns whether any of them found a solution.
+    '''
+    units, solution, _ = split_root(Solver(copy_board(board), iterative=True, **options), count)
+    if solution is not None:
+        return True
+    worker = Solver(copy_board(board), iterative=True, **options)
+    # Given work joins the queue being iterated, as it would the coordinator's
+    worker.should_stop = lambda: units.extend(worker.split_work() if worker.nodes_expanded % every == 0 else [])
+    for unit in units:
+        if worker.solve_subtree(unit):
+            assert verify(board, dict(worker.placed_blocks))
+            assert all(worker.placed_blocks.get((r, c)) == t for r, c, t in unit)
+            return True
+    return False
+
+
+def test_split_work_in_unit(cases=150, seed=0, bff_name="mad_7"):
+    '''
+    Work given away inside a unit is rooted at the unit's node: every given subtree extends the
+    unit's placements, and searching units with stealing inside them agrees with the plain
+    search, nogoods included.
+    '''
+    puzzle = load_puzzle(bff_name)
+    solver = Solver(puzzle_board(puzzle), iterative=True)
+    given = []
+    solver.should_stop = lambda: given.extend(solver.split_work() if not given else [])
+    solver.solve_subtree([(3, 4, 'A')])
+    assert given and all(unit[0] == (3, 4, 'A') for unit in given)
+
+    rng = random.Random(seed)
+    for options in ({}, dict(learn_nogoods=True)):
+        for _ in range(cases):
+            board = random_board(rng, max_rows=5, max_cols=5, max_blocks=5)
+            expected = Solver(copy_board(board), **options).solve()
+            assert solve_units(board, **options) == expected, (board.grid, board.lasers, board.targets)
+    print(f"[TEST] {bff_name}: {len(given)} units given below (3, 4, 'A'); {cases} random boards agree")
+
+
+def test_solve_distributed(bff_names=("mad_1", "yarn_5", "mad_7", "dark_1")):
+    '''A coordinator and three worker processes on localhost find valid solutions.'''
+    for bff_name in bff_names:
+        puzzle = load_puzzle(bff_name)
+        result = solve_distributed(puzzle, workers=3)
+        assert result['status'] == 'solved'
+        placements = {(r, c): t for r, c, t in result['placements']}
+        assert verify(puzzle_board(puzzle), placements)
+        print(f"[TEST] {bff_name}: solved by {result['workers']} workers, {result['units']} units, "
+              f"{result['nodes']} nodes")
+
+
+def test_work_stealing(bff_name="mad_7"):
+    '''
+    On a board without solution every node is searched; with one initial unit per worker the
+    workers that finish first steal from the others, and the search still ends as unsolvable.
+    '''
+    puzzle = load_puzzle(bff_name)
+    puzzle['blocks'] = dict(puzzle['blocks'], A=puzzle['blocks']['A'] - 1)
+    expected = Solver(puzzle_board(puzzle))
+    assert not expected.solve()
+    result = solve_distributed(puzzle, workers=3, units_per_worker=1)
+    assert result['status'] == 'unsolvable'
+    assert result['steals'] > 0 and result['stolen'] > 0
+    print(f"[TEST] {bff_name} without one block: {result['steals']} steals, {result['stolen']} units stolen, "
+          f"{result['nodes']} nodes (sequential: {expected.nodes_expanded})")
+
+
+def test_lost_worker(bff_name="yarn_5"):
+    '''
+    A worker that disconnects in the middle of a unit has its unit searched again by the others,
+    which are all told to stop once the solution is found.
+    '''
+    async def run():
+        coordinator = Coordinator(load_puzzle(bff_name), expected_workers=2)
+        port = await coordinator.start()
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'{"type":"hello"}\n')
+        await reader.readline()
+        assert b'"unit"' in await reader.readline()
+        writer.close()
+
+        workers = [Worker('127.0.0.1', port) for _ in range(2)]
+        threads = [threading.Thread(target=worker.run) for worker in workers]
+        for thread in threads:
+            thread.start()
+        result = await coordinator.wait()
+        for thread in threads:
+            await asyncio.get_running_loop().run_in_executor(None, thread.join)
+        return result, workers
+
+    result, workers = asyncio.run(run())
+    assert result['status'] == 'solved' and result['workers'] == 3
+    assert all(worker.stopped or worker.units for worker in workers)
+    print(f"[TEST] {bff_name}: solved after losing a worker, {sum(w.units for w in workers)} units")
+
+
+def test_protocol_errors(bff_name="yarn_5"):
+    '''
+    A 'done' for no unit, a 'done' for another worker's unit and a message without a type close
+    the connection as protocol errors; the search then goes on with a real worker.
+    '''
+    async def send(port, *lines):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        for line in lines:
+            writer.write(line)
+        while await reader.readline():
+            pass
+        writer.close()
+
+    async def run():
+        errors = []
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        coordinator = Coordinator(load_puzzle(bff_name), expected_workers=2)
+        port = await coordinator.start()
+        await asyncio.wait_for(send(port, b'{"type":"done","id":0,"solved":false,"nodes":1}\n'), 5)
+        await asyncio.wait_for(send(port, b'{"type":"hello"}\n',
+                                    b'{"type":"done","id":7,"solved":false,"nodes":1}\n'), 5)
+        await asyncio.wait_for(send(port, b'{"id":0}\n', b'[]\n'), 5)
+        assert coordinator.result is None and not coordinator.workers
+        worker = Worker('127.0.0.1', port)
+        thread = threading.Thread(target=worker.run)
+        thread.start()
+        result = await coordinator.wait()
+        await asyncio.get_running_loop().run_in_executor(None, thread.join)
+        return result, errors
+
+    result, errors = asyncio.run(run())
+    assert result['status'] == 'solved' and not errors, errors
+    print(f"[TEST] {bff_name}: 3 protocol errors dropped, then solved")
+
+
+def test_cli_options(bff_name="mad_1"):
+    '''
+    The local command passes every solver flag on, jit always as an explicit boolean (off unless
+    --jit), and the coordinator sends it to the workers even when its caller left it out.
+    '''
+    import Distributed
+    calls = []
+    solve = Distributed.solve_distributed
+    Distributed.solve_distributed = lambda puzzle, workers, options: calls.append(options) or {}
+    try:
+        with redirect_stdout(io.StringIO()):
+            for flags in (["--bitboards", "--jit"], ["--bitboards"], ["--jit", "--no-jit"]):
+                main(["local", f"bff_files/{bff_name}.bff", "--workers", "2", *flags])
+    finally:
+        Distributed.solve_distributed = solve
+    assert calls == [{'bitboards': True, 'jit': True}, {'bitboards': True, 'jit': False}, {'jit': False}]
+    assert Coordinator(load_puzzle(bff_name), {'bitboards': True}).options == {'bitboards': True, 'jit': False}
+    print(f"[TEST] local command options: {calls}")
+
+
+if __name__ == '__main__':
+    test_split_work()
+    test_split_work_in_unit()
+    test_solve_distributed()
+    test_work_stealing()
+    test_lost_worker()
+    test_protocol_errors()
+    test_cli_options()
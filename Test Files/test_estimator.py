@@ -0,0 +1,59 @@
+from Solver import Solver
+from Estimator import SearchEstimate, estimate_search, longest_first, predicted_makespan
+from test_checkpoint import load_board
+
+
+def count_tree(solver):
+    '''
+    Exact number of nodes of the tree estimate_search() samples: every (cell, block type)
+    child of every node, without caches and without stopping at a solution.
+    '''
+    solved, new_candidates = solver.simulate_with_blocks()
+    if solved or not new_candidates:
+        return 1
+    nodes = 1
+    for (r, c) in solver.candidate_order(new_candidates):
+        for block_type in 'ABC':
+            if solver.board.grid[r][c] != 'o' or solver.board.blocks.get(block_type, 0) < 1:
+                continue
+            solver.place_block(r, c, block_type)
+            nodes += count_tree(solver)
+            solver.remove_block(r, c, block_type)
+    return nodes
+
+
+def test_estimate_search(bff_names=("tiny_5", "showstopper_4", "mad_1"), probes=2000):
+    '''
+    With many probes the estimate must be close to the exact size of the tree, and the board
+    must be left as it was.
+    '''
+    for bff_name in bff_names:
+        solver = Solver(load_board(bff_name))
+        solver.reset_search()
+        exact = count_tree(solver)
+        estimate = estimate_search(solver, probes=probes, seed=0)
+        assert abs(estimate.nodes - exact) < 0.2 * exact
+        assert estimate.probes == probes and estimate.seconds > 0
+        assert not solver.placed_blocks and solver.board.grid == solver.original_grid
+        assert solver.solve()
+        print(f"[TEST] {bff_name}: {exact} nodes, estimated {estimate}")
+
+
+def test_longest_first():
+    '''
+    The batch order puts the longest expected runtime first; LPT on two workers beats the
+    reverse order on a skewed batch.
+    '''
+    estimates = {name: SearchEstimate(0, seconds, 1, 1)
+                 for name, seconds in [("a", 1.0), ("b", 4.0), ("c", 2.0), ("d", 3.0), ("e", 6.0)]}
+    order = longest_first(estimates)
+    assert order == ["e", "b", "d", "c", "a"]
+    seconds = [estimates[name].seconds for name in order]
+    assert predicted_makespan(seconds, 2) == 8.0
+    assert predicted_makespan(seconds[::-1], 2) == 10.0
+    assert predicted_makespan(seconds, 1) == sum(seconds)
+
+
+if __name__ == '__main__':
+    test_estimate_search()
+    test_longest_first()
@@ -0,0 +1,96 @@
+import heapq
+import os
+import random
+import tempfile
+import tracemalloc
+from Frontier import SpillFrontier, best_first_search, solver_frontier
+from Oracle import random_board, copy_board
+from Solver import Solver
+from Verifier import verify
+from test_checkpoint import load_board
+
+
+def test_spill_frontier(steps=20000, seed=0):
+    '''
+    With a few kilobytes of RAM the frontier spills most of its states, keeps no more than
+    capacity of them in memory, and pops exactly what an unbounded heap pops.
+    '''
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "frontier.bin")
+        heap, popped, expected = [], [], []
+        with SpillFrontier(6, ram_limit=20000, path=path, max_code=299) as frontier:
+            for number in range(steps):
+                if rng.random() < 0.6:
+                    priority, codes = rng.randrange(50), sorted(rng.sample(range(300), rng.randrange(7)))
+                    frontier.push(priority, codes)
+                    heapq.heappush(heap, (priority, number, codes))
+                elif heap:
+                    popped.append(frontier.pop())
+                    expected.append(heapq.heappop(heap)[::2])
+                assert frontier.in_memory <= frontier.capacity and len(frontier) == len(heap)
+            while heap:
+                popped.append(frontier.pop())
+                expected.append(heapq.heappop(heap)[::2])
+            assert popped == expected and frontier.spilled > steps // 10
+            assert os.path.getsize(path) == 0
+        assert not os.path.exists(path)
+    print(f"[TEST] {len(popped)} states popped in order, {frontier.spilled} spilled, "
+          f"{frontier.peak_disk_bytes} bytes on disk at most, {frontier.capacity} in memory")
+
+
+def test_best_first_search(bff_names=("mad_1", "mad_7", "yarn_5", "numbered_6"), ram_limit=1 << 14):
+    '''Best-first searches in a few kilobytes find valid solutions, with and without bitboards.'''
+    for bff_name in bff_names:
+        for options in ({}, {'bitboards': True}):
+            solver = Solver(load_board(bff_name), **options)
+            frontier = solver_frontier(solver, ram_limit)
+            assert best_first_search(solver, frontier)
+            assert verify(load_board(bff_name), dict(solver.placed_blocks)) and solver.final_paths
+            assert not os.path.exists(frontier.path)
+            print(f"[TEST] {bff_name}{' bitboards' if options else ''}: {solver.nodes_expanded} nodes, "
+                  f"{frontier.spilled} states spilled")
+
+
+def test_best_first_completeness(cases=60, seed=3):
+    '''On random boards, solvable or not, best first finds a solution exactly when solve() does.'''
+    rng = random.Random(seed)
+    unsolvable = 0
+    for _ in range(cases):
+        board = random_board(rng, max_rows=4, max_cols=4, max_blocks=4)
+        solved = Solver(copy_board(board)).solve()
+        solver = Solver(copy_board(board))
+        assert best_first_search(solver, solver_frontier(solver, ram_limit=4096)) == solved
+        if solved:
+            assert verify(board, dict(solver.placed_blocks))
+        unsolvable += not solved
+    assert 0 < unsolvable < cases
+    print(f"[TEST] {cases} random boards, {unsolvable} without a solution")
+
+
+def test_best_first_memory(bff_name="mad_7", ram_limit=1 << 14, nodes=(1000, 6000)):
+    '''
+    Long best-first searches of a wide board in a few kilobytes: the memory they allocate peaks
+    at the same level however many nodes they expand, the queued states spilling to disk.
+    '''
+    solver = Solver(load_board(bff_name))
+    best_first_search(solver, solver_frontier(solver, ram_limit), max_nodes=100)  # Fills the caches
+    peaks = []
+    for max_nodes in nodes:
+        solver = Solver(load_board(bff_name))
+        frontier = solver_frontier(solver, ram_limit)
+        tracemalloc.start()
+        assert not best_first_search(solver, frontier, max_nodes)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        assert solver.nodes_expanded == max_nodes and frontier.spilled > frontier.capacity
+    assert peaks[-1] < peaks[0] + ram_limit
+    print(f"[TEST] {bff_name}: {' and '.join(map(str, peaks))} bytes at most after {' and '.join(map(str, nodes))} "
+          f"nodes, {frontier.spilled} states spilled")
+
+
+if __name__ == '__main__':
+    test_spill_frontier()
+    test_best_first_search()
+    test_best_first_completeness()
+    test_best_first_memory()
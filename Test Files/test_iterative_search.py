@@ -0,0 +1,80 @@
+import inspect
+import os
+import sys
+import tempfile
+from Classes import Board
+from Solver import Solver
+from Verifier import verify
+from test_checkpoint import InterruptedSolver, load_board
+
+
+def test_iterative_search(bff_names=("mad_1", "mad_4", "mad_7", "numbered_6", "tiny_5", "yarn_5")):
+    '''
+    The iterative engine must expand the same nodes and find the same placements as the
+    recursive one, alone and combined with the other search options.
+    '''
+    for options in ({}, {"bitboards": True}, {"learn_nogoods": True},
+                    {"ray_jump": True, "prune_dead_cells": True, "bidirectional": True}):
+        for bff_name in bff_names:
+            recursive = Solver(load_board(bff_name), **options)
+            iterative = Solver(load_board(bff_name), iterative=True, **options)
+            assert recursive.solve() == iterative.solve()
+            assert recursive.placed_blocks == iterative.placed_blocks
+            assert recursive.nodes_expanded == iterative.nodes_expanded
+        print(f"[TEST] {options}: identical searches on {len(bff_names)} levels")
+
+
+def open_board(n=30):
+    '''An open n x n board with a block of type A per cell, whose solution is 32 blocks deep.'''
+    return Board(grid=[['o'] * n for _ in range(n)], lasers=[(0, 1, 1, 1)],
+                 targets=[(2, 2 * n - 1)], blocks={'A': n * n})
+
+
+def test_iterative_search_depth(frames=30):
+    '''
+    With only a few frames left before the recursion limit, the recursive engine fails while
+    the iterative one solves the deep board.
+    '''
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(len(inspect.stack()) + frames)
+    try:
+        try:
+            Solver(open_board()).solve()
+            assert False, "the recursive search should exceed the recursion limit"
+        except RecursionError:
+            pass
+        solver = Solver(open_board(), iterative=True)
+        assert solver.solve()
+    finally:
+        sys.setrecursionlimit(limit)
+    assert len(solver.placed_blocks) > frames
+    assert verify(open_board(), solver.placed_blocks)
+    print(f"[TEST] {len(solver.placed_blocks)} blocks deep with {frames} frames to spare")
+
+
+def test_iterative_checkpoint_resume(bff_name="numbered_6", stop_after=25):
+    '''
+    Interrupts an iterative solve; a recursive solver resumes its checkpoint (the format is
+    shared) and ends on the same placements as an uninterrupted solve.
+    '''
+    reference = Solver(load_board(bff_name))
+    assert reference.solve()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"{bff_name}.ckpt")
+        solver = InterruptedSolver(load_board(bff_name), stop_after, iterative=True,
+                                   checkpoint_path=path, checkpoint_interval=0)
+        try:
+            solver.solve()
+        except KeyboardInterrupt:
+            pass
+        for iterative in (False, True):
+            resumed = Solver(load_board(bff_name), iterative=iterative)
+            assert resumed.solve(resume_from=path)
+            assert resumed.placed_blocks == reference.placed_blocks
+    print(f"[TEST] {bff_name}: resumed iterative checkpoint finds {sorted(resumed.placed_blocks.items())}")
+
+
+if __name__ == '__main__':
+    test_iterative_search()
+    test_iterative_search_depth()
+    test_iterative_checkpoint_resume()
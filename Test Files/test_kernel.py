@@ -0,0 +1,72 @@
+import random
+from array import array
+from Kernel import JIT_AVAILABLE
+from Solver import Solver
+from Oracle import random_board, random_placements, copy_board
+from test_checkpoint import load_board
+
+
+def simulate_both(board, placed, **options):
+    '''
+    Simulates placed on board with the Python tracer and with the kernel; returns both
+    (solved, candidates, remaining targets).
+    '''
+    outcomes = []
+    for jit in (False, True):
+        solver = Solver(copy_board(board), jit=jit, **options)
+        solver.reset_search()
+        for (r, c), block_type in placed.items():
+            solver.place_block(r, c, block_type)
+        solved, candidates = solver.simulate_with_blocks()
+        outcomes.append((solved, candidates, solver.remaining_targets))
+    return outcomes
+
+
+def test_kernel_matches_tracer(cases=300, seed=0):
+    '''
+    On random boards and placements the kernel (interpreted here unless Numba is installed)
+    finds the same candidates and remaining targets as the Python tracer, in both modes.
+    '''
+    rng = random.Random(seed)
+    for _ in range(cases):
+        board = random_board(rng, max_rows=6, max_cols=6, max_blocks=6)
+        placed = random_placements(rng, board)
+        for bitboards in (False, True):
+            expected, actual = simulate_both(board, placed, bitboards=bitboards)
+            assert actual == expected, (board.to_string(), placed)
+    print(f"[TEST] {cases} random simulations agree (compiled: {JIT_AVAILABLE})")
+
+
+def test_kernel_solve(bff_names=("mad_1", "numbered_6", "yarn_5")):
+    '''
+    In bitboard mode the candidates are masks, so the search with the kernel is the same search.
+    Without bitboards the solutions may differ, but both are solutions.
+    '''
+    for bff_name in bff_names:
+        expected = Solver(load_board(bff_name), bitboards=True, jit=False)
+        solver = Solver(load_board(bff_name), bitboards=True, jit=True)
+        assert solver.solve() and expected.solve()
+        assert solver.placed_blocks == expected.placed_blocks
+        assert solver.nodes_expanded == expected.nodes_expanded
+        assert Solver(load_board(bff_name), jit=True).solve()
+        print(f"[TEST] {bff_name}: same search with the kernel, {solver.nodes_expanded} nodes")
+
+
+def test_queue_overflow(bff_name="mad_1"):
+    '''
+    A simulation with more beams than the kernel's queue holds is run again by the Python tracer.
+    '''
+    solver = Solver(load_board(bff_name), jit=True)
+    solver.kernel.queue = array('i', [0]) * (4 * len(solver.board.lasers))
+    expected = Solver(load_board(bff_name), jit=False)
+    assert solver.solve() and expected.solve()
+    assert solver.placed_blocks == expected.placed_blocks
+    assert 'C' in solver.placed_blocks.values()
+    assert solver.kernel.simulate(solver.placed_blocks, solver.board.lasers) is None
+    print(f"[TEST] {bff_name}: overflowing simulations fall back to the tracer")
+
+
+if __name__ == '__main__':
+    test_kernel_matches_tracer()
+    test_kernel_solve()
+    test_queue_overflow()
@@ -0,0 +1,56 @@
+import sys
+from Solver import Solver
+from Tracer import get_geometry
+from test_checkpoint import load_board
+
+
+def test_laser_paths(bff_names=("mad_1", "mad_7", "yarn_5")):
+    '''
+    Solves levels and checks the segment-compressed paths: every beam expands into unit
+    diagonal half steps from its source, the step states computed from the segments match
+    the expanded points, and the buffers are much smaller than the point tuples.
+    '''
+    for bff_name in bff_names:
+        board = load_board(bff_name)
+        solver = Solver(board)
+        assert solver.solve()
+        paths = solver.final_paths
+        expanded = list(paths)
+        assert len(paths) >= len(board.lasers)
+        for (lx, ly, _, _), path in zip(board.lasers, expanded):
+            assert path[0] == (lx, ly)
+        geometry = get_geometry(len(board.grid), len(board.grid[0]))
+        states = []
+        for path in expanded:
+            for (x1, y1), (x2, y2) in zip(path, path[1:]):
+                assert abs(x2 - x1) == 1 and abs(y2 - y1) == 1
+                states.append(geometry.index(x1, y1, x2 - x1, y2 - y1))
+        assert list(paths.step_states(geometry)) == states
+        tuples = sum(sys.getsizeof(path) + sum(sys.getsizeof(p) for p in path) for path in expanded)
+        assert paths.nbytes * 4 < tuples
+        print(f"[TEST] {bff_name}: {len(paths)} beams, {paths.nbytes} bytes instead of {tuples}")
+
+
+def test_paths_only_for_solutions(bff_name="mad_4"):
+    '''
+    The search does not record paths: a solve that fails leaves none, and the nodes of the
+    bidirectional search only fill the scratch paths.
+    '''
+    solver = Solver(load_board(bff_name))
+    solver.reset_search()
+    solver.simulate_with_blocks()
+    assert len(solver.final_paths) == 0
+    solver.simulate_with_blocks(record_paths=True)
+    assert len(solver.final_paths) == len(solver.board.lasers)
+
+    bidirectional = Solver(load_board(bff_name), bidirectional=True)
+    bidirectional.reset_search()
+    bidirectional.simulate_with_blocks()
+    assert len(bidirectional.final_paths) == 0 and len(bidirectional.node_paths) > 0
+    assert bidirectional.solve() and list(bidirectional.final_paths)
+    print(f"[TEST] {bff_name}: paths recorded for the solution only")
+
+
+if __name__ == '__main__':
+    test_laser_paths()
+    test_paths_only_for_solutions()
@@ -0,0 +1,33 @@
+from LazorBoard import LazorBoard
+from Classes import Board
+from Solver import Solver
+
+
+def test_laser_trace(bff_name="mad_1"):
+    '''
+    Solves a level with record_trace=True and checks that the trace index agrees with
+    the plain simulation: every target has a beam, split beams point to their C block.
+    '''
+    lazor_data = LazorBoard.from_file(f"bff_files/{bff_name}.bff")
+    board = Board(grid=lazor_data.grid, lasers=lazor_data.lasers,
+                  targets=lazor_data.targets, blocks=lazor_data.blocks)
+    solver = Solver(board, record_trace=True)
+    assert solver.solve()
+
+    trace = solver.trace
+    assert trace.solved and not trace.missed_targets()
+    assert len(trace.beam_parent) == len(solver.final_paths)
+    for target in board.targets:
+        beam = trace.beam_for_target(target)
+        assert target in solver.final_paths[beam]
+        assert trace.beam_ancestry(beam)[0] < len(board.lasers)
+        feeder = trace.feeder_of(target)
+        assert feeder is None or feeder in solver.placed_blocks
+    for beam, cell in enumerate(trace.beam_split_cell):
+        if trace.beam_parent[beam] >= 0:
+            assert solver.placed_blocks[divmod(cell, trace.cols)] == 'C'
+    print(f"[TEST] {bff_name}: trace of {len(trace.beam_parent)} beams is consistent")
+
+
+if __name__ == '__main__':
+    test_laser_trace()
@@ -0,0 +1,57 @@
+import os
+import tempfile
+from Solver import Solver
+from Verifier import verify
+from test_checkpoint import InterruptedSolver, load_board
+
+
+def test_nogood_learning(bff_names=("mad_4", "mad_7", "yarn_5")):
+    '''
+    Solves the hard levels with nogood learning; the solutions must verify and the searches
+    must expand fewer nodes than with the plain failed-state cache.
+    '''
+    for bff_name in bff_names:
+        plain = Solver(load_board(bff_name))
+        learning = Solver(load_board(bff_name), learn_nogoods=True)
+        assert plain.solve() and learning.solve()
+        assert verify(load_board(bff_name), learning.placed_blocks)
+        stats = learning.nogoods.stats()
+        assert stats['learned'] > 0 and stats['hits'] > 0
+        assert learning.nodes_expanded < plain.nodes_expanded
+        print(f"[TEST] {bff_name}: {plain.nodes_expanded} -> {learning.nodes_expanded} nodes, {stats}")
+
+
+def test_nogood_cap(bff_name="mad_4", max_nogoods=20):
+    '''
+    A store far too small for the search must evict nogoods and still find a valid solution.
+    '''
+    solver = Solver(load_board(bff_name), learn_nogoods=True, max_nogoods=max_nogoods)
+    assert solver.solve()
+    assert verify(load_board(bff_name), solver.placed_blocks)
+    assert len(solver.nogoods) <= max_nogoods and solver.nogoods.evicted > 0
+    print(f"[TEST] {bff_name}: solved with at most {max_nogoods} nogoods, {solver.nogoods.stats()}")
+
+
+def test_nogood_checkpoint_resume(bff_name="mad_4", stop_after=40):
+    '''
+    Interrupts a solve with nogood learning; the resumed solve loads the saved nogoods and
+    must still find a valid solution.
+    '''
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"{bff_name}.ckpt")
+        solver = InterruptedSolver(load_board(bff_name), stop_after, learn_nogoods=True,
+                                   checkpoint_path=path, checkpoint_interval=0)
+        try:
+            solver.solve()
+        except KeyboardInterrupt:
+            pass
+        resumed = Solver(load_board(bff_name), learn_nogoods=True, checkpoint_path=path)
+        assert resumed.solve(resume_from=path)
+        assert verify(load_board(bff_name), resumed.placed_blocks)
+    print(f"[TEST] {bff_name}: resumed solve with nogoods finds {sorted(resumed.placed_blocks.items())}")
+
+
+if __name__ == '__main__':
+    test_nogood_learning()
+    test_nogood_cap()
+    test_nogood_checkpoint_resume()
@@ -0,0 +1,84 @@
+import os
+import random
+import tempfile
+from Oracle import (ENGINES, SIMULATORS, load_case, random_board, run_engine_cases,
+                    run_simulator_cases, simulation_failure, solver_simulator)
+from Kernel import TraceKernel
+from LazorBoard import LazorBoard
+
+
+def test_oracle_built_in(cases=100):
+    '''
+    Every built-in simulator and engine must agree with the reference on random cases.
+    '''
+    for name, prepare in SIMULATORS.items():
+        report = run_simulator_cases(prepare, name, cases, seed=1)
+        assert report and len(report.cases) == cases
+        print(report.summary())
+    for name, prepare in ENGINES.items():
+        report = run_engine_cases(prepare, name, cases // 4, seed=1)
+        assert report
+        print(report.summary())
+
+
+def c_as_a(board, placements):
+    '''A broken simulator: C blocks only reflect, as if they were A blocks.'''
+    return solver_simulator()(board, {cell: 'A' if t == 'C' else t for cell, t in placements.items()})
+
+
+def test_oracle_shrinks_failures(cases=100):
+    '''
+    A broken simulator is caught; its failures shrink to a single C block and are written as
+    .bff reproducers that load back into a failing case.
+    '''
+    with tempfile.TemporaryDirectory() as tmp:
+        report = run_simulator_cases(c_as_a, "c_as_a", cases, seed=2, out_dir=tmp)
+        assert not report
+        for i, case in enumerate(report.failures):
+            assert list(case.placements.values()) == ['C']
+            assert len(case.board.lasers) == 1
+            board, placements = load_case(os.path.join(tmp, f"c_as_a_{i}.bff"))
+            assert placements == case.placements and board.grid == case.board.grid
+            assert simulation_failure(c_as_a, board, placements)
+        smallest = min(report.failures, key=lambda case: len(case.board.grid) * len(case.board.grid[0]))
+        print(f"[TEST] {len(report.failures)}/{cases} failures, smallest reproducer:")
+        print(open(os.path.join(tmp, f"c_as_a_{report.failures.index(smallest)}.bff")).read())
+
+
+def test_oracle_covers_kernel(cases=50):
+    '''
+    The jit simulators run the kernel: one that drops the first candidate of every simulation
+    is caught by both.
+    '''
+    simulate = TraceKernel.simulate
+
+    def broken(kernel, placed_blocks, lasers):
+        outcome = simulate(kernel, placed_blocks, lasers)
+        return outcome and (outcome[0], outcome[1][1:])
+
+    TraceKernel.simulate = broken
+    try:
+        for name in ('jit', 'jit+bitboards'):
+            report = run_simulator_cases(SIMULATORS[name], name, cases, seed=1)
+            assert not report
+            print(f"[TEST] broken kernel under {name}: {len(report.failures)}/{cases} failures")
+    finally:
+        TraceKernel.simulate = simulate
+
+
+def test_bff_round_trip(seed=3):
+    '''LazorBoard.to_string() is read back by from_string() unchanged.'''
+    rng = random.Random(seed)
+    for _ in range(20):
+        board = random_board(rng)
+        lazor_data = LazorBoard.from_string(
+            LazorBoard(board.grid, board.blocks, board.lasers, board.targets).to_string())
+        assert (lazor_data.grid, lazor_data.lasers, lazor_data.targets) == (board.grid, board.lasers, board.targets)
+        assert lazor_data.blocks == board.blocks
+
+
+if __name__ == '__main__':
+    test_oracle_built_in()
+    test_oracle_shrinks_failures()
+    test_oracle_covers_kernel()
+    test_bff_round_trip()
@@ -0,0 +1,85 @@
+import inspect
+import os
+import pickle
+import tempfile
+from Solver import Solver
+from Tracer import simulate_single_laser, simulate_single_laser_bits
+from Profiler import SolveProfile, collision_lines
+from test_checkpoint import load_board
+
+
+def read_folded(path):
+    '''Parses a collapsed stacks file into {stack: weight}.'''
+    stacks = {}
+    with open(path) as file:
+        for line in file:
+            stack, weight = line.rstrip('\n').rsplit(' ', 1)
+            stacks[stack] = int(weight)
+    return stacks
+
+
+def test_collision_lines():
+    '''
+    The collision lines of both tracers start after the no-collision branch and cover the
+    handling of a hit block, up to the end of the stepping loop.
+    '''
+    for func in (simulate_single_laser, simulate_single_laser_bits):
+        lines = collision_lines(func)
+        source, first = inspect.getsourcelines(func)
+        body = "".join(source[lines.start - first:lines.stop - first])
+        assert 'touched.add(cell)' in body and 'vx = -vx' in body
+        assert 'x, y = nx, ny' not in body
+        print(f"[TEST] {func.__name__}: collision lines {lines.start}-{lines.stop - 1}")
+
+
+def test_sample_profile(bff_name="mad_7"):
+    '''
+    A sampled solve finds the same solution; its stacks start with the phase of the solver and
+    show the simulation and collision phases within the search, also when the kernel is asked for
+    (a profiled solve keeps the Python tracer).
+    '''
+    expected = Solver(load_board(bff_name))
+    expected.solve()
+    for jit in (False, True):
+        profile = SolveProfile('sample', interval=0.0005)
+        solver = Solver(load_board(bff_name), profile=profile, jit=jit)
+        assert solver.solve() and solver.kernel is None
+        assert solver.placed_blocks == expected.placed_blocks
+        assert all(stack.split(';')[0] in ('[initial candidates]', '[search]') for stack in profile.stacks)
+        totals = profile.phase_totals()
+        assert totals['search'] > 0 and totals['simulation'] > 0 and totals['collision'] > 0
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, f"{bff_name}_profile.folded")
+            profile.write(path)
+            assert read_folded(path) == profile.stacks
+        print(f"[TEST] {bff_name} sampled{' with jit' if jit else ''}: {profile.summary()}")
+
+
+def test_cprofile_profile(bff_name="yarn_5"):
+    '''
+    With cProfile the own time of the tracer is found under the simulation label, nested
+    phases get their own prefix, and the profile survives pickling (as from a worker process).
+    '''
+    profile = SolveProfile('cprofile')
+    with profile.phase('parse'):
+        board = load_board(bff_name)
+        with profile.phase('render'):
+            load_board(bff_name)
+    assert Solver(board, profile=profile).solve()
+    totals = profile.phase_totals()
+    assert set(totals) <= {'parse', 'render', 'initial candidates', 'search', 'simulation'}
+    assert any(stack.startswith('[parse];[render];load_board') for stack in profile.stacks)
+    assert totals['parse'] > 0 and totals['search'] > 0 and totals['simulation'] > 0
+    assert any(stack.startswith('[search];') and '[simulation]' in stack
+               and stack.endswith(f"simulate_single_laser (Tracer.py:{simulate_single_laser.__code__.co_firstlineno})")
+               for stack in profile.stacks)
+    assert not any('_lsprof' in stack or '__enter__' in stack for stack in profile.stacks)
+    copy = pickle.loads(pickle.dumps(profile))
+    assert copy.stacks == profile.stacks and copy.mode == 'cprofile'
+    print(f"[TEST] {bff_name} cProfile: {profile.summary()}")
+
+
+if __name__ == '__main__':
+    test_collision_lines()
+    test_sample_profile()
+    test_cprofile_profile()
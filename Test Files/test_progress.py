@@ -0,0 +1,54 @@
+from Solver import Solver
+from Progress import SolveProgress, search_fraction
+from test_checkpoint import load_board
+
+
+def test_search_fraction():
+    '''The children before the one being searched are done, in equal shares of their parent.'''
+    cells = [(0, 0), (0, 1)]
+    assert search_fraction([]) == 0.0
+    assert search_fraction([[cells, 0, 0]]) == 0.0
+    assert search_fraction([[cells, 1, 0]]) == 0.5
+    assert search_fraction([[cells, 1, 0], [cells, 0, 2]]) == 0.5 + 2 / 36
+    assert search_fraction([[cells, 1, 2], [cells, 1, 2]]) < 1.0
+    print("[TEST] search_fraction")
+
+
+def test_progress_reports(bff_name="mad_7"):
+    '''
+    With interval 0 every sample is reported: the nodes grow, the fraction searched stays
+    below 1, the best coverage never drops, and samples are taken every sample_nodes nodes.
+    The recursive and iterative searches report the same.
+    '''
+    outcomes = []
+    for iterative in (False, True):
+        reports = []
+        progress = SolveProgress(reports.append, interval=0)
+        solver = Solver(load_board(bff_name), iterative=iterative, progress=progress)
+        assert solver.solve()
+        assert progress.reports == len(reports) > 0
+        assert all(a.nodes < b.nodes and a.targets_hit <= b.targets_hit for a, b in zip(reports, reports[1:]))
+        assert all(0 <= r.fraction < 1 and 0 <= r.depth <= sum(solver.original_blocks.values()) for r in reports)
+        assert all(r.targets == len(solver.original_targets) and r.targets_hit < r.targets for r in reports)
+        # Nodes skipped by the failed-state cache are not simulated, so not counted down
+        assert solver.nodes_expanded > len(reports) * progress.sample_nodes > solver.nodes_expanded / 4
+        outcomes.append([(r.nodes, r.depth, r.targets_hit, r.fraction) for r in reports])
+        print(f"[TEST] {bff_name}{' iterative' if iterative else ''}: {len(reports)} reports, last: {reports[-1]}")
+    assert outcomes[0] == outcomes[1]
+
+
+def test_progress_throttle(bff_name="mad_4"):
+    '''A solve shorter than the interval reports nothing, and the solution is unchanged.'''
+    reports = []
+    solver = Solver(load_board(bff_name), progress=SolveProgress(reports.append, interval=60))
+    assert solver.solve() and not reports
+    plain = Solver(load_board(bff_name))
+    assert plain.solve()
+    assert plain.placed_blocks == solver.placed_blocks and plain.nodes_expanded == solver.nodes_expanded
+    print(f"[TEST] {bff_name}: no report within the interval")
+
+
+if __name__ == '__main__':
+    test_search_fraction()
+    test_progress_reports()
+    test_progress_throttle()
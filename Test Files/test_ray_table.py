@@ -0,0 +1,52 @@
+import random
+from LazorBoard import LazorBoard
+from Classes import Board
+from Solver import Solver
+from RayTable import RayTable
+
+
+def load_board(bff_name):
+    lazor_data = LazorBoard.from_file(f"bff_files/{bff_name}.bff")
+    return Board(grid=lazor_data.grid, lasers=lazor_data.lasers,
+                 targets=lazor_data.targets, blocks=lazor_data.blocks)
+
+
+def test_ray_jump_solve(bff_name="mad_4"):
+    '''
+    Solves a level with and without ray jumping; the placements, the beam paths and the
+    number of expanded nodes must be identical.
+    '''
+    stepping = Solver(load_board(bff_name))
+    jumping = Solver(load_board(bff_name), ray_jump=True)
+    assert stepping.solve() and jumping.solve()
+    assert jumping.placed_blocks == stepping.placed_blocks
+    assert jumping.final_paths == stepping.final_paths
+    assert jumping.nodes_expanded == stepping.nodes_expanded
+    print(f"[TEST] {bff_name}: ray jumping finds the same solution in {jumping.nodes_expanded} nodes")
+
+
+def test_ray_table_updates(size=12, moves=300, seed=0):
+    '''
+    Places and removes random blocks on a large empty board; after every update the
+    incremental jump lengths must equal those of a freshly built table.
+    '''
+    rng = random.Random(seed)
+    board = Board(grid=[['o'] * size for _ in range(size)], lasers=[(0, 1, 1, 1)],
+                  targets=[(2 * size - 1, 2 * size), (5, 0)], blocks={'A': 0, 'B': 0, 'C': 0})
+    solver = Solver(board)
+    placed = {}
+    rays = RayTable(solver.geometry, board.grid, board.targets, placed)
+    for _ in range(moves):
+        cell = (rng.randrange(size), rng.randrange(size))
+        if cell in placed:
+            del placed[cell]
+        else:
+            placed[cell] = 'A'
+        rays.update(cell)
+        assert rays.jumps == RayTable(solver.geometry, board.grid, board.targets, placed).jumps
+    print(f"[TEST] {moves} incremental updates on a {size}x{size} board match a rebuilt table")
+
+
+if __name__ == '__main__':
+    test_ray_jump_solve()
+    test_ray_table_updates()
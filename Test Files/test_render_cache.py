@@ -0,0 +1,65 @@
+import os
+import tempfile
+from RenderCache import RenderCache, render_key
+from Solver import Solver
+from test_checkpoint import load_board
+
+
+def render(cache, key, output_path, drawn):
+    '''What visualize_lazor_solution() does with a cache, with a stand-in for matplotlib.'''
+    if cache.fetch(key, output_path):
+        return
+    with open(output_path, 'wb') as f:
+        f.write(key.encode('ascii'))
+    drawn.append(output_path)
+    cache.store(key, output_path)
+
+
+def test_render_key(bff_name="mad_1"):
+    '''The key changes with the placements, the paths and the options, and only with them.'''
+    solver = Solver(load_board(bff_name))
+    assert solver.solve()
+    grid, targets, paths = solver.board.grid, solver.board.targets, list(solver.final_paths)
+    key = render_key(grid, targets, paths, {'dpi': 300})
+    assert key == render_key([list(row) for row in grid], list(targets), [list(p) for p in paths], {'dpi': 300})
+    assert key != render_key(grid, targets, paths, {'dpi': 150})
+    assert key != render_key(grid, targets, paths[:-1], {'dpi': 300})
+    assert key != render_key(Solver(load_board(bff_name)).board.grid, targets, paths, {'dpi': 300})
+    print(f"[TEST] {bff_name}: render key {key[:12]}...")
+
+
+def test_render_cache():
+    '''
+    A second run with unchanged solutions draws nothing, a deleted output comes back from the
+    cache, and the entry of a solution that changed or whose output is gone is deleted.
+    '''
+    with tempfile.TemporaryDirectory() as folder:
+        outputs = [os.path.join(folder, f"level_{i}.png") for i in range(3)]
+        keys = [render_key([['o', 'A']], [(i, 0)], [[(0, 1), (4, 1)]], {'dpi': 300}) for i in range(3)]
+
+        drawn = []
+        cache = RenderCache(os.path.join(folder, ".render_cache"))
+        for key, output in zip(keys, outputs):
+            render(cache, key, output, drawn)
+        assert len(drawn) == 3 and cache.stats['misses'] == 3
+
+        drawn = []
+        cache = RenderCache(os.path.join(folder, ".render_cache"))
+        os.remove(outputs[0])
+        for key, output in zip(keys, outputs):
+            render(cache, key, output, drawn)
+        assert not drawn and cache.stats['hits'] == 3
+        assert open(outputs[0], 'rb').read() == keys[0].encode('ascii')
+
+        changed = render_key([['o', 'B']], [(1, 0)], [[(0, 1), (4, 1)]], {'dpi': 300})
+        render(cache, changed, outputs[1], drawn)
+        assert drawn == [outputs[1]] and not os.path.exists(cache.entry_path(keys[1]))
+        os.remove(outputs[2])
+        assert cache.prune() == 1 and not os.path.exists(cache.entry_path(keys[2]))
+        assert sorted(RenderCache(cache.directory).index.values()) == sorted([keys[0], changed])
+    print("[TEST] Unchanged renderings reused, stale entries removed")
+
+
+if __name__ == '__main__':
+    test_render_key()
+    test_render_cache()
@@ -0,0 +1,77 @@
+import os
+import tempfile
+from ResultSink import ResultSink, read_records, solve_record, zstandard
+from LazorBoard import puzzle_fingerprint
+from Solver import Solver
+from test_checkpoint import load_board
+
+
+def records(count, start=0):
+    return [{'name': f"level_{i}.bff", 'status': 'solved', 'placements': [[i % 5, 1, 'A']], 'nodes': i}
+            for i in range(start, start + count)]
+
+
+def test_solve_record(bff_name="mad_1"):
+    '''The record of a solve holds its fingerprint, status, sorted placements and stats.'''
+    board = load_board(bff_name)
+    fingerprint = puzzle_fingerprint(board.grid, board.lasers, board.targets, board.blocks)
+    solver = Solver(board)
+    assert solver.solve()
+    record = solve_record(f"{bff_name}.bff", fingerprint, solver.result(), 0.5, nodes=solver.nodes_expanded)
+    assert record['status'] == 'solved' and record['nodes'] == solver.nodes_expanded
+    assert record['placements'] == [[r, c, t] for (r, c), t in sorted(solver.placed_blocks.items())]
+    print(f"[TEST] {bff_name}: {record}")
+
+
+def test_result_sink(count=2500):
+    '''
+    Records come back in order from plain and compressed files, reach the file every
+    flush_records records before the sink is closed, and later runs append to them.
+    '''
+    extensions = [".jsonl", ".jsonl.gz"] + ([".jsonl.zst"] if zstandard is not None else [])
+    with tempfile.TemporaryDirectory() as folder:
+        for extension in extensions:
+            path = os.path.join(folder, "results" + extension)
+            with ResultSink(path, flush_records=1000, flush_interval=60) as sink:
+                for record in records(count):
+                    sink.write(record)
+                    if sink.records == 1500:
+                        assert len(list(read_records(path))) == 1000
+            with ResultSink(path) as sink:
+                for record in records(10, count):
+                    sink.write(record)
+            assert list(read_records(path)) == records(count + 10)
+            print(f"[TEST] {extension}: {count + 10} records in {os.path.getsize(path)} bytes")
+        if zstandard is None:
+            try:
+                ResultSink(os.path.join(folder, "results.jsonl.zst"))
+            except RuntimeError:
+                pass
+            else:
+                raise AssertionError("a zstd sink was made without zstandard")
+
+
+def test_crash_recovery():
+    '''
+    A file cut in the middle of its last line or frame, as after a crash, reads without it;
+    the next sink cuts it off and appends after the last complete one.
+    '''
+    with tempfile.TemporaryDirectory() as folder:
+        for extension in (".jsonl", ".jsonl.gz"):
+            path = os.path.join(folder, "results" + extension)
+            with ResultSink(path, flush_records=100) as sink:
+                for record in records(250):
+                    sink.write(record)
+            os.truncate(path, os.path.getsize(path) - 7)
+            kept = list(read_records(path))
+            assert kept == records(len(kept)) and len(kept) == (249 if extension == ".jsonl" else 200)
+            with ResultSink(path) as sink:
+                sink.write({'name': 'after the crash'})
+            assert list(read_records(path)) == kept + [{'name': 'after the crash'}]
+            print(f"[TEST] {extension}: {len(kept)} records kept after a torn write")
+
+
+if __name__ == '__main__':
+    test_solve_record()
+    test_result_sink()
+    test_crash_recovery()
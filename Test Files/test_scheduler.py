@@ -0,0 +1,117 @@
+import asyncio
+import time
+from Scheduler import RoundRobin, solve_async
+from Solver import Solver, SolveInterrupted
+from test_checkpoint import load_board
+
+
+def test_solve_steps(bff_names=("mad_1", "yarn_5", "numbered_6", "dark_1")):
+    '''
+    One node at a time, solve_steps() expands the nodes of solve() and finds its solution,
+    with and without bitboards or nogoods; later calls return the outcome again.
+    '''
+    for bff_name in bff_names:
+        for options in ({}, {'bitboards': True}, {'learn_nogoods': True}):
+            solver = Solver(load_board(bff_name), iterative=True, **options)
+            solved = solver.solve()
+            stepped = Solver(load_board(bff_name), iterative=True, **options)
+            calls, outcome = 1, stepped.solve_steps(max_nodes=1)
+            while outcome is None:
+                assert stepped.nodes_expanded == calls
+                calls, outcome = calls + 1, stepped.solve_steps(max_nodes=1)
+            assert outcome == solved and stepped.solve_steps() == solved and stepped.solved == solved
+            assert stepped.nodes_expanded == solver.nodes_expanded == calls
+            assert stepped.placed_blocks == solver.placed_blocks
+            assert list(stepped.final_paths) == list(solver.final_paths)
+        print(f"[TEST] {bff_name}: {calls} single-node steps")
+    try:
+        Solver(load_board("mad_1")).solve_steps()
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("solve_steps() ran without the explicit stack of iterative mode")
+
+
+def test_time_slices(bff_name="mad_7", budget=1000):
+    '''Slices of budget microseconds return about on time, the solve going on between them.'''
+    solver = Solver(load_board(bff_name), iterative=True)
+    slices = []
+    outcome = None
+    while outcome is None:
+        start = time.perf_counter()
+        outcome = solver.solve_steps(max_microseconds=budget)
+        slices.append(time.perf_counter() - start)
+    slices.sort()
+    assert outcome and len(slices) > 10
+    assert slices[len(slices) // 2] < 3 * budget / 1e6
+    print(f"[TEST] {bff_name}: {len(slices)} slices of {budget} us, median {slices[len(slices) // 2] * 1e6:.0f} us")
+
+
+def test_interrupted_steps(bff_name="mad_7"):
+    '''A solve interrupted between two slices starts over at the next call.'''
+    stop = [True]
+    solver = Solver(load_board(bff_name), iterative=True, should_stop=lambda: stop[0])
+    try:
+        solver.solve_steps(max_nodes=100)
+    except SolveInterrupted:
+        pass
+    else:
+        raise AssertionError("should_stop() was not polled")
+    stop[0] = False
+    outcome = solver.solve_steps(max_nodes=10)
+    assert outcome is None and solver.nodes_expanded == 10
+    print(f"[TEST] {bff_name}: search restarted after an interruption")
+
+
+def test_round_robin(bff_names=("mad_7", "mad_1", "yarn_5", "numbered_6"), slice_nodes=50):
+    '''
+    Solves interleaved in slices take turns, every one is given slices until it is over, and
+    each ends as it does alone.
+    '''
+    scheduler = RoundRobin(slice_microseconds=None, slice_nodes=slice_nodes)
+    solvers = {}
+    for bff_name in bff_names:
+        solvers[bff_name] = Solver(load_board(bff_name), iterative=True)
+        scheduler.add(bff_name, solvers[bff_name])
+    order = [scheduler.step() for _ in bff_names]
+    assert order == list(bff_names)
+    handled = []
+    outcomes = scheduler.run(callback=lambda: handled.append(scheduler.pending))
+    assert not scheduler.pending and len(handled) == sum(scheduler.slices.values()) - len(bff_names)
+    for bff_name, solver in solvers.items():
+        alone = Solver(load_board(bff_name), iterative=True)
+        assert outcomes[bff_name] == alone.solve() and solver.placed_blocks == alone.placed_blocks
+        assert scheduler.slices[bff_name] == -(-alone.nodes_expanded // slice_nodes)
+    print(f"[TEST] round robin: {scheduler.slices}")
+
+
+def test_solve_async(bff_names=("mad_7", "yarn_5")):
+    '''Solves running as asyncio tasks leave the loop free for other tasks.'''
+    async def main():
+        ticks = 0
+        done = asyncio.Event()
+
+        async def ticker():
+            nonlocal ticks
+            while not done.is_set():
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        task = asyncio.create_task(ticker())
+        outcomes = await asyncio.gather(*(solve_async(Solver(load_board(bff_name), iterative=True))
+                                          for bff_name in bff_names))
+        done.set()
+        await task
+        return outcomes, ticks
+
+    outcomes, ticks = asyncio.run(main())
+    assert all(outcomes) and ticks > 10
+    print(f"[TEST] asyncio: {len(bff_names)} solves, the loop ticked {ticks} times meanwhile")
+
+
+if __name__ == '__main__':
+    test_solve_steps()
+    test_time_slices()
+    test_interrupted_steps()
+    test_round_robin()
+    test_solve_async()
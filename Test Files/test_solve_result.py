@@ -0,0 +1,43 @@
+from LazorBoard import LazorBoard
+from Classes import Board
+from Solver import Solver
+from SolveResult import SolveResult
+
+
+def test_solve_result(bff_name="mad_1"):
+    '''
+    Builds a SolveResult from a solved level and reads it back from bytes and from a
+    shared memory block; both must match the solver's placements and paths.
+    '''
+    lazor_data = LazorBoard.from_file(f"bff_files/{bff_name}.bff")
+    board = Board(grid=lazor_data.grid, lasers=lazor_data.lasers,
+                  targets=lazor_data.targets, blocks=lazor_data.blocks)
+    solver = Solver(board)
+    assert solver.solve()
+    result = solver.result()
+
+    try:
+        result.solved = False
+        assert False, "SolveResult must be immutable"
+    except AttributeError:
+        pass
+
+    copy = SolveResult.from_buffer(result.to_bytes())
+    shm = result.to_shared_memory()
+    try:
+        shared = SolveResult.from_shared_memory(shm.name)
+        for other in (copy, shared):
+            assert other.solved
+            assert other.placed_blocks() == solver.placed_blocks
+            assert other.paths() == solver.final_paths
+            assert other.grid == board.grid
+            assert other.targets == lazor_data.targets
+        shared.release()
+    finally:
+        shm.close()
+        shm.unlink()
+    print(f"[TEST] {bff_name}: result of {result.nbytes} bytes round-trips through shared memory")
+
+
+if __name__ == '__main__':
+    test_solve_result()
@@ -0,0 +1,75 @@
+from Classes import Board
+from Solver import Solver
+from SolverContext import SolverContext, get_context
+from StaticAnalysis import analyze_board
+from test_checkpoint import load_board
+
+FLAGS = dict(ray_jump=True, bitboards=True, prune_dead_cells=True, bidirectional=True)
+
+
+def variant(board, targets):
+    '''The same grid and lasers as board with other targets, as in a level pack.'''
+    return Board(grid=[list(row) for row in board.grid], lasers=list(board.lasers),
+                 targets=targets, blocks=dict(board.blocks))
+
+
+def test_context_shared_across_variants(bff_name="mad_7"):
+    '''
+    Boards with the same grid share one context; the analysis made with it is the one made
+    without, and a context of another layout is refused.
+    '''
+    board = load_board(bff_name)
+    other = variant(board, board.targets[:1])
+    first, second = Solver(board, **FLAGS), Solver(other, **FLAGS)
+    assert first.context is second.context is get_context(board.grid)
+    assert first.solve() and second.solve()
+
+    analysis = analyze_board(second.geometry, second.original_grid, other.lasers,
+                             second.original_targets, second.original_blocks)
+    assert analysis.reflect_cones == second.analysis.reflect_cones
+    assert analysis.live_cells == second.analysis.live_cells
+
+    try:
+        Solver(load_board("tiny_5"), context=first.context)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("a context of another grid was accepted")
+    print(f"[TEST] {bff_name}: one context for both variants")
+
+
+def test_context_shared_memory(bff_names=("mad_7", "yarn_5", "dark_1")):
+    '''
+    A context attached from shared memory has the same tables as the one it was written from,
+    and solving with it gives the same solutions.
+    '''
+    for bff_name in bff_names:
+        board = load_board(bff_name)
+        built = SolverContext(board.grid).build()
+        shm = built.to_shared_memory()
+        try:
+            attached = SolverContext.from_shared_memory(shm.name)
+        finally:
+            shm.close()
+            shm.unlink()
+        assert attached.key == built.key
+        assert attached.geometry.step_cells == built.geometry.step_cells
+        assert attached.ray_lines().points == built.ray_lines().points
+        assert attached.ray_lines().cell_states == built.ray_lines().cell_states
+        for can_reflect in (False, True):
+            assert attached.beam_edges(can_reflect) == built.beam_edges(can_reflect)
+        assert attached.ray_cells() == built.ray_cells()
+        assert attached.cell_bits() == built.cell_bits()
+
+        for flags in ({}, FLAGS):
+            expected = Solver(load_board(bff_name), **flags)
+            solver = Solver(load_board(bff_name), context=attached, **flags)
+            assert solver.solve() == expected.solve()
+            assert solver.placed_blocks == expected.placed_blocks
+            assert solver.nodes_expanded == expected.nodes_expanded
+        print(f"[TEST] {bff_name}: attached context of {shm.size} bytes")
+
+
+if __name__ == '__main__':
+    test_context_shared_across_variants()
+    test_context_shared_memory()
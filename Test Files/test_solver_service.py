@@ -0,0 +1,64 @@
+import asyncio
+from SolverService import SolverService, parse_puzzle, solve_puzzle
+
+
+def test_solver_service(bff_name="mad_1", copies=5):
+    '''
+    Sends several identical requests at once and checks that they share one solve,
+    then cancels a slow solve and checks that its waiter is released.
+    '''
+    with open(f"bff_files/{bff_name}.bff", 'rb') as file:
+        puzzle, _ = parse_puzzle(file.read())
+    with open("bff_files/mad_7.bff", 'rb') as file:
+        slow_puzzle, _ = parse_puzzle(file.read())
+
+    async def run():
+        service = SolverService(workers=1)
+        try:
+            results = await asyncio.gather(*(service.solve(puzzle) for _ in range(copies)))
+            assert all(r['status'] == 'solved' for r in results)
+            assert service.stats['solves'] == 1 and service.stats['coalesced'] == copies - 1
+
+            waiter = asyncio.ensure_future(service.solve(slow_puzzle))
+            await asyncio.sleep(0.05)
+            assert service.cancel(waiter_fingerprint(service))
+            assert (await waiter)['status'] == 'cancelled'
+
+            timed_out = await service.solve(slow_puzzle, deadline=0.01)
+            assert timed_out['status'] == 'timeout'
+        finally:
+            service.close()
+
+    def waiter_fingerprint(service):
+        return next(iter(service.jobs))
+
+    asyncio.run(run())
+    print(f"[TEST] {bff_name}: {copies} requests coalesced, cancel and deadline honoured")
+
+
+def test_max_solve_time(bff_name="mad_7"):
+    '''
+    A solve stopped by its time limit reports a timeout, not a cancel, and is counted as one;
+    once it has finished it can no longer be cancelled, even before its slot is released.
+    '''
+    with open(f"bff_files/{bff_name}.bff", 'rb') as file:
+        puzzle, _ = parse_puzzle(file.read())
+    assert solve_puzzle(puzzle, time_limit=0.001)['status'] == 'timeout'
+
+    async def run():
+        service = SolverService(workers=1, max_solve_time=0.001)
+        try:
+            result = await service.solve(puzzle)
+            assert not service.cancel(result['fingerprint'])
+            return result, service.stats
+        finally:
+            service.close()
+
+    result, stats = asyncio.run(run())
+    assert result['status'] == 'timeout' and stats['timeouts'] == 1 and stats['cancelled'] == 0
+    print(f"[TEST] {bff_name}: stopped by max_solve_time after {result['nodes']} nodes")
+
+
+if __name__ == '__main__':
+    test_solver_service()
+    test_max_solve_time()
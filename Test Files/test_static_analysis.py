@@ -0,0 +1,37 @@
+from Solver import Solver
+from Verifier import verify
+from test_checkpoint import load_board
+
+
+def test_unreachable_target(bff_name="mad_1"):
+    '''
+    Without A or C blocks no beam can turn, so targets off the straight beam lines are
+    unreachable; solve() must give up before expanding a single node.
+    '''
+    board = load_board(bff_name)
+    board.blocks = {'A': 0, 'B': 3, 'C': 0}
+    solver = Solver(board)
+    assert not solver.solve()
+    assert solver.analysis.unreachable_targets
+    assert solver.nodes_expanded == 0
+    print(f"[TEST] {bff_name}: unreachable targets {solver.analysis.unreachable_targets} rejected instantly")
+
+
+def test_prune_dead_cells(bff_name="numbered_6"):
+    '''
+    Solves a level with dead-cell pruning; the solution must verify and the search must
+    expand fewer nodes than the unpruned one.
+    '''
+    plain = Solver(load_board(bff_name))
+    pruned = Solver(load_board(bff_name), prune_dead_cells=True)
+    assert plain.solve() and pruned.solve()
+    assert verify(load_board(bff_name), pruned.placed_blocks)
+    assert not set(pruned.placed_blocks) & pruned.analysis.dead_cells
+    assert pruned.nodes_expanded < plain.nodes_expanded
+    print(f"[TEST] {bff_name}: {len(pruned.analysis.dead_cells)} dead cells, "
+          f"{plain.nodes_expanded} -> {pruned.nodes_expanded} nodes")
+
+
+if __name__ == '__main__':
+    test_unreachable_target()
+    test_prune_dead_cells()
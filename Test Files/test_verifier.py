@@ -0,0 +1,44 @@
+from LazorBoard import LazorBoard
+from Classes import Board
+from Solver import Solver
+from Verifier import verify
+
+
+def load_board(bff_name):
+    lazor_data = LazorBoard.from_file(f"bff_files/{bff_name}.bff")
+    return Board(grid=lazor_data.grid, lasers=lazor_data.lasers,
+                 targets=lazor_data.targets, blocks=lazor_data.blocks)
+
+
+def test_verifier(bff_name="mad_4"):
+    '''
+    Verifies the solver's own solution (as placements and as a solved grid), then a broken
+    copy of it and an illegal placement.
+    '''
+    solved_board = load_board(bff_name)
+    solver = Solver(solved_board)
+    assert solver.solve()
+
+    board = load_board(bff_name)
+    assert verify(board, solver.placed_blocks)
+    assert verify(board, solved_board.grid)
+
+    # Moving one block away must miss at least one target
+    (r, c), block_type = next(iter(solver.placed_blocks.items()))
+    broken = dict(solver.placed_blocks)
+    del broken[(r, c)]
+    result = verify(board, broken, trace=True)
+    assert not result and result.missed_targets
+    assert result.missed_targets == result.trace.missed_targets()
+
+    # Blocks can only go on 'o' cells, and not more than the board provides
+    x_cells = [(r, c) for r, row in enumerate(board.grid) for c, cell in enumerate(row) if cell != 'o']
+    if x_cells:
+        assert verify(board, {x_cells[0]: 'A'}).errors
+    too_many = {(r, c): 'C' for r, row in enumerate(board.grid) for c, cell in enumerate(row) if cell == 'o'}
+    assert verify(board, too_many).errors
+    print(f"[TEST] {bff_name}: verifier accepts the solution and rejects broken ones")
+
+
+if __name__ == '__main__':
+    test_verifier()